@@ -0,0 +1,355 @@
+import asyncio
+import logging
+import random
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+
+import httpx
+
+from sqlalchemy import text
+
+from app import config, crud, database, locks, metrics
+
+logger = logging.getLogger(__name__)
+
+# --- TELEGRAM ALERTS (transactional outbox) ---
+# Request handlers never talk to Telegram. They stage alert rows in
+# alert_outbox inside their own transaction (enqueue) and wake the
+# dispatcher (on Postgres through NOTIFY, it may run in another process).
+# The dispatcher runs in one API process at a time, holding an advisory lock
+# (app/locks.py): the Telegram limits are per bot, so a dispatcher per worker
+# would send N times too fast. It is a background task that
+#   1. waits ALERT_COALESCE_SECONDS after a wake-up so a burst (one strategy
+#      firing across hundreds of accounts) piles up,
+#   2. claims due rows with a lease (SKIP LOCKED: workers never share a row),
+#   3. merges each chat's alerts into as few messages as fit Telegram's limit,
+#   4. sends them through a global and a per-chat token bucket,
+#   5. marks rows sent, or reschedules them with jittered exponential backoff
+#      (429: Telegram's retry_after) until ALERT_MAX_ATTEMPTS.
+# Pending rows survive restarts; a worker that dies mid-send loses its lease
+# and the lock, another one takes over and sends the rows again (at-least-once).
+
+MAX_MESSAGE_CHARS = 4096      # Telegram sendMessage text limit
+LEASE_SECONDS = 120           # Claimed rows are invisible to other dispatchers this long
+MAX_CHAT_BUCKETS = 10000      # Per-chat limiters kept (LRU)
+NOTIFY_CHANNEL = "alert_outbox"
+
+
+class TelegramError(Exception):
+    def __init__(self, message, retry_after=None, permanent=False):
+        super().__init__(message)
+        self.retry_after = retry_after    # Seconds, from a 429
+        self.permanent = permanent        # Bad chat / bot blocked: retrying won't help
+
+
+class TokenBucket:
+    """
+    rate tokens per second, bursts up to capacity. acquire() reserves a token
+    right away (the balance may go negative) and sleeps until it is due, so
+    waiters are served in arrival order without polling.
+    """
+    __slots__ = ("rate", "capacity", "tokens", "updated")
+
+    def __init__(self, rate, capacity=1.0):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self) -> float:
+        """Take a token; returns how many seconds until it may be used."""
+        self._refill(time.monotonic())
+        self.tokens -= 1.0
+        return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+    def pause(self, seconds):
+        """Nothing may go out for 'seconds' (a 429's retry_after)."""
+        self._refill(time.monotonic())
+        self.tokens = min(self.tokens, -seconds * self.rate)
+
+    async def acquire(self):
+        delay = self.reserve()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+class TelegramClient:
+    """Pooled httpx client for the Bot API; opened/closed with the dispatcher."""
+
+    def __init__(self, token, base_url, timeout=10.0, max_connections=50):
+        self.token = token
+        self.base_url = base_url
+        self.timeout = httpx.Timeout(timeout, connect=3.0)
+        self.limits = httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections)
+        self._client = None
+
+    async def open(self):
+        if self._client is None:
+            self._client = httpx.AsyncClient(base_url=self.base_url, timeout=self.timeout, limits=self.limits)
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def send_message(self, chat_id: str, text: str):
+        if self._client is None:
+            raise TelegramError("Telegram client is not open")
+        start = time.perf_counter()
+        status = "error"
+        try:
+            response = await self._client.post(
+                f"/bot{self.token}/sendMessage",
+                json={"chat_id": chat_id, "text": text, "disable_web_page_preview": True},
+            )
+            status = response.status_code
+        except httpx.RequestError as e:
+            raise TelegramError(f"{type(e).__name__}: {e}") from e
+        finally:
+            metrics.telegram_requests.observe(time.perf_counter() - start, "sendMessage", status)
+
+        if response.status_code == 200:
+            return
+        try:
+            body = response.json()
+        except ValueError:
+            body = {}
+        description = body.get("description") or f"HTTP {response.status_code}"
+        if response.status_code == 429:
+            retry_after = (body.get("parameters") or {}).get("retry_after", 1)
+            raise TelegramError(description, retry_after=float(retry_after))
+        # 400 (chat not found, bad text) / 403 (bot blocked) won't get better
+        raise TelegramError(description, permanent=response.status_code in (400, 403))
+
+
+def coalesce(alerts, limit=MAX_MESSAGE_CHARS):
+    """
+    Pack one chat's alerts (rows with .id and .text, oldest first) into as
+    few messages as fit 'limit'. Returns [(text, [alert ids])].
+    """
+    messages = []
+    text, ids = "", []
+    for alert in alerts:
+        part = alert.text[:limit]
+        if ids and len(text) + 2 + len(part) > limit:
+            messages.append((text, ids))
+            text, ids = "", []
+        text = f"{text}\n\n{part}" if ids else part
+        ids.append(alert.id)
+    if ids:
+        messages.append((text, ids))
+    return messages
+
+
+def fanout_alerts(strategy, accounts, result) -> list[tuple[str, str]]:
+    """(chat id, text) per child order of a fan-out, for accounts with a Telegram id."""
+    chats = {account.id: account.telegram_id for account in accounts if account.telegram_id}
+    label = strategy.name or strategy.ticker
+    alerts = []
+    for order, ack in zip(result.orders, result.acks):
+        chat_id = chats.get(order.account_id)
+        if chat_id is None:
+            continue
+        contract = order.ticker
+        if order.option_type:
+            contract += f" {order.option_type}"
+            if order.strike_value is not None:
+                contract += f" {order.strike_value:g}{'d' if order.strike_mode == 'delta' else ''}"
+            if order.expiration_days is not None:
+                contract += f" {order.expiration_days}DTE"
+        text = f"{label} leg {order.leg_index}: {order.action.upper()} {order.quantity:g} {contract} - {ack.status}"
+        if ack.error:
+            text += f" ({ack.error})"
+        alerts.append((chat_id, text))
+    return alerts
+
+
+class AlertDispatcher:
+    def __init__(self, telegram: TelegramClient, global_rate=30.0, chat_rate=1.0, coalesce_window=1.0,
+                 batch_size=500, max_attempts=8, poll_interval=5.0, backoff_base=2.0, backoff_max=600.0,
+                 max_concurrency=100):
+        self.telegram = telegram
+        # No burst allowance: a full second's worth at once is exactly what trips flood control
+        self.global_bucket = TokenBucket(global_rate)
+        self.chat_rate = chat_rate
+        self.coalesce_window = coalesce_window
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self.poll_interval = poll_interval
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.max_concurrency = max_concurrency
+
+        self._chat_buckets = OrderedDict()  # chat id -> TokenBucket, LRU
+        self._wakeup = asyncio.Event()
+        self._task = None
+        self._stopping = False
+        self._leader = locks.AdvisoryLock("alert-dispatcher")
+
+        self.sent = 0
+        self.messages = 0
+        self.failed = 0
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.telegram.token)
+
+    # --- REQUEST PATH ---
+
+    async def enqueue(self, db, alerts: list[tuple[str, str]]):
+        """
+        Stage (chat id, text) alerts in db's transaction; the caller commits
+        and then calls wake(). On Postgres the commit also wakes the
+        dispatcher if another process runs it. No-op when no bot token is
+        configured.
+        """
+        if not self.enabled or not alerts:
+            return
+        now = datetime.now(timezone.utc)
+        await crud.enqueue_alerts_async(db, [
+            {"chat_id": str(chat_id), "text": text[:MAX_MESSAGE_CHARS], "created_at": now, "next_attempt_at": now}
+            for chat_id, text in alerts
+        ])
+        if db.get_bind().dialect.name == "postgresql":
+            await db.execute(text("SELECT pg_notify(:channel, '')"), {"channel": NOTIFY_CHANNEL})
+
+    def wake(self):
+        self._wakeup.set()
+
+    # --- SENDING ---
+
+    def _chat_bucket(self, chat_id) -> TokenBucket:
+        bucket = self._chat_buckets.get(chat_id)
+        if bucket is None:
+            bucket = self._chat_buckets[chat_id] = TokenBucket(self.chat_rate)
+            if len(self._chat_buckets) > MAX_CHAT_BUCKETS:
+                self._chat_buckets.popitem(last=False)
+        else:
+            self._chat_buckets.move_to_end(chat_id)
+        return bucket
+
+    def _backoff(self, attempts) -> float:
+        # Full jitter on base * 2^attempts, capped
+        return random.uniform(0.5, 1.0) * min(self.backoff_max, self.backoff_base * (2 ** attempts))
+
+    async def _send_chat(self, chat_id, alerts, semaphore) -> list[dict]:
+        """Send one chat's messages in order; stop at the first failure and reschedule the rest."""
+        attempts = {alert.id: alert.attempts for alert in alerts}
+        bucket = self._chat_bucket(chat_id)
+        outcomes = []
+        messages = coalesce(alerts)
+        async with semaphore:
+            for position, (text, ids) in enumerate(messages):
+                await bucket.acquire()
+                await self.global_bucket.acquire()
+                now = datetime.now(timezone.utc)
+                try:
+                    await self.telegram.send_message(chat_id, text)
+                except TelegramError as e:
+                    if e.retry_after:
+                        bucket.pause(e.retry_after)
+                    tried = max(attempts[i] for i in ids) + 1
+                    give_up = e.permanent or tried >= self.max_attempts
+                    retry_at = now + timedelta(seconds=e.retry_after or self._backoff(tried))
+                    outcomes += [self._outcome(i, "failed" if give_up else "pending", 1, retry_at, None, str(e))
+                                 for i in ids]
+                    metrics.alerts.inc("failed" if give_up else "retry", amount=len(ids))
+                    # Keep the chat's order: the rest waits for the same retry
+                    outcomes += [self._outcome(i, "pending", 0, retry_at, None, None)
+                                 for _, rest in messages[position + 1:] for i in rest]
+                    if give_up:
+                        self.failed += len(ids)
+                        logger.warning("Telegram alert to %s failed for good: %s", chat_id, e)
+                    break
+                outcomes += [self._outcome(i, "sent", 1, now, now, None) for i in ids]
+                metrics.alerts.inc("sent", amount=len(ids))
+                self.sent += len(ids)
+                self.messages += 1
+        return outcomes
+
+    @staticmethod
+    def _outcome(alert_id, status, attempted, next_attempt_at, sent_at, error):
+        return {"alert_id": alert_id, "status": status, "attempted": attempted,
+                "next_attempt_at": next_attempt_at, "sent_at": sent_at, "last_error": error}
+
+    async def run_once(self) -> int:
+        """Claim, send and record one batch of due alerts. Returns how many were claimed."""
+        now = datetime.now(timezone.utc)
+        async with database.AsyncSessionLocal() as db:
+            rows = await crud.claim_due_alerts_async(db, now, now + timedelta(seconds=LEASE_SECONDS),
+                                                     self.batch_size)
+        if not rows:
+            return 0
+
+        by_chat = {}
+        for row in rows:
+            by_chat.setdefault(row.chat_id, []).append(row)
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        results = await asyncio.gather(*(self._send_chat(chat_id, alerts, semaphore)
+                                         for chat_id, alerts in by_chat.items()))
+
+        async with database.AsyncSessionLocal() as db:
+            await crud.finish_alerts_async(db, [outcome for outcomes in results for outcome in outcomes])
+            await db.commit()
+        return len(rows)
+
+    async def _run(self):
+        await self.telegram.open()
+        while not self._stopping:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+                # Woken by new alerts: let the rest of the burst arrive
+                await asyncio.sleep(self.coalesce_window)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                if not await self._lead():
+                    continue  # Another process sends
+                # Full batches mean there is more waiting
+                while not self._stopping and await self.run_once() >= self.batch_size:
+                    pass
+            except Exception:
+                logger.exception("Alert dispatch failed, retrying in %.0fs", self.poll_interval)
+
+    async def _lead(self) -> bool:
+        """Hold (or take over) the dispatcher lock; False while another process has it."""
+        if self._leader.held and await self._leader.check():
+            return True
+        if not await self._leader.acquire():
+            return False
+        logger.info("This process now sends the Telegram alerts")
+        return True
+
+    def start(self):
+        if self.enabled and self._task is None:
+            self._stopping = False
+            self._task = asyncio.create_task(self._run(), name="alert-dispatcher")
+
+    async def stop(self):
+        """Finish the batch in flight (rows left pending go out after the next start)."""
+        if self._task is not None:
+            self._stopping = True
+            self._wakeup.set()
+            await self._task
+            self._task = None
+        await self._leader.release()
+        await self.telegram.close()
+
+
+telegram = TelegramClient(config.settings.TELEGRAM_BOT_TOKEN, config.settings.TELEGRAM_API_URL)
+
+dispatcher = AlertDispatcher(
+    telegram,
+    global_rate=config.settings.TELEGRAM_GLOBAL_RATE,
+    chat_rate=config.settings.TELEGRAM_CHAT_RATE,
+    coalesce_window=config.settings.ALERT_COALESCE_SECONDS,
+    batch_size=config.settings.ALERT_BATCH_SIZE,
+    max_attempts=config.settings.ALERT_MAX_ATTEMPTS,
+    poll_interval=config.settings.ALERT_POLL_SECONDS,
+)
@@ -0,0 +1,216 @@
+import asyncio
+import json
+import logging
+import threading
+import uuid
+from datetime import date, datetime, timezone
+from decimal import Decimal
+
+from sqlalchemy import insert, text
+
+from app import config, database, models
+
+logger = logging.getLogger(__name__)
+
+# --- APPEND-ONLY AUDIT LOG ---
+# Who changed what. crud and the routers call writer.record() once a change
+# has committed; record() only appends a tuple to an in-memory buffer, so the
+# request path does no I/O. A background task writes the buffer in batches:
+# on Postgres with ONE COPY per batch (asyncpg binary COPY, no per-row INSERT)
+# into audit_events, which is range-partitioned by month on created_at.
+# History queries carry a time bound (cursor / lookback), so the planner only
+# touches the partitions that can match; retention is DROP TABLE of a month.
+#
+# Monthly partitions are created ahead by 'python -m app.bootstrap create'
+# and, should a batch reach a month that has none yet, right before its COPY.
+
+TABLE = models.AuditEvent.__tablename__
+COLUMNS = ("id", "created_at", "actor_id", "entity_type", "entity_id", "action", "changes")
+
+# If the DB is down, stop buffering past this and drop the oldest events
+MAX_PENDING = 200000
+
+
+def _jsonable(value):
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, uuid.UUID):
+        return str(value)
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+# --- PARTITIONS (Postgres) ---
+
+def month_start(moment: datetime) -> date:
+    moment = moment.astimezone(timezone.utc) if moment.tzinfo else moment
+    return date(moment.year, moment.month, 1)
+
+
+def next_month(month: date) -> date:
+    return date(month.year + month.month // 12, month.month % 12 + 1, 1)
+
+
+def partition_name(month: date) -> str:
+    return f"{TABLE}_{month:%Y_%m}"
+
+
+def upcoming_months(ahead: int, today: date = None) -> list[date]:
+    """This month and the next 'ahead' ones."""
+    months = [month_start(datetime.now(timezone.utc)) if today is None else date(today.year, today.month, 1)]
+    for _ in range(ahead):
+        months.append(next_month(months[-1]))
+    return months
+
+
+def ensure_partitions(connection, months):
+    """Create the monthly partitions for 'months' (first days, UTC) if missing. No-op off Postgres."""
+    if connection.dialect.name != "postgresql":
+        return
+    for month in sorted(set(months)):
+        connection.execute(text(
+            f"CREATE TABLE IF NOT EXISTS {partition_name(month)} PARTITION OF {TABLE} "
+            f"FOR VALUES FROM ('{month.isoformat()} 00:00:00+00') TO ('{next_month(month).isoformat()} 00:00:00+00')"
+        ))
+
+
+async def write_events(db, events: list[tuple], known_partitions=frozenset()) -> set:
+    """
+    Write 'events' (tuples in COLUMNS order, 'changes' not yet encoded) in
+    the session's transaction. Returns the months whose partitions it created.
+    """
+    connection = await db.connection()
+    records = [
+        (*event[:6], None if event[6] is None else json.dumps(event[6], default=_jsonable))
+        for event in events
+    ]
+    if connection.dialect.name != "postgresql":
+        # Dev / benchmarks: one multi-row INSERT
+        await connection.execute(insert(models.AuditEvent), [
+            dict(zip(COLUMNS, (*record[:6], None if record[6] is None else json.loads(record[6]))))
+            for record in records
+        ])
+        return set()
+
+    months = {month_start(record[1]) for record in records} - set(known_partitions)
+    if months:
+        await connection.run_sync(ensure_partitions, months)
+    raw = await connection.get_raw_connection()
+    await raw.driver_connection.copy_records_to_table(TABLE, records=records, columns=COLUMNS)
+    return months
+
+
+class AuditLogWriter:
+    def __init__(self, batch_size=1000, flush_interval=1.0, max_pending=MAX_PENDING):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+
+        self._events = []
+        # record() is also called from threadpool routes (the sync user endpoints)
+        self._lock = threading.Lock()
+        self._loop = None
+        self._wakeup = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        self._partitions = set()    # Months whose partition is known to exist
+        self._task = None
+        self._stopping = False
+
+        self.flushed_events = 0
+        self.dropped_events = 0
+
+    @property
+    def pending(self) -> int:
+        return len(self._events)
+
+    # --- REQUEST PATH (no I/O) ---
+
+    def record(self, action: str, entity_type: str, entity_id, actor_id=None, changes=None):
+        """Queue one event, stamped now. 'changes' is any JSON-able dict (Decimal/UUID/datetime allowed)."""
+        event = (uuid.uuid4(), datetime.now(timezone.utc), actor_id, entity_type, entity_id, action, changes)
+        with self._lock:
+            self._events.append(event)
+            self._trim()
+            full = len(self._events) >= self.batch_size
+        if full:
+            self._wake()
+
+    def _trim(self):
+        overflow = len(self._events) - self.max_pending
+        if overflow > 0:
+            del self._events[:overflow]
+            self.dropped_events += overflow
+            logger.warning("Audit log backlog full, dropped %d events", overflow)
+
+    def _wake(self):
+        loop = self._loop
+        if loop is None:
+            return
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is loop:
+            self._wakeup.set()
+        else:
+            loop.call_soon_threadsafe(self._wakeup.set)
+
+    # --- BACKGROUND FLUSH ---
+
+    async def flush(self):
+        async with self._flush_lock:
+            # Swap the buffer out; events recorded from now on go to the new one
+            with self._lock:
+                events, self._events = self._events, []
+            if not events:
+                return
+
+            try:
+                async with database.AsyncSessionLocal() as db:
+                    created = await write_events(db, events, self._partitions)
+                    await db.commit()
+            except Exception:
+                logger.exception("Audit log flush failed, will retry %d events", len(events))
+                with self._lock:
+                    self._events[:0] = events
+                    self._trim()
+                return
+
+            self._partitions |= created
+            self.flushed_events += len(events)
+
+    async def _run(self):
+        while not self._stopping:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()
+
+    def start(self):
+        if self._task is None:
+            self._stopping = False
+            self._loop = asyncio.get_running_loop()
+            self._task = asyncio.create_task(self._run(), name="audit-log-writer")
+
+    async def stop(self):
+        """Stop the background task and drain everything still queued."""
+        if self._task is not None:
+            # Not cancel(): a flush in progress must finish, or its batch is lost
+            self._stopping = True
+            self._wakeup.set()
+            await self._task
+            self._task = None
+            self._loop = None
+        await self.flush()
+
+    def stats(self) -> dict:
+        return {"pending": self.pending, "flushed": self.flushed_events, "dropped": self.dropped_events}
+
+
+writer = AuditLogWriter(
+    batch_size=config.settings.AUDIT_LOG_BATCH_SIZE,
+    flush_interval=config.settings.AUDIT_LOG_FLUSH_SECONDS,
+)
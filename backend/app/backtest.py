@@ -0,0 +1,473 @@
+"""
+Historical backtesting of stored strategies.
+
+    python -m app.backtest import-csv SPY spy_daily.csv      # ts,open,high,low,close,volume[,iv]
+    python -m app.backtest run --ticker SPY --start 2015-01-01 --workers 4 --out results.json
+    python -m app.backtest run --strategy-id <uuid> [--strategy-id ...]
+
+Run from the 'backend' folder ('run' reads the strategies from DATABASE_URL).
+"""
+import argparse
+import asyncio
+import csv
+import json
+import multiprocessing
+import os
+import sys
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import asdict, dataclass, field
+from datetime import datetime, timezone
+from pathlib import Path
+
+import numpy as np
+
+from app import config, pricing
+
+# --- MARKET DATA (memory-mapped columns) ---
+# One directory per ticker with one .npy file per column, bars sorted by ts
+# (epoch seconds). np.load(mmap_mode="r") maps them without reading or
+# copying; date windows are views, and every worker process maps the same
+# files, so the OS page cache holds one read-only copy for all of them.
+# An optional 'iv' column (annualized implied vol per bar) prices the option
+# legs; without it a flat vol is used.
+
+COLUMNS = ("ts", "open", "high", "low", "close", "volume")
+OPTIONAL_COLUMNS = ("iv",)
+SECONDS_PER_DAY = 86400
+SECONDS_PER_YEAR = 365.0 * SECONDS_PER_DAY
+DEFAULT_DTE = 30
+CONTRACT_MULTIPLIER = 100.0     # Shares per listed equity option contract
+
+
+class BacktestError(ValueError):
+    """Bad input: unknown ticker, empty window, unusable strategy."""
+
+
+class BarData:
+    def __init__(self, ticker, ts, close, iv=None):
+        self.ticker = ticker
+        self.ts = ts
+        self.close = close
+        self.iv = iv
+
+    @classmethod
+    def open(cls, data_dir, ticker) -> "BarData":
+        folder = Path(data_dir) / ticker
+        if not (folder / "ts.npy").exists():
+            raise BacktestError(f"No bar data for {ticker} in {data_dir}")
+        iv_path = folder / "iv.npy"
+        return cls(
+            ticker,
+            np.load(folder / "ts.npy", mmap_mode="r"),
+            np.load(folder / "close.npy", mmap_mode="r"),
+            np.load(iv_path, mmap_mode="r") if iv_path.exists() else None,
+        )
+
+    def window(self, start=None, end=None) -> "BarData":
+        """Bars with start <= ts < end (epoch seconds), as views."""
+        lo = 0 if start is None else int(np.searchsorted(self.ts, start, "left"))
+        hi = len(self.ts) if end is None else int(np.searchsorted(self.ts, end, "left"))
+        return BarData(self.ticker, self.ts[lo:hi], self.close[lo:hi],
+                       None if self.iv is None else self.iv[lo:hi])
+
+
+def write_bars(data_dir, ticker, columns: dict):
+    """Save columns (COLUMNS, optionally 'iv') for a ticker, sorted by ts."""
+    folder = Path(data_dir) / ticker
+    folder.mkdir(parents=True, exist_ok=True)
+    order = np.argsort(np.asarray(columns["ts"]), kind="stable")
+    for name in COLUMNS + OPTIONAL_COLUMNS:
+        if name in columns:
+            dtype = np.int64 if name == "ts" else np.float64
+            np.save(folder / f"{name}.npy", np.asarray(columns[name], dtype=dtype)[order])
+
+
+def import_csv(data_dir, ticker, path):
+    """CSV with a header row; ts as epoch seconds or ISO date/datetime."""
+    with open(path, newline="") as f:
+        rows = list(csv.DictReader(f))
+    if not rows:
+        raise BacktestError(f"{path} has no rows")
+
+    def parse_ts(value):
+        try:
+            return int(float(value))
+        except ValueError:
+            parsed = datetime.fromisoformat(value)
+            if parsed.tzinfo is None:
+                parsed = parsed.replace(tzinfo=timezone.utc)
+            return int(parsed.timestamp())
+
+    columns = {"ts": [parse_ts(r["ts"]) for r in rows]}
+    for name in COLUMNS[1:] + OPTIONAL_COLUMNS:
+        if name in rows[0]:
+            columns[name] = [float(r[name] or "nan") for r in rows]
+    write_bars(data_dir, ticker, columns)
+    return len(rows)
+
+
+# --- SIMULATION ---
+
+@dataclass
+class FillModel:
+    """Fills around the Black-Scholes theoretical value (options) or the bar close (underlying)."""
+    half_spread: float = 0.02       # Fraction of the option price paid on each side
+    slippage_bps: float = 2.0       # Underlying legs
+    commission: float = 0.65        # Per unit of leg quantity (option contract / share), per fill
+
+    def fill(self, theo, side, is_option):
+        # side: +1 buying, -1 selling; you always pay the spread
+        cost = np.where(is_option, self.half_spread, self.slippage_bps / 1e4)
+        return theo * (1.0 + side * cost)
+
+
+@dataclass
+class BacktestParams:
+    """
+    P&L is in currency: option leg quantities are contracts of
+    contract_multiplier shares (prices are per share), underlying leg
+    quantities are shares.
+    """
+    start: int = None               # Epoch seconds, inclusive
+    end: int = None                 # Epoch seconds, exclusive
+    vol: float = 0.20               # When the data has no 'iv' column
+    rate: float = 0.0
+    strike_step: float = 1.0        # Delta-targeted strikes are rounded to this grid
+    contract_multiplier: float = CONTRACT_MULTIPLIER
+    fill: FillModel = field(default_factory=FillModel)
+    include_equity: bool = False
+
+
+def strategy_spec(strategy) -> dict:
+    """Picklable description of a models.Strategy (legs loaded) for the worker processes."""
+    return {
+        "id": str(strategy.id),
+        "ticker": strategy.ticker,
+        "legs": [
+            {
+                "action": leg.action,
+                "option_type": leg.option_type,
+                "quantity": float(leg.quantity or 0),
+                "strike_mode": leg.strike_mode or "fixed",
+                "strike_value": None if leg.strike_value is None else float(leg.strike_value),
+                "expiration_days": None if leg.expiration_days is None else float(leg.expiration_days),
+            }
+            for leg in sorted(strategy.legs, key=lambda leg: int(leg.leg_index))
+        ],
+    }
+
+
+def run_backtest(spec: dict, params: BacktestParams, data: BarData) -> dict:
+    """
+    Replay one strategy over the bars: open all legs at a bar close, mark
+    them to market every bar, close everything at the first leg's expiry
+    and re-open on the same bar. Each open/close cycle is one trade.
+    """
+    bars = data.window(params.start, params.end)
+    ts, close = bars.ts, bars.close
+    n = len(ts)
+    if n < 2:
+        raise BacktestError(f"Not enough bars for {spec['ticker']} in the requested window")
+    vols = bars.iv if bars.iv is not None else np.full(n, params.vol)
+
+    legs = spec["legs"]
+    if not legs:
+        raise BacktestError("Strategy has no legs")
+    qty = np.array([(1.0 if leg["action"] == "buy" else -1.0) * leg["quantity"] for leg in legs])
+    is_option = np.array([bool(leg["option_type"]) for leg in legs])
+    is_call = np.array([leg["option_type"] == "call" for leg in legs])
+    by_delta = np.array([leg["strike_mode"] == "delta" for leg in legs])
+    target = np.array([np.nan if leg["strike_value"] is None else leg["strike_value"] for leg in legs])
+    dte = np.array([leg["expiration_days"] or DEFAULT_DTE for leg in legs], dtype=float)
+    if np.any(is_option & ~by_delta & np.isnan(target)):
+        raise BacktestError("Fixed-strike option leg without a strike")
+    if np.any(is_option & by_delta & ~((np.abs(target) > 0) & (np.abs(target) < 1))):
+        raise BacktestError("Delta-targeted leg needs 0 < |strike_value| < 1")
+
+    # Roll schedule: each cycle opens at a bar close and closes on the first
+    # bar at/after the first option expiry (or the last bar), re-opening there.
+    # It only depends on the timestamps, so every cycle is then priced at once.
+    hold_seconds = dte[is_option].min() * SECONDS_PER_DAY if is_option.any() else np.inf
+    starts = [0]
+    while starts[-1] < n - 1:
+        i = starts[-1]
+        j = n - 1 if not np.isfinite(hold_seconds) else int(np.searchsorted(ts, ts[i] + hold_seconds, "left"))
+        starts.append(min(max(j, i + 1), n - 1))
+    entries, exits = np.array(starts[:-1]), np.array(starts[1:])              # (C,)
+
+    ts = np.asarray(ts)
+    close = np.asarray(close, dtype=float)
+    vols = np.asarray(vols, dtype=float)
+    side = np.sign(qty)
+    # Shares per leg: prices are per share, an option leg trades whole contracts
+    size = qty * np.where(is_option, params.contract_multiplier, 1.0)
+    fill = params.fill
+    commission = fill.commission * np.abs(qty).sum()
+
+    # Strikes at entry (C, L): delta targets solved in closed form, rounded to the listing grid
+    spot, vol, tenor = close[entries][:, None], vols[entries][:, None], dte / 365.0
+    solved = pricing.strike_for_delta(spot, np.nan_to_num(target, nan=0.5), tenor, vol, is_call, params.rate)
+    solved = np.maximum(np.round(solved / params.strike_step), 1) * params.strike_step
+    strikes = np.where(is_option, np.where(by_delta, solved, target), spot)
+    theo = np.where(is_option, pricing.price(spot, strikes, tenor, vol, is_call, params.rate), spot)
+    entry = fill.fill(theo, side, is_option)
+
+    # Mark every bar after the first to market in one [bar, leg] broadcast;
+    # bar b belongs to the cycle with entry < b <= exit
+    cycle = np.repeat(np.arange(len(entries)), exits - entries)               # (n - 1,)
+    expiry = ts[entries][:, None] + dte * SECONDS_PER_DAY                      # (C, L)
+    tau = np.maximum(expiry[cycle] - ts[1:, None], 0) / SECONDS_PER_YEAR
+    path = close[1:, None]
+    value = np.where(is_option,
+                     pricing.price(path, strikes[cycle], tau, vols[1:, None], is_call, params.rate),
+                     path)
+    marks = (size * (value - entry[cycle])).sum(axis=1) - commission
+
+    exit_fill = fill.fill(value[exits - 1], -side, is_option)
+    trade_pnl = (size * (exit_fill - entry)).sum(axis=1) - 2 * commission      # (C,)
+    realized = np.cumsum(trade_pnl)
+
+    equity = np.zeros(n)
+    equity[1:] = (realized - trade_pnl)[cycle] + marks
+    equity[exits] = realized
+
+    return _summary(spec, ts, equity, trade_pnl, params)
+
+
+def _summary(spec, ts, equity, trades, params):
+    wins, losses = trades[trades > 0], trades[trades <= 0]
+    drawdown = np.maximum.accumulate(np.maximum(equity, 0.0)) - equity
+    result = {
+        "strategy_id": spec["id"],
+        "ticker": spec["ticker"],
+        "start": int(ts[0]),
+        "end": int(ts[-1]),
+        "bars": len(ts),
+        "years": round(float(ts[-1] - ts[0]) / SECONDS_PER_YEAR, 4),
+        "total_pnl": float(equity[-1]),
+        "max_drawdown": float(drawdown.max()),
+        "trades": len(trades),
+        "win_rate": float(len(wins) / len(trades)) if len(trades) else 0.0,
+        "avg_win": float(wins.mean()) if len(wins) else 0.0,
+        "avg_loss": float(losses.mean()) if len(losses) else 0.0,
+        "best_trade": float(trades.max()) if len(trades) else 0.0,
+        "worst_trade": float(trades.min()) if len(trades) else 0.0,
+        "profit_factor": float(wins.sum() / -losses.sum()) if losses.sum() < 0 else None,
+        "contract_multiplier": params.contract_multiplier,
+    }
+    if params.include_equity:
+        result["equity"] = {"ts": ts.tolist(), "pnl": equity.tolist()}
+    return result
+
+
+# --- PARALLEL EXECUTION ---
+# Workers are 'spawn'ed (no fork of a running event loop / DB pool) and each
+# keeps its own cache of memory-mapped tickers for the life of the pool.
+
+_worker_data_dir = None
+_worker_datasets = {}
+
+
+def _init_worker(data_dir):
+    global _worker_data_dir
+    _worker_data_dir = data_dir
+    _worker_datasets.clear()
+
+
+def _run_in_worker(spec, params):
+    try:
+        data = _worker_datasets.get(spec["ticker"])
+        if data is None:
+            data = _worker_datasets[spec["ticker"]] = BarData.open(_worker_data_dir, spec["ticker"])
+        return run_backtest(spec, params, data)
+    except BacktestError as e:
+        return {"strategy_id": spec["id"], "ticker": spec["ticker"], "error": str(e)}
+
+
+def default_workers() -> int:
+    return config.settings.BACKTEST_WORKERS or os.cpu_count() or 1
+
+
+def make_pool(data_dir, workers) -> ProcessPoolExecutor:
+    return ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"),
+                               initializer=_init_worker, initargs=(str(data_dir),))
+
+
+def run_many(specs, params: BacktestParams, data_dir, workers=None, progress=None) -> list:
+    """Backtest many strategies; results in input order. progress(done, total) after each one."""
+    workers = workers or default_workers()
+    if workers == 1:
+        _init_worker(str(data_dir))
+        results = []
+        for done, spec in enumerate(specs, 1):
+            results.append(_run_in_worker(spec, params))
+            if progress:
+                progress(done, len(specs))
+        return results
+
+    results = [None] * len(specs)
+    with make_pool(data_dir, workers) as pool:
+        futures = {pool.submit(_run_in_worker, spec, params): i for i, spec in enumerate(specs)}
+        for done, future in enumerate(as_completed(futures), 1):
+            results[futures[future]] = future.result()
+            if progress:
+                progress(done, len(specs))
+    return results
+
+
+# --- API JOBS ---
+
+@dataclass
+class BacktestJob:
+    id: str
+    strategy_id: str
+    status: str = "queued"          # queued -> running -> done / failed
+    progress: float = 0.0
+    submitted_at: float = field(default_factory=time.time)
+    finished_at: float = None
+    results: list = None
+    error: str = None
+
+
+class BacktestRunner:
+    """
+    Runs API backtest jobs on a shared process pool (created on first use,
+    shut down by the lifespan). Jobs live in memory; the newest max_jobs are kept.
+    """
+
+    def __init__(self, data_dir, workers=None, max_jobs=1000):
+        self.data_dir = data_dir
+        self.workers = workers
+        self.max_jobs = max_jobs
+        self.jobs = OrderedDict()
+        self._pool = None
+        self._tasks = set()
+
+    def pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            self._pool = make_pool(self.data_dir, self.workers or default_workers())
+        return self._pool
+
+    def submit(self, strategy_id, specs, params: BacktestParams) -> BacktestJob:
+        job = BacktestJob(id=uuid.uuid4().hex, strategy_id=str(strategy_id))
+        self.jobs[job.id] = job
+        while len(self.jobs) > self.max_jobs:
+            self.jobs.popitem(last=False)
+        task = asyncio.create_task(self._run(job, specs, params))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return job
+
+    async def _run(self, job, specs, params):
+        loop = asyncio.get_running_loop()
+        job.status = "running"
+        try:
+            futures = [loop.run_in_executor(self.pool(), _run_in_worker, spec, params) for spec in specs]
+            for done, future in enumerate(asyncio.as_completed(futures), 1):
+                await future
+                job.progress = done / len(futures)
+            job.results = [f.result() for f in futures]
+            job.status = "done"
+        except Exception as e:
+            job.status = "failed"
+            job.error = str(e) or type(e).__name__
+        finally:
+            job.finished_at = time.time()
+
+    def get(self, job_id):
+        return self.jobs.get(job_id)
+
+    async def shutdown(self):
+        for task in list(self._tasks):
+            task.cancel()
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+
+runner = BacktestRunner(config.settings.BACKTEST_DATA_DIR, config.settings.BACKTEST_WORKERS or None)
+
+
+# --- CLI ---
+
+def _epoch(value):
+    if value is None:
+        return None
+    parsed = datetime.fromisoformat(value)
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return int(parsed.timestamp())
+
+
+def _load_specs(strategy_ids, ticker):
+    from sqlalchemy import select
+    from sqlalchemy.orm import selectinload
+    from app import database, models
+
+    query = select(models.Strategy).options(selectinload(models.Strategy.legs))
+    if strategy_ids:
+        query = query.filter(models.Strategy.id.in_([uuid.UUID(s) for s in strategy_ids]))
+    if ticker:
+        query = query.filter(models.Strategy.ticker == ticker)
+    with database.get_sessionmaker()() as db:
+        return [strategy_spec(s) for s in db.execute(query).scalars().all()]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--data-dir", default=config.settings.BACKTEST_DATA_DIR)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    importer = commands.add_parser("import-csv", help="Convert a CSV of bars to memory-mappable columns")
+    importer.add_argument("ticker")
+    importer.add_argument("path")
+
+    run = commands.add_parser("run", help="Backtest stored strategies")
+    run.add_argument("--strategy-id", action="append", default=[])
+    run.add_argument("--ticker")
+    run.add_argument("--start", help="ISO date, inclusive")
+    run.add_argument("--end", help="ISO date, exclusive")
+    run.add_argument("--vol", type=float, default=0.20)
+    run.add_argument("--rate", type=float, default=0.0)
+    run.add_argument("--strike-step", type=float, default=1.0)
+    run.add_argument("--contract-multiplier", type=float, default=CONTRACT_MULTIPLIER, help="Shares per option contract")
+    run.add_argument("--workers", type=int, default=None)
+    run.add_argument("--out", help="Write results as JSON here (default: stdout)")
+    args = parser.parse_args(argv)
+
+    if args.command == "import-csv":
+        count = import_csv(args.data_dir, args.ticker, args.path)
+        print(f"{count} bars written to {Path(args.data_dir) / args.ticker}", file=sys.stderr)
+        return 0
+
+    specs = _load_specs(args.strategy_id, args.ticker)
+    if not specs:
+        print("No matching strategies", file=sys.stderr)
+        return 1
+    params = BacktestParams(start=_epoch(args.start), end=_epoch(args.end), vol=args.vol,
+                            rate=args.rate, strike_step=args.strike_step,
+                            contract_multiplier=args.contract_multiplier)
+
+    def progress(done, total):
+        print(f"\r{done}/{total} strategies", end="", file=sys.stderr, flush=True)
+
+    start = time.perf_counter()
+    results = run_many(specs, params, args.data_dir, args.workers, progress)
+    elapsed = time.perf_counter() - start
+    years = sum(r.get("years", 0.0) for r in results)
+    print(f"\n{len(results)} strategies, {years:.1f} strategy-years in {elapsed:.2f} s "
+          f"({years / elapsed:,.0f} strategy-years/s)", file=sys.stderr)
+
+    output = json.dumps({"params": asdict(params), "results": results}, indent=2)
+    if args.out:
+        Path(args.out).write_text(output)
+    else:
+        print(output)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
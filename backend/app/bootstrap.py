@@ -0,0 +1,173 @@
+"""
+Schema bootstrap / migration command. Run from the 'backend' folder:
+
+    python -m app.bootstrap create      # create missing extensions, tables, indexes and audit partitions
+    python -m app.bootstrap check       # report what is missing, exit 1 if anything is
+    python -m app.bootstrap templates   # one-off: move per-strategy legs onto shared templates
+
+All are idempotent. The API never does this on import; at startup it only
+runs when DB_AUTO_CREATE / DB_SCHEMA_CHECK are set (see app/main.py).
+"""
+import argparse
+import logging
+import sys
+
+import uuid
+
+from sqlalchemy import bindparam, column, inspect, select, table, text
+
+from app import auditlog, database, legsets, models
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Extensions the models rely on (the trigram indexes on profiles)
+POSTGRES_EXTENSIONS = ["pg_trgm"]
+
+
+def _applies(index, dialect) -> bool:
+    # Dialect-specific indexes (Index(...).ddl_if(dialect=...), e.g. trigram GIN)
+    condition = index._ddl_if
+    return condition is None or condition.dialect in (None, dialect.name)
+
+
+def missing_schema(connection) -> list[str]:
+    """Tables, columns and indexes declared in the models but absent from the database."""
+    inspector = inspect(connection)
+    existing_tables = set(inspector.get_table_names())
+    missing = []
+    for table in models.Base.metadata.sorted_tables:
+        if table.name not in existing_tables:
+            missing.append(f"table {table.name}")
+            continue
+        columns = {column["name"] for column in inspector.get_columns(table.name)}
+        missing.extend(f"column {table.name}.{column.name}" for column in table.columns if column.name not in columns)
+        indexes = {index["name"] for index in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if _applies(index, connection.dialect) and index.name not in indexes:
+                missing.append(f"index {index.name}")
+    return missing
+
+
+def create_schema(connection):
+    """
+    Create whatever is missing. create_all() skips existing tables entirely,
+    so indexes added to a table later are created one by one afterwards.
+    """
+    if connection.dialect.name == "postgresql":
+        for extension in POSTGRES_EXTENSIONS:
+            connection.execute(text(f"CREATE EXTENSION IF NOT EXISTS {extension}"))
+    models.Base.metadata.create_all(bind=connection)
+    for table in models.Base.metadata.sorted_tables:
+        for index in table.indexes:
+            if _applies(index, connection.dialect):
+                index.create(bind=connection, checkfirst=True)
+    # Audit log partitions for this month and the next few (Postgres only)
+    auditlog.ensure_partitions(connection, auditlog.upcoming_months(settings.AUDIT_PARTITION_MONTHS_AHEAD))
+
+
+def migrate_legs_to_templates(connection) -> dict:
+    """
+    Upgrade a Postgres database from legs stored per strategy
+    (strategy_legs.strategy_id) to shared leg-set templates: one template per
+    distinct content hash keeps the legs of its first strategy, the duplicates'
+    legs are deleted and every strategy points at its template. No-op once done.
+    SQLite files (dev / benchmarks) are simply recreated with 'create'.
+    """
+    inspector = inspect(connection)
+    if "strategy_id" not in {c["name"] for c in inspector.get_columns("strategy_legs")}:
+        return {"strategies": 0, "templates": 0, "legs_deleted": 0}
+    if connection.dialect.name != "postgresql":
+        raise RuntimeError("Only Postgres databases are migrated; recreate this one with 'create'")
+
+    models.StrategyTemplate.__table__.create(connection, checkfirst=True)
+    for table_name in ("strategies", "strategy_legs"):
+        connection.execute(text(f"ALTER TABLE {table_name} ADD COLUMN IF NOT EXISTS template_id UUID "
+                                f"REFERENCES strategy_templates(id)"))
+
+    # The pre-template layout, which the models no longer describe
+    legacy_legs = table("strategy_legs", column("id"), column("strategy_id"), column("template_id"),
+                        *(column(name) for name in legsets.LEG_FIELDS))
+    strategies = models.Strategy.__table__
+
+    legs_by_strategy = {}
+    for leg in connection.execute(select(legacy_legs).order_by(legacy_legs.c.strategy_id, legacy_legs.c.leg_index)):
+        legs_by_strategy.setdefault(leg.strategy_id, []).append(leg._mapping)
+
+    templates = dict(connection.execute(select(models.StrategyTemplate.content_hash, models.StrategyTemplate.id)).all())
+    new_templates, keep, assign, drop = [], [], [], []
+    for strategy in connection.execute(select(strategies.c.id, strategies.c.ticker, strategies.c.instrument_type)
+                                       .where(strategies.c.template_id.is_(None))):
+        legs = legs_by_strategy.get(strategy.id, [])
+        digest = legsets.content_hash(strategy.ticker, strategy.instrument_type, legs)
+        if digest not in templates:
+            templates[digest] = uuid.uuid4()
+            new_templates.append({"id": templates[digest], "content_hash": digest, "ticker": strategy.ticker,
+                                  "instrument_type": strategy.instrument_type, "leg_count": len(legs)})
+            keep.append({"owner": strategy.id, "template": templates[digest]})
+        else:
+            drop.append(strategy.id)
+        assign.append({"strategy": strategy.id, "template": templates[digest]})
+
+    if new_templates:
+        connection.execute(models.StrategyTemplate.__table__.insert(), new_templates)
+    if keep:
+        connection.execute(legacy_legs.update().where(legacy_legs.c.strategy_id == bindparam("owner"))
+                           .values(template_id=bindparam("template")), keep)
+    deleted = 0
+    for offset in range(0, len(drop), 5000):
+        deleted += connection.execute(legacy_legs.delete().where(
+            legacy_legs.c.strategy_id.in_(drop[offset:offset + 5000]))).rowcount
+    if assign:
+        connection.execute(strategies.update().where(strategies.c.id == bindparam("strategy"))
+                           .values(template_id=bindparam("template")), assign)
+
+    connection.execute(text("ALTER TABLE strategy_legs DROP COLUMN strategy_id"))
+    for table_name in ("strategies", "strategy_legs"):
+        connection.execute(text(f"ALTER TABLE {table_name} ALTER COLUMN template_id SET NOT NULL"))
+    create_schema(connection)
+    return {"strategies": len(assign), "templates": len(new_templates), "legs_deleted": deleted}
+
+
+async def check_schema_async() -> list[str]:
+    """Startup variant of 'check' on the async engine."""
+    async with database.get_async_engine().connect() as connection:
+        return await connection.run_sync(missing_schema)
+
+
+async def create_schema_async():
+    async with database.get_async_engine().begin() as connection:
+        await connection.run_sync(create_schema)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", choices=["create", "check", "templates"])
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+    engine = database.get_engine()
+    if args.command == "create":
+        with engine.begin() as connection:
+            create_schema(connection)
+        logger.info("Schema is up to date (%s)", engine.url.render_as_string(hide_password=True))
+        return 0
+
+    if args.command == "templates":
+        with engine.begin() as connection:
+            counts = migrate_legs_to_templates(connection)
+        logger.info("%(strategies)d strategies moved onto %(templates)d new templates, "
+                    "%(legs_deleted)d duplicate legs deleted", counts)
+        return 0
+
+    with engine.connect() as connection:
+        missing = missing_schema(connection)
+    for item in missing:
+        logger.info("missing %s", item)
+    if not missing:
+        logger.info("Schema is up to date")
+    return 1 if missing else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,22 @@
+from app.config import settings
+from app.brokers.base import Account, BrokerAdapter, BrokerError, BrokerOrderState, ChildOrder, OrderAck
+from app.brokers.simulated import SimulatedBroker
+
+# Broker name -> adapter instance. Real integrations register themselves here;
+# the simulated broker only when it is configured (DEFAULT_BROKER=simulated).
+adapters: dict[str, BrokerAdapter] = {}
+
+
+def register_adapter(adapter: BrokerAdapter):
+    adapters[adapter.name] = adapter
+
+
+def get_adapter(name: str) -> BrokerAdapter:
+    try:
+        return adapters[name]
+    except KeyError:
+        raise BrokerError(f"No adapter registered for broker '{name}'")
+
+
+if settings.DEFAULT_BROKER == SimulatedBroker.name:
+    register_adapter(SimulatedBroker())
@@ -0,0 +1,76 @@
+from dataclasses import dataclass
+from typing import Optional
+from uuid import UUID
+
+# --- ORDER TYPES SHARED BY ALL BROKER ADAPTERS ---
+
+@dataclass(slots=True)
+class Account:
+    """A trading account a strategy fans out to (a Profile with a BrokerAccount)."""
+    id: UUID
+    broker: str
+    multiplier: float = 1.0  # TRD A3: 1.0 to 10.0 in 0.5 steps
+    telegram_id: Optional[str] = None  # Alert recipient (Profile.telegram_id)
+
+@dataclass(slots=True)
+class ChildOrder:
+    """One leg of one strategy signal for one account."""
+    client_order_id: str  # Deterministic, so a retried dispatch is idempotent at the broker
+    signal_id: str
+    strategy_id: UUID
+    account_id: UUID
+    broker: str
+    ticker: str
+    instrument_type: str
+    leg_index: int
+    action: str  # 'buy' / 'sell'
+    quantity: float
+    option_type: Optional[str] = None
+    strike_value: Optional[float] = None
+    strike_mode: str = "fixed"
+    expiration_days: Optional[int] = None
+
+@dataclass(slots=True)
+class OrderAck:
+    client_order_id: str
+    account_id: UUID
+    broker: str
+    status: str  # 'accepted', 'rejected', 'timeout', 'error'
+    broker_order_id: Optional[str] = None
+    latency: float = 0.0  # Seconds from dispatch to ack
+    error: Optional[str] = None
+
+@dataclass(slots=True)
+class BrokerOrderState:
+    """What the broker currently reports for one order (reconciliation)."""
+    client_order_id: str
+    status: str  # 'accepted', 'partial', 'filled', 'rejected', 'cancelled'
+    filled_quantity: float = 0.0
+    avg_fill_price: Optional[float] = None
+    broker_order_id: Optional[str] = None
+    error: Optional[str] = None
+
+class BrokerError(Exception):
+    """Raised by adapters when the broker call itself fails (network, 5xx...)."""
+
+class BrokerAdapter:
+    """
+    Interface every broker integration implements.
+    The fan-out engine bounds each adapter by its own max_concurrency/timeout.
+    """
+    name = "base"
+    max_concurrency = 50
+    timeout = 5.0
+    # Order-status polling (app/reconcile.py): orders per request, requests per second
+    status_batch_size = 100
+    status_rate_limit = 10.0
+
+    async def place_order(self, order: ChildOrder) -> OrderAck:
+        raise NotImplementedError
+
+    async def get_order_states(self, client_order_ids: list[str]) -> list[BrokerOrderState]:
+        """
+        Current state of up to status_batch_size orders, by client order id.
+        Orders the broker doesn't know are left out of the result.
+        """
+        raise NotImplementedError
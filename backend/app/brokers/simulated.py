@@ -0,0 +1,103 @@
+import asyncio
+import random
+import time
+import uuid
+
+from app.brokers.base import BrokerAdapter, BrokerError, BrokerOrderState, ChildOrder, OrderAck
+
+
+class SimulatedBroker(BrokerAdapter):
+    """
+    In-process broker for tests and benchmarks: fake network latency,
+    configurable reject/error rates, and an in-memory order book. Accepted
+    orders fill over time: each status poll fills one completely with
+    probability fill_rate, or half of what is left with partial_rate.
+    """
+    name = "simulated"
+
+    def __init__(self, name="simulated", latency=0.005, jitter=0.002,
+                 reject_rate=0.0, error_rate=0.0, max_concurrency=200, timeout=2.0, seed=None,
+                 fill_rate=0.5, partial_rate=0.2, fill_price=100.0, status_batch_size=100, status_rate_limit=50.0):
+        self.name = name
+        self.latency = latency
+        self.jitter = jitter
+        self.reject_rate = reject_rate
+        self.error_rate = error_rate
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self.fill_rate = fill_rate
+        self.partial_rate = partial_rate
+        self.fill_price = fill_price
+        self.status_batch_size = status_batch_size
+        self.status_rate_limit = status_rate_limit
+        self._random = random.Random(seed)
+        # client_order_id -> order; re-sending the same id doesn't create a duplicate
+        self.orders = {}
+        self.status_requests = 0
+
+    async def _simulate_latency(self):
+        delay = self.latency + self._random.uniform(-self.jitter, self.jitter)
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    async def place_order(self, order: ChildOrder) -> OrderAck:
+        start = time.perf_counter()
+        await self._simulate_latency()
+
+        roll = self._random.random()
+        if roll < self.error_rate:
+            raise BrokerError("Simulated broker error")
+
+        if order.client_order_id in self.orders:
+            existing = self.orders[order.client_order_id]
+            return OrderAck(order.client_order_id, order.account_id, self.name, existing["status"],
+                            existing["broker_order_id"], time.perf_counter() - start)
+
+        status = "rejected" if roll < self.error_rate + self.reject_rate else "accepted"
+        broker_order_id = uuid.uuid4().hex
+        self.orders[order.client_order_id] = {
+            "order": order,
+            "broker_order_id": broker_order_id,
+            "status": status,
+            "filled_quantity": 0.0,
+            "filled_value": 0.0,
+        }
+        return OrderAck(order.client_order_id, order.account_id, self.name, status,
+                        broker_order_id, time.perf_counter() - start,
+                        "Simulated rejection" if status == "rejected" else None)
+
+    def _advance(self, entry):
+        # Fill (part of) what is left at fill_price +/- 1%
+        if entry["status"] not in ("accepted", "partial"):
+            return
+        roll = self._random.random()
+        remaining = entry["order"].quantity - entry["filled_quantity"]
+        if roll < self.fill_rate:
+            quantity = remaining
+        elif roll < self.fill_rate + self.partial_rate and remaining > 1:
+            quantity = float(int(remaining // 2))
+        else:
+            return
+        price = round(self.fill_price * self._random.uniform(0.99, 1.01), 2)
+        entry["filled_quantity"] += quantity
+        entry["filled_value"] += quantity * price
+        entry["status"] = "filled" if entry["filled_quantity"] >= entry["order"].quantity else "partial"
+
+    async def get_order_states(self, client_order_ids: list[str]) -> list[BrokerOrderState]:
+        await self._simulate_latency()
+        self.status_requests += 1
+        if self._random.random() < self.error_rate:
+            raise BrokerError("Simulated broker error")
+
+        states = []
+        for client_order_id in client_order_ids:
+            entry = self.orders.get(client_order_id)
+            if entry is None:
+                continue
+            self._advance(entry)
+            filled = entry["filled_quantity"]
+            states.append(BrokerOrderState(
+                client_order_id, entry["status"], filled,
+                entry["filled_value"] / filled if filled else None, entry["broker_order_id"],
+            ))
+        return states
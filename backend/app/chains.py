@@ -0,0 +1,114 @@
+import asyncio
+import logging
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import text
+from sqlalchemy.exc import SQLAlchemyError
+
+from app import config, crud, database, strikes
+
+logger = logging.getLogger(__name__)
+
+# --- SHARED OPTION CHAINS ---
+# Each API process resolves strikes against its own in-memory chains
+# (app/strikes.py), but a chain is posted to one of them. So POST
+# /marketdata/{ticker}/chain stores the snapshot in option_chains (the newest
+# per ticker) and, on Postgres, NOTIFYs the ticker on CHAIN_CHANNEL
+# (delivered by profilecache.listener). Every worker loads the stored chains
+# at start, reloads a ticker when notified, and polls for newer snapshots
+# every OPTION_CHAIN_POLL_SECONDS (missed notifications, no LISTEN behind
+# PgBouncer). Deltas are computed once per snapshot and process.
+
+CHAIN_CHANNEL = "option_chain"
+# Re-check this far behind the newest chain seen: a row stamped earlier may commit after a poll
+POLL_OVERLAP = timedelta(seconds=60)
+
+
+class ChainSync:
+    def __init__(self, resolver: strikes.StrikeResolver, poll_seconds=5.0):
+        self.resolver = resolver
+        self.poll_seconds = poll_seconds
+        self._seen_at = None    # Newest stored_at loaded
+        self._task = None
+        self._loads = set()     # Notification-triggered loads in flight
+
+    async def store(self, db, chain: strikes.OptionChain, contracts: list) -> strikes.OptionChain:
+        """
+        Store an uploaded chain for every worker, then load it here. A chain
+        older than the stored one is still loaded here, not stored.
+        """
+        stored = await crud.store_option_chain_async(db, {
+            "ticker": chain.ticker, "snapshot_time": chain.snapshot_time, "spot": chain.spot,
+            "rate": chain.rate, "dividend": chain.dividend, "contracts": contracts,
+            "stored_at": datetime.now(timezone.utc),
+        })
+        if stored and db.get_bind().dialect.name == "postgresql":
+            await db.execute(text("SELECT pg_notify(:channel, :ticker)"),
+                             {"channel": CHAIN_CHANNEL, "ticker": chain.ticker})
+        await db.commit()
+        return self.resolver.load_chain(chain)
+
+    async def load(self, tickers=None) -> int:
+        """
+        Load the stored chains this process doesn't have: the given tickers,
+        or those stored since the last load (all of them the first time).
+        """
+        async with database.AsyncSessionLocal() as db:
+            if tickers is None:
+                since = None if self._seen_at is None else self._seen_at - POLL_OVERLAP
+                keys = await crud.get_option_chain_keys_async(db, since)
+                for _, _, stored_at in keys:
+                    if self._seen_at is None or stored_at > self._seen_at:
+                        self._seen_at = stored_at
+                # Newest first; the resolver keeps max_chains of them anyway
+                keys.sort(key=lambda key: key[2], reverse=True)
+                tickers = [ticker for ticker, snapshot_time, _ in keys
+                           if self.resolver.get_chain(ticker, snapshot_time) is None][:self.resolver.max_chains]
+            rows = await crud.get_option_chains_async(db, list(tickers)) if tickers else []
+        for row in rows:
+            if self.resolver.get_chain(row["ticker"], row["snapshot_time"]) is not None:
+                continue
+            self.resolver.load_chain(strikes.OptionChain.from_records(
+                row["ticker"], row["snapshot_time"], row["spot"], row["contracts"],
+                rate=row["rate"], dividend=row["dividend"],
+            ))
+        return len(rows)
+
+    def on_notify(self, ticker: str):
+        task = asyncio.create_task(self._load_notified(ticker))
+        self._loads.add(task)
+        task.add_done_callback(self._loads.discard)
+
+    async def _load_notified(self, ticker):
+        try:
+            await self.load([ticker])
+        except (SQLAlchemyError, OSError) as e:
+            logger.warning("Loading the %s option chain failed: %s", ticker, e.__class__.__name__)
+
+    async def _run(self):
+        while True:
+            try:
+                await self.load()
+            except (SQLAlchemyError, OSError) as e:
+                logger.warning("Loading stored option chains failed: %s", e.__class__.__name__)
+            if not self.poll_seconds:
+                return
+            await asyncio.sleep(self.poll_seconds)
+
+    def start(self):
+        if self._task is None and config.settings.DATABASE_URL:
+            self._task = asyncio.create_task(self._run(), name="option-chain-sync")
+
+    async def stop(self):
+        for task in [self._task, *self._loads]:
+            if task is None:
+                continue
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        self._task = None
+
+
+sync = ChainSync(strikes.resolver, poll_seconds=config.settings.OPTION_CHAIN_POLL_SECONDS)
@@ -6,9 +6,12 @@ from pathlib import Path
 # This points to the 'backend' folder
 BASE_DIR = Path(__file__).resolve().parent.parent
 
-# Load environment variables from the .env file explicitly
-env_path = BASE_DIR / ".env"
-load_dotenv(dotenv_path=env_path)
+# Load environment variables from the .env file explicitly.
+# Variables already set in the environment win; ENV_FILE points elsewhere
+# (or ENV_FILE="" skips the file, e.g. for CLIs and benchmarks).
+env_path = Path(os.getenv("ENV_FILE", BASE_DIR / ".env"))
+if os.getenv("ENV_FILE") != "":
+    load_dotenv(dotenv_path=env_path, override=False)
 
 class Settings:
     PROJECT_NAME: str = "Multi-Broker Platform"
@@ -16,13 +19,141 @@ class Settings:
     
     # We use this URL to connect to the DB
     DATABASE_URL: str = os.getenv("DATABASE_URL")
+    # Optional override for the async engine; by default DATABASE_URL with the asyncpg driver
+    ASYNC_DATABASE_URL: str = os.getenv("ASYNC_DATABASE_URL")
     SUPABASE_URL: str = os.getenv("SUPABASE_URL")
     SUPABASE_KEY: str = os.getenv("SUPABASE_KEY")
 
-settings = Settings()
+    # Connection pool (see app/database.py)
+    DB_POOL_SIZE: int = int(os.getenv("DB_POOL_SIZE", "10"))
+    DB_MAX_OVERFLOW: int = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+    DB_POOL_TIMEOUT: float = float(os.getenv("DB_POOL_TIMEOUT", "10"))
+    DB_POOL_RECYCLE: int = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+    # Only ping connections idle for longer than this before reuse
+    DB_PING_IDLE_SECONDS: float = float(os.getenv("DB_PING_IDLE_SECONDS", "30"))
+    # PgBouncer transaction mode (no server-side prepared statements).
+    # Unset = auto-detect from the Supabase pooler port 6543.
+    DB_PGBOUNCER: bool = None if os.getenv("DB_PGBOUNCER") is None else os.getenv("DB_PGBOUNCER").lower() == "true"
+    # Startup schema handling (see app/bootstrap.py). Both off by default:
+    # schema changes are applied with 'python -m app.bootstrap create'.
+    DB_SCHEMA_CHECK: bool = os.getenv("DB_SCHEMA_CHECK", "false").lower() == "true"
+    DB_AUTO_CREATE: bool = os.getenv("DB_AUTO_CREATE", "false").lower() == "true"
+
+    # Read replica (see app/replica.py); unset = every read goes to the primary.
+    # Any URL of the same schema works, e.g. the primary itself as a stand-in.
+    READ_REPLICA_URL: str = os.getenv("READ_REPLICA_URL")
+    # Past this much replay lag (or a failed probe) reads fall back to the primary
+    REPLICA_MAX_LAG_SECONDS: float = float(os.getenv("REPLICA_MAX_LAG_SECONDS", "5"))
+    REPLICA_CHECK_SECONDS: float = float(os.getenv("REPLICA_CHECK_SECONDS", "2"))
+    # After a user's own write, their reads stay on the primary this long
+    READ_YOUR_WRITES_SECONDS: float = float(os.getenv("READ_YOUR_WRITES_SECONDS", "5"))
+
+    # Local JWT verification (see app/security.py)
+    # Legacy projects sign access tokens with the HS256 JWT secret,
+    # newer ones with asymmetric keys published on the JWKS endpoint.
+    SUPABASE_JWT_SECRET: str = os.getenv("SUPABASE_JWT_SECRET")
+    JWT_AUDIENCE: str = os.getenv("JWT_AUDIENCE", "authenticated")
+    JWKS_REFRESH_SECONDS: int = int(os.getenv("JWKS_REFRESH_SECONDS", "600"))
+    # Reject tokens older than this even if 'exp' is later (0 = rely on 'exp' only)
+    TOKEN_MAX_AGE_SECONDS: int = int(os.getenv("TOKEN_MAX_AGE_SECONDS", "0"))
+    # Logouts are shared through the revoked_tokens table (NOTIFY on Postgres); each worker
+    # also polls it this often, the longest a revoked token can still pass elsewhere (0 = no polling)
+    TOKEN_REVOCATION_POLL_SECONDS: float = float(os.getenv("TOKEN_REVOCATION_POLL_SECONDS", "5"))
+
+    # Shared GoTrue HTTP client (see app/gotrue.py)
+    GOTRUE_CONNECT_TIMEOUT: float = float(os.getenv("GOTRUE_CONNECT_TIMEOUT", "3.0"))
+    GOTRUE_READ_TIMEOUT: float = float(os.getenv("GOTRUE_READ_TIMEOUT", "10.0"))
+    GOTRUE_MAX_CONNECTIONS: int = int(os.getenv("GOTRUE_MAX_CONNECTIONS", "100"))
+    GOTRUE_MAX_KEEPALIVE: int = int(os.getenv("GOTRUE_MAX_KEEPALIVE", "20"))
+    GOTRUE_MAX_RETRIES: int = int(os.getenv("GOTRUE_MAX_RETRIES", "2"))
+    GOTRUE_HTTP2: bool = os.getenv("GOTRUE_HTTP2", "false").lower() == "true"
+    # Auth users created at once by POST /users/bulk
+    GOTRUE_BULK_CONCURRENCY: int = int(os.getenv("GOTRUE_BULK_CONCURRENCY", "10"))
+
+    # Write-behind session logging (see app/sessionlog.py); a row the database rejects
+    # on its own this many flushes in a row is dropped
+    SESSION_LOG_BATCH_SIZE: int = int(os.getenv("SESSION_LOG_BATCH_SIZE", "200"))
+    SESSION_LOG_FLUSH_SECONDS: float = float(os.getenv("SESSION_LOG_FLUSH_SECONDS", "1.0"))
+    SESSION_LOG_MAX_ATTEMPTS: int = int(os.getenv("SESSION_LOG_MAX_ATTEMPTS", "3"))
+
+    # Audit / event log (see app/auditlog.py): write-behind batches, monthly partitions
+    AUDIT_LOG_BATCH_SIZE: int = int(os.getenv("AUDIT_LOG_BATCH_SIZE", "1000"))
+    AUDIT_LOG_FLUSH_SECONDS: float = float(os.getenv("AUDIT_LOG_FLUSH_SECONDS", "1.0"))
+    AUDIT_PARTITION_MONTHS_AHEAD: int = int(os.getenv("AUDIT_PARTITION_MONTHS_AHEAD", "3"))
+    # History endpoints look back this far unless 'since' is given (bounds the partitions scanned)
+    AUDIT_LOOKBACK_DAYS: int = int(os.getenv("AUDIT_LOOKBACK_DAYS", "90"))
+
+    # Current-user profile cache (see app/profilecache.py)
+    PROFILE_CACHE_SIZE: int = int(os.getenv("PROFILE_CACHE_SIZE", "10000"))
+    PROFILE_CACHE_TTL: float = float(os.getenv("PROFILE_CACHE_TTL", "30"))
+    # Direct (session-mode) connection for LISTEN; needed behind PgBouncer transaction mode
+    PROFILE_CACHE_LISTEN_URL: str = os.getenv("PROFILE_CACHE_LISTEN_URL")
+
+    # Order fan-out (see app/fanout.py): broker of broker accounts linked without one.
+    # Required, no default; 'simulated' (app/brokers/simulated.py) is for dev and benchmarks only.
+    DEFAULT_BROKER: str = os.getenv("DEFAULT_BROKER")
 
-# Troubleshooting print (Visible in terminal on startup)
-if not settings.DATABASE_URL:
-    print(f"⚠️ WARNING: DATABASE_URL is None. Checking for .env at: {env_path}")
-else:
-    print(f"✅ Configuration Loaded. DB URL found.")
\ No newline at end of file
+    # Market data feed (see app/marketdata.py): a 'ts,ticker,price,size' CSV replayed into
+    # every worker (unset = no feed; ticks can also be posted to POST /marketdata/ticks).
+    # Speed 1.0 keeps the recorded pacing, 0 = as fast as possible; LOOP starts over at the end.
+    MARKET_DATA_REPLAY_PATH: str = os.getenv("MARKET_DATA_REPLAY_PATH")
+    MARKET_DATA_REPLAY_SPEED: float = float(os.getenv("MARKET_DATA_REPLAY_SPEED", "1.0"))
+    MARKET_DATA_REPLAY_LOOP: bool = os.getenv("MARKET_DATA_REPLAY_LOOP", "false").lower() == "true"
+
+    # Option chains posted to one worker reach the others by NOTIFY and by polling the stored
+    # snapshots this often (see app/chains.py; 0 = only loaded at start)
+    OPTION_CHAIN_POLL_SECONDS: float = float(os.getenv("OPTION_CHAIN_POLL_SECONDS", "5"))
+
+    # Live positions / P&L (see app/positions.py): DB snapshot period, how often
+    # equity/future legs are re-marked from market data, WebSocket push period
+    POSITIONS_SNAPSHOT_SECONDS: float = float(os.getenv("POSITIONS_SNAPSHOT_SECONDS", "10"))
+    POSITIONS_MARK_SECONDS: float = float(os.getenv("POSITIONS_MARK_SECONDS", "0.25"))
+    POSITIONS_PUSH_SECONDS: float = float(os.getenv("POSITIONS_PUSH_SECONDS", "1.0"))
+
+    # Broker order reconciliation (see app/reconcile.py): sweep period (0 = only on demand),
+    # rows per batched UPDATE, and how old a never-acked 'pending' order gets before it is
+    # given up as never sent
+    RECONCILE_INTERVAL_SECONDS: float = float(os.getenv("RECONCILE_INTERVAL_SECONDS", "30"))
+    RECONCILE_UPDATE_BATCH: int = int(os.getenv("RECONCILE_UPDATE_BATCH", "1000"))
+    RECONCILE_PENDING_GRACE_SECONDS: float = float(os.getenv("RECONCILE_PENDING_GRACE_SECONDS", "60"))
+
+    # Load shedding (see app/overload.py): per route group concurrency limits adapted
+    # to observed latency; requests over the limit wait up to OVERLOAD_QUEUE_TIMEOUT
+    # for a slot, then get a 503 with Retry-After
+    OVERLOAD_ENABLED: bool = os.getenv("OVERLOAD_ENABLED", "true").lower() == "true"
+    OVERLOAD_INITIAL_LIMIT: int = int(os.getenv("OVERLOAD_INITIAL_LIMIT", "20"))
+    OVERLOAD_MIN_LIMIT: int = int(os.getenv("OVERLOAD_MIN_LIMIT", "2"))
+    OVERLOAD_MAX_LIMIT: int = int(os.getenv("OVERLOAD_MAX_LIMIT", "500"))
+    # Average latency above this multiple of the no-load latency cuts the limit by OVERLOAD_BACKOFF
+    OVERLOAD_LATENCY_TOLERANCE: float = float(os.getenv("OVERLOAD_LATENCY_TOLERANCE", "2.0"))
+    OVERLOAD_BACKOFF: float = float(os.getenv("OVERLOAD_BACKOFF", "0.9"))
+    OVERLOAD_QUEUE_TIMEOUT: float = float(os.getenv("OVERLOAD_QUEUE_TIMEOUT", "0.5"))
+    OVERLOAD_MAX_QUEUE: int = int(os.getenv("OVERLOAD_MAX_QUEUE", "1000"))
+    OVERLOAD_RETRY_AFTER: int = int(os.getenv("OVERLOAD_RETRY_AFTER", "1"))
+    # Token bucket per user (verified token) and per client address otherwise; 0 = off.
+    # Bursts of up to RATE_LIMIT_BURST_SECONDS worth of requests pass.
+    RATE_LIMIT_USER_PER_SECOND: float = float(os.getenv("RATE_LIMIT_USER_PER_SECOND", "20"))
+    RATE_LIMIT_IP_PER_SECOND: float = float(os.getenv("RATE_LIMIT_IP_PER_SECOND", "50"))
+    RATE_LIMIT_BURST_SECONDS: float = float(os.getenv("RATE_LIMIT_BURST_SECONDS", "2"))
+    RATE_LIMIT_MAX_KEYS: int = int(os.getenv("RATE_LIMIT_MAX_KEYS", "100000"))
+    # Behind a proxy the client address is the first X-Forwarded-For entry
+    RATE_LIMIT_TRUST_FORWARDED: bool = os.getenv("RATE_LIMIT_TRUST_FORWARDED", "false").lower() == "true"
+
+    # Backtesting (see app/backtest.py): bar files per ticker, worker processes (0 = one per CPU)
+    BACKTEST_DATA_DIR: str = os.getenv("BACKTEST_DATA_DIR", str(BASE_DIR / "data" / "bars"))
+    BACKTEST_WORKERS: int = int(os.getenv("BACKTEST_WORKERS", "0"))
+
+    # Telegram alerts (see app/alerts.py); no token = alerts are not queued at all
+    TELEGRAM_BOT_TOKEN: str = os.getenv("TELEGRAM_BOT_TOKEN")
+    TELEGRAM_API_URL: str = os.getenv("TELEGRAM_API_URL", "https://api.telegram.org")
+    # Bot API limits: ~30 messages/s overall, ~1 message/s to the same chat
+    TELEGRAM_GLOBAL_RATE: float = float(os.getenv("TELEGRAM_GLOBAL_RATE", "30"))
+    TELEGRAM_CHAT_RATE: float = float(os.getenv("TELEGRAM_CHAT_RATE", "1"))
+    # Alerts to one chat arriving within this window are sent as one message
+    ALERT_COALESCE_SECONDS: float = float(os.getenv("ALERT_COALESCE_SECONDS", "1.0"))
+    ALERT_BATCH_SIZE: int = int(os.getenv("ALERT_BATCH_SIZE", "500"))
+    ALERT_MAX_ATTEMPTS: int = int(os.getenv("ALERT_MAX_ATTEMPTS", "8"))
+    # Safety net for retries and rows queued by other workers
+    ALERT_POLL_SECONDS: float = float(os.getenv("ALERT_POLL_SECONDS", "5.0"))
+
+settings = Settings()
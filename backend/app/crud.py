@@ -1,29 +1,23 @@
-from sqlalchemy.orm import Session
-from sqlalchemy import func
-from app import models, schemas, config
-import httpx
-import json
+from sqlalchemy.orm import Session, selectinload
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import func, select, insert, update, delete, bindparam, or_
+import asyncio
+import logging
+import uuid
+from datetime import datetime, timezone
+from app import models, schemas, gotrue, pagination, config, profilecache, legsets, auditlog
+from app.brokers import Account
 from uuid import UUID
 
+logger = logging.getLogger(__name__)
+
 # Helper to create user in Supabase Auth (GoTrue)
-def create_supabase_auth_user(user: schemas.UserCreate):
+async def create_supabase_auth_user(user: schemas.UserCreate):
     """
     Creates a user in Supabase Auth using the Admin API.
     We need this to get a valid UUID for the profile.
     """
-    url = f"{config.settings.SUPABASE_URL}/auth/v1/admin/users"
-    headers = {
-        "apikey": config.settings.SUPABASE_KEY,
-        "Authorization": f"Bearer {config.settings.SUPABASE_KEY}",
-        "Content-Type": "application/json"
-    }
-    payload = {
-        "email": user.email,
-        "password": user.password,
-        "email_confirm": True # Auto-confirm email for internal users
-    }
-    
-    response = httpx.post(url, headers=headers, json=payload)
+    response = await gotrue.client.create_user(user.email, user.password)
     
     if response.status_code != 200 and response.status_code != 201:
         raise Exception(f"Failed to create Auth user: {response.text}")
@@ -31,10 +25,10 @@ def create_supabase_auth_user(user: schemas.UserCreate):
     return response.json()
 
 # Create the Profile in our Database
-def create_user_profile(db: Session, user: schemas.UserCreate):
-    # 1. Create Auth User first
-    auth_data = create_supabase_auth_user(user)
-    user_id = auth_data.get("id")
+async def create_user_profile(db: AsyncSession, user: schemas.UserCreate, actor_id: UUID = None):
+    # 1. Create Auth User first (async, on the shared GoTrue client)
+    auth_data = await create_supabase_auth_user(user)
+    user_id = UUID(auth_data.get("id"))
     
     # 2. Create Profile linked to that ID
     db_user = models.Profile(
@@ -48,10 +42,114 @@ def create_user_profile(db: Session, user: schemas.UserCreate):
     )
     
     db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
+    try:
+        await db.commit()
+    except Exception:
+        # 3. No profile, no auth user: don't leave an orphan login behind
+        await db.rollback()
+        await delete_supabase_auth_users([user_id])
+        raise
+    await db.refresh(db_user)
+    auditlog.writer.record("create", "profile", user_id, actor_id, _profile_snapshot(db_user))
     return db_user
 
+# Audited profile fields (never the password, which only GoTrue stores)
+PROFILE_AUDIT_FIELDS = ("email", "first_name", "last_name", "role", "multiplier", "telegram_id", "is_active")
+
+def _profile_snapshot(profile) -> dict:
+    if isinstance(profile, dict):
+        return {field: profile.get(field) for field in PROFILE_AUDIT_FIELDS}
+    return {field: getattr(profile, field) for field in PROFILE_AUDIT_FIELDS}
+
+async def delete_supabase_auth_users(user_ids: list[UUID], concurrency: int = None):
+    """
+    Compensation for auth users whose profile was never stored. Best effort:
+    failures are logged with the ids so they can be removed by hand.
+    """
+    limit = asyncio.Semaphore(concurrency or config.settings.GOTRUE_BULK_CONCURRENCY)
+
+    async def delete(user_id):
+        async with limit:
+            try:
+                response = await gotrue.client.delete_user(user_id)
+                if response.status_code in (200, 204, 404):
+                    return
+                reason = f"HTTP {response.status_code}"
+            except gotrue.GoTrueError as e:
+                reason = str(e)
+            logger.error("Orphaned auth user %s could not be deleted: %s", user_id, reason)
+
+    await asyncio.gather(*(delete(user_id) for user_id in user_ids))
+
+async def existing_emails_async(db: AsyncSession, emails: list[str]) -> set:
+    result = await db.execute(select(models.Profile.email).filter(models.Profile.email.in_(emails)))
+    return set(result.scalars().all())
+
+async def bulk_create_user_profiles_async(db: AsyncSession, users: list[schemas.UserCreate],
+                                          concurrency: int = None, actor_id: UUID = None):
+    """
+    Onboard many users: auth users are created concurrently (at most
+    'concurrency' GoTrue calls in flight), then every profile goes in with one
+    multi-row INSERT ... RETURNING. A user whose auth creation fails is just
+    reported; if the INSERT fails, all auth users of the batch are deleted again.
+    Returns, in input order, a UserResponse-shaped dict or an error message per user.
+    """
+    limit = asyncio.Semaphore(concurrency or config.settings.GOTRUE_BULK_CONCURRENCY)
+
+    # 1. Auth users, concurrently; one failure doesn't stop the others
+    async def create_auth_user(user):
+        async with limit:
+            try:
+                response = await gotrue.client.create_user(user.email, user.password)
+            except gotrue.GoTrueError as e:
+                return f"Auth service unavailable: {e}"
+        if response.status_code not in (200, 201):
+            try:
+                detail = response.json()
+                message = detail.get("msg") or detail.get("message") or detail.get("error_description")
+            except ValueError:
+                message = None
+            return f"Failed to create Auth user: {message or f'HTTP {response.status_code}'}"
+        return UUID(response.json().get("id"))
+
+    outcomes = await asyncio.gather(*(create_auth_user(user) for user in users))
+
+    # 2. One INSERT for every profile whose auth user exists
+    rows = [
+        {
+            "id": user_id,
+            "email": user.email,
+            "first_name": user.first_name,
+            "last_name": user.last_name,
+            "role": user.role,
+            "multiplier": user.multiplier,
+            "telegram_id": user.telegram_id,
+            "is_active": True
+        }
+        for user, user_id in zip(users, outcomes) if isinstance(user_id, UUID)
+    ]
+    created_at = []
+    if rows:
+        try:
+            result = await db.execute(
+                insert(models.Profile).returning(
+                    models.Profile.id, models.Profile.created_at, sort_by_parameter_order=True
+                ),
+                rows
+            )
+            created_at = [row.created_at for row in result]
+            await db.commit()
+        except Exception:
+            # 3. Compensate: the batch is all-or-nothing for profiles, so no orphan logins either
+            await db.rollback()
+            await delete_supabase_auth_users([row["id"] for row in rows], concurrency)
+            raise
+
+    for row in rows:
+        auditlog.writer.record("create", "profile", row["id"], actor_id, _profile_snapshot(row))
+    created = iter(dict(row, created_at=created) for row, created in zip(rows, created_at))
+    return [next(created) if isinstance(outcome, UUID) else outcome for outcome in outcomes]
+
 def get_user_by_email(db: Session, email: str):
     return db.query(models.Profile).filter(models.Profile.email == email).first()
 
@@ -84,62 +182,711 @@ def get_active_session(db: Session, user_id: UUID):
              .order_by(models.UserSession.login_time.desc())\
              .first()
 
-def create_strategy(db: Session, strategy: schemas.StrategyCreate, user_id: UUID):
-    # 1. Create the Strategy Container
-    db_strat = models.Strategy(
-        user_id=user_id,
-        name=strategy.name,
-        ticker=strategy.ticker,
-        instrument_type=strategy.instrument_type
-    )
-    db.add(db_strat)
-    db.commit()
-    db.refresh(db_strat)
-    
-    # 2. Create the Legs
-    for leg in strategy.legs:
-        db_leg = models.StrategyLeg(
-            strategy_id=db_strat.id,
-            leg_index=leg.leg_index,
-            action=leg.action,
-            option_type=leg.option_type,
-            quantity=leg.quantity,
-            strike_value=leg.strike_value,
-            strike_mode=leg.strike_mode,
-            expiration_days=leg.expiration_days
-        )
-        db.add(db_leg)
-    
-    db.commit()
-    return db_strat
-
 def get_user_strategies(db: Session, user_id: UUID):
     # Fetch all strategies for this specific user
     return db.query(models.Strategy).filter(models.Strategy.user_id == user_id).all()
     
 # --- USER MANAGEMENT ---
 
-def get_all_users(db: Session, skip: int = 0, limit: int = 100):
-    return db.query(models.Profile).offset(skip).limit(limit).all()
+def _escape_like(term: str) -> str:
+    return term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+def _user_filters(query, role=None, is_active=None, search=None):
+    if role is not None:
+        query = query.filter(models.Profile.role == role)
+    if is_active is not None:
+        query = query.filter(models.Profile.is_active == is_active)
+    if search:
+        # Substring match (so also prefix) on email and names, case-insensitive.
+        # Served by the pg_trgm GIN indexes on Postgres.
+        pattern = f"%{_escape_like(search)}%"
+        query = query.filter(or_(
+            models.Profile.email.ilike(pattern, escape="\\"),
+            models.Profile.first_name.ilike(pattern, escape="\\"),
+            models.Profile.last_name.ilike(pattern, escape="\\"),
+        ))
+    return query
+
+async def list_users_async(db: AsyncSession, role: str = None, is_active: bool = None, search: str = None,
+                           cursor: str = None, limit: int = pagination.DEFAULT_PAGE_SIZE,
+                           with_total: bool = True):
+    """
+    One page of profiles, newest first, plus the cursor for the next page and
+    an approximate total for the same filters (planner estimate, no COUNT(*)).
+    """
+    query = _user_filters(select(models.Profile), role, is_active, search)
+    total = await pagination.estimate_count(db, query) if with_total else None
+    result = await db.execute(pagination.apply_keyset(query, models.Profile, cursor).limit(limit + 1))
+    page, next_cursor = pagination.split_page(result.scalars().all(), limit)
+    return page, next_cursor, total
 
-def update_user(db: Session, user_id: UUID, user_update: dict):
+def update_user(db: Session, user_id: UUID, user_update: dict, actor_id: UUID = None):
     # Get the user
     db_user = db.query(models.Profile).filter(models.Profile.id == user_id).first()
     if not db_user:
         return None
     
-    # Update fields dynamically
+    # Update fields dynamically, remembering old -> new of audited fields that changed
+    changes = {}
     for key, value in user_update.items():
+        if key in PROFILE_AUDIT_FIELDS and getattr(db_user, key) != value:
+            changes[key] = [getattr(db_user, key), value]
         setattr(db_user, key, value)
     
+    # Role / is_active may have changed: drop cached copies on every worker
+    profilecache.notify_changed(db, user_id)
     db.commit()
     db.refresh(db_user)
+    if changes:
+        auditlog.writer.record("update", "profile", user_id, actor_id, changes)
     return db_user
 
-def delete_user(db: Session, user_id: UUID):
+def delete_user(db: Session, user_id: UUID, actor_id: UUID = None):
     db_user = db.query(models.Profile).filter(models.Profile.id == user_id).first()
     if db_user:
+        # The profile row is gone afterwards; the audit event keeps what it was
+        snapshot = _profile_snapshot(db_user)
         db.delete(db_user)
+        profilecache.notify_changed(db, user_id)
         db.commit()
+        auditlog.writer.record("delete", "profile", user_id, actor_id, snapshot)
         return True
-    return False
\ No newline at end of file
+    return False
+
+# --- ASYNC VARIANTS ---
+# Same queries on an AsyncSession (app.database.get_async_db), used by the async routes.
+
+async def get_user_by_email_async(db: AsyncSession, email: str):
+    result = await db.execute(select(models.Profile).filter(models.Profile.email == email))
+    return result.scalars().first()
+
+async def get_user_async(db: AsyncSession, user_id: UUID):
+    return await db.get(models.Profile, user_id)
+
+async def get_profile_record_async(db: AsyncSession, user_id: UUID):
+    """
+    Compact profile (id, email, role, is_active, multiplier) for auth checks,
+    served from profilecache when possible. None if there is no profile.
+    """
+    record = profilecache.cache.get(user_id)
+    if record is not None:
+        return record
+    profile = await get_user_async(db, user_id)
+    if profile is None:
+        return None
+    return profilecache.cache.put(profile)
+
+async def create_user_session_async(db: AsyncSession, user_id: UUID, ip_address: str, user_agent: str):
+    session = models.UserSession(
+        user_id=user_id,
+        ip_address=ip_address,
+        user_agent=user_agent
+    )
+    db.add(session)
+    await db.commit()
+    await db.refresh(session)
+    return session
+
+async def end_user_session_async(db: AsyncSession, session_id: UUID):
+    session = await db.get(models.UserSession, session_id)
+    if session:
+        session.logout_time = func.now()
+        await db.commit()
+        await db.refresh(session)
+    return session
+
+async def insert_user_sessions_async(db: AsyncSession, rows: list[dict]):
+    # One multi-row INSERT for a whole batch of logins (no commit, caller owns the transaction)
+    if rows:
+        await db.execute(insert(models.UserSession), rows)
+
+async def end_user_sessions_async(db: AsyncSession, logouts: list[dict]):
+    # Batched UPDATE (executemany); rows are {"session_id": ..., "closed_at": ...}
+    if logouts:
+        sessions = models.UserSession.__table__
+        await db.execute(
+            update(sessions)
+            .where(sessions.c.id == bindparam("session_id"))
+            .where(sessions.c.logout_time == None)
+            .values(logout_time=bindparam("closed_at")),
+            logouts
+        )
+
+def _utc(value):
+    # SQLite drops the zone of timezone-aware columns; they are stored as UTC
+    return value.replace(tzinfo=timezone.utc) if value is not None and value.tzinfo is None else value
+
+async def store_revoked_token_async(db: AsyncSession, key: str, expires_at, revoked_at):
+    """Upsert one revocation and drop the expired ones. No commit."""
+    await db.execute(delete(models.RevokedToken).where(models.RevokedToken.expires_at < revoked_at))
+    await db.execute(
+        _upsert(db.get_bind().dialect.name, models.RevokedToken, ["key"], ["expires_at", "revoked_at"]),
+        {"key": key, "expires_at": expires_at, "revoked_at": revoked_at},
+    )
+
+async def get_revoked_tokens_async(db: AsyncSession, now, since=None):
+    """Unexpired revocations as (key, expires_at, revoked_at), optionally only those revoked after 'since'."""
+    query = select(models.RevokedToken.key, models.RevokedToken.expires_at, models.RevokedToken.revoked_at) \
+        .filter(models.RevokedToken.expires_at >= now)
+    if since is not None:
+        query = query.filter(models.RevokedToken.revoked_at > since)
+    result = await db.execute(query)
+    return [(row.key, _utc(row.expires_at), _utc(row.revoked_at)) for row in result]
+
+async def get_active_session_async(db: AsyncSession, user_id: UUID):
+    result = await db.execute(
+        select(models.UserSession)
+        .filter(models.UserSession.user_id == user_id)
+        .filter(models.UserSession.logout_time == None)
+        .order_by(models.UserSession.login_time.desc())
+        .limit(1)
+    )
+    return result.scalars().first()
+
+async def create_strategy_async(db: AsyncSession, strategy: schemas.StrategyCreate, user_id: UUID):
+    # Container pointing at the (possibly pre-existing) leg-set template, one transaction
+    [template_id] = await get_or_create_templates_async(db, [strategy])
+    db_strat = models.Strategy(
+        user_id=user_id,
+        name=strategy.name,
+        ticker=strategy.ticker,
+        instrument_type=strategy.instrument_type,
+        template_id=template_id
+    )
+    db.add(db_strat)
+    await db.commit()
+    # Load server defaults (created_at, is_active) and the template's legs
+    await db.refresh(db_strat, ["created_at", "is_active", "legs"])
+    auditlog.writer.record("create", "strategy", db_strat.id, user_id, _strategy_snapshot(db_strat))
+    return db_strat
+
+def _strategy_snapshot(strategy) -> dict:
+    fields = ("user_id", "name", "ticker", "instrument_type", "template_id")
+    if isinstance(strategy, dict):
+        return {field: strategy.get(field) for field in fields}
+    return {field: getattr(strategy, field) for field in fields}
+
+async def bulk_create_strategies_async(db: AsyncSession, strategies: list[schemas.StrategyCreate], user_id: UUID):
+    """
+    Insert many strategies in ONE transaction: the missing leg-set templates
+    (and their legs) first, then one multi-row INSERT ... RETURNING for the
+    containers. Either everything is created or nothing is.
+    Returns StrategyResponse-shaped dicts in the same order as 'strategies'.
+    """
+    if not strategies:
+        return []
+
+    try:
+        template_ids = await get_or_create_templates_async(db, strategies)
+        strategy_rows = [
+            {
+                "id": uuid.uuid4(),
+                "user_id": user_id,
+                "name": strategy.name,
+                "ticker": strategy.ticker,
+                "instrument_type": strategy.instrument_type,
+                "is_active": True,
+                "template_id": template_id
+            }
+            for strategy, template_id in zip(strategies, template_ids)
+        ]
+        result = await db.execute(
+            insert(models.Strategy).returning(
+                models.Strategy.id, models.Strategy.created_at, sort_by_parameter_order=True
+            ),
+            strategy_rows
+        )
+        created_at = [row.created_at for row in result]
+        await db.commit()
+    except Exception:
+        await db.rollback()
+        raise
+
+    for row in strategy_rows:
+        auditlog.writer.record("create", "strategy", row["id"], user_id, _strategy_snapshot(row))
+    return [
+        {**row, "created_at": created, "legs": strategy.legs}
+        for row, created, strategy in zip(strategy_rows, created_at, strategies)
+    ]
+
+def _strategy_filters(query, user_id=None, ticker=None, instrument_type=None, is_active=None, template_id=None):
+    # user_id=None means all strategies (Super Admin view)
+    if user_id is not None:
+        query = query.filter(models.Strategy.user_id == user_id)
+    if template_id is not None:
+        query = query.filter(models.Strategy.template_id == template_id)
+    if ticker is not None:
+        query = query.filter(models.Strategy.ticker == ticker)
+    if instrument_type is not None:
+        query = query.filter(models.Strategy.instrument_type == instrument_type)
+    if is_active is not None:
+        query = query.filter(models.Strategy.is_active == is_active)
+    return query
+
+async def list_strategies_async(db: AsyncSession, user_id: UUID = None, ticker: str = None,
+                                instrument_type: str = None, is_active: bool = None, template_id: UUID = None,
+                                cursor: str = None, limit: int = pagination.DEFAULT_PAGE_SIZE):
+    """
+    One page of strategies, newest first, plus the cursor for the next page.
+    Legs come from a single extra SELECT ... IN (selectinload), not one per strategy.
+    """
+    query = select(models.Strategy).options(selectinload(models.Strategy.legs))
+    query = _strategy_filters(query, user_id, ticker, instrument_type, is_active, template_id)
+    query = pagination.apply_keyset(query, models.Strategy, cursor).limit(limit + 1)
+    result = await db.execute(query)
+    return pagination.split_page(result.scalars().all(), limit)
+
+async def stream_strategies_async(db: AsyncSession, user_id: UUID = None, ticker: str = None,
+                                  instrument_type: str = None, is_active: bool = None,
+                                  batch_size: int = 500):
+    """
+    Yield every matching strategy from a server-side cursor, batch by batch,
+    so memory stays flat however big the table is. Legs are loaded per batch.
+    """
+    query = select(models.Strategy).options(selectinload(models.Strategy.legs))
+    query = _strategy_filters(query, user_id, ticker, instrument_type, is_active)
+    query = pagination.apply_keyset(query, models.Strategy).execution_options(yield_per=batch_size)
+    result = await db.stream(query)
+    async for partition in result.scalars().partitions():
+        for strategy in partition:
+            yield strategy
+        # Drop the batch from the identity map before fetching the next one
+        db.expunge_all()
+
+async def get_strategy_async(db: AsyncSession, strategy_id: UUID):
+    result = await db.execute(
+        select(models.Strategy)
+        .options(selectinload(models.Strategy.legs))
+        .filter(models.Strategy.id == strategy_id)
+    )
+    return result.scalars().first()
+
+async def get_trading_accounts_async(db: AsyncSession):
+    """Active profiles with a broker account; only the columns fan-out needs."""
+    result = await db.execute(
+        select(models.Profile.id, models.Profile.multiplier, models.Profile.telegram_id, models.BrokerAccount.broker)
+        .join(models.BrokerAccount, models.BrokerAccount.profile_id == models.Profile.id)
+        .filter(models.Profile.is_active == True)
+    )
+    return [
+        Account(id=row.id, multiplier=float(row.multiplier or 1), broker=row.broker or config.settings.DEFAULT_BROKER,
+                telegram_id=row.telegram_id or None)
+        for row in result
+    ]
+
+async def set_broker_account_async(db: AsyncSession, profile_id: UUID, broker: str = None, account_ref: str = None,
+                                   actor_id: UUID = None):
+    """Create or replace a profile's broker account (the profile is then traded)."""
+    dialect_name = db.get_bind().dialect.name
+    await db.execute(
+        _upsert(dialect_name, models.BrokerAccount, ["profile_id"], ["broker", "account_ref"]),
+        {"profile_id": profile_id, "broker": broker, "account_ref": account_ref},
+    )
+    await db.commit()
+    account = await db.get(models.BrokerAccount, profile_id, populate_existing=True)
+    auditlog.writer.record("update", "broker_account", profile_id, actor_id,
+                           {"broker": broker, "account_ref": account_ref})
+    return account
+
+async def delete_broker_account_async(db: AsyncSession, profile_id: UUID, actor_id: UUID = None) -> bool:
+    """Unlink a profile from its broker: it is no longer traded."""
+    result = await db.execute(delete(models.BrokerAccount).where(models.BrokerAccount.profile_id == profile_id))
+    await db.commit()
+    if not result.rowcount:
+        return False
+    auditlog.writer.record("delete", "broker_account", profile_id, actor_id)
+    return True
+
+
+# --- STRATEGY TEMPLATES (content-addressed leg sets, app/legsets.py) ---
+
+def _insert_ignoring_duplicates(dialect_name: str, model, index_elements):
+    # INSERT ... ON CONFLICT DO NOTHING (Postgres and SQLite spell it the same)
+    if dialect_name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    return dialect_insert(model).on_conflict_do_nothing(index_elements=index_elements)
+
+async def get_or_create_templates_async(db: AsyncSession, strategies) -> list[UUID]:
+    """
+    Template id for each strategy (schemas.StrategyCreate or anything with
+    ticker / instrument_type / legs), creating the leg sets that don't exist
+    yet: one SELECT by hash, then one INSERT for new templates and one for
+    their legs. Two requests creating the same leg set race on the unique
+    content_hash; the loser's INSERT is a no-op and it reads the winner's row.
+    No commit, caller owns the transaction.
+    """
+    templates = models.StrategyTemplate
+    hashes = [legsets.content_hash(s.ticker, s.instrument_type, s.legs) for s in strategies]
+    by_hash = dict(zip(hashes, strategies))
+
+    result = await db.execute(select(templates.content_hash, templates.id).filter(templates.content_hash.in_(by_hash)))
+    ids = dict(result.all())
+
+    missing = [h for h in by_hash if h not in ids]
+    if missing:
+        rows = [
+            {"id": uuid.uuid4(), "content_hash": h, "ticker": by_hash[h].ticker,
+             "instrument_type": by_hash[h].instrument_type, "leg_count": len(by_hash[h].legs)}
+            for h in missing
+        ]
+        statement = _insert_ignoring_duplicates(db.get_bind().dialect.name, templates, ["content_hash"])
+        result = await db.execute(statement.returning(templates.content_hash, templates.id), rows)
+        created = dict(result.all())
+        leg_rows = [
+            {"id": uuid.uuid4(), "template_id": template_id, **legsets.leg_values(leg)}
+            for h, template_id in created.items()
+            for leg in by_hash[h].legs
+        ]
+        if leg_rows:
+            await db.execute(insert(models.StrategyLeg), leg_rows)
+        ids.update(created)
+
+        # Lost races: someone else committed the same leg set in between
+        lost = [h for h in missing if h not in ids]
+        if lost:
+            result = await db.execute(select(templates.content_hash, templates.id).filter(templates.content_hash.in_(lost)))
+            ids.update(result.all())
+
+    return [ids[h] for h in hashes]
+
+async def existing_profile_ids_async(db: AsyncSession, user_ids: list[UUID]) -> set:
+    result = await db.execute(select(models.Profile.id).filter(models.Profile.id.in_(user_ids)))
+    return set(result.scalars().all())
+
+async def clone_strategy_async(db: AsyncSession, source: models.Strategy, user_ids: list[UUID], name: str = None,
+                               actor_id: UUID = None):
+    """
+    TRD [87-91] Clone: one new Strategy row per user, all pointing at the
+    source's template (no legs are copied), in one multi-row INSERT.
+    Returns StrategyResponse-shaped dicts in the same order as user_ids.
+    """
+    rows = [
+        {
+            "id": uuid.uuid4(),
+            "user_id": user_id,
+            "name": name if name is not None else source.name,
+            "ticker": source.ticker,
+            "instrument_type": source.instrument_type,
+            "is_active": True,
+            "template_id": source.template_id
+        }
+        for user_id in user_ids
+    ]
+    try:
+        result = await db.execute(
+            insert(models.Strategy).returning(models.Strategy.created_at, sort_by_parameter_order=True),
+            rows
+        )
+        created_at = [row.created_at for row in result]
+        await db.commit()
+    except Exception:
+        await db.rollback()
+        raise
+    for row in rows:
+        snapshot = {**_strategy_snapshot(row), "source_id": source.id}
+        auditlog.writer.record("clone", "strategy", row["id"], actor_id, snapshot)
+    return [{**row, "created_at": created, "legs": source.legs} for row, created in zip(rows, created_at)]
+
+# --- AUDIT LOG (app/auditlog.py) ---
+
+async def list_audit_events_async(db: AsyncSession, entity_type: str = None, entity_id: UUID = None,
+                                  actor_id: UUID = None, action: str = None, since=None, until=None,
+                                  cursor: str = None, limit: int = pagination.DEFAULT_PAGE_SIZE):
+    """
+    One page of events, newest first, plus the cursor for the next page.
+    Every bound on created_at is also a plain range predicate (the keyset
+    row comparison alone doesn't prune), so Postgres only scans the monthly
+    partitions between 'since' and the cursor / 'until'.
+    """
+    event = models.AuditEvent
+    query = select(event)
+    if entity_type is not None:
+        query = query.filter(event.entity_type == entity_type, event.entity_id == entity_id)
+    if actor_id is not None:
+        query = query.filter(event.actor_id == actor_id)
+    if action is not None:
+        query = query.filter(event.action == action)
+    if since is not None:
+        query = query.filter(event.created_at >= since)
+    if until is not None:
+        query = query.filter(event.created_at < until)
+    if cursor:
+        query = query.filter(event.created_at <= pagination.decode_cursor(cursor)[0])
+    result = await db.execute(pagination.apply_keyset(query, event, cursor).limit(limit + 1))
+    return pagination.split_page(result.scalars().all(), limit)
+
+# --- ALERT OUTBOX (app/alerts.py) ---
+
+async def enqueue_alerts_async(db: AsyncSession, rows: list[dict]):
+    # Multi-row INSERT of {"chat_id", "text", "created_at", "next_attempt_at"}; no commit, so the
+    # alerts land in the same transaction as whatever they report
+    if rows:
+        await db.execute(insert(models.AlertOutbox), rows)
+
+async def claim_due_alerts_async(db: AsyncSession, now, lease_until, limit: int):
+    """
+    Oldest due pending alerts, leased until lease_until so no other dispatcher
+    (another worker) takes them; if this one dies they become due again.
+    SKIP LOCKED on Postgres, so concurrent claimers never block each other.
+    Commits.
+    """
+    outbox = models.AlertOutbox
+    result = await db.execute(
+        select(outbox.id, outbox.chat_id, outbox.text, outbox.attempts)
+        .filter(outbox.status == "pending", outbox.next_attempt_at <= now)
+        .order_by(outbox.next_attempt_at, outbox.created_at)
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+    )
+    rows = result.all()
+    if rows:
+        await db.execute(
+            update(outbox.__table__)
+            .where(outbox.__table__.c.id.in_([row.id for row in rows]))
+            .values(next_attempt_at=lease_until)
+        )
+    await db.commit()
+    return rows
+
+async def finish_alerts_async(db: AsyncSession, outcomes: list[dict]):
+    # Batched UPDATE (executemany); rows are {"alert_id", "status", "attempted" (0/1),
+    # "next_attempt_at", "sent_at", "last_error"}
+    if outcomes:
+        outbox = models.AlertOutbox.__table__
+        await db.execute(
+            update(outbox)
+            .where(outbox.c.id == bindparam("alert_id"))
+            .values(
+                status=bindparam("status"),
+                attempts=outbox.c.attempts + bindparam("attempted"),
+                next_attempt_at=bindparam("next_attempt_at"),
+                sent_at=bindparam("sent_at"),
+                last_error=bindparam("last_error"),
+            ),
+            outcomes
+        )
+
+# --- POSITION SNAPSHOTS (app/positions.py) ---
+
+def _upsert(dialect_name: str, model, index_elements, update_columns):
+    # INSERT ... ON CONFLICT (key) DO UPDATE SET col = excluded.col
+    if dialect_name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    statement = dialect_insert(model)
+    return statement.on_conflict_do_update(
+        index_elements=index_elements,
+        set_={column: statement.excluded[column] for column in update_columns},
+    )
+
+async def save_position_snapshots_async(db: AsyncSession, positions: list[dict], marks: list[dict]):
+    """
+    Upsert changed position rows (PositionSnapshot columns) and leg marks
+    (PositionMark columns), one executemany each. No commit.
+    """
+    dialect_name = (await db.connection()).dialect.name
+    if positions:
+        await db.execute(_upsert(
+            dialect_name, models.PositionSnapshot, ["account_id", "strategy_id", "leg_index"],
+            ["broker", "ticker", "instrument_type", "quantity", "cost_basis", "realized_pnl", "updated_at"],
+        ), positions)
+    if marks:
+        await db.execute(_upsert(
+            dialect_name, models.PositionMark, ["strategy_id", "leg_index"], ["mark", "updated_at"],
+        ), marks)
+
+async def load_position_snapshots_async(db: AsyncSession):
+    """(position rows, mark rows) as Core rows, for rebuilding the in-memory book."""
+    snapshots, marks = models.PositionSnapshot, models.PositionMark
+    positions = await db.execute(select(
+        snapshots.account_id, snapshots.strategy_id, snapshots.leg_index, snapshots.broker, snapshots.ticker,
+        snapshots.instrument_type, snapshots.quantity, snapshots.cost_basis, snapshots.realized_pnl,
+    ))
+    mark_rows = await db.execute(select(marks.strategy_id, marks.leg_index, marks.mark))
+    return positions.all(), mark_rows.all()
+
+async def insert_position_fills_async(db: AsyncSession, entries):
+    """Write (seq, positions.Fill) pairs to the fill ledger, one executemany. No commit."""
+    if not entries:
+        return
+    now = datetime.now(timezone.utc)
+    await db.execute(insert(models.PositionFill),
+                     [{"seq": seq, **fill._asdict(), "booked_at": now} for seq, fill in entries])
+
+async def load_position_fills_async(db: AsyncSession):
+    """Ledger rows not covered by a snapshot yet, in booking order."""
+    fills = models.PositionFill
+    result = await db.execute(select(
+        fills.seq, fills.account_id, fills.strategy_id, fills.leg_index, fills.quantity, fills.price,
+        fills.broker, fills.ticker, fills.instrument_type, fills.fill_id,
+    ).order_by(fills.seq))
+    return result.all()
+
+async def delete_position_fills_async(db: AsyncSession, seqs):
+    """Drop ledger rows a snapshot now covers. No commit."""
+    if seqs:
+        table = models.PositionFill.__table__
+        await db.execute(delete(table).where(table.c.seq == bindparam("ledger_seq")),
+                         [{"ledger_seq": seq} for seq in seqs])
+
+# --- OPTION CHAINS (app/chains.py) ---
+
+async def store_option_chain_async(db: AsyncSession, row: dict) -> bool:
+    """
+    Upsert a ticker's chain (OptionChainSnapshot columns) unless a newer
+    snapshot is stored already. True if stored. No commit.
+    """
+    if db.get_bind().dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    chains = models.OptionChainSnapshot
+    statement = dialect_insert(chains).values(row)
+    statement = statement.on_conflict_do_update(
+        index_elements=["ticker"],
+        set_={column: statement.excluded[column] for column in row if column != "ticker"},
+        where=chains.snapshot_time <= statement.excluded.snapshot_time,
+    )
+    result = await db.execute(statement)
+    return bool(result.rowcount)
+
+async def get_option_chain_keys_async(db: AsyncSession, since=None):
+    """(ticker, snapshot_time, stored_at) of the stored chains, optionally only those stored after 'since'."""
+    chains = models.OptionChainSnapshot
+    query = select(chains.ticker, chains.snapshot_time, chains.stored_at)
+    if since is not None:
+        query = query.filter(chains.stored_at > since)
+    result = await db.execute(query)
+    return [(row.ticker, _utc(row.snapshot_time), _utc(row.stored_at)) for row in result]
+
+async def get_option_chains_async(db: AsyncSession, tickers: list[str]):
+    """Full stored chains of some tickers, as dicts (snapshot_time in UTC)."""
+    chains = models.OptionChainSnapshot
+    result = await db.execute(select(
+        chains.ticker, chains.snapshot_time, chains.spot, chains.rate, chains.dividend, chains.contracts,
+    ).filter(chains.ticker.in_(tickers)))
+    return [{**row._mapping, "snapshot_time": _utc(row.snapshot_time)} for row in result]
+
+# --- BROKER ORDERS (app/reconcile.py) ---
+
+# 'pending' = written before dispatch, no ack recorded yet
+OPEN_ORDER_STATUSES = ("pending", "accepted", "partial", "timeout")
+
+async def create_broker_orders_async(db: AsyncSession, orders, acks=None):
+    """
+    Store a fan-out's child orders (fanout.ChildOrder, + its OrderAck if
+    already sent) in one multi-row INSERT. Without acks the rows are
+    'pending': the API writes them before dispatch and fills in the acks
+    with record_order_acks_async. A re-sent signal reuses its client order
+    ids, so rows that already exist are left alone. No commit.
+    """
+    if not orders:
+        return
+    dialect_name = (await db.connection()).dialect.name
+    await db.execute(_insert_ignoring_duplicates(dialect_name, models.BrokerOrder, ["client_order_id"]), [
+        {
+            "client_order_id": order.client_order_id,
+            "signal_id": order.signal_id,
+            "strategy_id": order.strategy_id,
+            "account_id": order.account_id,
+            "broker": ack.broker if ack else order.broker,
+            "broker_order_id": ack.broker_order_id if ack else None,
+            "ticker": order.ticker,
+            "instrument_type": order.instrument_type,
+            "leg_index": order.leg_index,
+            "action": order.action,
+            "quantity": order.quantity,
+            "status": ack.status if ack else "pending",
+            "filled_quantity": 0,
+            "error": ack.error if ack else None,
+        }
+        for order, ack in zip(orders, acks or [None] * len(orders))
+    ])
+
+async def get_signal_order_statuses_async(db: AsyncSession, signal_id: str) -> dict:
+    """client order id -> status of the orders already stored for a signal (a retried fan-out)."""
+    orders = models.BrokerOrder
+    result = await db.execute(select(orders.client_order_id, orders.status).filter(orders.signal_id == signal_id))
+    return dict(result.all())
+
+async def record_order_acks_async(db: AsyncSession, acks, now):
+    """
+    Dispatch outcome of 'pending' orders. Only rows still pending are updated:
+    if a reconciliation sweep already got the order's state from the broker,
+    that is newer than the ack. No commit.
+    """
+    if not acks:
+        return
+    table = models.BrokerOrder.__table__
+    statement = (
+        update(table)
+        .where(table.c.client_order_id == bindparam("order_id"), table.c.status == "pending")
+        .values(status=bindparam("status"), broker_order_id=bindparam("broker_order_id"),
+                error=bindparam("error"), updated_at=bindparam("updated_at"))
+    )
+    await db.execute(statement, [
+        {"order_id": ack.client_order_id, "status": ack.status, "broker_order_id": ack.broker_order_id,
+         "error": ack.error, "updated_at": now}
+        for ack in acks
+    ])
+
+async def get_open_broker_orders_async(db: AsyncSession):
+    # Core rows of every order that can still change (the partial index ix_broker_orders_open)
+    orders = models.BrokerOrder
+    result = await db.execute(
+        select(orders.client_order_id, orders.broker, orders.broker_order_id, orders.status,
+               orders.filled_quantity, orders.avg_fill_price, orders.account_id, orders.strategy_id,
+               orders.leg_index, orders.action, orders.ticker, orders.instrument_type, orders.created_at)
+        .filter(orders.status.in_(OPEN_ORDER_STATUSES))
+    )
+    return result.all()
+
+async def update_broker_orders_async(db: AsyncSession, changes: list[dict], batch_size: int = 1000,
+                                     track=frozenset()) -> set:
+    """
+    Batched UPDATE (executemany per batch); rows are {"order_id", "old_status",
+    "old_filled_quantity", "status", "filled_quantity", "avg_fill_price",
+    "broker_order_id", "error", "updated_at"}. A row is only updated while its
+    status and filled quantity are still the old ones the change was computed
+    from, so a stale change (another process got there first) is a no-op.
+    Returns the ids in 'track' whose row was actually updated. No commit.
+    """
+    table = models.BrokerOrder.__table__
+    statement = (
+        update(table)
+        .where(
+            table.c.client_order_id == bindparam("order_id"),
+            table.c.status == bindparam("old_status"),
+            table.c.filled_quantity == bindparam("old_filled_quantity"),
+        )
+        .values(
+            status=bindparam("status"),
+            filled_quantity=bindparam("filled_quantity"),
+            avg_fill_price=bindparam("avg_fill_price"),
+            broker_order_id=bindparam("broker_order_id"),
+            error=bindparam("error"),
+            updated_at=bindparam("updated_at"),
+        )
+    )
+    stamps = {change["order_id"]: change["updated_at"] for change in changes}
+    for start in range(0, len(changes), batch_size):
+        await db.execute(statement, changes[start:start + batch_size])
+
+    # executemany doesn't report which rows matched: read the tracked ones
+    # back, those updated here carry this call's updated_at
+    updated = set()
+    track = list(track)
+    for start in range(0, len(track), batch_size):
+        result = await db.execute(
+            select(table.c.client_order_id, table.c.updated_at)
+            .where(table.c.client_order_id.in_(track[start:start + batch_size]))
+        )
+        for order_id, updated_at in result.all():
+            if updated_at is not None and updated_at.tzinfo is None:
+                updated_at = updated_at.replace(tzinfo=timezone.utc)  # SQLite drops the zone
+            if updated_at == stamps[order_id]:
+                updated.add(order_id)
+    return updated
@@ -1,23 +1,269 @@
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker, declarative_base
+import time
+import uuid
+from sqlalchemy import create_engine, event, exc
+from sqlalchemy.engine import make_url
+from sqlalchemy.orm import Session, sessionmaker, declarative_base
+from starlette.requests import Request
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+from app import metrics
 from app.config import settings
 
-# 1. Create the database engine
-# pool_pre_ping=True checks if the connection is alive before using it
-engine = create_engine(settings.DATABASE_URL, pool_pre_ping=True)
+# --- POOL TUNING ---
+# Instead of pool_pre_ping (one extra round trip on EVERY checkout) we only
+# ping connections that sat idle in the pool longer than DB_PING_IDLE_SECONDS.
+# Busy connections are reused straight away; stale ones are tested once and
+# transparently replaced if the server (or PgBouncer) already dropped them.
 
-# 2. Create a SessionLocal class
-# Each request will create a new session instance from this class
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# Same pools SQLAlchemy would pick, plus checkout wait timing for /metrics
+class _TimedQueuePool(metrics.TimedCheckoutMixin, QueuePool):
+    metrics_name = "sync"
 
-# 3. Create the Base class
+class _TimedAsyncQueuePool(metrics.TimedCheckoutMixin, AsyncAdaptedQueuePool):
+    metrics_name = "async"
+
+class _TimedReplicaQueuePool(metrics.TimedCheckoutMixin, AsyncAdaptedQueuePool):
+    metrics_name = "replica"
+
+def _pool_kwargs(url, poolclass=None):
+    if url.get_backend_name() == "sqlite":
+        return {}
+    return {
+        "poolclass": poolclass,
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT,
+        "pool_recycle": settings.DB_POOL_RECYCLE,
+    }
+
+def _install_idle_ping(engine):
+    idle_seconds = settings.DB_PING_IDLE_SECONDS
+
+    @event.listens_for(engine, "checkin")
+    def _mark_checkin(dbapi_connection, connection_record):
+        connection_record.info["last_checkin"] = time.monotonic()
+
+    @event.listens_for(engine, "checkout")
+    def _ping_if_idle(dbapi_connection, connection_record, connection_proxy):
+        last_checkin = connection_record.info.get("last_checkin")
+        if last_checkin is None or time.monotonic() - last_checkin < idle_seconds:
+            return
+        try:
+            engine.dialect.do_ping(dbapi_connection)
+        except Exception:
+            # The pool catches this, discards the connection and retries with a fresh one
+            raise exc.DisconnectionError()
+
+def is_pgbouncer(url):
+    # Supabase's transaction-mode pooler listens on 6543
+    if settings.DB_PGBOUNCER is not None:
+        return settings.DB_PGBOUNCER
+    return url.port == 6543
+
+def _async_url(url, configured=None):
+    # Same database, async driver
+    if configured:
+        return make_url(configured)
+    backend = url.get_backend_name()
+    if backend == "postgresql":
+        return url.set(drivername="postgresql+asyncpg")
+    if backend == "sqlite":
+        return url.set(drivername="sqlite+aiosqlite")
+    return None
+
+def _async_connect_args(url):
+    if url.get_backend_name() != "postgresql" or not is_pgbouncer(url):
+        return {}
+    # PgBouncer in transaction mode hands each transaction to a different
+    # server connection, so named server-side prepared statements break.
+    # Disable asyncpg's statement caches and make names unique per statement.
+    return {
+        "statement_cache_size": 0,
+        "prepared_statement_cache_size": 0,
+        "prepared_statement_name_func": lambda: f"__asyncpg_{uuid.uuid4()}__",
+    }
+
+# --- LAZY ENGINES ---
+# Nothing here connects (or even creates an engine) at import time: importing
+# the app must not need a database. The engines are built on first use and
+# disposed by the lifespan. 'database.engine', 'database.SessionLocal',
+# 'database.async_engine' and 'database.AsyncSessionLocal' still work as
+# module attributes; they resolve through the getters below.
+
+# 1. The Base class
 # All our database models (tables) will inherit from this
 Base = declarative_base()
 
+_engine = None
+_session_factory = None
+_async_engine = None
+_async_session_factory = None
+_read_engine = None
+_read_session_factory = None
+
+def _database_url():
+    if not settings.DATABASE_URL:
+        raise RuntimeError("DATABASE_URL is not set (environment or backend/.env)")
+    return make_url(settings.DATABASE_URL)
+
+# 2. The (sync) database engine and its session factory
+# Each request will create a new session instance from the factory
+def get_engine():
+    global _engine
+    if _engine is None:
+        url = _database_url()
+        engine = create_engine(url, **_pool_kwargs(url, _TimedQueuePool))
+        _install_idle_ping(engine)
+        metrics.instrument_engine(engine, "sync")
+        _engine = engine
+    return _engine
+
+def get_sessionmaker():
+    global _session_factory
+    if _session_factory is None:
+        _session_factory = sessionmaker(autocommit=False, autoflush=False, bind=get_engine())
+    return _session_factory
+
 # Dependency to get the database session in API requests
-def get_db():
-    db = SessionLocal()
+def get_db(request: Request = None):
+    db = get_sessionmaker()()
+    db.info["request_state"] = request.state if request is not None else None
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+# --- ASYNC ENGINE (optional) ---
+# Used by the async routes so one worker isn't capped by the threadpool size.
+# Needs 'asyncpg' (Postgres) or 'aiosqlite' (SQLite); if the driver isn't
+# installed the async engine is simply not available (getters return None).
+
+def get_async_engine():
+    global _async_engine
+    if _async_engine is None:
+        try:
+            from sqlalchemy.ext.asyncio import create_async_engine
+        except ImportError:
+            return None
+        async_url = _async_url(_database_url(), settings.ASYNC_DATABASE_URL)
+        if async_url is None:
+            return None
+        try:
+            engine = create_async_engine(
+                async_url,
+                connect_args=_async_connect_args(async_url),
+                **_pool_kwargs(async_url, _TimedAsyncQueuePool)
+            )
+        except ImportError:
+            # Driver (asyncpg / aiosqlite) not installed
+            return None
+        _install_idle_ping(engine.sync_engine)
+        metrics.instrument_engine(engine.sync_engine, "async")
+        _async_engine = engine
+    return _async_engine
+
+def get_async_sessionmaker():
+    global _async_session_factory
+    if _async_session_factory is None:
+        engine = get_async_engine()
+        if engine is None:
+            return None
+        from sqlalchemy.ext.asyncio import async_sessionmaker
+        # expire_on_commit=False: objects stay readable after commit without
+        # an implicit (and in async, illegal) lazy reload
+        _async_session_factory = async_sessionmaker(engine, expire_on_commit=False, autoflush=False)
+    return _async_session_factory
+
+async def get_async_db(request: Request = None):
+    factory = get_async_sessionmaker()
+    if factory is None:
+        raise RuntimeError("Async database engine is not configured (is asyncpg installed?)")
+    async with factory() as db:
+        db.info["request_state"] = request.state if request is not None else None
+        yield db
+
+# --- READ REPLICA ENGINE (optional) ---
+# A second async engine on READ_REPLICA_URL, same pool settings. Which
+# requests may use it is decided by app/replica.py (get_read_db).
+
+def get_async_read_engine():
+    global _read_engine
+    if _read_engine is None and settings.READ_REPLICA_URL:
+        from sqlalchemy.ext.asyncio import create_async_engine
+        read_url = _async_url(make_url(settings.READ_REPLICA_URL))
+        engine = create_async_engine(
+            read_url,
+            connect_args=_async_connect_args(read_url),
+            **_pool_kwargs(read_url, _TimedReplicaQueuePool)
+        )
+        _install_idle_ping(engine.sync_engine)
+        metrics.instrument_engine(engine.sync_engine, "replica")
+        _read_engine = engine
+    return _read_engine
+
+def get_async_read_sessionmaker():
+    global _read_session_factory
+    if _read_session_factory is None:
+        engine = get_async_read_engine()
+        if engine is None:
+            return None
+        from sqlalchemy.ext.asyncio import async_sessionmaker
+        _read_session_factory = async_sessionmaker(engine, expire_on_commit=False, autoflush=False)
+    return _read_session_factory
+
+# --- WRITE TRACKING ---
+# Read-your-writes (app/replica.py) needs to know who just wrote. A session
+# remembers that it wrote (an ORM flush or an INSERT / UPDATE / DELETE
+# statement); when that commits, the caller the auth dependency stored in
+# request.state.user_id and request.state are passed to every callback in
+# 'write_listeners'.
+
+write_listeners = []
+
+@event.listens_for(Session, "do_orm_execute")
+def _note_dml(orm_execute_state):
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        orm_execute_state.session.info["wrote"] = True
+
+@event.listens_for(Session, "after_flush")
+def _note_flush(session, flush_context):
+    session.info["wrote"] = True
+
+@event.listens_for(Session, "after_rollback")
+def _forget_writes(session):
+    session.info.pop("wrote", None)
+
+@event.listens_for(Session, "after_commit")
+def _report_writes(session):
+    if not session.info.pop("wrote", False):
+        return
+    request_state = session.info.get("request_state")
+    user_id = getattr(request_state, "user_id", None)
+    if user_id is not None:
+        for listener in write_listeners:
+            listener(user_id, request_state)
+
+async def dispose():
+    """Close every pooled connection (lifespan shutdown). Engines are rebuilt on next use."""
+    global _engine, _session_factory, _async_engine, _async_session_factory, _read_engine, _read_session_factory
+    if _read_engine is not None:
+        await _read_engine.dispose()
+    if _async_engine is not None:
+        await _async_engine.dispose()
+    if _engine is not None:
+        _engine.dispose()
+    _engine = _session_factory = _async_engine = _async_session_factory = None
+    _read_engine = _read_session_factory = None
+
+_LAZY_ATTRIBUTES = {
+    "engine": get_engine,
+    "SessionLocal": get_sessionmaker,
+    "async_engine": get_async_engine,
+    "AsyncSessionLocal": get_async_sessionmaker,
+}
+
+def __getattr__(name):
+    # Module attribute access (database.engine, ...) builds the engine on demand
+    getter = _LAZY_ATTRIBUTES.get(name)
+    if getter is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    return getter()
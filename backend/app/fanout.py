@@ -0,0 +1,141 @@
+import asyncio
+import logging
+import time
+import uuid
+from dataclasses import dataclass, field
+from decimal import Decimal, ROUND_HALF_UP
+
+from app import brokers
+from app.brokers import Account, BrokerError, ChildOrder, OrderAck
+
+logger = logging.getLogger(__name__)
+
+# --- ORDER FAN-OUT ---
+# One strategy signal -> one child order per (account, leg), sized by the
+# account multiplier, dispatched concurrently to each account's broker.
+
+
+def child_quantity(leg_quantity, multiplier) -> float:
+    """Leg quantity x account multiplier, rounded half-up to whole units."""
+    quantity = Decimal(str(leg_quantity)) * Decimal(str(multiplier))
+    return float(quantity.quantize(Decimal(1), rounding=ROUND_HALF_UP))
+
+
+def signal_id_for(strategy_id, idempotency_key: str) -> str:
+    """
+    Deterministic signal id for a caller-supplied idempotency key, scoped to
+    the strategy: a retried request gets the same client order ids, which
+    the brokers (and broker_orders) treat as the same orders.
+    """
+    return uuid.uuid5(strategy_id, idempotency_key).hex
+
+
+def build_child_orders(strategy, accounts: list[Account], signal_id: str) -> list[ChildOrder]:
+    """
+    'strategy' is a models.Strategy (or anything with the same attributes)
+    with its legs loaded. Legs that round to zero units are skipped.
+    """
+    orders = []
+    legs = sorted(strategy.legs, key=lambda leg: int(leg.leg_index))
+    for account in accounts:
+        for leg in legs:
+            quantity = child_quantity(leg.quantity or 1, account.multiplier or 1)
+            if quantity <= 0:
+                continue
+            leg_index = int(leg.leg_index)
+            orders.append(ChildOrder(
+                client_order_id=f"{signal_id}-{account.id.hex}-{leg_index}",
+                signal_id=signal_id,
+                strategy_id=strategy.id,
+                account_id=account.id,
+                broker=account.broker,
+                ticker=strategy.ticker,
+                instrument_type=strategy.instrument_type,
+                leg_index=leg_index,
+                action=leg.action,
+                quantity=quantity,
+                option_type=leg.option_type,
+                strike_value=float(leg.strike_value) if leg.strike_value is not None else None,
+                strike_mode=leg.strike_mode or "fixed",
+                expiration_days=int(leg.expiration_days) if leg.expiration_days is not None else None,
+            ))
+    return orders
+
+
+@dataclass
+class FanOutResult:
+    signal_id: str
+    acks: list[OrderAck] = field(default_factory=list)
+    orders: list[ChildOrder] = field(default_factory=list)  # Same order as acks
+    elapsed: float = 0.0
+
+    def count(self, status: str) -> int:
+        return sum(1 for ack in self.acks if ack.status == status)
+
+    def summary(self) -> dict:
+        return {
+            "signal_id": self.signal_id,
+            "orders": len(self.acks),
+            "accepted": self.count("accepted"),
+            "rejected": self.count("rejected"),
+            "timeout": self.count("timeout"),
+            "error": self.count("error"),
+            "elapsed_ms": round(self.elapsed * 1000, 2),
+        }
+
+
+class FanOutEngine:
+    """
+    Dispatches child orders concurrently. Each broker gets its own semaphore
+    (adapter.max_concurrency) and per-order timeout (adapter.timeout), so one
+    slow broker can't starve the others.
+    """
+
+    def __init__(self, adapters: dict = None):
+        self.adapters = adapters if adapters is not None else brokers.adapters
+        self._semaphores = {}
+
+    def _semaphore(self, adapter) -> asyncio.Semaphore:
+        semaphore = self._semaphores.get(adapter.name)
+        if semaphore is None:
+            semaphore = self._semaphores[adapter.name] = asyncio.Semaphore(adapter.max_concurrency)
+        return semaphore
+
+    async def _send(self, order: ChildOrder) -> OrderAck:
+        adapter = self.adapters.get(order.broker)
+        if adapter is None:
+            return OrderAck(order.client_order_id, order.account_id, order.broker, "error",
+                            error=f"No adapter registered for broker '{order.broker}'")
+
+        async with self._semaphore(adapter):
+            start = time.perf_counter()
+            try:
+                ack = await asyncio.wait_for(adapter.place_order(order), adapter.timeout)
+            except asyncio.TimeoutError:
+                return OrderAck(order.client_order_id, order.account_id, adapter.name, "timeout",
+                                latency=time.perf_counter() - start, error="Broker timed out")
+            except BrokerError as e:
+                return OrderAck(order.client_order_id, order.account_id, adapter.name, "error",
+                                latency=time.perf_counter() - start, error=str(e))
+            except Exception as e:
+                # An adapter bug must not fail the whole signal after other orders went out
+                logger.exception("Broker adapter '%s' failed on order %s", adapter.name, order.client_order_id)
+                return OrderAck(order.client_order_id, order.account_id, adapter.name, "error",
+                                latency=time.perf_counter() - start, error=f"{e.__class__.__name__}: {e}")
+            ack.latency = time.perf_counter() - start
+            return ack
+
+    async def dispatch(self, orders: list[ChildOrder]) -> list[OrderAck]:
+        """Send every order and return the acks in the same order."""
+        return await asyncio.gather(*(self._send(order) for order in orders))
+
+    async def fan_out(self, strategy, accounts: list[Account], signal_id: str = None) -> FanOutResult:
+        signal_id = signal_id or uuid.uuid4().hex
+        orders = build_child_orders(strategy, accounts, signal_id)
+        start = time.perf_counter()
+        acks = await self.dispatch(orders)
+        return FanOutResult(signal_id, acks, orders, time.perf_counter() - start)
+
+
+# Shared engine for the API (uses the global broker registry)
+engine = FanOutEngine()
@@ -0,0 +1,138 @@
+import asyncio
+import random
+import time
+
+import httpx
+
+from app import config, metrics
+
+# Statuses that mean "try again later" rather than "your request is wrong"
+RETRYABLE_STATUS = {429, 502, 503, 504}
+
+
+class GoTrueError(Exception):
+    """Raised when Supabase Auth can't be reached after all retries."""
+
+
+class GoTrueClient:
+    """
+    One pooled httpx.AsyncClient for every Supabase Auth (GoTrue) call.
+    Opened/closed by the FastAPI lifespan in app/main.py.
+    """
+
+    def __init__(self, base_url, api_key, connect_timeout=3.0, read_timeout=10.0,
+                 max_connections=100, max_keepalive=20, http2=False,
+                 max_retries=2, backoff_base=0.1):
+        self.base_url = base_url
+        self.api_key = api_key
+        self.timeout = httpx.Timeout(read_timeout, connect=connect_timeout)
+        self.limits = httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_keepalive)
+        self.http2 = http2
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self._client = None
+
+    async def open(self):
+        if self._client is not None:
+            return
+        http2 = self.http2
+        if http2:
+            # HTTP/2 needs the optional 'h2' package (pip install httpx[http2])
+            try:
+                import h2  # noqa: F401
+            except ImportError:
+                http2 = False
+        self._client = httpx.AsyncClient(
+            base_url=self.base_url or "",
+            headers={"apikey": self.api_key or ""},
+            timeout=self.timeout,
+            limits=self.limits,
+            http2=http2,
+        )
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            raise GoTrueError("GoTrue client is not open (app lifespan not started?)")
+        return self._client
+
+    async def request(self, method, url, idempotent=True, endpoint=None, **kwargs) -> httpx.Response:
+        """
+        Send a request with bounded retries and jittered exponential backoff.
+        Non-idempotent calls are only retried when the connection never got made.
+        'endpoint' is the metrics label when the url carries an id.
+        """
+        attempt = 0
+        while True:
+            start = time.perf_counter()
+            status = "error"
+            try:
+                response = await self.client.request(method, url, **kwargs)
+                status = response.status_code
+                if not (idempotent and response.status_code in RETRYABLE_STATUS):
+                    return response
+                if attempt >= self.max_retries:
+                    return response
+            except (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout) as e:
+                if attempt >= self.max_retries:
+                    raise GoTrueError(str(e)) from e
+            except httpx.RequestError as e:
+                if not idempotent or attempt >= self.max_retries:
+                    raise GoTrueError(str(e)) from e
+            finally:
+                metrics.gotrue_requests.observe(time.perf_counter() - start, method, endpoint or url, status)
+
+            # Full jitter: sleep somewhere in [0, base * 2^attempt]
+            await asyncio.sleep(random.uniform(0, self.backoff_base * (2 ** attempt)))
+            attempt += 1
+
+    # --- SUPABASE AUTH ENDPOINTS ---
+
+    async def password_grant(self, email: str, password: str) -> httpx.Response:
+        return await self.request(
+            "POST", "/auth/v1/token",
+            params={"grant_type": "password"},
+            json={"email": email, "password": password},
+        )
+
+    async def create_user(self, email: str, password: str) -> httpx.Response:
+        # Admin API: needs the service role key as bearer
+        return await self.request(
+            "POST", "/auth/v1/admin/users",
+            idempotent=False,
+            headers={"Authorization": f"Bearer {self.api_key}"},
+            json={
+                "email": email,
+                "password": password,
+                "email_confirm": True  # Auto-confirm email for internal users
+            },
+        )
+
+    async def delete_user(self, user_id) -> httpx.Response:
+        # Admin API: undoes create_user when the matching profile couldn't be stored
+        return await self.request(
+            "DELETE", f"/auth/v1/admin/users/{user_id}",
+            endpoint="/auth/v1/admin/users/{id}",
+            headers={"Authorization": f"Bearer {self.api_key}"},
+        )
+
+    async def get_jwks(self) -> httpx.Response:
+        return await self.request("GET", "/auth/v1/.well-known/jwks.json")
+
+
+# Application-lifetime client shared by crud, routers and the token verifier
+client = GoTrueClient(
+    base_url=config.settings.SUPABASE_URL,
+    api_key=config.settings.SUPABASE_KEY,
+    connect_timeout=config.settings.GOTRUE_CONNECT_TIMEOUT,
+    read_timeout=config.settings.GOTRUE_READ_TIMEOUT,
+    max_connections=config.settings.GOTRUE_MAX_CONNECTIONS,
+    max_keepalive=config.settings.GOTRUE_MAX_KEEPALIVE,
+    http2=config.settings.GOTRUE_HTTP2,
+    max_retries=config.settings.GOTRUE_MAX_RETRIES,
+)
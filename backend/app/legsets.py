@@ -0,0 +1,51 @@
+import hashlib
+import json
+from decimal import Decimal
+
+# --- CONTENT-ADDRESSED LEG SETS ---
+# Strategies are immutable (TRD [85]), so two strategies with the same ticker,
+# instrument type and legs are the same trade. Their legs live once, on a
+# models.StrategyTemplate keyed by content_hash = sha256 of a canonical form:
+# legs ordered by leg_index, numbers normalized (1 == 1.0 == Decimal("1.00")),
+# absent optionals as null. Clone = new Strategy row pointing at the template;
+# "equivalent strategies" = same template_id.
+
+LEG_FIELDS = ("leg_index", "action", "option_type", "quantity", "strike_value", "strike_mode", "expiration_days")
+
+
+def _number(value):
+    if value is None:
+        return None
+    return format(Decimal(str(value)).normalize(), "f")
+
+
+def _field(leg, name):
+    return leg.get(name) if isinstance(leg, dict) else getattr(leg, name, None)
+
+
+def leg_values(leg) -> dict:
+    """Column values of one leg (schema, ORM row or dict) for a strategy_legs row."""
+    return {name: _field(leg, name) for name in LEG_FIELDS}
+
+
+def canonical_legs(legs) -> list[dict]:
+    """Legs (schemas, ORM rows or dicts) as plain dicts in canonical form and order."""
+    canonical = []
+    for leg in legs:
+        quantity = _field(leg, "quantity")
+        canonical.append({
+            "leg_index": int(_field(leg, "leg_index")),
+            "action": _field(leg, "action"),
+            "option_type": _field(leg, "option_type") or None,
+            "quantity": _number(1 if quantity is None else quantity),
+            "strike_value": _number(_field(leg, "strike_value")),
+            "strike_mode": _field(leg, "strike_mode") or "fixed",
+            "expiration_days": _number(_field(leg, "expiration_days")),
+        })
+    return sorted(canonical, key=lambda leg: leg["leg_index"])
+
+
+def content_hash(ticker: str, instrument_type: str, legs) -> str:
+    payload = {"ticker": ticker, "instrument_type": instrument_type, "legs": canonical_legs(legs)}
+    encoded = json.dumps(payload, sort_keys=True, separators=(",", ":")).encode()
+    return hashlib.sha256(encoded).hexdigest()
@@ -0,0 +1,78 @@
+import hashlib
+import logging
+
+from sqlalchemy import text
+
+from app import database
+
+logger = logging.getLogger(__name__)
+
+# --- ADVISORY LOCKS ---
+# Background work that must run in one API process at a time (several uvicorn
+# workers, several replicas) holds a Postgres advisory lock. The lock is
+# transaction-scoped (pg_try_advisory_xact_lock) in a transaction kept open on
+# a dedicated connection: unlike a session-level lock, that also holds through
+# PgBouncer in transaction mode, which pins one server connection per
+# transaction. Closing the connection, or the process dying, releases it.
+# Other databases (SQLite: one process, dev / benchmarks) always grant it.
+
+
+def lock_key(name: str) -> int:
+    """Stable signed 64-bit advisory lock key for a name."""
+    return int.from_bytes(hashlib.sha256(name.encode()).digest()[:8], "big", signed=True)
+
+
+class AdvisoryLock:
+    def __init__(self, name: str):
+        self.name = name
+        self.key = lock_key(name)
+        self._connection = None
+        self._held = False
+
+    @property
+    def held(self) -> bool:
+        return self._held
+
+    async def acquire(self) -> bool:
+        """Try once, without waiting; True if this process holds the lock."""
+        if self._held:
+            return True
+        engine = database.get_async_engine()
+        if engine.dialect.name != "postgresql":
+            self._held = True
+            return True
+        connection = await engine.connect()
+        try:
+            await connection.begin()
+            result = await connection.execute(text("SELECT pg_try_advisory_xact_lock(:key)"), {"key": self.key})
+            acquired = bool(result.scalar())
+        except Exception:
+            await connection.close()
+            raise
+        if not acquired:
+            await connection.close()  # Rolls back
+            return False
+        self._connection, self._held = connection, True
+        return True
+
+    async def check(self) -> bool:
+        """
+        Still held? A dropped connection has released the lock (another
+        process may hold it by now), so this gives it up too. The round trip
+        also keeps the open transaction from looking idle.
+        """
+        if self._held and self._connection is not None:
+            try:
+                await self._connection.execute(text("SELECT 1"))
+            except Exception as e:
+                logger.warning("Lost advisory lock '%s': %s", self.name, e.__class__.__name__)
+                await self.release()
+        return self._held
+
+    async def release(self):
+        connection, self._connection, self._held = self._connection, None, False
+        if connection is not None:
+            try:
+                await connection.close()
+            except Exception:
+                logger.warning("Closing the connection of advisory lock '%s' failed", self.name, exc_info=True)
@@ -1,20 +1,94 @@
+import logging
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, Depends, HTTPException
-from sqlalchemy.orm import Session
+from fastapi.responses import PlainTextResponse
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import text
 from app.config import settings
-from app.database import get_db, engine
-from app import models
-from app.routers import users, auth, strategies
+from app import alerts, auditlog, backtest, bootstrap, chains, database, gotrue, marketdata, metrics, overload, positions, reconcile, replica, sessionlog, profilecache
+from app.security import REVOCATION_CHANNEL, verifier
+from app.routers import users, auth, strategies, marketdata as marketdata_router, audit, orders, positions as positions_router
 from fastapi.middleware.cors import CORSMiddleware
 
-# THIS LINE CREATES THE TABLES AUTOMATICALLY
-models.Base.metadata.create_all(bind=engine)
+logger = logging.getLogger(__name__)
+
+# Importing this module does no I/O: no engine, no connection, no schema work.
+# Tables are created with 'python -m app.bootstrap create'; the engines are
+# built on first use and the lifespan below owns everything long-lived.
+
+async def _prepare_schema():
+    # Both optional and off by default (DB_AUTO_CREATE is meant for local dev)
+    if settings.DB_AUTO_CREATE:
+        await bootstrap.create_schema_async()
+    elif settings.DB_SCHEMA_CHECK:
+        missing = await bootstrap.check_schema_async()
+        if missing:
+            logger.warning("Database schema is behind the models, run 'python -m app.bootstrap create'. Missing: %s",
+                           ", ".join(missing))
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if not settings.DEFAULT_BROKER:
+        raise RuntimeError("DEFAULT_BROKER is not set (e.g. DEFAULT_BROKER=simulated for dev and benchmarks)")
+    if not settings.DATABASE_URL:
+        logger.warning("DATABASE_URL is not set; database routes will fail")
+    else:
+        await _prepare_schema()
+    # One pooled GoTrue client for the whole app lifetime
+    await gotrue.client.open()
+    # Keep the JWKS signing keys and the shared token revocations fresh in the background
+    verifier.start()
+    # Batched background writer for login/logout records
+    sessionlog.writer.start()
+    # Batched (COPY) writer for the audit / event log
+    auditlog.writer.start()
+    # Cross-worker profile cache invalidation (Postgres LISTEN/NOTIFY), plus ticks
+    # posted to, logouts served, alerts queued and option chains stored by other workers
+    profilecache.listener.listen(marketdata.TICK_CHANNEL, marketdata.on_ticks_notify)
+    profilecache.listener.listen(REVOCATION_CHANNEL, verifier.on_revocation_notify)
+    profilecache.listener.listen(alerts.NOTIFY_CHANNEL, lambda payload: alerts.dispatcher.wake())
+    profilecache.listener.listen(chains.CHAIN_CHANNEL, chains.sync.on_notify)
+    profilecache.listener.start()
+    # Market data feed into this worker's hub (only with MARKET_DATA_REPLAY_PATH)
+    marketdata.feed.start()
+    # Stored option chains into this worker's strike resolver
+    chains.sync.start()
+    # Telegram alerts from the durable outbox (only with a bot token; one process sends)
+    alerts.dispatcher.start()
+    # Read replica health / lag probes (only with READ_REPLICA_URL)
+    replica.monitor.start()
+    # Live positions / P&L: resume from the last snapshot before serving fills
+    await positions.book.start()
+    # Broker order reconciliation sweeps (books new fills into the position book)
+    reconcile.reconciler.start()
+    yield
+    await reconcile.reconciler.stop()
+    await positions.book.stop()
+    await marketdata.feed.stop()
+    await chains.sync.stop()
+    await replica.monitor.stop()
+    await alerts.dispatcher.stop()
+    # Backtest worker processes (only started if a backtest job ran)
+    await backtest.runner.shutdown()
+    await profilecache.listener.stop()
+    await sessionlog.writer.stop()
+    await auditlog.writer.stop()
+    await verifier.stop()
+    await gotrue.client.close()
+    await database.dispose()
 
 app = FastAPI(
     title=settings.PROJECT_NAME,
-    version=settings.VERSION
+    version=settings.VERSION,
+    lifespan=lifespan
 )
 
+# Rate limits + adaptive concurrency limits per route group (fast 429 / 503 with
+# Retry-After). Added first so it sits inside CORS: rejections still carry the
+# CORS headers, and preflights are never shed.
+if settings.OVERLOAD_ENABLED:
+    app.add_middleware(overload.LoadShedMiddleware)
+
 # --- ADD CORS MIDDLEWARE HERE ---
 # This tells the browser: "It's okay to accept responses from this server"
 app.add_middleware(
@@ -23,26 +97,45 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],  # Allows all methods (GET, POST, etc.)
     allow_headers=["*"],  # Allows all headers
+    expose_headers=["X-Next-Cursor", "X-Total-Estimate", "Retry-After", replica.WRITE_HEADER],  # Pagination / back-off / read-your-writes headers readable by the frontend
 )
 
+# Marks responses to writes so the client's next reads skip the replica, on any worker
+app.add_middleware(replica.LastWriteMiddleware)
+
+# Per-route latency histograms for /metrics (outermost, so it times everything)
+app.add_middleware(metrics.PrometheusMiddleware)
+
 # Include the User Router
 app.include_router(users.router)
 app.include_router(auth.router)
 app.include_router(strategies.router)
+app.include_router(marketdata_router.router)
+app.include_router(audit.router)
+app.include_router(positions_router.router)
+app.include_router(orders.router)
 
 @app.get("/")
 def read_root():
     return {"status": "active", "system": "Multi-Broker Platform Alpha Layer"}
 
 @app.get("/health")
-def health_check(db: Session = Depends(get_db)):
+async def health_check(db: AsyncSession = Depends(replica.get_read_db)):
     """
     Check database connection using SQLAlchemy.
     Executing 'SELECT 1' is the standard way to ping a SQL DB.
+    Served by the read replica when it is usable; 'replica' says which.
     """
     try:
         # Try to execute a simple query
-        db.execute(text("SELECT 1"))
-        return {"db_status": "connected", "mode": "SQLAlchemy"}
+        await db.execute(text("SELECT 1"))
+        return {"db_status": "connected", "mode": "SQLAlchemy", "profile_cache": profilecache.cache.stats(),
+                "replica": replica.monitor.stats(), "marketdata_feed": marketdata.feed.stats(),
+                "overload": overload.shedder.stats() if settings.OVERLOAD_ENABLED else None}
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/metrics", include_in_schema=False)
+def read_metrics():
+    """Prometheus scrape endpoint (text exposition format 0.0.4)."""
+    return PlainTextResponse(metrics.registry.render(), media_type="text/plain; version=0.0.4")
@@ -0,0 +1,334 @@
+import asyncio
+import csv
+import json
+import logging
+import time
+import uuid
+from collections import deque
+
+import numpy as np
+
+from app import config
+
+# --- MARKET DATA CACHE ---
+# Per ticker: a fixed-size NumPy ring buffer of recent ticks, a ring of
+# finished OHLCV bars, and the last price as a plain float (O(1) lookup).
+# Subscribers (strategy evaluators, WebSocket clients) get a reference to
+# the same immutable Quote object; the JSON for WebSockets is encoded once
+# per quote, not once per subscriber.
+
+TICK_CAPACITY = 4096
+BAR_CAPACITY = 1440       # One day of 1-minute bars
+BAR_SECONDS = 60
+SUBSCRIBER_QUEUE_SIZE = 1024
+
+logger = logging.getLogger(__name__)
+
+
+class Quote:
+    """One tick. Shared by every subscriber, so never mutate it."""
+    __slots__ = ("ticker", "ts", "price", "size", "_json")
+
+    def __init__(self, ticker: str, ts: float, price: float, size: float = 0.0):
+        self.ticker = ticker
+        self.ts = ts
+        self.price = price
+        self.size = size
+        self._json = None
+
+    def to_json(self) -> str:
+        # Encoded lazily, at most once, however many sockets receive it
+        if self._json is None:
+            self._json = json.dumps({"ticker": self.ticker, "ts": self.ts, "price": self.price, "size": self.size})
+        return self._json
+
+
+class TickerBook:
+    """Ring buffers for one ticker."""
+
+    def __init__(self, ticker: str, tick_capacity=TICK_CAPACITY, bar_capacity=BAR_CAPACITY, bar_seconds=BAR_SECONDS):
+        self.ticker = ticker
+        self.bar_seconds = bar_seconds
+
+        # Ticks: columns ts, price, size
+        self.ticks = np.zeros((tick_capacity, 3), dtype=np.float64)
+        self.tick_count = 0
+
+        # Finished bars: columns start, open, high, low, close, volume
+        self.bars = np.zeros((bar_capacity, 6), dtype=np.float64)
+        self.bar_count = 0
+        self._bar = None  # In-progress bar as a list, same column order
+
+        self.last_price = None
+        self.last_ts = None
+        self.subscribers = set()
+
+    def add_tick(self, ts: float, price: float, size: float = 0.0):
+        row = self.ticks[self.tick_count % len(self.ticks)]
+        row[0] = ts
+        row[1] = price
+        row[2] = size
+        self.tick_count += 1
+        self.last_price = price
+        self.last_ts = ts
+        self._update_bar(ts, price, size)
+
+    def _update_bar(self, ts, price, size):
+        start = ts - (ts % self.bar_seconds)
+        bar = self._bar
+        if bar is None or start > bar[0]:
+            if bar is not None:
+                self.bars[self.bar_count % len(self.bars)] = bar
+                self.bar_count += 1
+            self._bar = [start, price, price, price, price, size]
+            return
+        if price > bar[2]:
+            bar[2] = price
+        if price < bar[3]:
+            bar[3] = price
+        bar[4] = price
+        bar[5] += size
+
+    @staticmethod
+    def _ordered(buffer, count, n):
+        # Oldest -> newest view of the last n rows of a ring
+        capacity = len(buffer)
+        n = min(n, count, capacity)
+        if n == 0:
+            return buffer[:0].copy()
+        end = count % capacity
+        start = (end - n) % capacity
+        if start < end:
+            return buffer[start:end].copy()
+        return np.concatenate([buffer[start:], buffer[:end]])
+
+    def recent_ticks(self, n: int) -> np.ndarray:
+        return self._ordered(self.ticks, self.tick_count, n)
+
+    def recent_bars(self, n: int, include_current=True) -> np.ndarray:
+        bars = self._ordered(self.bars, self.bar_count, n)
+        if include_current and self._bar is not None:
+            bars = np.vstack([bars, np.array(self._bar)])[-n:]
+        return bars
+
+
+class Subscription:
+    """
+    Async iterator of Quotes for some tickers. Bounded buffer: a subscriber
+    that falls behind drops its oldest quotes instead of slowing the feed.
+    A deque + one wake-up future is much cheaper per quote than asyncio.Queue.
+    """
+
+    def __init__(self, hub, tickers, maxsize=SUBSCRIBER_QUEUE_SIZE):
+        self.hub = hub
+        self.tickers = set(tickers)
+        self.buffer = deque(maxlen=maxsize)
+        self.dropped = 0
+        self._waiter = None
+
+    def push(self, quote: Quote):
+        if len(self.buffer) == self.buffer.maxlen:
+            self.dropped += 1
+        self.buffer.append(quote)
+        waiter = self._waiter
+        if waiter is not None and not waiter.done():
+            waiter.set_result(None)
+
+    async def get(self) -> Quote:
+        while not self.buffer:
+            self._waiter = asyncio.get_running_loop().create_future()
+            try:
+                await self._waiter
+            finally:
+                self._waiter = None
+        return self.buffer.popleft()
+
+    def drain(self) -> list[Quote]:
+        """Everything buffered right now, oldest first (for batch consumers)."""
+        quotes = list(self.buffer)
+        self.buffer.clear()
+        return quotes
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self) -> Quote:
+        return await self.get()
+
+    def close(self):
+        self.hub.unsubscribe(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class MarketDataHub:
+    def __init__(self, tick_capacity=TICK_CAPACITY, bar_capacity=BAR_CAPACITY, bar_seconds=BAR_SECONDS):
+        self.tick_capacity = tick_capacity
+        self.bar_capacity = bar_capacity
+        self.bar_seconds = bar_seconds
+        self.books = {}
+        self.ticks_ingested = 0
+
+    def book(self, ticker: str) -> TickerBook:
+        book = self.books.get(ticker)
+        if book is None:
+            book = self.books[ticker] = TickerBook(ticker, self.tick_capacity, self.bar_capacity, self.bar_seconds)
+        return book
+
+    def publish(self, ticker: str, price: float, size: float = 0.0, ts: float = None) -> Quote:
+        """Ingest one tick and fan it out. Call from the event loop thread."""
+        quote = Quote(ticker, time.time() if ts is None else float(ts), float(price), float(size))
+        book = self.book(ticker)
+        book.add_tick(quote.ts, quote.price, quote.size)
+        self.ticks_ingested += 1
+        for subscription in book.subscribers:
+            subscription.push(quote)
+        return quote
+
+    def last_price(self, ticker: str):
+        book = self.books.get(ticker)
+        return None if book is None else book.last_price
+
+    def subscribe(self, tickers, maxsize=SUBSCRIBER_QUEUE_SIZE) -> Subscription:
+        subscription = Subscription(self, tickers, maxsize)
+        for ticker in subscription.tickers:
+            self.book(ticker).subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        for ticker in subscription.tickers:
+            book = self.books.get(ticker)
+            if book is not None:
+                book.subscribers.discard(subscription)
+
+
+class ReplayFeed:
+    """
+    Feed adapter that replays a CSV file of 'ts,ticker,price,size' rows into
+    a hub. speed=1.0 keeps the original pacing, 0 replays as fast as possible.
+    rebase=True shifts the timestamps so the first row is published as 'now'.
+    """
+
+    def __init__(self, hub: MarketDataHub, path, speed=0.0, rebase=False):
+        self.hub = hub
+        self.path = path
+        self.speed = speed
+        self.rebase = rebase
+
+    def rows(self):
+        with open(self.path, newline="") as f:
+            for row in csv.reader(f):
+                if not row or row[0].startswith("#") or row[0] == "ts":
+                    continue
+                yield float(row[0]), row[1], float(row[2]), float(row[3]) if len(row) > 3 else 0.0
+
+    async def run(self) -> int:
+        count = 0
+        first_ts = None
+        offset = 0.0
+        started = time.monotonic()
+        for ts, ticker, price, size in self.rows():
+            if first_ts is None:
+                first_ts = ts
+                offset = time.time() - ts if self.rebase else 0.0
+            if self.speed:
+                delay = (ts - first_ts) / self.speed - (time.monotonic() - started)
+                if delay > 0:
+                    await asyncio.sleep(delay)
+            self.hub.publish(ticker, price, size, ts + offset)
+            count += 1
+            if count % 1000 == 0:
+                await asyncio.sleep(0)  # Let subscribers run during fast replays
+        return count
+
+
+class FeedRunner:
+    """
+    Runs the configured feed into the hub for the app's lifetime. Every API
+    process runs its own copy, so each worker's hub gets the same quotes.
+    Today that is a ReplayFeed (MARKET_DATA_REPLAY_PATH); live broker feeds
+    plug in the same way.
+    """
+
+    def __init__(self, hub: MarketDataHub, replay_path=None, replay_speed=1.0, replay_loop=False):
+        self.hub = hub
+        self.replay_path = replay_path
+        self.replay_speed = replay_speed
+        self.replay_loop = replay_loop
+        self.replays = 0
+        self.ticks = 0
+        self._task = None
+
+    async def _run(self):
+        while True:
+            feed = ReplayFeed(self.hub, self.replay_path, self.replay_speed, rebase=True)
+            try:
+                count = await feed.run()
+            except (OSError, ValueError, IndexError) as e:
+                logger.error("Market data replay of %s failed: %s", self.replay_path, e)
+                return
+            self.replays += 1
+            self.ticks += count
+            if not self.replay_loop or not count:
+                return
+
+    def start(self):
+        if self.replay_path and self._task is None:
+            self._task = asyncio.create_task(self._run(), name="marketdata-feed")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> dict:
+        return {"replay_path": self.replay_path, "running": self._task is not None and not self._task.done(),
+                "replays": self.replays, "ticks": self.ticks}
+
+
+# --- CROSS-WORKER INGEST ---
+# Ticks posted to the API (POST /marketdata/ticks) are published into the
+# process that serves the request and, on Postgres, NOTIFYed to the others
+# (profilecache.listener delivers them). NOTIFY payloads are capped at 8000
+# bytes, so ticks go out in small chunks; a worker skips its own.
+
+TICK_CHANNEL = "marketdata_ticks"
+TICKS_PER_NOTIFY = 50
+ORIGIN = uuid.uuid4().hex  # This process
+
+
+def encode_ticks(ticks) -> list[str]:
+    """NOTIFY payloads for (ticker, price, size, ts) tuples."""
+    return [
+        json.dumps({"origin": ORIGIN, "ticks": ticks[i:i + TICKS_PER_NOTIFY]}, separators=(",", ":"))
+        for i in range(0, len(ticks), TICKS_PER_NOTIFY)
+    ]
+
+
+def on_ticks_notify(payload: str):
+    try:
+        message = json.loads(payload)
+        if message["origin"] == ORIGIN:
+            return
+        for ticker, price, size, ts in message["ticks"]:
+            hub.publish(ticker, price, size, ts)
+    except (ValueError, KeyError, TypeError):
+        logger.warning("Ignoring a malformed market data notification")
+
+
+# Process-wide hub used by the API, and the feed that fills it
+hub = MarketDataHub()
+feed = FeedRunner(
+    hub,
+    replay_path=config.settings.MARKET_DATA_REPLAY_PATH,
+    replay_speed=config.settings.MARKET_DATA_REPLAY_SPEED,
+    replay_loop=config.settings.MARKET_DATA_REPLAY_LOOP,
+)
@@ -0,0 +1,262 @@
+import time
+from bisect import bisect_left
+
+# --- METRICS (Prometheus text format, no extra dependency) ---
+# Hot paths only do a dict lookup + a couple of int/float adds on
+# preallocated slots; no locks (the event loop is single threaded, and a
+# rare lost increment from a threadpool route is acceptable for metrics).
+# Everything is formatted only when /metrics is scraped.
+
+# Seconds; tuned for API calls (sub-ms cache hits up to slow upstreams)
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names, values, extra="") -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.values = {}  # label values tuple -> float
+
+    def inc(self, *labels, amount=1.0):
+        self.values[labels] = self.values.get(labels, 0.0) + amount
+
+    def samples(self):
+        for labels, value in self.values.items():
+            yield f"{self.name}{_labels(self.labelnames, labels)} {value}"
+
+
+class _HistogramSeries:
+    __slots__ = ("counts", "sum", "count")
+
+    def __init__(self, size):
+        self.counts = [0] * size  # Per bucket (non-cumulative), last = +Inf
+        self.sum = 0.0
+        self.count = 0
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name, help, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self.series = {}  # label values tuple -> _HistogramSeries
+
+    def observe(self, value, *labels):
+        series = self.series.get(labels)
+        if series is None:
+            series = self.series[labels] = _HistogramSeries(len(self.buckets) + 1)
+        series.counts[bisect_left(self.buckets, value)] += 1
+        series.sum += value
+        series.count += 1
+
+    def samples(self):
+        for labels, series in self.series.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + ("+Inf",), series.counts):
+                cumulative += count
+                le = f'le="{bound}"'
+                yield f"{self.name}_bucket{_labels(self.labelnames, labels, le)} {cumulative}"
+            yield f"{self.name}_sum{_labels(self.labelnames, labels)} {series.sum}"
+            yield f"{self.name}_count{_labels(self.labelnames, labels)} {series.count}"
+
+
+class Gauge:
+    """Read at scrape time from a callback returning {label values tuple: value}."""
+    kind = "gauge"
+
+    def __init__(self, name, help, labelnames=(), collect=None):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.collect = collect
+
+    def samples(self):
+        for labels, value in (self.collect() if self.collect else {}).items():
+            yield f"{self.name}{_labels(self.labelnames, labels)} {value}"
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self.metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+# --- APPLICATION METRICS ---
+
+http_requests = registry.register(Histogram(
+    "http_request_duration_seconds", "HTTP request latency by route template",
+    ("method", "route", "status")))
+
+db_queries = registry.register(Histogram(
+    "db_query_duration_seconds", "SQL statement execution time (cursor execute)",
+    ("engine",)))
+db_query_errors = registry.register(Counter(
+    "db_query_errors_total", "SQL statements that raised", ("engine",)))
+db_pool_wait = registry.register(Histogram(
+    "db_pool_checkout_wait_seconds", "Time spent waiting for a pooled connection",
+    ("engine",)))
+
+gotrue_requests = registry.register(Histogram(
+    "gotrue_request_duration_seconds", "Outbound Supabase Auth (GoTrue) call latency, per attempt",
+    ("method", "endpoint", "status")))
+
+telegram_requests = registry.register(Histogram(
+    "telegram_request_duration_seconds", "Outbound Telegram Bot API call latency",
+    ("method", "status")))
+alerts = registry.register(Counter(
+    "alerts_total", "Outbox alerts by outcome (sent, retry, failed)", ("outcome",)))
+
+# Engines whose pool is reported by the gauges below: name -> Engine
+_engines = {}
+
+
+def _pool_stat(stat):
+    def collect():
+        values = {}
+        for name, engine in _engines.items():
+            reader = getattr(engine.pool, stat, None)
+            if callable(reader):
+                values[(name,)] = reader()
+        return values
+    return collect
+
+
+registry.register(Gauge("db_pool_checked_out", "Connections currently checked out", ("engine",), _pool_stat("checkedout")))
+registry.register(Gauge("db_pool_checked_in", "Idle connections in the pool", ("engine",), _pool_stat("checkedin")))
+registry.register(Gauge("db_pool_overflow", "Connections above pool_size (negative = room left)", ("engine",), _pool_stat("overflow")))
+registry.register(Gauge("db_pool_size", "Configured pool_size", ("engine",), _pool_stat("size")))
+
+# Read replica routing (app/replica.py); the monitor updates replica_state after every probe
+db_reads = registry.register(Counter(
+    "db_read_sessions_total", "Sessions handed out by get_read_db, by target (replica, primary)", ("target",)))
+replica_state = {}
+
+
+def _replica_stat(key):
+    def collect():
+        value = replica_state.get(key)
+        return {} if value is None else {(): value}
+    return collect
+
+
+registry.register(Gauge("db_replica_healthy", "1 if the replica is reachable and within the lag limit", (),
+                        _replica_stat("healthy")))
+registry.register(Gauge("db_replica_lag_seconds", "Replay lag of the read replica at the last probe", (),
+                        _replica_stat("lag_seconds")))
+
+# Load shedding (app/overload.py); the shedder registers its route groups here
+shed_requests = registry.register(Counter(
+    "http_requests_shed_total", "Requests answered 429 (rate_limited) or 503 (overloaded)", ("group", "reason")))
+concurrency_groups = {}   # Route group name -> overload.AdaptiveLimit
+
+
+def _group_stat(attr):
+    def collect():
+        return {(name,): getattr(group, attr) for name, group in concurrency_groups.items()}
+    return collect
+
+
+registry.register(Gauge("http_concurrency_limit", "Adaptive concurrency limit per route group", ("group",),
+                        _group_stat("limit")))
+registry.register(Gauge("http_requests_in_flight", "Requests holding a slot, per route group", ("group",),
+                        _group_stat("in_flight")))
+registry.register(Gauge("http_requests_queued", "Requests waiting for a slot, per route group", ("group",),
+                        _group_stat("queued")))
+
+
+# --- HOOKS ---
+
+def instrument_engine(engine, name: str):
+    """Query timing + pool gauges for a (sync, or async's .sync_engine) Engine."""
+    from sqlalchemy import event
+
+    _engines[name] = engine
+    labels = (name,)
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _start(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _end(conn, cursor, statement, parameters, context, executemany):
+        db_queries.observe(time.perf_counter() - conn.info["query_start"].pop(), *labels)
+
+    @event.listens_for(engine, "handle_error")
+    def _error(context):
+        starts = context.connection.info.get("query_start") if context.connection is not None else None
+        if starts:
+            starts.pop()
+        db_query_errors.inc(*labels)
+
+
+class TimedCheckoutMixin:
+    """Pool mixin that records how long each checkout waited (pool exhaustion shows up here)."""
+    metrics_name = "default"
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            db_pool_wait.observe(time.perf_counter() - start, self.metrics_name)
+
+
+class PrometheusMiddleware:
+    """
+    Pure ASGI middleware (cheaper than BaseHTTPMiddleware and doesn't buffer
+    streaming responses). Labels by route template, e.g. /strategies/{strategy_id},
+    so path parameters don't explode the series count.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        start = time.perf_counter()
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            route = scope.get("route")
+            path = getattr(route, "path", None) or "unmatched"
+            http_requests.observe(time.perf_counter() - start, scope["method"], path, status)
@@ -1,6 +1,6 @@
 import uuid
-from sqlalchemy import Column, String, Boolean, Numeric, DateTime, func, ForeignKey
-from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy import Column, String, Boolean, Integer, BigInteger, Float, Numeric, DateTime, JSON, func, ForeignKey, Index
+from sqlalchemy.dialects.postgresql import JSONB, UUID
 from sqlalchemy.orm import relationship
 from app.database import Base
 
@@ -30,6 +30,21 @@ class Profile(Base):
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
 
+    # Directory listing: keyset order (created_at, id), optionally within a role.
+    # Search is ILIKE '%term%' on email / names, which only an index of trigrams
+    # (pg_trgm, GIN) can serve; those are Postgres-only. The extension is created
+    # by bootstrap.create_schema (POSTGRES_EXTENSIONS).
+    __table_args__ = (
+        Index("ix_profiles_created_at_id", "created_at", "id"),
+        Index("ix_profiles_role_created_at_id", "role", "created_at", "id"),
+        Index("ix_profiles_email_trgm", "email", postgresql_using="gin",
+              postgresql_ops={"email": "gin_trgm_ops"}).ddl_if(dialect="postgresql"),
+        Index("ix_profiles_first_name_trgm", "first_name", postgresql_using="gin",
+              postgresql_ops={"first_name": "gin_trgm_ops"}).ddl_if(dialect="postgresql"),
+        Index("ix_profiles_last_name_trgm", "last_name", postgresql_using="gin",
+              postgresql_ops={"last_name": "gin_trgm_ops"}).ddl_if(dialect="postgresql"),
+    )
+
 class UserSession(Base):
     __tablename__ = "user_sessions"
 
@@ -48,6 +63,34 @@ class UserSession(Base):
     # Relationship to link back to the user
     user = relationship("Profile", backref="sessions")
 
+    # Partial index for crud.get_active_session: only OPEN sessions are indexed,
+    # newest first, so "latest open session of user X" is a single index probe
+    # and the index stays small however many closed sessions pile up.
+    __table_args__ = (
+        Index(
+            "ix_user_sessions_open_by_user",
+            "user_id", login_time.desc(),
+            postgresql_where=logout_time.is_(None),
+            sqlite_where=logout_time.is_(None),
+        ),
+    )
+
+class RevokedToken(Base):
+    """
+    Access tokens revoked by a logout (see app/security.py), shared by every
+    API process. Rows are only needed until the token would have expired.
+    """
+    __tablename__ = "revoked_tokens"
+
+    key = Column(String, primary_key=True)     # Auth session_id, or the token's SHA-256
+    expires_at = Column(DateTime(timezone=True), nullable=False)    # The token's 'exp'
+    revoked_at = Column(DateTime(timezone=True), nullable=False)
+
+    __table_args__ = (
+        Index("ix_revoked_tokens_revoked_at", "revoked_at"),
+        Index("ix_revoked_tokens_expires_at", "expires_at"),
+    )
+
 # --- STRATEGY MODELS ---
 
 class Strategy(Base):
@@ -67,16 +110,49 @@ class Strategy(Base):
     is_active = Column(Boolean, default=True)
     
     created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    # The legs live on a shared, deduplicated template (see app/legsets.py):
+    # a clone is just another Strategy row pointing at the same template
+    template_id = Column(UUID(as_uuid=True), ForeignKey("strategy_templates.id"), nullable=False)
+    template = relationship("StrategyTemplate")
     
-    # Relationship to Legs
-    legs = relationship("StrategyLeg", backref="strategy", cascade="all, delete-orphan")
+    # Relationship to Legs (read-only, through the template)
+    legs = relationship(
+        "StrategyLeg",
+        primaryjoin="Strategy.template_id == foreign(StrategyLeg.template_id)",
+        order_by="StrategyLeg.leg_index",
+        viewonly=True,
+    )
+
+    # Keyset pagination on (created_at, id), newest first, globally and per owner;
+    # "strategies equivalent to X" = same template, in the same order
+    __table_args__ = (
+        Index("ix_strategies_created_at_id", "created_at", "id"),
+        Index("ix_strategies_user_created_at_id", "user_id", "created_at", "id"),
+        Index("ix_strategies_template_created_at_id", "template_id", "created_at", "id"),
+    )
+
+
+class StrategyTemplate(Base):
+    """Immutable leg set shared by every strategy with the same ticker, instrument type and legs."""
+    __tablename__ = "strategy_templates"
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    # sha256 of the canonical (ticker, instrument_type, legs); one row per distinct leg set
+    content_hash = Column(String(64), nullable=False, unique=True)
+    ticker = Column(String, nullable=False)
+    instrument_type = Column(String, nullable=False)
+    leg_count = Column(Integer, nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    legs = relationship("StrategyLeg", order_by="StrategyLeg.leg_index", cascade="all, delete-orphan")
 
 
 class StrategyLeg(Base):
     __tablename__ = "strategy_legs"
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
-    strategy_id = Column(UUID(as_uuid=True), ForeignKey("strategies.id"), nullable=False)
+    template_id = Column(UUID(as_uuid=True), ForeignKey("strategy_templates.id"), nullable=False, index=True)
     
     # TRD [96]: Up to 4 legs per strategy 
     leg_index = Column(Numeric(1,0), nullable=False) # 1, 2, 3, or 4
@@ -95,4 +171,196 @@ class StrategyLeg(Base):
     strike_mode = Column(String, default="fixed") # 'fixed' or 'delta'
     
     # TRD [102]: Expiration Targeting (DTE)
-    expiration_days = Column(Numeric, nullable=True) # DTE
\ No newline at end of file
+    expiration_days = Column(Numeric, nullable=True) # DTE
+
+# --- NOTIFICATIONS ---
+
+class AlertOutbox(Base):
+    """
+    Durable queue of Telegram alerts (see app/alerts.py). Rows are written in
+    the same transaction as the event they describe and kept afterwards with
+    status 'sent' / 'failed' for auditing.
+    """
+    __tablename__ = "alert_outbox"
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    chat_id = Column(String, nullable=False)    # Profile.telegram_id of the recipient
+    text = Column(String, nullable=False)
+
+    # 'pending' -> 'sent' / 'failed'; a claimed row stays 'pending' with
+    # next_attempt_at pushed out by a lease, so a crashed sender's rows come back
+    status = Column(String, nullable=False, default="pending")
+    attempts = Column(Integer, nullable=False, default=0)
+    next_attempt_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+    last_error = Column(String, nullable=True)
+
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    sent_at = Column(DateTime(timezone=True), nullable=True)
+
+    # The dispatcher only ever scans due pending rows
+    __table_args__ = (
+        Index(
+            "ix_alert_outbox_pending_due", "next_attempt_at",
+            postgresql_where=status == "pending",
+            sqlite_where=status == "pending",
+        ),
+    )
+
+# --- AUDIT LOG ---
+
+class AuditEvent(Base):
+    """
+    Append-only history of who changed what (see app/auditlog.py). Rows are
+    never updated or deleted one by one; on Postgres the table is partitioned
+    by month on created_at, and old months go away as whole partitions.
+    No foreign keys: the history outlives the profiles and strategies it describes.
+    """
+    __tablename__ = "audit_events"
+
+    # A partitioned table's primary key must include the partition key
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    created_at = Column(DateTime(timezone=True), primary_key=True)  # When it happened (set by the app)
+
+    actor_id = Column(UUID(as_uuid=True), nullable=True)    # Profile that did it; None = the system
+    entity_type = Column(String, nullable=False)            # 'profile', 'strategy'
+    entity_id = Column(UUID(as_uuid=True), nullable=False)
+    action = Column(String, nullable=False)                 # 'create', 'update', 'delete', 'clone', 'fanout', 'order'
+    changes = Column(JSON().with_variant(JSONB(), "postgresql"), nullable=True)  # {field: [old, new]} or a snapshot
+
+    # History pages: one entity's events, or one actor's, newest first
+    __table_args__ = (
+        Index("ix_audit_events_entity_created_at_id", "entity_type", "entity_id", "created_at", "id"),
+        Index("ix_audit_events_actor_created_at_id", "actor_id", "created_at", "id"),
+        {"postgresql_partition_by": "RANGE (created_at)"},
+    )
+
+# --- POSITIONS ---
+
+class PositionSnapshot(Base):
+    """
+    Periodic copy of the in-memory position book (see app/positions.py), one
+    row per (account, strategy, leg), so a restart resumes from here instead of
+    replaying fills. Floats, not Numeric: the book is float64 and a snapshot
+    must load back bit for bit. No foreign keys, like the audit log.
+    """
+    __tablename__ = "position_snapshots"
+
+    account_id = Column(UUID(as_uuid=True), primary_key=True)  # Profile.id
+    strategy_id = Column(UUID(as_uuid=True), primary_key=True)
+    leg_index = Column(Integer, primary_key=True)
+
+    broker = Column(String, nullable=False)
+    ticker = Column(String, nullable=True)
+    instrument_type = Column(String, nullable=True)
+    quantity = Column(Float, nullable=False)        # Signed: > 0 long, < 0 short
+    cost_basis = Column(Float, nullable=False)      # quantity x average price
+    realized_pnl = Column(Float, nullable=False)
+    updated_at = Column(DateTime(timezone=True), nullable=False)
+
+class PositionFill(Base):
+    """
+    Fills booked since the last position snapshot, written in the transaction
+    that books them (before the in-memory book has them). load() replays them
+    on top of the snapshot; a snapshot deletes the rows it covers.
+    """
+    __tablename__ = "position_fills"
+
+    seq = Column(BigInteger, primary_key=True, autoincrement=False)   # Booking order, assigned by the book
+    fill_id = Column(String, nullable=True)
+    account_id = Column(UUID(as_uuid=True), nullable=False)
+    strategy_id = Column(UUID(as_uuid=True), nullable=False)
+    leg_index = Column(Integer, nullable=False)
+    quantity = Column(Float, nullable=False)        # Signed: > 0 bought, < 0 sold
+    price = Column(Float, nullable=False)
+    broker = Column(String, nullable=False)
+    ticker = Column(String, nullable=True)
+    instrument_type = Column(String, nullable=True)
+    booked_at = Column(DateTime(timezone=True), nullable=False)
+
+class PositionMark(Base):
+    """Last mark price of each strategy leg (shared by every account holding it)."""
+    __tablename__ = "position_marks"
+
+    strategy_id = Column(UUID(as_uuid=True), primary_key=True)
+    leg_index = Column(Integer, primary_key=True)
+    mark = Column(Float, nullable=False)
+    updated_at = Column(DateTime(timezone=True), nullable=False)
+
+# --- BROKER ORDERS ---
+
+class BrokerAccount(Base):
+    """
+    A profile's account at a broker. Only profiles with one are traded: a
+    strategy fans out to the active profiles that have a row here.
+    """
+    __tablename__ = "broker_accounts"
+
+    profile_id = Column(UUID(as_uuid=True), ForeignKey("profiles.id", ondelete="CASCADE"), primary_key=True)
+    broker = Column(String, nullable=True)          # NULL = settings.DEFAULT_BROKER
+    account_ref = Column(String, nullable=True)     # The account id at the broker
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+
+class BrokerOrder(Base):
+    """
+    One child order of a fan-out (see app/fanout.py), as the platform last
+    knew it. Written before it is sent ('pending') and updated with the ack;
+    app/reconcile.py keeps status and fills in line with what the broker
+    reports afterwards.
+    """
+    __tablename__ = "broker_orders"
+
+    client_order_id = Column(String, primary_key=True)  # Deterministic per (signal, account, leg)
+    signal_id = Column(String, nullable=False)
+    strategy_id = Column(UUID(as_uuid=True), nullable=False)
+    account_id = Column(UUID(as_uuid=True), nullable=False)     # Profile.id
+    broker = Column(String, nullable=False)
+    broker_order_id = Column(String, nullable=True)
+
+    ticker = Column(String, nullable=False)
+    instrument_type = Column(String, nullable=False)
+    leg_index = Column(Integer, nullable=False)
+    action = Column(String, nullable=False)     # 'buy' / 'sell'
+    quantity = Column(Numeric, nullable=False)
+
+    # 'pending' (stored, being sent) -> 'accepted' -> 'partial' -> 'filled', or
+    # 'rejected' / 'cancelled' / 'error'; 'timeout' = no ack, the broker may or may not have it
+    status = Column(String, nullable=False)
+    filled_quantity = Column(Numeric, nullable=False, default=0)
+    avg_fill_price = Column(Numeric, nullable=True)
+    error = Column(String, nullable=True)
+
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), nullable=True)     # Last change seen at the broker
+
+    # Reconciliation only ever scans orders that can still change
+    __table_args__ = (
+        Index(
+            "ix_broker_orders_open", "broker",
+            postgresql_where=status.in_(["pending", "accepted", "partial", "timeout"]),
+            sqlite_where=status.in_(["pending", "accepted", "partial", "timeout"]),
+        ),
+        Index("ix_broker_orders_strategy_created_at", "strategy_id", "created_at"),
+    )
+
+# --- OPTION CHAINS ---
+
+class OptionChainSnapshot(Base):
+    """
+    Newest option chain snapshot of each ticker (see app/chains.py). Every
+    API process loads it into its strike resolver.
+    """
+    __tablename__ = "option_chains"
+
+    ticker = Column(String, primary_key=True)
+    snapshot_time = Column(DateTime(timezone=True), nullable=False)
+    spot = Column(Float, nullable=False)
+    rate = Column(Float, nullable=False)
+    dividend = Column(Float, nullable=False)
+    # [[expiration_days, strike, 'call' / 'put', iv], ...], one per listed contract
+    contracts = Column(JSON().with_variant(JSONB(), "postgresql"), nullable=False)
+    stored_at = Column(DateTime(timezone=True), nullable=False)
+
+    __table_args__ = (
+        Index("ix_option_chains_stored_at", "stored_at"),
+    )
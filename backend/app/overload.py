@@ -0,0 +1,370 @@
+import asyncio
+import math
+import time
+from array import array
+from collections import deque
+
+import jwt
+import numpy as np
+
+from app import config, metrics
+from app.security import VERIFIED_CLAIMS_STATE, verifier
+
+# --- ADAPTIVE CONCURRENCY LIMITS / LOAD SHEDDING ---
+# Under a burst (everyone logging in at market open) requests used to pile up
+# on the DB pool and GoTrue until they all timed out: the server kept working
+# on requests whose clients had already given up, so goodput collapsed.
+# LoadShedMiddleware, for every HTTP request:
+#   1. rate limits it with a token bucket per user (verified bearer token) or,
+#      without a valid token, per client address -> 429 + Retry-After,
+#   2. takes a slot from its route group's concurrency limit (first path
+#      segment: /auth, /users, /strategies, ...). A request over the limit
+#      waits up to OVERLOAD_QUEUE_TIMEOUT for a slot, then gets a fast
+#      503 + Retry-After instead of queueing without bound.
+# Each group's limit adapts to the latency it observes (AIMD): every window of
+# ~limit completions, average latency above OVERLOAD_LATENCY_TOLERANCE x the
+# group's no-load latency (or a 500/503/504) cuts the limit by
+# OVERLOAD_BACKOFF; otherwise, if the limit was actually used, it grows by 1.
+# The latency measured runs from getting the slot to the response head: it
+# excludes the queue wait and a streamed body, so it tracks what the
+# backends (DB pool, GoTrue) deliver at the current concurrency.
+# State is per worker process, like the profile cache.
+
+ROUTE_GROUPS = {"auth", "users", "strategies", "marketdata", "audit", "positions", "orders"}
+EXEMPT_PATHS = {"/metrics"}   # Scrapes must get through, above all during overload
+
+# No-load latency estimate: the lowest window average, forgotten at this rate
+# per window so a stale best case doesn't pin the limit down forever
+BASELINE_DRIFT = 0.002
+MIN_WINDOW = 10
+
+
+class AdaptiveLimit:
+    """Concurrency limit of one route group; see the section comment above."""
+
+    def __init__(self, name, initial=20, min_limit=2, max_limit=500, tolerance=2.0, backoff=0.9,
+                 queue_timeout=0.5, max_queue=1000):
+        self.name = name
+        self.limit = float(initial)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.tolerance = tolerance
+        self.backoff = backoff
+        self.queue_timeout = queue_timeout
+        self.max_queue = max_queue
+
+        self.in_flight = 0
+        self.baseline = None        # Seconds; None until the first window
+        self._waiters = deque()     # Futures of queued requests, oldest first
+        # Current window
+        self._sum = 0.0
+        self._count = 0
+        self._peak = 0
+        self._congested = False
+
+        self.shed = 0
+        self.increases = 0
+        self.decreases = 0
+
+    @property
+    def queued(self) -> int:
+        return len(self._waiters)
+
+    def _take(self):
+        self.in_flight += 1
+        if self.in_flight > self._peak:
+            self._peak = self.in_flight
+
+    async def acquire(self) -> bool:
+        """A slot (True), or False if the request should be shed."""
+        if self.in_flight < self.limit and not self._waiters:
+            self._take()
+            return True
+        if self.queue_timeout <= 0 or len(self._waiters) >= self.max_queue:
+            self.shed += 1
+            return False
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), self.queue_timeout)
+            return True
+        except asyncio.TimeoutError:
+            if self._abandon(waiter):
+                return True
+            self.shed += 1
+            return False
+        except asyncio.CancelledError:
+            # Client went away while queued; give back a slot handed over meanwhile
+            if self._abandon(waiter):
+                self._release_slot()
+            raise
+
+    def _abandon(self, waiter) -> bool:
+        """Stop waiting; True if a slot was handed over in the meantime."""
+        if waiter.done():
+            return True
+        waiter.cancel()
+        try:
+            self._waiters.remove(waiter)
+        except ValueError:
+            pass
+        return False
+
+    def release(self, latency: float, failed: bool = False):
+        self._sum += latency
+        self._count += 1
+        self._congested |= failed
+        if self._count >= max(MIN_WINDOW, self.limit):
+            self._adjust()
+        self._release_slot()
+
+    def _release_slot(self):
+        self.in_flight -= 1
+        # Hand freed slots straight to the oldest waiters
+        while self._waiters and self.in_flight < self.limit:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                self._take()
+                waiter.set_result(None)
+
+    def _adjust(self):
+        sample = self._sum / self._count
+        self.baseline = sample if self.baseline is None else min(sample, self.baseline * (1 + BASELINE_DRIFT))
+        if self._congested or sample > self.tolerance * self.baseline:
+            self.limit = max(self.min_limit, self.limit * self.backoff)
+            self.decreases += 1
+        elif self._peak >= self.limit / 2:
+            # Only grow a limit that was actually in use
+            self.limit = min(self.max_limit, self.limit + 1)
+            self.increases += 1
+        self._sum = 0.0
+        self._count = 0
+        self._peak = self.in_flight
+        self._congested = False
+
+    def stats(self) -> dict:
+        return {
+            "limit": round(self.limit, 1),
+            "in_flight": self.in_flight,
+            "queued": len(self._waiters),
+            "baseline_ms": None if self.baseline is None else round(self.baseline * 1000, 2),
+            "shed": self.shed,
+            "increases": self.increases,
+            "decreases": self.decreases,
+        }
+
+
+class RateLimiter:
+    """
+    Token buckets (rate per second, up to burst) for many keys, kept in two
+    flat float arrays (16 bytes per key) plus a dict key -> slot. A bucket
+    that has refilled is the same as no entry, so when the table reaches
+    max_keys those slots are reused first; if that frees less than an eighth
+    of the table, the least recently used buckets go too (those keys start
+    over with a full bucket).
+    """
+
+    def __init__(self, rate, burst, max_keys=100_000):
+        self.rate = rate
+        self.burst = max(1.0, burst)
+        self.max_keys = max(8, max_keys)
+        self._slots = {}
+        self._keys = []
+        self._tokens = array("d")
+        self._updated = array("d")   # Monotonic seconds; inf for a free slot
+        self._free = []
+        self.limited = 0
+        self.evictions = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.rate > 0
+
+    def take(self, key, now=None) -> float:
+        """Take a token for 'key': 0.0 if allowed, else seconds until the next one."""
+        now = time.monotonic() if now is None else now
+        slot = self._slots.get(key)
+        if slot is None:
+            slot = self._new_slot(key, now)
+            tokens = self.burst
+        else:
+            tokens = min(self.burst, self._tokens[slot] + (now - self._updated[slot]) * self.rate)
+        self._updated[slot] = now
+        if tokens < 1.0:
+            self._tokens[slot] = tokens
+            self.limited += 1
+            return (1.0 - tokens) / self.rate
+        self._tokens[slot] = tokens - 1.0
+        return 0.0
+
+    def _new_slot(self, key, now) -> int:
+        if not self._free and len(self._slots) >= self.max_keys:
+            self._evict(now)
+        if self._free:
+            slot = self._free.pop()
+            self._keys[slot] = key
+        else:
+            slot = len(self._keys)
+            self._keys.append(key)
+            self._tokens.append(0.0)
+            self._updated.append(0.0)
+        self._slots[key] = slot
+        return slot
+
+    def _evict(self, now):
+        # Zero-copy views; dropped before the arrays can grow again
+        tokens = np.frombuffer(self._tokens, dtype=np.float64)
+        updated = np.frombuffer(self._updated, dtype=np.float64)
+        slots = np.flatnonzero(tokens + (now - updated) * self.rate >= self.burst)
+        want = len(self._keys) // 8
+        if len(slots) < want:
+            slots = np.union1d(slots, np.argpartition(updated, want)[:want])
+        del tokens, updated
+        freed = len(self._free)
+        for slot in slots.tolist():
+            key = self._keys[slot]
+            if key is None:
+                continue
+            del self._slots[key]
+            self._keys[slot] = None
+            self._updated[slot] = math.inf
+            self._free.append(slot)
+        self.evictions += len(self._free) - freed
+
+    def stats(self) -> dict:
+        return {"rate": self.rate, "burst": self.burst, "keys": len(self._slots),
+                "limited": self.limited, "evictions": self.evictions}
+
+
+class LoadShedder:
+    def __init__(self, initial_limit=20, min_limit=2, max_limit=500, tolerance=2.0, backoff=0.9,
+                 queue_timeout=0.5, max_queue=1000, retry_after=1,
+                 user_rate=20.0, ip_rate=50.0, burst_seconds=2.0, max_keys=100_000, trust_forwarded=False):
+        self.groups = {
+            name: AdaptiveLimit(name, initial_limit, min_limit, max_limit, tolerance, backoff, queue_timeout, max_queue)
+            for name in sorted(ROUTE_GROUPS) + ["other"]
+        }
+        metrics.concurrency_groups.update(self.groups)
+        self.retry_after = retry_after
+        self.users = RateLimiter(user_rate, user_rate * burst_seconds, max_keys)
+        self.addresses = RateLimiter(ip_rate, ip_rate * burst_seconds, max_keys)
+        self.trust_forwarded = trust_forwarded
+
+    def group_for(self, path: str) -> AdaptiveLimit:
+        segment = path.split("/", 2)[1]
+        return self.groups[segment if segment in ROUTE_GROUPS else "other"]
+
+    def _client_address(self, scope, headers) -> str:
+        if self.trust_forwarded:
+            forwarded = headers.get(b"x-forwarded-for")
+            if forwarded:
+                return forwarded.split(b",", 1)[0].strip().decode("latin-1")
+        client = scope.get("client")
+        return client[0] if client else "unknown"
+
+    def rate_limit(self, scope) -> float:
+        """0.0 if the request may go on, else seconds until its bucket allows it."""
+        if not self.users.enabled and not self.addresses.enabled:
+            return 0.0
+        headers = dict(scope["headers"])
+        if self.users.enabled:
+            authorization = headers.get(b"authorization", b"")
+            if authorization[:7].lower() == b"bearer ":
+                try:
+                    # Verified, so nobody can spend someone else's budget; a bad
+                    # token falls through to the client address. The route's auth
+                    # dependency reuses the claims (security.get_token_claims).
+                    token = authorization[7:].decode("latin-1")
+                    claims = verifier.decode(token)
+                    wait = self.users.take(claims["sub"])
+                    scope.setdefault("state", {})[VERIFIED_CLAIMS_STATE] = (token, claims)
+                    return wait
+                except (jwt.PyJWTError, KeyError, UnicodeDecodeError):
+                    pass
+        if self.addresses.enabled:
+            return self.addresses.take(self._client_address(scope, headers))
+        return 0.0
+
+    def stats(self) -> dict:
+        return {
+            "groups": {name: group.stats() for name, group in self.groups.items()},
+            "users": self.users.stats(),
+            "addresses": self.addresses.stats(),
+        }
+
+
+shedder = LoadShedder(
+    initial_limit=config.settings.OVERLOAD_INITIAL_LIMIT,
+    min_limit=config.settings.OVERLOAD_MIN_LIMIT,
+    max_limit=config.settings.OVERLOAD_MAX_LIMIT,
+    tolerance=config.settings.OVERLOAD_LATENCY_TOLERANCE,
+    backoff=config.settings.OVERLOAD_BACKOFF,
+    queue_timeout=config.settings.OVERLOAD_QUEUE_TIMEOUT,
+    max_queue=config.settings.OVERLOAD_MAX_QUEUE,
+    retry_after=config.settings.OVERLOAD_RETRY_AFTER,
+    user_rate=config.settings.RATE_LIMIT_USER_PER_SECOND,
+    ip_rate=config.settings.RATE_LIMIT_IP_PER_SECOND,
+    burst_seconds=config.settings.RATE_LIMIT_BURST_SECONDS,
+    max_keys=config.settings.RATE_LIMIT_MAX_KEYS,
+    trust_forwarded=config.settings.RATE_LIMIT_TRUST_FORWARDED,
+)
+
+
+async def _reject(send, status: int, retry_after: int, detail: bytes):
+    body = b'{"detail":"' + detail + b'"}'
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode()),
+            (b"retry-after", str(retry_after).encode()),
+        ],
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+class LoadShedMiddleware:
+    """Pure ASGI middleware (like metrics.PrometheusMiddleware) in front of the routes."""
+
+    def __init__(self, app, load_shedder: LoadShedder = None):
+        self.app = app
+        self.shedder = load_shedder or shedder
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] in EXEMPT_PATHS:
+            return await self.app(scope, receive, send)
+
+        # 1. Per-user / per-address rate limit
+        wait = self.shedder.rate_limit(scope)
+        group = self.shedder.group_for(scope["path"])
+        if wait:
+            metrics.shed_requests.inc(group.name, "rate_limited")
+            return await _reject(send, 429, max(1, math.ceil(wait)), b"Too many requests")
+
+        # 2. Adaptive concurrency limit of the route group
+        if not await group.acquire():
+            metrics.shed_requests.inc(group.name, "overloaded")
+            return await _reject(send, 503, self.shedder.retry_after, b"Server overloaded, retry later")
+
+        start = time.perf_counter()
+        status = 500
+        latency = None
+
+        async def send_with_status(message):
+            nonlocal status, latency
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                # Time to the response head: a streamed body (/strategies/export)
+                # lasts as long as the client keeps reading, which says nothing
+                # about load. The slot is still held until the body is sent.
+                latency = time.perf_counter() - start
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            if latency is None:
+                latency = time.perf_counter() - start
+            group.release(latency, failed=status in (500, 503, 504))
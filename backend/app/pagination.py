@@ -0,0 +1,68 @@
+import base64
+import json
+from datetime import datetime
+from uuid import UUID
+
+from sqlalchemy import func, select, text, tuple_
+
+# Keyset ("seek") pagination on (created_at, id), newest first.
+# The cursor is an opaque token the client sends back to get the next page,
+# so deep pages cost the same as the first one (no OFFSET scan).
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 500
+
+
+def encode_cursor(created_at: datetime, row_id: UUID) -> str:
+    raw = json.dumps({"c": created_at.isoformat(), "i": str(row_id)})
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(token: str):
+    """Return (created_at, id) or raise ValueError for a malformed token."""
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        data = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return datetime.fromisoformat(data["c"]), UUID(data["i"])
+    except (KeyError, TypeError, json.JSONDecodeError, UnicodeDecodeError) as e:
+        raise ValueError("Invalid cursor") from e
+
+
+def apply_keyset(query, model, cursor: str = None):
+    """Order newest first and, if given a cursor, seek past it."""
+    if cursor:
+        created_at, row_id = decode_cursor(cursor)
+        query = query.filter(tuple_(model.created_at, model.id) < tuple_(created_at, row_id))
+    return query.order_by(model.created_at.desc(), model.id.desc())
+
+
+def split_page(rows, limit: int):
+    """
+    Queries fetch limit + 1 rows; the extra one only tells us there is a next page.
+    Returns (page, next_cursor), next_cursor is None on the last page.
+    """
+    if len(rows) <= limit:
+        return rows, None
+    page = rows[:limit]
+    return page, encode_cursor(page[-1].created_at, page[-1].id)
+
+
+async def estimate_count(db, query) -> int:
+    """
+    Approximate number of rows 'query' matches, without a COUNT(*) scan.
+    On Postgres this is the planner's row estimate (from pg_class / pg_stats,
+    as fresh as the last ANALYZE); elsewhere it falls back to an exact count.
+    """
+    dialect = db.get_bind().dialect
+    if dialect.name != "postgresql":
+        result = await db.execute(select(func.count()).select_from(query.order_by(None).subquery()))
+        return result.scalar_one()
+
+    # EXPLAIN can't take bind parameters, so the (already validated) filter
+    # values are rendered inline by the dialect's literal quoting
+    sql = query.order_by(None).compile(dialect=dialect, compile_kwargs={"literal_binds": True})
+    result = await db.execute(text(f"EXPLAIN (FORMAT JSON) {sql}"))
+    plan = result.scalar_one()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]["Plan"]["Plan Rows"])
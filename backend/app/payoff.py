@@ -0,0 +1,235 @@
+from collections import OrderedDict
+from dataclasses import dataclass
+
+import numpy as np
+
+from app import pricing, strikes
+
+# --- PAYOFF / GREEKS ENGINE ---
+# Risk view for multi-leg strategies: P&L curves over a price grid at a few
+# time slices (today ... first expiry) plus aggregate delta/gamma/theta/vega.
+#
+# Strategies are packed into a LegBook: (S, MAX_LEGS) columns, padded with
+# zero-quantity legs. Every strategy has its own spot (so one batch can mix
+# tickers) and its price grid is spot * grid_moves. A batch is then one
+# broadcast over [option leg, slice, price] (padding dropped), summed back
+# per strategy, and chunked to bound memory.
+# Values are per unit of quantity (no contract multiplier).
+
+MAX_LEGS = 4
+DAYS_PER_YEAR = strikes.DAYS_PER_YEAR
+DEFAULT_POINTS = 101
+DEFAULT_RANGE = 0.25      # Grid spans spot * (1 +/- 25%)
+DEFAULT_VOL = 0.20        # When no chain IV is available
+CHUNK_STRATEGIES = 64     # Strategies per broadcast (~ legs*K*N floats per temporary)
+
+
+class PayoffError(ValueError):
+    """A strategy can't be evaluated (e.g. an option leg without strike or DTE)."""
+
+
+@dataclass
+class MarketSnapshot:
+    """Inputs for one underlying at one point in time."""
+    ticker: str
+    spot: float
+    as_of: object = None          # Chain snapshot time / last tick ts; part of the cache key
+    vol: float = DEFAULT_VOL      # Flat vol for legs without a chain IV
+    rate: float = 0.0
+    dividend: float = 0.0
+    chain: strikes.OptionChain = None
+
+    @property
+    def key(self):
+        return (self.ticker, self.as_of, self.spot, self.vol, self.rate, self.dividend)
+
+
+@dataclass
+class LegBook:
+    """Column-oriented legs of S strategies, (S, MAX_LEGS) each; qty 0 = padding."""
+    quantity: np.ndarray    # Signed: buy > 0, sell < 0
+    is_option: np.ndarray
+    is_call: np.ndarray
+    strike: np.ndarray
+    dte: np.ndarray         # Days to expiry at the snapshot
+    vol: np.ndarray
+    spot: np.ndarray        # (S,)
+    rate: np.ndarray        # (S,)
+    dividend: np.ndarray    # (S,)
+
+    @classmethod
+    def empty(cls, n):
+        legs = (n, MAX_LEGS)
+        return cls(np.zeros(legs), np.zeros(legs, bool), np.zeros(legs, bool), np.ones(legs),
+                   np.zeros(legs), np.full(legs, DEFAULT_VOL), np.ones(n), np.zeros(n), np.zeros(n))
+
+    def __len__(self):
+        return len(self.spot)
+
+    def rows(self, part: slice) -> "LegBook":
+        return LegBook(*(getattr(self, f)[part] for f in self.__dataclass_fields__))
+
+    @classmethod
+    def from_strategies(cls, strategies, snapshots: dict) -> "LegBook":
+        """
+        Pack models.Strategy objects (legs loaded). snapshots maps ticker ->
+        MarketSnapshot. Option legs are snapped to listed contracts (and take
+        the chain IV) when the snapshot has a chain; otherwise they need a
+        fixed strike and a DTE and are priced at the snapshot's flat vol.
+        """
+        book = cls.empty(len(strategies))
+        for row, strategy in enumerate(strategies):
+            snapshot = snapshots[strategy.ticker]
+            book.spot[row] = snapshot.spot
+            book.rate[row] = snapshot.rate
+            book.dividend[row] = snapshot.dividend
+            resolved = {}
+            if snapshot.chain is not None:
+                resolved = {r["leg_index"]: r for r in strikes.resolver.resolve_strategy(snapshot.chain, strategy)}
+
+            legs = sorted(strategy.legs, key=lambda leg: int(leg.leg_index))[:MAX_LEGS]
+            for col, leg in enumerate(legs):
+                sign = 1.0 if leg.action == "buy" else -1.0
+                book.quantity[row, col] = sign * float(leg.quantity or 0)
+                if not leg.option_type:
+                    # Linear leg in the underlying, entered at spot
+                    book.strike[row, col] = snapshot.spot
+                    continue
+                book.is_option[row, col] = True
+                book.is_call[row, col] = leg.option_type == "call"
+
+                contract = resolved.get(int(leg.leg_index))
+                if contract and contract["strike"] is not None:
+                    strike, dte = contract["strike"], contract["expiration_days"]
+                    vol = _chain_iv(snapshot.chain, leg.option_type, dte, strike)
+                elif leg.strike_mode == "fixed" and leg.strike_value is not None and leg.expiration_days is not None:
+                    strike, dte, vol = float(leg.strike_value), float(leg.expiration_days), snapshot.vol
+                else:
+                    raise PayoffError(f"Leg {int(leg.leg_index)} of strategy {strategy.id} can't be priced "
+                                      f"without an option chain for {strategy.ticker}")
+                book.strike[row, col] = strike
+                book.dte[row, col] = dte
+                book.vol[row, col] = snapshot.vol if vol is None or np.isnan(vol) else vol
+        return book
+
+
+def _chain_iv(chain, option_type, dte, strike):
+    exp_idx = np.searchsorted(chain.expiries, dte)
+    strike_idx = np.searchsorted(chain.strikes, strike)
+    if exp_idx >= len(chain.expiries) or strike_idx >= len(chain.strikes):
+        return None
+    return float(chain.iv[strikes.CALL if option_type == "call" else strikes.PUT, exp_idx, strike_idx])
+
+
+@dataclass
+class PayoffResult:
+    """Batch result; S = strategies, K = time slices, N = grid points."""
+    prices: np.ndarray       # (S, N)
+    days: np.ndarray         # (S, K) days from the snapshot; the last slice is the first expiry
+    pnl: np.ndarray          # (S, K, N)
+    premium: np.ndarray      # (S,) net cost today (> 0 debit, < 0 credit)
+    delta: np.ndarray        # (S,) aggregate at spot, today
+    gamma: np.ndarray
+    theta: np.ndarray        # Per calendar day
+    vega: np.ndarray         # Per vol point
+
+    def row(self, i) -> "PayoffResult":
+        return PayoffResult(*(getattr(self, f)[i] for f in self.__dataclass_fields__))
+
+
+def breakevens(prices, pnl):
+    """Prices where a P&L curve crosses zero (linear interpolation between grid points)."""
+    sign = np.sign(pnl)
+    cross = np.nonzero(sign[:-1] * sign[1:] < 0)[0]
+    x0, x1, y0, y1 = prices[cross], prices[cross + 1], pnl[cross], pnl[cross + 1]
+    points = list(x0 - y0 * (x1 - x0) / (y1 - y0))
+    points += list(prices[np.nonzero(pnl == 0)[0]])
+    return sorted(float(p) for p in points)
+
+
+class PayoffEngine:
+    """
+    Evaluates LegBooks. Single-strategy results are cached per
+    (strategy id, market snapshot, grid), since legs never change after creation.
+    """
+
+    def __init__(self, max_cached=4096):
+        self.max_cached = max_cached
+        self._cache = OrderedDict()
+
+    def evaluate(self, book: LegBook, points=DEFAULT_POINTS, price_range=DEFAULT_RANGE,
+                 slices=(0.0, 0.5), chunk=CHUNK_STRATEGIES) -> PayoffResult:
+        """
+        slices are fractions of the time to each strategy's first expiry
+        (0 = today); the first expiry itself is always added as the last slice.
+        """
+        moves = 1.0 + np.linspace(-price_range, price_range, points)
+        fractions = np.append(np.asarray(slices, dtype=float), 1.0)
+        parts = [self._evaluate_chunk(book.rows(slice(start, start + chunk)), moves, fractions)
+                 for start in range(0, len(book), chunk)]
+        return PayoffResult(*(np.concatenate([getattr(p, f) for p in parts])
+                              for f in PayoffResult.__dataclass_fields__))
+
+    @staticmethod
+    def _evaluate_chunk(book: LegBook, moves, fractions) -> PayoffResult:
+        qty, is_option, is_call, strike, vol = book.quantity, book.is_option, book.is_call, book.strike, book.vol
+        spot, rate, dividend = book.spot[:, None], book.rate[:, None], book.dividend[:, None]
+        tau_now = book.dte / DAYS_PER_YEAR                                       # (S, L)
+
+        # Entry value and Greeks today, at spot (small: S x L)
+        entry = pricing.price(spot, strike, tau_now, vol, is_call, rate, dividend)
+        leg_delta, leg_gamma, leg_theta, leg_vega = pricing.greeks(spot, strike, tau_now, vol, is_call, rate, dividend)
+        options = is_option & (qty != 0)
+        option_qty = np.where(options, qty, 0.0)
+        linear_qty = np.where(is_option, 0.0, qty).sum(axis=1)                   # (S,)
+
+        # Time slices: fractions of the first option expiry (0 if there is none)
+        first_expiry = np.where(options, book.dte, np.inf).min(axis=1)
+        first_expiry = np.where(np.isfinite(first_expiry), first_expiry, 0.0)
+        days = first_expiry[:, None] * fractions[None, :]                        # (S, K)
+        prices = spot * moves[None, :]                                           # (S, N)
+
+        # Linear legs (underlying) are just qty * (price - spot)
+        pnl = np.broadcast_to((linear_qty[:, None] * (prices - spot))[:, None, :],
+                              (len(prices), len(fractions), len(moves))).copy()
+
+        # Option legs: only the real ones (no padding), flattened to M legs,
+        # priced as one [M, K, N] broadcast and summed back per strategy
+        rows, cols = np.nonzero(options)
+        if len(rows):
+            leg = (rows, cols)
+            tau = np.maximum(book.dte[leg][:, None] - days[rows], 0.0)[:, :, None] / DAYS_PER_YEAR   # (M, K, 1)
+            value = pricing.price(prices[rows][:, None, :], strike[leg][:, None, None], tau,
+                                  vol[leg][:, None, None], is_call[leg][:, None, None],
+                                  book.rate[rows][:, None, None], book.dividend[rows][:, None, None])
+            contribution = qty[leg][:, None, None] * (value - entry[leg][:, None, None])
+            # rows come sorted, so each strategy's legs are one contiguous run
+            owners, starts = np.unique(rows, return_index=True)
+            pnl[owners] += np.add.reduceat(contribution, starts, axis=0)
+
+        return PayoffResult(
+            prices=prices, days=days, pnl=pnl,
+            premium=(option_qty * entry).sum(axis=1),
+            delta=(option_qty * leg_delta).sum(axis=1) + linear_qty,
+            gamma=(option_qty * leg_gamma).sum(axis=1),
+            theta=(option_qty * leg_theta).sum(axis=1),
+            vega=(option_qty * leg_vega).sum(axis=1),
+        )
+
+    def evaluate_strategy(self, strategy, snapshot: MarketSnapshot, points=DEFAULT_POINTS,
+                          price_range=DEFAULT_RANGE, slices=(0.0, 0.5)) -> PayoffResult:
+        key = (strategy.id, snapshot.key, points, price_range, tuple(slices))
+        cached = self._cache.get(key)
+        if cached is not None:
+            self._cache.move_to_end(key)
+            return cached
+        book = LegBook.from_strategies([strategy], {strategy.ticker: snapshot})
+        result = self.evaluate(book, points, price_range, slices).row(0)
+        self._cache[key] = result
+        if len(self._cache) > self.max_cached:
+            self._cache.popitem(last=False)
+        return result
+
+
+# Shared engine (result cache) for the app
+engine = PayoffEngine()
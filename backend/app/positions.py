@@ -0,0 +1,659 @@
+import asyncio
+import logging
+import math
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import NamedTuple, Optional
+from uuid import UUID
+
+import numpy as np
+
+from app import config, crud, database, locks, marketdata
+
+logger = logging.getLogger(__name__)
+
+# --- LIVE POSITIONS AND P&L ---
+# Running totals per account, per strategy, per broker and per strategy leg,
+# updated on every fill and mark change instead of being recomputed from the
+# fills on every dashboard refresh.
+#
+# State is struct-of-arrays (one NumPy column per field, rows appended):
+#   instruments  one row per strategy leg. Every account on a strategy holds
+#                the same legs (scaled by its multiplier), so a leg's mark is shared
+#   positions    one row per (account, leg): signed quantity, cost basis
+#                (quantity x average price) and realized P&L
+#   accounts / strategies / brokers / instruments
+#                running realized P&L, cost basis and market value
+# Unrealized P&L = market value - cost basis; total = realized + unrealized.
+# Values are per unit of quantity, like app/payoff.py.
+#
+# A fill changes one position row and adds its deltas to one row of each
+# total: O(1). A mark change adds quantity x (new - old) for every holder of
+# that leg in one vectorized pass. Reads are array lookups, or one argsort for
+# ranked account lists.
+#
+# Marks: equity / future legs follow the market data hub's last price, polled
+# every POSITIONS_MARK_SECONDS (a burst of ticks costs one update). Option
+# legs are marked through POST /positions/marks, until then at their last fill.
+#
+# Every POSITIONS_SNAPSHOT_SECONDS the changed rows are upserted into
+# position_snapshots / position_marks, and the totals are re-summed from the
+# positions (no float drift from millions of small deltas). Fills are durable
+# before they are booked: whoever books them writes them to position_fills in
+# its own transaction (ledger(), then apply_fill() after the commit). A
+# snapshot deletes the ledger rows it covers in the same transaction, and
+# startup resumes from the snapshot plus the ledger, so a crash loses no fill.
+#
+# With several API processes only one owns the book: start() takes an
+# advisory lock (app/locks.py), and only its holder books fills / marks and
+# writes snapshots. The others are read-only followers that reload the book
+# from the snapshot tables every snapshot interval (so they lag the leader by
+# up to two intervals), refuse writes (PositionBookFollower), and take over
+# the lock, resuming from the snapshot, if the leader goes away.
+
+MARKET_MARKED = ("equity", "future")    # Legs marked from the market data hub
+FILL_ID_MEMORY = 100000                 # Recent fill ids kept to ignore re-sent fills
+EPSILON = 1e-9                          # |quantity| below this is flat
+
+
+class PositionBookFollower(Exception):
+    """A fill / mark reached a process that doesn't own the book."""
+
+
+class Fill(NamedTuple):
+    account_id: UUID
+    strategy_id: UUID
+    leg_index: int
+    quantity: float                     # Signed: > 0 bought, < 0 sold
+    price: float
+    broker: str = "simulated"
+    ticker: Optional[str] = None
+    instrument_type: Optional[str] = None
+    fill_id: Optional[str] = None       # Broker execution id, for de-duplication
+
+
+class Columns:
+    """
+    Growable struct-of-arrays: one NumPy array per column, rows appended at
+    the end. Appending may reallocate, so don't keep a column across appends.
+    """
+
+    def __init__(self, capacity=1024, **dtypes):
+        self.size = 0
+        self.capacity = capacity
+        self.columns = tuple(dtypes)
+        for name, dtype in dtypes.items():
+            setattr(self, name, np.zeros(capacity, dtype))
+
+    def view(self, name) -> np.ndarray:
+        return getattr(self, name)[:self.size]
+
+    def append(self) -> int:
+        if self.size == self.capacity:
+            for name in self.columns:
+                array = getattr(self, name)
+                grown = np.zeros(self.capacity * 2, array.dtype)
+                grown[:self.capacity] = array
+                setattr(self, name, grown)
+            self.capacity *= 2
+        self.size += 1
+        return self.size - 1
+
+
+class Totals(Columns):
+    """Rows keyed by an id (key <-> row index), each with running realized / cost / value."""
+
+    def __init__(self, capacity=1024, **dtypes):
+        super().__init__(capacity, realized=np.float64, cost=np.float64, value=np.float64, **dtypes)
+        self.index = {}
+        self.keys = []
+
+    def row(self, key) -> int:
+        row = self.index.get(key)
+        if row is None:
+            row = self.index[key] = self.append()
+            self.keys.append(key)
+        return row
+
+    def add(self, row, realized, cost, value):
+        self.realized[row] += realized
+        self.cost[row] += cost
+        self.value[row] += value
+
+    def pnl(self, row) -> dict:
+        realized, cost, value = float(self.realized[row]), float(self.cost[row]), float(self.value[row])
+        return {"realized": realized, "unrealized": value - cost, "total": realized + value - cost, "market_value": value}
+
+
+class PositionBook:
+    def __init__(self, snapshot_interval=10.0, mark_interval=0.25, hub=None):
+        self.snapshot_interval = snapshot_interval
+        self.mark_interval = mark_interval
+        self.hub = hub if hub is not None else marketdata.hub
+        self._reset()
+
+        self._snapshot_lock = asyncio.Lock()
+        self._leader = locks.AdvisoryLock("position-book")
+        self._wakeup = asyncio.Event()
+        self._task = None
+        self._stopping = False
+
+        self.restored = False   # Snapshot loaded; until then nothing is written back
+        self.follower = False   # Another process owns the book: read-only, reloaded from its snapshots
+        self.version = 0        # Bumped by every change, for polling (ETag) and pushes
+        self.fills_applied = 0
+        self.duplicate_fills = 0
+        self.marks_applied = 0
+        self.snapshots_written = 0
+        self.reloads = 0
+        self._last_seq = 0
+
+    def _reset(self):
+        """Empty state, before (re)loading a snapshot."""
+        self.accounts = Totals()
+        self.strategies = Totals(capacity=64)
+        self.brokers = Totals(capacity=8)
+        self.instruments = Totals(capacity=64, strategy=np.intp, leg_index=np.int16, mark=np.float64,
+                                  marked=np.bool_, quantity=np.float64)
+        # intp row indexes: NumPy fancy indexing converts anything narrower first
+        self.positions = Columns(capacity=4096, account=np.intp, instrument=np.intp, broker=np.intp,
+                                 quantity=np.float64, cost=np.float64, realized=np.float64)
+        self._grand = [0.0, 0.0, 0.0]           # Book-wide realized / cost / value
+
+        self._instrument_info = []              # instrument row -> (ticker, instrument_type)
+        self._position_index = {}               # (account row, instrument row) -> position row
+        self._holders = []                      # instrument row -> its position rows
+        self._holder_arrays = {}                # instrument row -> (position, account, broker rows) arrays, cached
+        self._by_account = {}                   # account row -> its position rows
+        self._by_strategy = {}                  # strategy row -> its instrument rows
+        self._strategy_accounts = {}            # strategy row -> account rows trading it
+        self._by_ticker = {}                    # ticker -> instrument rows marked from market data
+        self._fill_ids = OrderedDict()
+
+        self._dirty_positions = set()
+        self._dirty_marks = set()
+        self._ledger_booked = []                # Ledger seqs booked since the last snapshot
+
+    # --- ROWS ---
+
+    def _instrument(self, strategy_id, leg_index, ticker, instrument_type) -> int:
+        key = (strategy_id, int(leg_index))
+        instrument = self.instruments.index.get(key)
+        if instrument is None:
+            instrument = self.instruments.row(key)
+            strategy = self.strategies.row(strategy_id)
+            self.instruments.strategy[instrument] = strategy
+            self.instruments.leg_index[instrument] = key[1]
+            self._instrument_info.append((ticker, instrument_type))
+            self._holders.append([])
+            self._by_strategy.setdefault(strategy, []).append(instrument)
+            if ticker and instrument_type in MARKET_MARKED:
+                self._by_ticker.setdefault(ticker, []).append(instrument)
+        return instrument
+
+    def _position(self, account_id, strategy_id, leg_index, broker, ticker=None, instrument_type=None) -> int:
+        instrument = self._instrument(strategy_id, leg_index, ticker, instrument_type)
+        account = self.accounts.row(account_id)
+        row = self._position_index.get((account, instrument))
+        if row is None:
+            broker_row = self.brokers.row(broker)
+            row = self._position_index[(account, instrument)] = self.positions.append()
+            self.positions.account[row] = account
+            self.positions.instrument[row] = instrument
+            self.positions.broker[row] = broker_row
+            self._holders[instrument].append(row)
+            self._holder_arrays.pop(instrument, None)
+            self._by_account.setdefault(account, []).append(row)
+            self._strategy_accounts.setdefault(int(self.instruments.strategy[instrument]), set()).add(account)
+        return row
+
+    def _holder_rows(self, instrument):
+        """Position rows holding a leg, with their account and broker rows (index arrays)."""
+        holders = self._holder_arrays.get(instrument)
+        if holders is None:
+            rows = np.array(self._holders[instrument], dtype=np.intp)
+            holders = self._holder_arrays[instrument] = (rows, self.positions.account[rows], self.positions.broker[rows])
+        return holders
+
+    def _add(self, row, instrument, realized, cost, value):
+        positions = self.positions
+        self.accounts.add(positions.account[row], realized, cost, value)
+        self.strategies.add(self.instruments.strategy[instrument], realized, cost, value)
+        self.brokers.add(positions.broker[row], realized, cost, value)
+        self.instruments.add(instrument, realized, cost, value)
+        grand = self._grand
+        grand[0] += realized
+        grand[1] += cost
+        grand[2] += value
+
+    # --- UPDATES ---
+
+    def ledger(self, fills) -> list[tuple[int, Fill]]:
+        """
+        (seq, fill) for the fills to write to the ledger (crud.insert_position_fills_async),
+        in order, leaving out fill ids already booked. Book them with apply_fill(fill, seq)
+        once that has committed.
+        """
+        if self.follower:
+            raise PositionBookFollower("Fills are booked by the process that owns the position book")
+        entries, seen = [], set()
+        for fill in fills:
+            if fill.fill_id is not None:
+                if fill.fill_id in self._fill_ids or fill.fill_id in seen:
+                    continue
+                seen.add(fill.fill_id)
+            # Increasing across restarts and hand-overs, like the clock
+            self._last_seq = max(time.time_ns(), self._last_seq + 1)
+            entries.append((self._last_seq, fill))
+        return entries
+
+    def apply_fill(self, fill: Fill, seq: int = None) -> bool:
+        """
+        Book one fill (average-cost accounting); seq is its ledger row. False
+        if its fill_id was already booked.
+        """
+        if self.follower:
+            raise PositionBookFollower("Fills are booked by the process that owns the position book")
+        return self._book(fill, seq)
+
+    def _book(self, fill: Fill, seq: int = None) -> bool:
+        if seq is not None:
+            self._ledger_booked.append(seq)
+        if fill.fill_id is not None:
+            if fill.fill_id in self._fill_ids:
+                self.duplicate_fills += 1
+                return False
+            self._fill_ids[fill.fill_id] = None
+            if len(self._fill_ids) > FILL_ID_MEMORY:
+                self._fill_ids.popitem(last=False)
+
+        row = self._position(fill.account_id, fill.strategy_id, fill.leg_index, fill.broker,
+                             fill.ticker, fill.instrument_type)
+        positions, instruments = self.positions, self.instruments
+        instrument = int(positions.instrument[row])
+        price, quantity = float(fill.price), float(fill.quantity)
+        if not instruments.marked[instrument]:
+            # Nobody holds an unmarked leg yet: its first fill is its first mark
+            instruments.mark[instrument] = price
+            instruments.marked[instrument] = True
+            self._dirty_marks.add(instrument)
+
+        old_quantity, old_cost = float(positions.quantity[row]), float(positions.cost[row])
+        new_quantity, new_cost, realized = old_quantity, old_cost, 0.0
+        if old_quantity and (old_quantity > 0) != (quantity > 0):
+            # Reduces (or flips) the position: the closed part realizes against the average price
+            closed = math.copysign(min(abs(quantity), abs(old_quantity)), old_quantity)
+            average = old_cost / old_quantity
+            realized = closed * (price - average)
+            new_quantity -= closed
+            new_cost -= closed * average
+            quantity += closed
+        new_quantity += quantity
+        new_cost += quantity * price
+        if abs(new_quantity) < EPSILON:
+            new_quantity = new_cost = 0.0
+
+        positions.quantity[row] = new_quantity
+        positions.cost[row] = new_cost
+        positions.realized[row] += realized
+        change = new_quantity - old_quantity
+        self._add(row, instrument, realized, new_cost - old_cost, change * float(instruments.mark[instrument]))
+        instruments.quantity[instrument] += change
+
+        self._dirty_positions.add(row)
+        self.fills_applied += 1
+        self.version += 1
+        return True
+
+    def _mark(self, instrument: int, price: float):
+        instruments = self.instruments
+        change = price - instruments.mark[instrument] if instruments.marked[instrument] else 0.0
+        if instruments.marked[instrument] and not change:
+            return
+        instruments.mark[instrument] = price
+        instruments.marked[instrument] = True
+        self._dirty_marks.add(instrument)
+        self.marks_applied += 1
+        self.version += 1
+        if not change:
+            return
+
+        # Every holder's market value moves by quantity x change
+        rows, accounts, brokers = self._holder_rows(instrument)
+        values = self.positions.quantity[rows] * change
+        # One position per (account, leg), so no account index repeats here
+        self.accounts.value[accounts] += values
+        self.brokers.value[:self.brokers.size] += np.bincount(brokers, values, self.brokers.size)
+        moved = float(values.sum())
+        self.strategies.value[instruments.strategy[instrument]] += moved
+        instruments.value[instrument] += moved
+        self._grand[2] += moved
+
+    def mark(self, strategy_id, leg_index, price: float) -> bool:
+        """New mark for one strategy leg. False if nobody has traded that leg yet."""
+        if self.follower:
+            raise PositionBookFollower("Marks are set by the process that owns the position book")
+        instrument = self.instruments.index.get((strategy_id, int(leg_index)))
+        if instrument is None:
+            return False
+        self._mark(instrument, float(price))
+        return True
+
+    def mark_ticker(self, ticker: str, price: float) -> int:
+        """New mark for every equity / future leg on 'ticker'; returns how many legs."""
+        if self.follower:
+            raise PositionBookFollower("Marks are set by the process that owns the position book")
+        instruments = self._by_ticker.get(ticker, ())
+        for instrument in instruments:
+            self._mark(instrument, float(price))
+        return len(instruments)
+
+    def refresh_marks(self):
+        """Re-mark equity / future legs from the market data hub's last prices."""
+        for ticker, instruments in self._by_ticker.items():
+            price = self.hub.last_price(ticker)
+            if price is not None:
+                for instrument in instruments:
+                    self._mark(instrument, price)
+
+    def recompute(self):
+        """Re-sum every total from the position rows (exact, undoes float drift)."""
+        positions, instruments = self.positions, self.instruments
+        instrument = positions.view("instrument")
+        columns = {
+            "realized": positions.view("realized"),
+            "cost": positions.view("cost"),
+            "value": positions.view("quantity") * instruments.mark[instrument],
+        }
+        groups = (
+            (self.accounts, positions.view("account")),
+            (self.strategies, instruments.strategy[instrument]),
+            (self.brokers, positions.view("broker")),
+            (instruments, instrument),
+        )
+        for table, group in groups:
+            for name, weights in columns.items():
+                table.view(name)[:] = np.bincount(group, weights, table.size)
+        instruments.view("quantity")[:] = np.bincount(instrument, positions.view("quantity"), instruments.size)
+        self._grand = [float(weights.sum()) for weights in columns.values()]
+
+    # --- READS ---
+
+    def totals(self) -> dict:
+        realized, cost, value = self._grand
+        return {"realized": realized, "unrealized": value - cost, "total": realized + value - cost, "market_value": value}
+
+    def summary(self) -> dict:
+        """Book-wide totals plus one entry per strategy and per broker."""
+        strategies = self.strategies
+        return {
+            "version": self.version,
+            "totals": self.totals(),
+            "strategies": [
+                {"strategy_id": strategy_id, "accounts": len(self._strategy_accounts.get(row, ())), **strategies.pnl(row)}
+                for row, strategy_id in enumerate(strategies.keys)
+            ],
+            "brokers": [{"broker": name, **self.brokers.pnl(row)} for row, name in enumerate(self.brokers.keys)],
+        }
+
+    def strategy_detail(self, strategy_id) -> Optional[dict]:
+        """A strategy's totals and per-leg net quantity, mark and P&L. None if never traded."""
+        row = self.strategies.index.get(strategy_id)
+        if row is None:
+            return None
+        instruments = self.instruments
+        legs = []
+        for instrument in sorted(self._by_strategy.get(row, ()), key=lambda i: instruments.leg_index[i]):
+            ticker, instrument_type = self._instrument_info[instrument]
+            legs.append({
+                "leg_index": int(instruments.leg_index[instrument]),
+                "ticker": ticker,
+                "instrument_type": instrument_type,
+                "quantity": float(instruments.quantity[instrument]),
+                "mark": float(instruments.mark[instrument]),
+                "accounts": len(self._holders[instrument]),
+                **instruments.pnl(instrument),
+            })
+        return {"strategy_id": strategy_id, "version": self.version, "accounts": len(self._strategy_accounts.get(row, ())),
+                **self.strategies.pnl(row), "legs": legs}
+
+    def ranked_accounts(self, strategy_id=None, limit=50, offset=0, worst_first=False) -> list[dict]:
+        """Accounts by total P&L (best first), overall or on one strategy only."""
+        if strategy_id is None:
+            accounts = self.accounts
+            keys = np.arange(accounts.size)
+            realized, cost, value = accounts.view("realized"), accounts.view("cost"), accounts.view("value")
+        else:
+            strategy = self.strategies.index.get(strategy_id)
+            if strategy is None:
+                return []
+            instruments = self._by_strategy.get(strategy, [])
+            rows = np.concatenate([self._holder_rows(i)[0] for i in instruments]) if instruments else np.zeros(0, np.intp)
+            positions = self.positions
+            # Per-account sums over just this strategy's positions
+            keys, group = np.unique(positions.account[rows], return_inverse=True)
+            realized = np.bincount(group, positions.realized[rows], len(keys))
+            cost = np.bincount(group, positions.cost[rows], len(keys))
+            value = np.bincount(group, positions.quantity[rows] * self.instruments.mark[positions.instrument[rows]],
+                                len(keys))
+
+        total = realized + value - cost
+        order = np.argsort(total, kind="stable")
+        if not worst_first:
+            order = order[::-1]
+        return [
+            {"account_id": self.accounts.keys[keys[i]], "realized": float(realized[i]),
+             "unrealized": float(value[i] - cost[i]), "total": float(total[i]), "market_value": float(value[i])}
+            for i in order[offset:offset + limit]
+        ]
+
+    def account_detail(self, account_id) -> Optional[dict]:
+        """An account's totals and open / closed positions. None if it never traded."""
+        row = self.accounts.index.get(account_id)
+        if row is None:
+            return None
+        positions, instruments = self.positions, self.instruments
+        items = []
+        for position in self._by_account.get(row, ()):
+            instrument = positions.instrument[position]
+            strategy_id, leg_index = instruments.keys[instrument]
+            ticker, instrument_type = self._instrument_info[instrument]
+            quantity, cost = float(positions.quantity[position]), float(positions.cost[position])
+            mark, realized = float(instruments.mark[instrument]), float(positions.realized[position])
+            unrealized = quantity * mark - cost
+            items.append({
+                "strategy_id": strategy_id,
+                "leg_index": leg_index,
+                "ticker": ticker,
+                "instrument_type": instrument_type,
+                "broker": self.brokers.keys[positions.broker[position]],
+                "quantity": quantity,
+                "average_price": cost / quantity if quantity else None,
+                "mark": mark,
+                "realized": realized,
+                "unrealized": unrealized,
+                "total": realized + unrealized,
+            })
+        return {"account_id": account_id, "version": self.version, **self.accounts.pnl(row), "positions": items}
+
+    # --- SNAPSHOTS ---
+
+    def _snapshot_rows(self, positions_rows, mark_rows):
+        now = datetime.now(timezone.utc)
+        positions, instruments = self.positions, self.instruments
+        snapshots = []
+        for row in positions_rows:
+            instrument = positions.instrument[row]
+            strategy_id, leg_index = instruments.keys[instrument]
+            ticker, instrument_type = self._instrument_info[instrument]
+            snapshots.append({
+                "account_id": self.accounts.keys[positions.account[row]],
+                "strategy_id": strategy_id,
+                "leg_index": leg_index,
+                "broker": self.brokers.keys[positions.broker[row]],
+                "ticker": ticker,
+                "instrument_type": instrument_type,
+                "quantity": float(positions.quantity[row]),
+                "cost_basis": float(positions.cost[row]),
+                "realized_pnl": float(positions.realized[row]),
+                "updated_at": now,
+            })
+        marks = []
+        for instrument in mark_rows:
+            strategy_id, leg_index = instruments.keys[instrument]
+            marks.append({"strategy_id": strategy_id, "leg_index": leg_index,
+                          "mark": float(instruments.mark[instrument]), "updated_at": now})
+        return snapshots, marks
+
+    async def snapshot(self):
+        """Upsert the rows changed since the last snapshot, then re-sum the totals."""
+        async with self._snapshot_lock:
+            if not self.restored or self.follower:
+                # Writing now could overwrite stored positions this process never loaded
+                # (or that the owning process has changed since)
+                return
+            positions_rows, mark_rows, booked = self._dirty_positions, self._dirty_marks, self._ledger_booked
+            if not positions_rows and not mark_rows and not booked:
+                return
+            # (A book that was never started, e.g. in the benchmarks, has no lock to lose)
+            if self._leader.held and not await self._leader.check():
+                logger.warning("Position book lock lost; %d changed rows not saved, following the new owner",
+                               len(positions_rows) + len(mark_rows))
+                self.follower = True
+                return
+            self._dirty_positions, self._dirty_marks, self._ledger_booked = set(), set(), []
+            # Rows are copied before the first await, so the snapshot is consistent
+            snapshots, marks = self._snapshot_rows(positions_rows, mark_rows)
+            try:
+                async with database.AsyncSessionLocal() as db:
+                    await crud.save_position_snapshots_async(db, snapshots, marks)
+                    # The snapshot now holds these fills
+                    await crud.delete_position_fills_async(db, booked)
+                    await db.commit()
+            except Exception:
+                logger.exception("Position snapshot failed, will retry %d rows", len(snapshots) + len(marks))
+                self._dirty_positions |= positions_rows
+                self._dirty_marks |= mark_rows
+                self._ledger_booked = booked + self._ledger_booked
+                return
+            self.snapshots_written += 1
+            self.recompute()
+
+    async def load(self):
+        """(Re)build the book from the last snapshot and the fill ledger. Call before the first fill."""
+        async with database.AsyncSessionLocal() as db:
+            snapshots, marks = await crud.load_position_snapshots_async(db)
+            ledger = await crud.load_position_fills_async(db)
+        # No await from here on: readers never see a half-built book
+        if self.restored:
+            self._reset()
+            self.reloads += 1
+        for snapshot in snapshots:
+            row = self._position(snapshot.account_id, snapshot.strategy_id, snapshot.leg_index, snapshot.broker,
+                                 snapshot.ticker, snapshot.instrument_type)
+            self.positions.quantity[row] = snapshot.quantity
+            self.positions.cost[row] = snapshot.cost_basis
+            self.positions.realized[row] = snapshot.realized_pnl
+        for mark in marks:
+            instrument = self.instruments.index.get((mark.strategy_id, mark.leg_index))
+            if instrument is not None:
+                self.instruments.mark[instrument] = mark.mark
+                self.instruments.marked[instrument] = True
+        self.recompute()
+        # Fills booked after that snapshot (the owner's next snapshot deletes them)
+        for row in ledger:
+            self._book(Fill(row.account_id, row.strategy_id, row.leg_index, row.quantity, row.price, row.broker,
+                            row.ticker, row.instrument_type, row.fill_id), row.seq)
+            self._last_seq = max(self._last_seq, row.seq)
+        self.restored = True
+        self.version += 1
+        if not self.follower:
+            logger.info("Position book restored: %d positions, %d legs, %d fills replayed",
+                        len(snapshots), len(marks), len(ledger))
+
+    async def _take_over(self) -> bool:
+        """Follower: try for the lock; once held, resume from the owner's last snapshot."""
+        if not await self._leader.acquire():
+            return False
+        try:
+            await self.load()
+        except Exception:
+            await self._leader.release()
+            raise
+        self.follower = False
+        logger.info("This process now owns the position book")
+        return True
+
+    # --- BACKGROUND ---
+
+    async def _run(self):
+        next_snapshot = time.monotonic() + self.snapshot_interval
+        while not self._stopping:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.mark_interval)
+            except asyncio.TimeoutError:
+                pass
+            try:
+                if not self.follower:
+                    self.refresh_marks()
+                if time.monotonic() >= next_snapshot:
+                    next_snapshot = time.monotonic() + self.snapshot_interval
+                    if not self.follower:
+                        await self.snapshot()
+                    elif not await self._take_over():
+                        await self.load()
+            except Exception:
+                logger.exception("Position book maintenance failed")
+
+    async def start(self):
+        """
+        Take the book's lock, resume from the snapshot, then mark and snapshot
+        in the background; without the lock, follow the owner's snapshots.
+        Awaited by the lifespan: the snapshot must be in before the first fill.
+        """
+        if self._task is not None:
+            return
+        try:
+            self.follower = not await self._leader.acquire()
+            if self.follower:
+                logger.info("Position book owned by another process; serving its snapshots read-only")
+            await self.load()
+        except Exception:
+            logger.exception("Position snapshot not loaded; positions start empty and are not saved")
+        self._stopping = False
+        self._task = asyncio.create_task(self._run(), name="position-book")
+
+    async def stop(self):
+        """Stop the background task, write a last snapshot and hand the book over."""
+        if self._task is not None:
+            # Not cancel(): a snapshot in progress must finish
+            self._stopping = True
+            self._wakeup.set()
+            await self._task
+            self._task = None
+        await self.snapshot()
+        await self._leader.release()
+
+    def stats(self) -> dict:
+        return {
+            "restored": self.restored,
+            "follower": self.follower,
+            "reloads": self.reloads,
+            "accounts": self.accounts.size,
+            "strategies": self.strategies.size,
+            "positions": self.positions.size,
+            "fills": self.fills_applied,
+            "duplicate_fills": self.duplicate_fills,
+            "marks": self.marks_applied,
+            "snapshots": self.snapshots_written,
+            "pending_rows": len(self._dirty_positions) + len(self._dirty_marks),
+            "ledger_fills": len(self._ledger_booked),
+        }
+
+
+# Process-wide book used by the API
+book = PositionBook(
+    snapshot_interval=config.settings.POSITIONS_SNAPSHOT_SECONDS,
+    mark_interval=config.settings.POSITIONS_MARK_SECONDS,
+)
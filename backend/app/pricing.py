@@ -0,0 +1,120 @@
+import numpy as np
+
+# --- VECTORIZED BLACK-SCHOLES ---
+# Everything here takes NumPy arrays (or scalars) and broadcasts, so a whole
+# option chain or price grid is evaluated in one pass without Python loops.
+
+SQRT_2 = np.sqrt(2.0)
+SQRT_2PI = np.sqrt(2.0 * np.pi)
+
+# Floors so expiring / zero-vol contracts don't divide by zero
+MIN_TIME = 1e-6   # years
+MIN_VOL = 1e-4
+
+
+def _erf(x):
+    # Abramowitz & Stegun 7.1.26 (|error| < 1.5e-7); avoids a SciPy dependency
+    sign = np.sign(x)
+    x = np.abs(x)
+    t = 1.0 / (1.0 + 0.3275911 * x)
+    poly = t * (0.254829592 + t * (-0.284496736 + t * (1.421413741 + t * (-1.453152027 + t * 1.061405429))))
+    return sign * (1.0 - poly * np.exp(-x * x))
+
+
+def norm_cdf(x):
+    return 0.5 * (1.0 + _erf(np.asarray(x, dtype=float) / SQRT_2))
+
+
+def norm_pdf(x):
+    x = np.asarray(x, dtype=float)
+    return np.exp(-0.5 * x * x) / SQRT_2PI
+
+
+def d1_d2(spot, strike, time, vol, rate=0.0, dividend=0.0):
+    time = np.maximum(time, MIN_TIME)
+    vol = np.maximum(vol, MIN_VOL)
+    vol_sqrt_t = vol * np.sqrt(time)
+    d1 = (np.log(spot / strike) + (rate - dividend + 0.5 * vol * vol) * time) / vol_sqrt_t
+    return d1, d1 - vol_sqrt_t
+
+
+def delta(spot, strike, time, vol, is_call, rate=0.0, dividend=0.0):
+    """Black-Scholes delta; is_call is a bool array (True = call, False = put)."""
+    d1, _ = d1_d2(spot, strike, time, vol, rate, dividend)
+    call_delta = np.exp(-dividend * np.maximum(time, MIN_TIME)) * norm_cdf(d1)
+    return np.where(is_call, call_delta, call_delta - np.exp(-dividend * np.maximum(time, MIN_TIME)))
+
+
+def price(spot, strike, time, vol, is_call, rate=0.0, dividend=0.0):
+    """Black-Scholes value; at time <= 0 this is exactly the intrinsic value."""
+    d1, d2 = d1_d2(spot, strike, time, vol, rate, dividend)
+    t = np.maximum(time, MIN_TIME)
+    spot_df = spot * np.exp(-dividend * t)
+    strike_df = strike * np.exp(-rate * t)
+    call = spot_df * norm_cdf(d1) - strike_df * norm_cdf(d2)
+    # Put from put-call parity: two normal CDFs per contract instead of four
+    value = np.where(is_call, call, call - spot_df + strike_df)
+    intrinsic = np.where(is_call, np.maximum(spot - strike, 0.0), np.maximum(strike - spot, 0.0))
+    return np.where(time > 0, value, intrinsic)
+
+
+def greeks(spot, strike, time, vol, is_call, rate=0.0, dividend=0.0):
+    """
+    (delta, gamma, theta, vega) sharing one d1/d2 evaluation.
+    theta is per calendar day, vega per 1 vol point (0.01); all zero once expired.
+    """
+    d1, d2 = d1_d2(spot, strike, time, vol, rate, dividend)
+    t = np.maximum(time, MIN_TIME)
+    v = np.maximum(vol, MIN_VOL)
+    q_df = np.exp(-dividend * t)
+    r_df = np.exp(-rate * t)
+    pdf_d1 = norm_pdf(d1)
+    sqrt_t = np.sqrt(t)
+
+    call_delta = q_df * norm_cdf(d1)
+    delta_ = np.where(is_call, call_delta, call_delta - q_df)
+    gamma_ = q_df * pdf_d1 / (spot * v * sqrt_t)
+    vega_ = spot * q_df * pdf_d1 * sqrt_t / 100.0
+
+    decay = -spot * q_df * pdf_d1 * v / (2.0 * sqrt_t)
+    call_theta = decay - rate * strike * r_df * norm_cdf(d2) + dividend * spot * q_df * norm_cdf(d1)
+    put_theta = decay + rate * strike * r_df * norm_cdf(-d2) - dividend * spot * q_df * norm_cdf(-d1)
+    theta_ = np.where(is_call, call_theta, put_theta) / 365.0
+
+    live = time > 0
+    return (np.where(live, delta_, 0.0), np.where(live, gamma_, 0.0),
+            np.where(live, theta_, 0.0), np.where(live, vega_, 0.0))
+
+
+def norm_ppf(p):
+    """Inverse standard normal CDF (Acklam's rational approximation, |rel error| < 1.2e-9)."""
+    p = np.asarray(p, dtype=float)
+    a = (-3.969683028665376e+01, 2.209460984245205e+02, -2.759285104469687e+02,
+         1.383577518672690e+02, -3.066479806614716e+01, 2.506628277459239e+00)
+    b = (-5.447609879822406e+01, 1.615858368580409e+02, -1.556989798598866e+02,
+         6.680131188771972e+01, -1.328068155288572e+01)
+    c = (-7.784894002430293e-03, -3.223964580411365e-01, -2.400758277161838e+00,
+         -2.549732539343734e+00, 4.374664141464968e+00, 2.938163982698783e+00)
+    d = (7.784695709041462e-03, 3.224671290700398e-01, 2.445134137142996e+00, 3.754408661907416e+00)
+    low = 0.02425
+
+    q = np.sqrt(-2.0 * np.log(np.clip(np.minimum(p, 1.0 - p), 1e-300, None)))
+    tail = (((((c[0] * q + c[1]) * q + c[2]) * q + c[3]) * q + c[4]) * q + c[5]) / \
+           ((((d[0] * q + d[1]) * q + d[2]) * q + d[3]) * q + 1.0)
+    tail = np.where(p < 0.5, tail, -tail)
+
+    r = (p - 0.5) ** 2
+    central = (p - 0.5) * (((((a[0] * r + a[1]) * r + a[2]) * r + a[3]) * r + a[4]) * r + a[5]) / \
+              (((((b[0] * r + b[1]) * r + b[2]) * r + b[3]) * r + b[4]) * r + 1.0)
+    return np.where((p < low) | (p > 1.0 - low), tail, central)
+
+
+def strike_for_delta(spot, target_delta, time, vol, is_call, rate=0.0, dividend=0.0):
+    """Strike whose Black-Scholes |delta| equals target_delta (0 < target < 1)."""
+    time = np.maximum(time, MIN_TIME)
+    vol = np.maximum(vol, MIN_VOL)
+    q_df = np.exp(-dividend * time)
+    target = np.clip(np.abs(target_delta) / q_df, 1e-6, 1.0 - 1e-6)
+    # call: N(d1) = target, put: N(d1) = 1 - target
+    d1 = norm_ppf(np.where(is_call, target, 1.0 - target))
+    return spot * np.exp(-d1 * vol * np.sqrt(time) + (rate - dividend + 0.5 * vol * vol) * time)
@@ -0,0 +1,208 @@
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from typing import NamedTuple, Optional
+from uuid import UUID
+
+from sqlalchemy import event, text
+from sqlalchemy.engine import make_url
+
+from app import config, database
+
+logger = logging.getLogger(__name__)
+
+# --- CURRENT-USER PROFILE CACHE ---
+# Authenticated requests only need the caller's role / is_active, which almost
+# never change. We keep a small TTL + LRU cache of those per user id, so most
+# requests make no profile query at all.
+#
+# Invalidation:
+# - crud.update_user / crud.delete_user call notify_changed() -> (on Postgres)
+#   pg_notify inside the same transaction, and a local evict once it commits
+#   (evicting earlier would let a concurrent request re-cache the old row).
+#   Those run in the threadpool, so the evict is handed to the event loop:
+#   the cache is only ever touched on the loop thread.
+# - Every worker LISTENs on that channel and evicts on delivery. LISTEN needs a
+#   session-mode connection, so behind PgBouncer transaction mode set
+#   PROFILE_CACHE_LISTEN_URL to a direct connection; otherwise the TTL bounds
+#   staleness on the other workers.
+# - Without Postgres the local evict is the whole story (single-process stand-in).
+# Other modules that need to reach every worker register their own channels on
+# the same connection with listener.listen().
+
+NOTIFY_CHANNEL = "profile_cache_invalidate"
+
+
+class ProfileRecord(NamedTuple):
+    """Compact, immutable view of a Profile: just what auth checks need."""
+    id: UUID
+    email: str
+    role: str
+    is_active: bool
+    multiplier: Optional[float] = None
+
+
+class ProfileCache:
+    def __init__(self, maxsize=10000, ttl=30.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()  # user_id -> (ProfileRecord, expires_at)
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def get(self, user_id) -> Optional[ProfileRecord]:
+        entry = self._entries.get(user_id)
+        if entry is None:
+            self.misses += 1
+            return None
+        record, expires_at = entry
+        if expires_at < time.monotonic():
+            del self._entries[user_id]
+            self.misses += 1
+            return None
+        self._entries.move_to_end(user_id)
+        self.hits += 1
+        return record
+
+    def put(self, profile) -> ProfileRecord:
+        record = ProfileRecord(
+            id=profile.id,
+            email=profile.email,
+            role=profile.role,
+            is_active=bool(profile.is_active),
+            multiplier=float(profile.multiplier) if profile.multiplier is not None else None,
+        )
+        if self.ttl > 0:
+            self._entries[record.id] = (record, time.monotonic() + self.ttl)
+            self._entries.move_to_end(record.id)
+            if len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return record
+
+    def invalidate(self, user_id):
+        if self._entries.pop(user_id, None) is not None:
+            self.invalidations += 1
+
+    def clear(self):
+        self.invalidations += len(self._entries)
+        self._entries.clear()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else None,
+            "invalidations": self.invalidations,
+        }
+
+
+cache = ProfileCache(
+    maxsize=config.settings.PROFILE_CACHE_SIZE,
+    ttl=config.settings.PROFILE_CACHE_TTL,
+)
+
+
+def _evict(user_id):
+    loop = listener.loop
+    if loop is not None and not loop.is_closed():
+        loop.call_soon_threadsafe(cache.invalidate, user_id)
+    else:
+        cache.invalidate(user_id)  # No app loop (scripts): single thread
+
+
+def notify_changed(db, user_id):
+    """
+    Call from a sync Session BEFORE commit when a profile changes. Once the
+    transaction commits it is evicted here and, on Postgres, on the other
+    workers.
+    """
+    event.listen(db, "after_commit", lambda session: _evict(user_id), once=True)
+    if db.get_bind().dialect.name == "postgresql":
+        db.execute(text("SELECT pg_notify(:channel, :user_id)"),
+                   {"channel": NOTIFY_CHANNEL, "user_id": str(user_id)})
+
+
+class InvalidationListener:
+    """LISTENs for other workers' profile changes on a dedicated asyncpg connection."""
+
+    RETRY_SECONDS = 5.0
+
+    def __init__(self, dsn):
+        self.dsn = dsn
+        self.loop = None    # The app's event loop, which owns the cache
+        self._task = None
+        self._connection = None
+        self._channels = {NOTIFY_CHANNEL: self._on_notify}
+
+    def listen(self, channel: str, callback):
+        """
+        Also deliver the notifications of another channel: callback(payload)
+        runs on the event loop. Register before start().
+        """
+        self._channels[channel] = lambda connection, pid, channel, payload: callback(payload)
+
+    def _on_notify(self, connection, pid, channel, payload):
+        try:
+            cache.invalidate(UUID(payload))
+        except ValueError:
+            pass
+
+    def _on_lost(self, connection):
+        # Notifications may have been missed while disconnected
+        cache.clear()
+
+    async def _run(self):
+        import asyncpg
+
+        while True:
+            try:
+                self._connection = await asyncpg.connect(self.dsn)
+                self._connection.add_termination_listener(self._on_lost)
+                for channel, handler in self._channels.items():
+                    await self._connection.add_listener(channel, handler)
+                cache.clear()  # Anything cached before we listened may be stale
+                while not self._connection.is_closed():
+                    await asyncio.sleep(self.RETRY_SECONDS)
+            except (OSError, asyncpg.PostgresError) as e:
+                logger.warning("Profile cache listener disconnected: %s", e)
+            await asyncio.sleep(self.RETRY_SECONDS)
+
+    def start(self):
+        self.loop = asyncio.get_running_loop()
+        if self.dsn and self._task is None:
+            self._task = asyncio.create_task(self._run(), name="profile-cache-listener")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._connection is not None and not self._connection.is_closed():
+            await self._connection.close()
+        self.loop = None
+
+
+def _listen_dsn():
+    if config.settings.PROFILE_CACHE_LISTEN_URL:
+        url = make_url(config.settings.PROFILE_CACHE_LISTEN_URL)
+    elif config.settings.DATABASE_URL:
+        url = make_url(config.settings.DATABASE_URL)
+        # The transaction-mode pooler can't hold a LISTEN
+        if database.is_pgbouncer(url):
+            return None
+    else:
+        return None
+    if url.get_backend_name() != "postgresql":
+        return None
+    # asyncpg wants a plain postgresql:// DSN
+    return url.set(drivername="postgresql").render_as_string(hide_password=False)
+
+
+listener = InvalidationListener(_listen_dsn())
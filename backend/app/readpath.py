@@ -0,0 +1,117 @@
+from collections import defaultdict
+
+import orjson
+from pydantic import TypeAdapter
+from sqlalchemy import select
+from starlette.responses import Response
+
+from app import crud, models, pagination, schemas
+
+# --- ORM-BYPASS READ PATH ---
+# GET /strategies/ and GET /users/ return up to MAX_PAGE_SIZE rows per call,
+# and most of their CPU went to building ORM objects, validating them again
+# through the response_model and encoding the result. Here the same pages are
+# read with Core SELECTs (plain row tuples), legs are grouped onto their
+# strategies in one pass, and the dicts - built in the response schema's field
+# order - go straight to orjson.
+#
+# The body is byte-for-byte what FastAPI produces from the response model
+# (benchmarks/bench_read_path.py checks it). The one encoding difference is
+# floats >= 1e16, written "1e16" by orjson and "1e+16" by pydantic; a page
+# holding one falls back to the schema serializer.
+
+EXPONENT_FLOAT = 1e16
+
+STRATEGY_COLUMNS = ("name", "ticker", "instrument_type", "id", "user_id", "is_active", "created_at", "template_id")
+USER_COLUMNS = ("email", "first_name", "last_name", "role", "multiplier", "telegram_id", "id", "is_active",
+                "created_at")
+
+_strategy_list = TypeAdapter(list[schemas.StrategyResponse])
+_user_list = TypeAdapter(list[schemas.UserResponse])
+
+
+class JSONBytesResponse(Response):
+    """A body that is already encoded JSON."""
+    media_type = "application/json"
+
+
+def _float(value):
+    # Numeric columns come back as Decimal; the schemas declare float
+    return None if value is None else float(value)
+
+
+def _int(value):
+    return None if value is None else int(value)
+
+
+def _dumps(items: list[dict], fallback: TypeAdapter, exact: bool) -> bytes:
+    if exact:
+        return orjson.dumps(items, option=orjson.OPT_UTC_Z)
+    return fallback.dump_json(fallback.validate_python(items))
+
+
+async def strategy_page(db, user_id=None, ticker=None, instrument_type=None, is_active=None, template_id=None,
+                        cursor: str = None, limit: int = pagination.DEFAULT_PAGE_SIZE):
+    """
+    Same page as crud.list_strategies_async, as an encoded list of
+    StrategyResponse. Returns (body, next_cursor); raises ValueError on a bad cursor.
+    """
+    strategy = models.Strategy.__table__.c
+    leg = models.StrategyLeg.__table__.c
+
+    # 1. The page itself: one tuple per strategy
+    query = select(*(strategy[name] for name in STRATEGY_COLUMNS))
+    query = crud._strategy_filters(query, user_id, ticker, instrument_type, is_active, template_id)
+    query = pagination.apply_keyset(query, models.Strategy, cursor).limit(limit + 1)
+    page, next_cursor = pagination.split_page((await db.execute(query)).all(), limit)
+
+    # 2. Legs of every template on the page in one SELECT ... IN, grouped in one pass.
+    #    Popular leg sets are shared, so this is often far fewer rows than strategies x legs.
+    legs_by_template = defaultdict(list)
+    exact = True
+    template_ids = {row.template_id for row in page}
+    if template_ids:
+        legs = await db.execute(
+            select(leg.template_id, leg.leg_index, leg.action, leg.option_type, leg.quantity,
+                   leg.strike_value, leg.strike_mode, leg.expiration_days)
+            .filter(leg.template_id.in_(template_ids))
+            .order_by(leg.template_id, leg.leg_index)
+        )
+        for template, index, action, option_type, quantity, strike_value, strike_mode, days in legs:
+            quantity, strike_value = _float(quantity), _float(strike_value)
+            if abs(quantity or 0) >= EXPONENT_FLOAT or abs(strike_value or 0) >= EXPONENT_FLOAT:
+                exact = False
+            legs_by_template[template].append({
+                "leg_index": int(index), "action": action, "option_type": option_type, "quantity": quantity,
+                "strike_value": strike_value, "strike_mode": strike_mode, "expiration_days": _int(days),
+            })
+
+    # 3. Field order of StrategyResponse: StrategyCreate's fields, then its own
+    items = [
+        {"name": name, "ticker": row_ticker, "instrument_type": row_type, "legs": legs_by_template[template],
+         "id": row_id, "user_id": owner, "is_active": active, "created_at": created_at, "template_id": template}
+        for name, row_ticker, row_type, row_id, owner, active, created_at, template in page
+    ]
+    return _dumps(items, _strategy_list, exact), next_cursor
+
+
+async def user_page(db, role=None, is_active=None, search=None, cursor: str = None,
+                    limit: int = pagination.DEFAULT_PAGE_SIZE, with_total: bool = True):
+    """
+    Same page as crud.list_users_async, as an encoded list of UserResponse.
+    Returns (body, next_cursor, total); raises ValueError on a bad cursor.
+    """
+    profile = models.Profile.__table__.c
+    query = crud._user_filters(select(*(profile[name] for name in USER_COLUMNS)), role, is_active, search)
+    total = await pagination.estimate_count(db, query) if with_total else None
+    query = pagination.apply_keyset(query, models.Profile, cursor).limit(limit + 1)
+    page, next_cursor = pagination.split_page((await db.execute(query)).all(), limit)
+
+    # Row tuples are already in UserResponse field order; only the multiplier needs converting
+    items = [
+        {"email": email, "first_name": first_name, "last_name": last_name, "role": row_role,
+         "multiplier": _float(multiplier), "telegram_id": telegram_id, "id": row_id, "is_active": active,
+         "created_at": created_at}
+        for email, first_name, last_name, row_role, multiplier, telegram_id, row_id, active, created_at in page
+    ]
+    return _dumps(items, _user_list, True), next_cursor, total
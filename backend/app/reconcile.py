@@ -0,0 +1,277 @@
+import asyncio
+import logging
+import time
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Optional
+
+from app import brokers, config, crud, database, locks, positions
+from app.alerts import TokenBucket
+from app.brokers import BrokerAdapter, BrokerError
+
+logger = logging.getLogger(__name__)
+
+# --- BROKER ORDER RECONCILIATION ---
+# After a fan-out, orders keep changing at the brokers (partial fills, fills,
+# cancels), and an order whose ack timed out may or may not exist there.
+# A sweep:
+#   1. loads every open order (pending / accepted / partial / timeout) into a
+#      dict keyed by client order id,
+#   2. asks every broker at once for the current state of those orders, each
+#      in batches of adapter.status_batch_size, with at most
+#      adapter.max_concurrency requests in flight and adapter.status_rate_limit
+#      requests per second (token bucket, kept across sweeps),
+#   3. diffs each reported state against the dict (one hash lookup per order)
+#      and keeps only the orders whose status, fills or broker id changed,
+#   4. writes those in batched UPDATEs (one transaction) and books the new
+#      fill quantity into the live position book (app/positions.py).
+# A batch that fails or times out is simply asked again by the next sweep.
+# A timed-out order that a successful request doesn't return never reached
+# the broker and becomes 'error'; so does a 'pending' one (stored, then the
+# API process died before sending it) once it is older than pending_grace.
+#
+# With several API processes only one sweeps at a time: a sweep runs under
+# an advisory lock (app/locks.py) and is skipped while another process holds
+# it, or when this one doesn't own the position book. The UPDATEs are also
+# conditional on the status / filled quantity the diff started from, and
+# fills are only booked for rows actually updated, so even a stale sweep
+# can't book a fill twice.
+
+
+@dataclass
+class SweepReport:
+    skipped: bool = False       # Another process sweeps (or owns the position book)
+    orders: int = 0             # Open orders checked
+    requests: int = 0           # Status requests sent
+    failed_requests: int = 0    # Errors / timeouts (their orders wait for the next sweep)
+    missing: int = 0            # Accepted / partial orders the broker didn't return
+    changed: int = 0            # Rows updated
+    filled: int = 0             # Orders with new fills booked into the position book
+    load_ms: float = 0.0
+    poll_ms: float = 0.0
+    apply_ms: float = 0.0
+    elapsed_ms: float = 0.0
+    finished_at: Optional[datetime] = None
+
+
+def diff(stored: dict, requested: list[str], states, now: datetime, pending_grace: float = 60.0):
+    """
+    Compare one status response against the stored orders (client order id ->
+    row). Returns (update rows for crud.update_broker_orders_async, client
+    order id -> positions.Fill of the new fills, ids of accepted / partial
+    orders not returned).
+    Pending orders younger than pending_grace seconds may still be in flight
+    and are left alone.
+    """
+    changes, fills = [], {}
+    seen = set()
+    for state in states:
+        row = stored.get(state.client_order_id)
+        if row is None:
+            continue
+        seen.add(state.client_order_id)
+        old_filled = float(row.filled_quantity or 0)
+        filled = float(state.filled_quantity or 0)
+        broker_order_id = state.broker_order_id or row.broker_order_id
+        if state.status == row.status and filled == old_filled and broker_order_id == row.broker_order_id:
+            continue
+        changes.append({
+            "order_id": row.client_order_id,
+            "old_status": row.status,
+            "old_filled_quantity": row.filled_quantity,
+            "status": state.status,
+            "filled_quantity": filled,
+            "avg_fill_price": state.avg_fill_price,
+            "broker_order_id": broker_order_id,
+            "error": state.error,
+            "updated_at": now,
+        })
+        if filled > old_filled and state.avg_fill_price is not None:
+            # Price of just the new part, from the change in filled value
+            old_value = old_filled * float(row.avg_fill_price or 0)
+            price = (filled * state.avg_fill_price - old_value) / (filled - old_filled)
+            side = 1 if row.action == "buy" else -1
+            fills[row.client_order_id] = positions.Fill(
+                row.account_id, row.strategy_id, row.leg_index, side * (filled - old_filled), price,
+                row.broker, row.ticker, row.instrument_type, fill_id=f"{row.client_order_id}:{filled}",
+            )
+
+    missing = []
+    for client_order_id in requested:
+        if client_order_id in seen:
+            continue
+        row = stored[client_order_id]
+        if row.status == "timeout":
+            changes.append({
+                "order_id": client_order_id, "old_status": row.status, "old_filled_quantity": row.filled_quantity,
+                "status": "error", "filled_quantity": 0, "avg_fill_price": None,
+                "broker_order_id": None, "error": "Unknown at the broker (ack timed out)", "updated_at": now,
+            })
+        elif row.status == "pending":
+            created_at = row.created_at
+            if created_at is not None and created_at.tzinfo is None:
+                created_at = created_at.replace(tzinfo=timezone.utc)  # SQLite drops the zone
+            if created_at is not None and (now - created_at).total_seconds() > pending_grace:
+                changes.append({
+                    "order_id": client_order_id, "old_status": row.status, "old_filled_quantity": row.filled_quantity,
+                    "status": "error", "filled_quantity": 0, "avg_fill_price": None,
+                    "broker_order_id": None, "error": "Unknown at the broker (never sent)", "updated_at": now,
+                })
+        else:
+            missing.append(client_order_id)
+    return changes, fills, missing
+
+
+class Reconciler:
+    def __init__(self, adapters: dict = None, interval=30.0, update_batch=1000, book=None, pending_grace=60.0):
+        self.adapters = adapters if adapters is not None else brokers.adapters
+        self.interval = interval
+        self.update_batch = update_batch
+        self.pending_grace = pending_grace
+        self.book = book if book is not None else positions.book
+
+        self._buckets = {}
+        self._semaphores = {}
+        self._sweep_lock = asyncio.Lock()   # One sweep at a time in this process...
+        self._lock = locks.AdvisoryLock("broker-order-reconciliation")  # ...and across processes
+        self._wakeup = asyncio.Event()
+        self._task = None
+        self._stopping = False
+
+        self.sweeps = 0
+        self.last_report = None
+
+    def _limits(self, adapter: BrokerAdapter):
+        bucket = self._buckets.get(adapter.name)
+        if bucket is None:
+            rate = adapter.status_rate_limit
+            bucket = self._buckets[adapter.name] = TokenBucket(rate, capacity=max(1.0, rate))
+            self._semaphores[adapter.name] = asyncio.Semaphore(adapter.max_concurrency)
+        return bucket, self._semaphores[adapter.name]
+
+    async def _poll(self, adapter: BrokerAdapter, client_order_ids: list[str], report: SweepReport):
+        """One status request; None if it failed."""
+        bucket, semaphore = self._limits(adapter)
+        async with semaphore:
+            await bucket.acquire()
+            report.requests += 1
+            try:
+                return await asyncio.wait_for(adapter.get_order_states(client_order_ids), adapter.timeout)
+            except (asyncio.TimeoutError, BrokerError, NotImplementedError) as e:
+                report.failed_requests += 1
+                logger.warning("Order status request to %s failed (%d orders): %s",
+                               adapter.name, len(client_order_ids), e.__class__.__name__)
+                return None
+
+    async def sweep(self) -> SweepReport:
+        async with self._sweep_lock:
+            # Fills are booked into the position book, so only its owner sweeps
+            if self.book.follower or not await self._lock.acquire():
+                return SweepReport(skipped=True, finished_at=datetime.now(timezone.utc))
+            try:
+                return await self._sweep()
+            finally:
+                await self._lock.release()
+
+    async def _sweep(self) -> SweepReport:
+        report = SweepReport()
+        start = time.perf_counter()
+
+        # 1. Open orders, hash-indexed by client order id
+        async with database.AsyncSessionLocal() as db:
+            rows = await crud.get_open_broker_orders_async(db)
+        stored = {row.client_order_id: row for row in rows}
+        report.orders = len(stored)
+        loaded = time.perf_counter()
+
+        # 2. Every broker concurrently, each within its own limits
+        by_broker = {}
+        for row in rows:
+            by_broker.setdefault(row.broker, []).append(row.client_order_id)
+        batches = []
+        for name, ids in by_broker.items():
+            adapter = self.adapters.get(name)
+            if adapter is None:
+                logger.warning("No adapter registered for broker '%s', %d orders not reconciled", name, len(ids))
+                continue
+            size = adapter.status_batch_size
+            batches += [(adapter, ids[i:i + size]) for i in range(0, len(ids), size)]
+        results = await asyncio.gather(*(self._poll(adapter, ids, report) for adapter, ids in batches))
+        polled = time.perf_counter()
+
+        # 3. Only what changed
+        now = datetime.now(timezone.utc)
+        changes, fills = [], {}
+        for (adapter, ids), states in zip(batches, results):
+            if states is None:
+                continue
+            batch_changes, batch_fills, missing = diff(stored, ids, states, now, self.pending_grace)
+            changes += batch_changes
+            fills.update(batch_fills)
+            report.missing += len(missing)
+
+        # 4. Conditional batched UPDATEs, then the position book, only for fills
+        #    whose row this sweep updated (fill ids also make re-booking a no-op).
+        #    Those go to the fill ledger in the same transaction, so a fill the
+        #    order rows say was booked survives a crash before the next snapshot.
+        entries = []
+        if changes:
+            async with database.AsyncSessionLocal() as db:
+                booked = await crud.update_broker_orders_async(db, changes, self.update_batch, track=fills.keys())
+                entries = self.book.ledger([fills[client_order_id] for client_order_id in booked])
+                await crud.insert_position_fills_async(db, entries)
+                await db.commit()
+        for seq, fill in entries:
+            self.book.apply_fill(fill, seq)
+        report.changed = len(changes)
+        report.filled = len(entries)
+
+        finished = time.perf_counter()
+        report.load_ms = round((loaded - start) * 1000, 2)
+        report.poll_ms = round((polled - loaded) * 1000, 2)
+        report.apply_ms = round((finished - polled) * 1000, 2)
+        report.elapsed_ms = round((finished - start) * 1000, 2)
+        report.finished_at = datetime.now(timezone.utc)
+        self.sweeps += 1
+        self.last_report = report
+        if report.missing or report.failed_requests:
+            logger.warning("Reconciliation: %d orders not returned by their broker, %d requests failed",
+                           report.missing, report.failed_requests)
+        return report
+
+    async def _run(self):
+        while not self._stopping:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            if self._stopping:
+                break
+            try:
+                await self.sweep()
+            except Exception:
+                logger.exception("Reconciliation sweep failed, retrying in %.0fs", self.interval)
+
+    def start(self):
+        if self.interval > 0 and self._task is None:
+            self._stopping = False
+            self._task = asyncio.create_task(self._run(), name="order-reconciler")
+
+    async def stop(self):
+        """Let a sweep in progress finish, then stop."""
+        if self._task is not None:
+            self._stopping = True
+            self._wakeup.set()
+            await self._task
+            self._task = None
+
+    def stats(self) -> dict:
+        return {"sweeps": self.sweeps, "interval_seconds": self.interval}
+
+
+reconciler = Reconciler(
+    interval=config.settings.RECONCILE_INTERVAL_SECONDS,
+    update_batch=config.settings.RECONCILE_UPDATE_BATCH,
+    pending_grace=config.settings.RECONCILE_PENDING_GRACE_SECONDS,
+)
@@ -0,0 +1,214 @@
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+
+from sqlalchemy import exc, text
+from starlette.requests import Request
+
+from app import config, database, metrics
+
+logger = logging.getLogger(__name__)
+
+# --- READ REPLICA ROUTING ---
+# Read-only routes take their session from get_read_db instead of get_async_db.
+# It hands out a replica session only when
+# - READ_REPLICA_URL is set and the last probe (every REPLICA_CHECK_SECONDS) succeeded,
+# - the replica's replay lag at that probe was at most REPLICA_MAX_LAG_SECONDS, and
+# - the caller hasn't committed a write in the last READ_YOUR_WRITES_SECONDS
+#   (it may not have reached the replica yet);
+# otherwise the read goes to the primary, as before.
+#
+# Writes are reported by database.write_listeners. The worker that committed
+# one remembers the user, but the next request can land on another worker, so
+# the client carries the write too: LastWriteMiddleware sets WRITE_HEADER
+# (epoch seconds) on the response, the frontend sends it back on every
+# request, and get_read_db reads from the primary while it's within the
+# window. Clients that don't echo it (scripts) only get the per-worker window.
+#
+# Testing: two local Postgres instances (primary + streaming standby), or a
+# stand-in with READ_REPLICA_URL = the primary's own URL (lag is always 0).
+
+WRITE_HEADER = "X-Last-Write"
+
+# Seconds the standby is behind. 0 when everything received is replayed (an
+# idle primary would otherwise look like ever-growing lag) and when the server
+# isn't a standby at all.
+LAG_SQL = """
+SELECT CASE
+    WHEN NOT pg_is_in_recovery() THEN 0
+    WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+    ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+END
+"""
+
+
+class ReplicaMonitor:
+    """Probes the replica in the background and decides, per request, replica or primary."""
+
+    def __init__(self, max_lag=5.0, check_interval=2.0, read_your_writes=5.0):
+        self.max_lag = max_lag
+        self.check_interval = check_interval
+        self.read_your_writes = read_your_writes
+        self.healthy = False        # Reachable and within max_lag; False until the first good probe
+        self.lag = None
+        self.last_error = None
+        self._recent_writes = OrderedDict()  # user id -> monotonic time their window ends, oldest first
+        self._task = None
+
+    # --- READ-YOUR-WRITES ---
+
+    def note_write(self, user_id, request_state=None):
+        if request_state is not None:
+            # Sent to the client by LastWriteMiddleware
+            request_state.last_write = time.time()
+        now = time.monotonic()
+        self._recent_writes[user_id] = now + self.read_your_writes
+        self._recent_writes.move_to_end(user_id)
+        # Same window for everyone, so expired entries are always at the front
+        while self._recent_writes:
+            oldest, until = next(iter(self._recent_writes.items()))
+            if until > now:
+                break
+            del self._recent_writes[oldest]
+
+    def recently_wrote(self, user_id) -> bool:
+        until = self._recent_writes.get(user_id)
+        return until is not None and until > time.monotonic()
+
+    def use_replica(self, user_id=None, last_write=None) -> bool:
+        """last_write: the client's WRITE_HEADER, epoch seconds of its last write on any worker."""
+        if not self.healthy:
+            return False
+        if last_write is not None and time.time() < last_write + self.read_your_writes:
+            return False
+        return user_id is None or not self.recently_wrote(user_id)
+
+    # --- HEALTH ---
+
+    def _update(self, healthy: bool, lag=None, error=None):
+        if healthy != self.healthy:
+            if healthy:
+                logger.info("Read replica usable again (lag %.2f s)", lag)
+            else:
+                logger.warning("Read replica unusable, reading from the primary: %s", error)
+        self.healthy, self.lag, self.last_error = healthy, lag, error
+        metrics.replica_state.update(healthy=int(healthy), lag_seconds=lag)
+
+    def mark_unhealthy(self, error: str):
+        """A replica session lost its connection: stop routing there until the next good probe."""
+        self._update(False, error=error)
+
+    async def check(self):
+        engine = database.get_async_read_engine()
+        try:
+            async with engine.connect() as connection:
+                if connection.dialect.name == "postgresql":
+                    lag = float(await connection.scalar(text(LAG_SQL)))
+                else:
+                    await connection.execute(text("SELECT 1"))
+                    lag = 0.0
+        except Exception as e:
+            self._update(False, error=f"{e.__class__.__name__}: {e}")
+            return
+        if lag > self.max_lag:
+            self._update(False, lag, f"lag {lag:.1f} s > {self.max_lag:.1f} s")
+        else:
+            self._update(True, lag)
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self.check(), timeout=max(1.0, self.check_interval))
+            except asyncio.TimeoutError:
+                self._update(False, error="probe timed out")
+            except Exception:
+                logger.exception("Read replica probe failed")
+            await asyncio.sleep(self.check_interval)
+
+    def start(self):
+        if not config.settings.READ_REPLICA_URL or self._task is not None:
+            return
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        self.healthy = False
+
+    def stats(self) -> dict:
+        return {
+            "configured": bool(config.settings.READ_REPLICA_URL),
+            "healthy": self.healthy,
+            "lag_seconds": self.lag,
+            "error": self.last_error,
+        }
+
+
+monitor = ReplicaMonitor(
+    max_lag=config.settings.REPLICA_MAX_LAG_SECONDS,
+    check_interval=config.settings.REPLICA_CHECK_SECONDS,
+    read_your_writes=config.settings.READ_YOUR_WRITES_SECONDS,
+)
+database.write_listeners.append(monitor.note_write)
+
+
+class LastWriteMiddleware:
+    """Pure ASGI middleware: WRITE_HEADER on the response of a request that committed a write."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        async def send_with_header(message):
+            if message["type"] == "http.response.start":
+                # request.state lives in scope["state"]
+                last_write = scope.get("state", {}).get("last_write")
+                if last_write is not None:
+                    header = (WRITE_HEADER.lower().encode(), f"{last_write:.3f}".encode())
+                    message = {**message, "headers": [*message.get("headers", ()), header]}
+            await send(message)
+
+        await self.app(scope, receive, send_with_header)
+
+
+def _last_write(request: Request):
+    try:
+        return float(request.headers[WRITE_HEADER])
+    except (KeyError, ValueError):
+        return None
+
+
+async def get_read_db(request: Request = None):
+    """
+    Session for read-only routes: the replica when the monitor allows it for
+    this caller, else the primary. The caller is request.state.user_id, so
+    declare this after the auth dependency. Never write through it.
+    """
+    user_id = getattr(request.state, "user_id", None) if request is not None else None
+    last_write = _last_write(request) if request is not None else None
+    factory = database.get_async_read_sessionmaker() if monitor.use_replica(user_id, last_write) else None
+    target = "replica" if factory is not None else "primary"
+    if factory is None:
+        factory = database.get_async_sessionmaker()
+        if factory is None:
+            raise RuntimeError("Async database engine is not configured (is asyncpg installed?)")
+    metrics.db_reads.inc(target)
+
+    async with factory() as db:
+        db.info["request_state"] = request.state if request is not None else None
+        try:
+            yield db
+        except exc.DBAPIError as e:
+            if target == "replica" and e.connection_invalidated:
+                monitor.mark_unhealthy(str(e.orig))
+            raise
@@ -0,0 +1,79 @@
+from datetime import datetime, timedelta, timezone
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Optional
+from uuid import UUID
+from app import schemas, crud, pagination, profilecache
+from app.config import settings
+from app.replica import get_read_db
+from app.routers.users import get_current_user
+
+router = APIRouter(
+    prefix="/audit",
+    tags=["audit"]
+)
+
+# History pages of the append-only audit log (app/auditlog.py), newest first.
+# Without 'since' they look back AUDIT_LOOKBACK_DAYS: with the cursor as the
+# upper bound, each page only touches the monthly partitions in that range.
+
+async def _history_page(db, response, since, until, cursor, limit, **filters):
+    if since is None:
+        since = datetime.now(timezone.utc) - timedelta(days=settings.AUDIT_LOOKBACK_DAYS)
+    try:
+        events, next_cursor = await crud.list_audit_events_async(
+            db, since=since, until=until, cursor=cursor, limit=limit, **filters
+        )
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return events
+
+@router.get("/users/{user_id}", response_model=list[schemas.AuditEventResponse])
+async def read_user_history(
+    user_id: UUID,
+    response: Response,
+    as_actor: bool = False,
+    action: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(default=pagination.DEFAULT_PAGE_SIZE, ge=1, le=pagination.MAX_PAGE_SIZE),
+    current_user: profilecache.ProfileRecord = Depends(get_current_user),
+    db: AsyncSession = Depends(get_read_db)
+):
+    """
+    What happened to a profile (created, updated field by field, deleted), or
+    with 'as_actor' everything that user did. Admins see anyone, others themselves.
+    """
+    if current_user.role not in ['super_admin', 'admin'] and current_user.id != user_id:
+        raise HTTPException(status_code=403, detail="Not authorized to view this history")
+
+    filters = {"actor_id": user_id} if as_actor else {"entity_type": "profile", "entity_id": user_id}
+    return await _history_page(db, response, since, until, cursor, limit, action=action, **filters)
+
+@router.get("/strategies/{strategy_id}", response_model=list[schemas.AuditEventResponse])
+async def read_strategy_history(
+    strategy_id: UUID,
+    response: Response,
+    action: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(default=pagination.DEFAULT_PAGE_SIZE, ge=1, le=pagination.MAX_PAGE_SIZE),
+    current_user: profilecache.ProfileRecord = Depends(get_current_user),
+    db: AsyncSession = Depends(get_read_db)
+):
+    """
+    A strategy's history: creation / clone, every fan-out signal and its child
+    orders ('action=order' for just the orders). Admins and the owner only.
+    """
+    if current_user.role not in ['super_admin', 'admin']:
+        strategy = await crud.get_strategy_async(db, strategy_id)
+        if not strategy or strategy.user_id != current_user.id:
+            raise HTTPException(status_code=404, detail="Strategy not found")
+
+    return await _history_page(db, response, since, until, cursor, limit, action=action,
+                               entity_type="strategy", entity_id=strategy_id)
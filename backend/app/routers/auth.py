@@ -1,9 +1,10 @@
 from fastapi import APIRouter, Depends, HTTPException, status, Request
-from sqlalchemy.orm import Session
-from app import schemas, crud, config
-from app.database import get_db
-import httpx
+from sqlalchemy.ext.asyncio import AsyncSession
+from app import schemas, crud, gotrue, sessionlog
+from app.database import get_async_db
+from app.security import verifier, get_token_claims
 from fastapi.security import OAuth2PasswordBearer
+from uuid import UUID
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/login")
 
@@ -13,25 +14,15 @@ router = APIRouter(
 )
 
 @router.post("/login", response_model=schemas.Token)
-def login(
+async def login(
     login_data: schemas.UserLogin, 
     request: Request,  # <--- We need the Request object to get IP
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    # A. Verify with Supabase (Same as before)
-    auth_url = f"{config.settings.SUPABASE_URL}/auth/v1/token?grant_type=password"
-    headers = {
-        "apikey": config.settings.SUPABASE_KEY,
-        "Content-Type": "application/json"
-    }
-    payload = {
-        "email": login_data.email,
-        "password": login_data.password
-    }
-
+    # A. Verify with Supabase (shared pooled client, doesn't block the event loop)
     try:
-        response = httpx.post(auth_url, headers=headers, json=payload)
-    except httpx.RequestError as e:
+        response = await gotrue.client.password_grant(login_data.email, login_data.password)
+    except gotrue.GoTrueError as e:
         raise HTTPException(status_code=503, detail=f"Auth service unavailable: {e}")
 
     if response.status_code != 200:
@@ -40,8 +31,8 @@ def login(
     auth_response = response.json()
     access_token = auth_response.get("access_token")
 
-    # B. Verify Local Profile (Same as before)
-    db_user = crud.get_user_by_email(db, email=login_data.email)
+    # B. Verify Local Profile
+    db_user = await crud.get_user_by_email_async(db, email=login_data.email)
     if not db_user or not db_user.is_active:
         raise HTTPException(status_code=403, detail="User account is disabled or not found")
 
@@ -50,7 +41,8 @@ def login(
     client_ip = request.headers.get("x-forwarded-for", request.client.host)
     user_agent = request.headers.get("user-agent", "unknown")
     
-    new_session = crud.create_user_session(db, db_user.id, client_ip, user_agent)
+    # Write-behind: queued and flushed in batches, not written inline
+    sessionlog.writer.log_login(db_user.id, client_ip, user_agent)
 
     # D. Return Token (We do not attach session_id to JWT here to avoid complexity, 
     # but the frontend will hold the token. For strict tracking, frontend calls logout.)
@@ -61,35 +53,27 @@ def login(
     }
 
 @router.post("/logout")
-def logout(
+async def logout(
+    request: Request,
     token: str = Depends(oauth2_scheme), 
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    # 1. Verify token with Supabase to get the User ID
-    # We call the Supabase 'User' endpoint using the token provided
-    user_url = f"{config.settings.SUPABASE_URL}/auth/v1/user"
-    headers = {
-        "apikey": config.settings.SUPABASE_KEY,
-        "Authorization": f"Bearer {token}"
-    }
-    
-    try:
-        response = httpx.get(user_url, headers=headers)
-    except httpx.RequestError:
-        raise HTTPException(status_code=503, detail="Auth provider unavailable")
-
-    if response.status_code != 200:
-        raise HTTPException(status_code=401, detail="Invalid token")
+    # 1. Verify token locally to get the User ID
+    claims = await get_token_claims(token, request)
+    user_id = UUID(claims["sub"])
 
-    user_data = response.json()
-    user_id = user_data.get("id")
+    # Revoke the token's auth session so it can't be reused until it expires (every worker)
+    await verifier.revoke(db, token, claims)
 
-    # 2. Find the active session for this user
-    active_session = crud.get_active_session(db, user_id)
+    # 2. Find the active session for this user (may not be flushed to the DB yet)
+    session_id = sessionlog.writer.unflushed_session(user_id)
+    if session_id is None:
+        active_session = await crud.get_active_session_async(db, user_id)
+        session_id = active_session.id if active_session else None
     
-    if active_session:
-        # 3. Close the session
-        crud.end_user_session(db, active_session.id)
+    if session_id:
+        # 3. Close the session (queued, like the login)
+        sessionlog.writer.log_logout(session_id)
         return {"status": "success", "message": "Logged out successfully"}
     
     return {"status": "warning", "message": "User was logged in, but no active session record found."}
\ No newline at end of file
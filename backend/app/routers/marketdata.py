@@ -0,0 +1,127 @@
+import asyncio
+import time
+import numpy as np
+from datetime import datetime, timezone
+from fastapi import APIRouter, Body, Depends, HTTPException, Query, WebSocket, WebSocketDisconnect, status
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+from uuid import UUID
+from app import chains, marketdata, profilecache, schemas, strikes
+from app.database import get_async_db
+from app.routers.strategies import get_current_user_id
+from app.routers.users import get_current_user
+from app.security import get_token_claims
+
+router = APIRouter(
+    prefix="/marketdata",
+    tags=["marketdata"]
+)
+
+BAR_COLUMNS = ("start", "open", "high", "low", "close", "volume")
+
+# Upper bound on ticks per POST /marketdata/ticks request
+MAX_TICKS_PER_REQUEST = 10000
+
+@router.get("/{ticker}/last")
+async def read_last_price(ticker: str, user_id: UUID = Depends(get_current_user_id)):
+    book = marketdata.hub.books.get(ticker)
+    if book is None or book.last_price is None:
+        raise HTTPException(status_code=404, detail="No market data for this ticker")
+    return {"ticker": ticker, "price": book.last_price, "ts": book.last_ts}
+
+@router.get("/{ticker}/bars")
+async def read_bars(
+    ticker: str,
+    limit: int = Query(default=60, ge=1, le=marketdata.BAR_CAPACITY),
+    user_id: UUID = Depends(get_current_user_id)
+):
+    book = marketdata.hub.books.get(ticker)
+    if book is None:
+        raise HTTPException(status_code=404, detail="No market data for this ticker")
+    return [dict(zip(BAR_COLUMNS, bar.tolist())) for bar in book.recent_bars(limit)]
+
+@router.post("/ticks", response_model=schemas.TicksResult)
+async def ingest_ticks(
+    ticks: list[schemas.TickCreate] = Body(max_length=MAX_TICKS_PER_REQUEST),
+    current_user: profilecache.ProfileRecord = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Feed endpoint: publish ticks to /last, /bars, /ws and the position marks
+    of every API process (this one directly, the others via Postgres NOTIFY).
+    """
+    if current_user.role not in ['super_admin', 'admin']:
+        raise HTTPException(status_code=403, detail="Not authorized to publish market data")
+
+    now = time.time()
+    rows = [(tick.ticker, tick.price, tick.size, now if tick.ts is None else tick.ts) for tick in ticks]
+    for ticker, price, size, ts in rows:
+        marketdata.hub.publish(ticker, price, size, ts)
+    if rows and db.get_bind().dialect.name == "postgresql":
+        for payload in marketdata.encode_ticks(rows):
+            await db.execute(text("SELECT pg_notify(:channel, :payload)"),
+                             {"channel": marketdata.TICK_CHANNEL, "payload": payload})
+        await db.commit()
+    return {"published": len(rows)}
+
+@router.post("/{ticker}/chain", response_model=schemas.OptionChainSummary)
+async def upload_option_chain(
+    ticker: str,
+    chain: schemas.OptionChainUpload,
+    current_user: profilecache.ProfileRecord = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Load an option chain snapshot (one row per listed contract) into the
+    strike resolver: delta-targeted legs, payoff curves and greeks on this
+    ticker use the newest one. The snapshot is stored and loaded by every
+    API process (app/chains.py); the chain feed posts here.
+    """
+    if current_user.role not in ['super_admin', 'admin']:
+        raise HTTPException(status_code=403, detail="Not authorized to load option chains")
+
+    snapshot_time = chain.snapshot_time or datetime.now(timezone.utc)
+    if snapshot_time.tzinfo is None:
+        snapshot_time = snapshot_time.replace(tzinfo=timezone.utc)
+    contracts = [(c.expiration_days, c.strike, c.option_type, c.iv) for c in chain.contracts]
+    loaded = await chains.sync.store(db, strikes.OptionChain.from_records(
+        ticker, snapshot_time, chain.spot, contracts, rate=chain.rate, dividend=chain.dividend,
+    ), contracts)
+    return {
+        "ticker": ticker, "snapshot_time": loaded.snapshot_time, "spot": loaded.spot,
+        "expiries": len(loaded.expiries), "strikes": len(loaded.strikes),
+        "contracts": int((~np.isnan(loaded.iv)).sum()),
+    }
+
+@router.websocket("/ws")
+async def stream_quotes(websocket: WebSocket, tickers: str, token: str):
+    """
+    Live quotes for comma-separated tickers. Browsers can't set headers on a
+    WebSocket, so the access token comes in the 'token' query parameter.
+    """
+    try:
+        await get_token_claims(token)
+    except HTTPException:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+
+    await websocket.accept()
+    with marketdata.hub.subscribe(ticker.strip() for ticker in tickers.split(",") if ticker.strip()) as subscription:
+
+        async def forward():
+            async for quote in subscription:
+                await websocket.send_text(quote.to_json())
+
+        sender = asyncio.create_task(forward())
+        try:
+            # Waiting on receive (not just on quotes) notices a closed socket right
+            # away, even on tickers that never trade; client messages are ignored
+            while (await websocket.receive())["type"] != "websocket.disconnect":
+                pass
+        finally:
+            # Leaving the 'with' unsubscribes
+            sender.cancel()
+            try:
+                await sender
+            except (asyncio.CancelledError, WebSocketDisconnect):
+                pass
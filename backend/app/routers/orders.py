@@ -0,0 +1,27 @@
+from fastapi import APIRouter, Depends, HTTPException
+from typing import Optional
+from app import schemas, profilecache, reconcile
+from app.routers.users import get_current_user
+
+router = APIRouter(
+    prefix="/orders",
+    tags=["orders"]
+)
+
+# Child orders of fan-outs are kept in line with the brokers by a background
+# sweep every RECONCILE_INTERVAL_SECONDS (app/reconcile.py); these run or
+# inspect it on demand.
+
+@router.post("/reconcile", response_model=schemas.ReconcileReport)
+async def run_reconciliation(current_user: profilecache.ProfileRecord = Depends(get_current_user)):
+    """Reconcile every open order with its broker now (waits for a sweep already running)."""
+    if current_user.role not in ['super_admin', 'admin']:
+        raise HTTPException(status_code=403, detail="Not authorized to reconcile orders")
+    return await reconcile.reconciler.sweep()
+
+@router.get("/reconcile", response_model=Optional[schemas.ReconcileReport])
+async def read_last_reconciliation(current_user: profilecache.ProfileRecord = Depends(get_current_user)):
+    """The last sweep's report (null before the first one)."""
+    if current_user.role not in ['super_admin', 'admin']:
+        raise HTTPException(status_code=403, detail="Not authorized to view reconciliation")
+    return reconcile.reconciler.last_report
@@ -0,0 +1,197 @@
+import asyncio
+import uuid
+from fastapi import APIRouter, Body, Depends, HTTPException, Query, Request, Response, WebSocket, WebSocketDisconnect, status
+from typing import Optional
+from uuid import UUID
+from sqlalchemy.ext.asyncio import AsyncSession
+from app import schemas, crud, database, positions, profilecache
+from app.database import get_async_db
+from app.config import settings
+from app.routers.users import get_current_user
+from app.security import get_token_user_id
+
+# Upper bound on fills / marks per request
+MAX_BATCH = 10000
+
+router = APIRouter(
+    prefix="/positions",
+    tags=["positions"]
+)
+
+# Live positions and P&L from the in-memory book (app/positions.py). Reads
+# never touch the database. Dashboards either poll with If-None-Match (304
+# until something changed) or keep /positions/ws open for pushed summaries.
+# The book is owned by one process (an advisory lock, see app/positions.py).
+# Other workers serve reads from its snapshots, up to two snapshot intervals
+# behind, and answer fills / marks with 503: feeds must post to the owner.
+
+# Versions restart with the process; the prefix keeps old ETags from matching
+_ETAG_PREFIX = uuid.uuid4().hex[:8]
+
+def _not_modified(request: Request, response: Response) -> bool:
+    etag = f'"{_ETAG_PREFIX}-{positions.book.version}"'
+    response.headers["ETag"] = etag
+    return request.headers.get("if-none-match") == etag
+
+def _require_owner():
+    if positions.book.follower:
+        raise HTTPException(status_code=503, detail="The position book is owned by another API process",
+                            headers={"Retry-After": "1"})
+
+def _require_admin(current_user: profilecache.ProfileRecord):
+    if current_user.role not in ['super_admin', 'admin']:
+        raise HTTPException(status_code=403, detail="Not authorized to view positions")
+
+# An id the book has never seen simply has no P&L yet
+_FLAT = {"realized": 0.0, "unrealized": 0.0, "total": 0.0, "market_value": 0.0}
+
+@router.get("/summary", response_model=schemas.PositionsSummary)
+async def read_summary(
+    request: Request,
+    response: Response,
+    current_user: profilecache.ProfileRecord = Depends(get_current_user)
+):
+    """Book-wide P&L plus one line per strategy and per broker."""
+    _require_admin(current_user)
+    if _not_modified(request, response):
+        return Response(status_code=304, headers=response.headers)
+    return positions.book.summary()
+
+@router.get("/strategies/{strategy_id}", response_model=schemas.StrategyPositions)
+async def read_strategy_positions(
+    strategy_id: UUID,
+    request: Request,
+    response: Response,
+    current_user: profilecache.ProfileRecord = Depends(get_current_user)
+):
+    """One strategy's P&L and, per leg, the net quantity over all accounts and its mark."""
+    _require_admin(current_user)
+    if _not_modified(request, response):
+        return Response(status_code=304, headers=response.headers)
+    detail = positions.book.strategy_detail(strategy_id)
+    if detail is None:
+        return {"strategy_id": strategy_id, "version": positions.book.version, "accounts": 0, **_FLAT, "legs": []}
+    return detail
+
+@router.get("/accounts", response_model=list[schemas.AccountPnL])
+async def read_account_ranking(
+    strategy_id: Optional[UUID] = None,
+    worst_first: bool = False,
+    offset: int = Query(default=0, ge=0),
+    limit: int = Query(default=50, ge=1, le=500),
+    current_user: profilecache.ProfileRecord = Depends(get_current_user)
+):
+    """Accounts ranked by total P&L, over everything or on one strategy only."""
+    _require_admin(current_user)
+    return positions.book.ranked_accounts(strategy_id, limit, offset, worst_first)
+
+@router.get("/accounts/{account_id}", response_model=schemas.AccountPositions)
+async def read_account_positions(
+    account_id: UUID,
+    request: Request,
+    response: Response,
+    current_user: profilecache.ProfileRecord = Depends(get_current_user)
+):
+    """An account's P&L and positions. Admins see any account, others their own."""
+    if current_user.role not in ['super_admin', 'admin'] and current_user.id != account_id:
+        raise HTTPException(status_code=403, detail="Not authorized to view these positions")
+    if _not_modified(request, response):
+        return Response(status_code=304, headers=response.headers)
+    detail = positions.book.account_detail(account_id)
+    if detail is None:
+        return {"account_id": account_id, "version": positions.book.version, **_FLAT, "positions": []}
+    return detail
+
+@router.post("/fills", response_model=schemas.FillsResult)
+async def post_fills(
+    fills: list[schemas.FillCreate] = Body(..., max_length=MAX_BATCH),
+    current_user: profilecache.ProfileRecord = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Book executions reported by the brokers, in order. Fills carrying a
+    'fill_id' that was already booked are skipped, so a feed can re-send.
+    They are written to the fill ledger before they are booked.
+    """
+    if current_user.role not in ['super_admin', 'admin']:
+        raise HTTPException(status_code=403, detail="Not authorized to book fills")
+
+    _require_owner()
+    entries = positions.book.ledger([
+        positions.Fill(
+            account_id=fill.account_id,
+            strategy_id=fill.strategy_id,
+            leg_index=fill.leg_index,
+            quantity=fill.quantity if fill.action == 'buy' else -fill.quantity,
+            price=fill.price,
+            broker=fill.broker,
+            ticker=fill.ticker,
+            instrument_type=fill.instrument_type,
+            fill_id=fill.fill_id,
+        )
+        for fill in fills
+    ])
+    if entries:
+        await crud.insert_position_fills_async(db, entries)
+        await db.commit()
+    applied = 0
+    for seq, fill in entries:
+        applied += positions.book.apply_fill(fill, seq)
+    return {"applied": applied, "duplicates": len(fills) - applied}
+
+@router.post("/marks", response_model=schemas.MarksResult)
+async def post_marks(
+    marks: list[schemas.MarkUpdate] = Body(..., max_length=MAX_BATCH),
+    current_user: profilecache.ProfileRecord = Depends(get_current_user)
+):
+    """
+    Set mark prices: per leg (option legs have no market data feed here) or
+    per ticker for equity / future legs.
+    """
+    if current_user.role not in ['super_admin', 'admin']:
+        raise HTTPException(status_code=403, detail="Not authorized to set marks")
+
+    _require_owner()
+    marked = unknown = 0
+    for mark in marks:
+        if mark.strategy_id is not None and mark.leg_index is not None:
+            legs = int(positions.book.mark(mark.strategy_id, mark.leg_index, mark.price))
+        elif mark.ticker:
+            legs = positions.book.mark_ticker(mark.ticker, mark.price)
+        else:
+            raise HTTPException(status_code=422, detail="Each mark needs strategy_id + leg_index, or ticker")
+        marked += legs
+        unknown += not legs
+    return {"marked": marked, "unknown": unknown}
+
+@router.websocket("/ws")
+async def stream_summary(websocket: WebSocket, token: str):
+    """
+    The /positions/summary body, pushed whenever it changed, at most every
+    POSITIONS_PUSH_SECONDS. Admins only; the token comes as a query parameter.
+    """
+    try:
+        user_id = await get_token_user_id(token)
+    except HTTPException:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+    async with database.AsyncSessionLocal() as db:
+        user = await crud.get_profile_record_async(db, user_id)
+    if user is None or user.role not in ['super_admin', 'admin']:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+
+    await websocket.accept()
+    sent_version = None
+    try:
+        while True:
+            if positions.book.version != sent_version:
+                sent_version = positions.book.version
+                await websocket.send_text(schemas.PositionsSummary(**positions.book.summary()).model_dump_json())
+            try:
+                # Waiting on receive (not sleep) notices a closed socket right away
+                await asyncio.wait_for(websocket.receive_text(), settings.POSITIONS_PUSH_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+    except WebSocketDisconnect:
+        pass
@@ -1,9 +1,21 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from app import schemas, crud, models, config  # <--- Added 'models' here
-from app.database import get_db
+from fastapi import APIRouter, Body, Depends, Header, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.exc import SQLAlchemyError
+from pydantic import ValidationError
+from typing import Any, Optional, Literal
+from datetime import datetime, timezone
+import time
+from uuid import UUID, uuid4
+from app import schemas, crud, pagination, fanout, marketdata, payoff, strikes, backtest, alerts, readpath, auditlog
+from app import database
+from app.database import get_async_db
+from app.replica import get_read_db
 from app.routers.auth import oauth2_scheme
-import httpx
+from app.security import get_token_user_id
+
+# Upper bound on items per POST /strategies/bulk request
+MAX_BULK_STRATEGIES = 1000
 
 router = APIRouter(
     prefix="/strategies",
@@ -11,44 +23,367 @@ router = APIRouter(
 )
 
 # Helper to get current user ID from token
-async def get_current_user_id(token: str = Depends(oauth2_scheme)):
-    user_url = f"{config.settings.SUPABASE_URL}/auth/v1/user"
-    headers = {
-        "apikey": config.settings.SUPABASE_KEY,
-        "Authorization": f"Bearer {token}"
-    }
-    response = httpx.get(user_url, headers=headers)
-    if response.status_code != 200:
-        raise HTTPException(status_code=401, detail="Invalid token")
-    return response.json().get("id")
+# The JWT is verified locally (signature + expiry), no round trip to Supabase,
+# at most once per request (the load shedder's per-user rate limit may have).
+# Also kept on request.state for read-your-writes routing (app/replica.py).
+async def get_current_user_id(request: Request, token: str = Depends(oauth2_scheme)):
+    user_id = await get_token_user_id(token, request)
+    request.state.user_id = user_id
+    return user_id
 
 @router.post("/", response_model=schemas.StrategyResponse)
-def create_strategy(
+async def create_strategy(
     strategy: schemas.StrategyCreate, 
-    user_id: str = Depends(get_current_user_id),
-    db: Session = Depends(get_db)
+    user_id: UUID = Depends(get_current_user_id),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Create a new multi-leg strategy.
     TRD [85]: Immutable once created.
     """
-    return crud.create_strategy(db=db, strategy=strategy, user_id=user_id)
+    return await crud.create_strategy_async(db=db, strategy=strategy, user_id=user_id)
 
-@router.get("/", response_model=list[schemas.StrategyResponse])
-def read_strategies(
-    user_id: str = Depends(get_current_user_id),
-    db: Session = Depends(get_db)
+@router.post("/bulk", response_model=schemas.BulkStrategyResponse)
+async def create_strategies_bulk(
+    payload: list[Any] = Body(..., max_length=MAX_BULK_STRATEGIES), # Non-objects are per-item errors too
+    user_id: UUID = Depends(get_current_user_id),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Create many strategies at once (e.g. onboarding a desk's book).
+    Every item is validated on its own and reported by index; all valid
+    items are then inserted in a single transaction.
+    """
+    # 1. Validate each item separately so one bad item doesn't reject the batch
+    results = []
+    valid = []
+    for index, item in enumerate(payload):
+        try:
+            valid.append((index, schemas.StrategyCreate.model_validate(item)))
+        except ValidationError as e:
+            errors = [f"{'.'.join(str(part) for part in err['loc']) or 'row'}: {err['msg']}" for err in e.errors()]
+            results.append({"index": index, "status": "error", "errors": errors})
+
+    # 2. Insert all valid strategies + legs in one transaction
+    try:
+        created = await crud.bulk_create_strategies_async(db, [strategy for _, strategy in valid], user_id)
+    except SQLAlchemyError as e:
+        raise HTTPException(status_code=500, detail=f"Bulk insert failed, nothing was created: {e.__class__.__name__}")
+
+    for (index, _), strategy in zip(valid, created):
+        results.append({"index": index, "status": "created", "strategy": strategy})
+
+    results.sort(key=lambda result: result["index"])
+    return {"created": len(created), "failed": len(payload) - len(created), "results": results}
+
+async def get_visible_owner(
+    user_id: UUID = Depends(get_current_user_id),
+    db: AsyncSession = Depends(get_async_db)
 ):
+    """
+    Which owner's strategies the caller may list: None (= everyone's) for a
+    Super Admin, otherwise the caller's own user id.
+    """
     # 1. Get the full user profile to check the role
-    # We use 'models.Profile' here, which required the import we just added
-    current_user = db.query(models.Profile).filter(models.Profile.id == user_id).first()
+    current_user = await crud.get_profile_record_async(db, user_id)
     
     if not current_user:
         raise HTTPException(status_code=404, detail="User profile not found")
 
     # 2. TRD [31]: Super Admin has "Full" access -> See ALL strategies
     if current_user.role == 'super_admin':
-        return db.query(models.Strategy).all()
+        return None
     
     # 3. Everyone else (Analyst/Admin) sees ONLY their own strategies
-    return crud.get_user_strategies(db, user_id)
\ No newline at end of file
+    return user_id
+
+@router.get("/", response_model=list[schemas.StrategyResponse])
+async def read_strategies(
+    ticker: Optional[str] = None,
+    instrument_type: Optional[Literal['equity', 'option', 'future']] = None,
+    is_active: Optional[bool] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(default=pagination.DEFAULT_PAGE_SIZE, ge=1, le=pagination.MAX_PAGE_SIZE),
+    owner_id: Optional[UUID] = Depends(get_visible_owner),
+    db: AsyncSession = Depends(get_read_db)
+):
+    """
+    Newest first, one page at a time. The body stays a plain list; the cursor
+    for the next page is in the 'X-Next-Cursor' header (absent on the last page).
+    Served by the ORM-bypass read path (app/readpath.py), same bytes as the response_model.
+    """
+    try:
+        body, next_cursor = await readpath.strategy_page(
+            db, user_id=owner_id, ticker=ticker, instrument_type=instrument_type,
+            is_active=is_active, cursor=cursor, limit=limit
+        )
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+    headers = {"X-Next-Cursor": next_cursor} if next_cursor else None
+    return readpath.JSONBytesResponse(body, headers=headers)
+
+@router.get("/export")
+async def export_strategies(
+    ticker: Optional[str] = None,
+    instrument_type: Optional[Literal['equity', 'option', 'future']] = None,
+    is_active: Optional[bool] = None,
+    owner_id: Optional[UUID] = Depends(get_visible_owner)
+):
+    """
+    Stream every visible strategy as NDJSON (one StrategyResponse per line)
+    for large exports, straight from a server-side cursor.
+    """
+    async def rows():
+        # Own session: the request-scoped one may be closed before streaming ends
+        async with database.AsyncSessionLocal() as db:
+            async for strategy in crud.stream_strategies_async(
+                db, user_id=owner_id, ticker=ticker,
+                instrument_type=instrument_type, is_active=is_active
+            ):
+                yield schemas.StrategyResponse.model_validate(strategy, from_attributes=True).model_dump_json() + "\n"
+
+    return StreamingResponse(rows(), media_type="application/x-ndjson")
+
+
+@router.post("/{strategy_id}/clone", response_model=list[schemas.StrategyResponse])
+async def clone_strategy(
+    strategy_id: UUID,
+    clone: schemas.StrategyClone = Body(default_factory=schemas.StrategyClone),
+    user_id: UUID = Depends(get_current_user_id),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    TRD [87-91]: Clone a strategy for the caller, or (admins) for many users
+    at once. Clones share the source's leg-set template, so each one is a
+    single small row however many legs the strategy has.
+    """
+    current_user = await crud.get_profile_record_async(db, user_id)
+    if not current_user:
+        raise HTTPException(status_code=404, detail="User profile not found")
+
+    strategy = await crud.get_strategy_async(db, strategy_id)
+    if not strategy or (current_user.role != 'super_admin' and strategy.user_id != user_id):
+        raise HTTPException(status_code=404, detail="Strategy not found")
+
+    targets = list(dict.fromkeys(clone.user_ids or [user_id]))
+    if targets != [user_id]:
+        if current_user.role not in ['super_admin', 'admin']:
+            raise HTTPException(status_code=403, detail="Not authorized to clone strategies for other users")
+        unknown = set(targets) - await crud.existing_profile_ids_async(db, targets)
+        if unknown:
+            raise HTTPException(status_code=422, detail=f"Unknown user ids: {', '.join(sorted(map(str, unknown)))}")
+
+    return await crud.clone_strategy_async(db, strategy, targets, clone.name, actor_id=user_id)
+
+@router.get("/{strategy_id}/equivalents", response_model=list[schemas.StrategyResponse])
+async def read_equivalent_strategies(
+    strategy_id: UUID,
+    cursor: Optional[str] = None,
+    limit: int = Query(default=pagination.DEFAULT_PAGE_SIZE, ge=1, le=pagination.MAX_PAGE_SIZE),
+    owner_id: Optional[UUID] = Depends(get_visible_owner),
+    db: AsyncSession = Depends(get_read_db)
+):
+    """
+    Visible strategies with exactly the same ticker, instrument type and legs
+    (including this one), newest first: an index lookup on the shared template.
+    Paged like GET /strategies/.
+    """
+    strategy = await crud.get_strategy_async(db, strategy_id)
+    if not strategy or (owner_id is not None and strategy.user_id != owner_id):
+        raise HTTPException(status_code=404, detail="Strategy not found")
+
+    try:
+        body, next_cursor = await readpath.strategy_page(
+            db, user_id=owner_id, template_id=strategy.template_id, cursor=cursor, limit=limit
+        )
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+    headers = {"X-Next-Cursor": next_cursor} if next_cursor else None
+    return readpath.JSONBytesResponse(body, headers=headers)
+
+@router.post("/{strategy_id}/fanout", response_model=schemas.FanOutResponse)
+async def fan_out_strategy(
+    strategy_id: UUID,
+    idempotency_key: Optional[str] = Header(default=None, alias="Idempotency-Key", min_length=1, max_length=200),
+    user_id: UUID = Depends(get_current_user_id),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Fire a strategy signal: one child order per (active account, leg), sized
+    by the account multiplier and sent concurrently to each account's broker.
+    Send an Idempotency-Key to make retries safe: the same key on the same
+    strategy reuses the signal id, so no order is placed twice; a retry only
+    (re-)sends the orders still 'pending' and reports just those.
+    """
+    current_user = await crud.get_profile_record_async(db, user_id)
+    if not current_user or current_user.role not in ['super_admin', 'admin']:
+        raise HTTPException(status_code=403, detail="Not authorized to trigger strategies")
+
+    strategy = await crud.get_strategy_async(db, strategy_id)
+    if not strategy:
+        raise HTTPException(status_code=404, detail="Strategy not found")
+    if not strategy.is_active:
+        raise HTTPException(status_code=400, detail="Strategy is disabled")
+
+    accounts = await crud.get_trading_accounts_async(db)
+    signal_id = fanout.signal_id_for(strategy.id, idempotency_key) if idempotency_key else uuid4().hex
+    orders = fanout.build_child_orders(strategy, accounts, signal_id)
+
+    # 1. Child orders are stored as 'pending' and committed before anything is
+    #    sent, so an order a broker has is never missing from broker_orders
+    #    (a crash mid-dispatch leaves rows for app/reconcile.py to resolve)
+    known = await crud.get_signal_order_statuses_async(db, signal_id)
+    await crud.create_broker_orders_async(db, orders)
+    await db.commit()
+
+    # 2. Send the new orders and any a previous attempt left pending (brokers
+    #    dedupe by client order id); orders already acked are not sent again
+    orders = [order for order in orders if known.get(order.client_order_id, "pending") == "pending"]
+    start = time.perf_counter()
+    acks = await fanout.engine.dispatch(orders)
+    result = fanout.FanOutResult(signal_id, acks, orders, time.perf_counter() - start)
+
+    # 3. The acks; Telegram alerts go through the outbox in the same
+    #    transaction, delivered in the background
+    await crud.record_order_acks_async(db, result.acks, datetime.now(timezone.utc))
+    if alerts.dispatcher.enabled:
+        await alerts.dispatcher.enqueue(db, alerts.fanout_alerts(strategy, accounts, result))
+    await db.commit()
+    if alerts.dispatcher.enabled:
+        alerts.dispatcher.wake()
+
+    # Audit trail: the signal, then every child order and its outcome (buffered, written in the background)
+    summary = result.summary()
+    auditlog.writer.record("fanout", "strategy", strategy.id, user_id, summary)
+    for order, ack in zip(result.orders, result.acks):
+        auditlog.writer.record("order", "strategy", strategy.id, user_id, {
+            "signal_id": order.signal_id, "client_order_id": order.client_order_id, "account_id": order.account_id,
+            "broker": ack.broker, "leg_index": order.leg_index, "action": order.action, "quantity": order.quantity,
+            "status": ack.status, "broker_order_id": ack.broker_order_id, "error": ack.error,
+        })
+    return summary
+
+def _market_snapshot(ticker: str, spot: Optional[float], vol: Optional[float], rate: Optional[float]):
+    """
+    Latest market inputs for a ticker: the newest cached option chain if any
+    (spot, per-contract IV, rate), else the live last price. Query parameters
+    override individual inputs (what-if analysis).
+    """
+    chain = strikes.resolver.latest_chain(ticker)
+    if chain is not None:
+        as_of, base_spot, base_rate = chain.snapshot_time, chain.spot, chain.rate
+    else:
+        book = marketdata.hub.books.get(ticker)
+        as_of = book.last_ts if book else None
+        base_spot, base_rate = (book.last_price if book else None), 0.0
+
+    if spot is None and base_spot is None:
+        raise HTTPException(status_code=409, detail=f"No market data for {ticker}; pass 'spot' explicitly")
+    return payoff.MarketSnapshot(
+        ticker=ticker,
+        spot=float(spot if spot is not None else base_spot),
+        as_of=as_of,
+        vol=payoff.DEFAULT_VOL if vol is None else vol,
+        rate=base_rate if rate is None else rate,
+        chain=chain,
+    )
+
+@router.get("/{strategy_id}/payoff", response_model=schemas.PayoffResponse)
+async def read_strategy_payoff(
+    strategy_id: UUID,
+    spot: Optional[float] = Query(default=None, gt=0),
+    vol: Optional[float] = Query(default=None, gt=0, le=5, description="Flat vol for legs without chain IV"),
+    rate: Optional[float] = Query(default=None, ge=-0.1, le=1),
+    points: int = Query(default=payoff.DEFAULT_POINTS, ge=3, le=1001),
+    price_range: float = Query(default=payoff.DEFAULT_RANGE, gt=0, lt=1),
+    slices: list[float] = Query(default=[0.0, 0.5], description="Fractions of the time to first expiry"),
+    owner_id: Optional[UUID] = Depends(get_visible_owner),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    P&L curves (today, intermediate slices, first expiry) over a price grid
+    around spot, plus aggregate Greeks at spot. Cached per market snapshot.
+    """
+    strategy = await crud.get_strategy_async(db, strategy_id)
+    if not strategy or (owner_id is not None and strategy.user_id != owner_id):
+        raise HTTPException(status_code=404, detail="Strategy not found")
+    if any(not 0.0 <= s < 1.0 for s in slices) or len(slices) > 10:
+        raise HTTPException(status_code=422, detail="slices must be up to 10 fractions in [0, 1)")
+
+    snapshot = _market_snapshot(strategy.ticker, spot, vol, rate)
+    try:
+        result = payoff.engine.evaluate_strategy(strategy, snapshot, points, price_range, tuple(sorted(slices)))
+    except payoff.PayoffError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+    at_expiry = result.pnl[-1]
+    return {
+        "strategy_id": strategy.id,
+        "ticker": strategy.ticker,
+        "spot": snapshot.spot,
+        "as_of": None if snapshot.as_of is None else str(snapshot.as_of),
+        "premium": float(result.premium),
+        "prices": result.prices.tolist(),
+        "slices": [{"days": float(d), "pnl": curve.tolist()} for d, curve in zip(result.days, result.pnl)],
+        "greeks": {"delta": float(result.delta), "gamma": float(result.gamma),
+                   "theta": float(result.theta), "vega": float(result.vega)},
+        "max_profit": float(at_expiry.max()),
+        "max_loss": float(at_expiry.min()),
+        "breakevens": payoff.breakevens(result.prices, at_expiry),
+    }
+
+def _job_response(job: backtest.BacktestJob):
+    return {
+        "job_id": job.id,
+        "strategy_id": job.strategy_id,
+        "status": job.status,
+        "progress": job.progress,
+        "error": job.error,
+        "result": job.results[0] if job.results else None,
+    }
+
+@router.post("/{strategy_id}/backtest", response_model=schemas.BacktestJobResponse, status_code=202)
+async def start_strategy_backtest(
+    strategy_id: UUID,
+    request: schemas.BacktestRequest = Body(default_factory=schemas.BacktestRequest),
+    owner_id: Optional[UUID] = Depends(get_visible_owner),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Queue a historical backtest on the worker pool; poll
+    GET /strategies/{id}/backtest/{job_id} for progress and the result.
+    """
+    strategy = await crud.get_strategy_async(db, strategy_id)
+    if not strategy or (owner_id is not None and strategy.user_id != owner_id):
+        raise HTTPException(status_code=404, detail="Strategy not found")
+    if request.start and request.end and request.start >= request.end:
+        raise HTTPException(status_code=422, detail="start must be before end")
+
+    params = backtest.BacktestParams(
+        start=int(request.start.timestamp()) if request.start else None,
+        end=int(request.end.timestamp()) if request.end else None,
+        vol=request.vol, rate=request.rate, strike_step=request.strike_step,
+        contract_multiplier=request.contract_multiplier,
+        fill=backtest.FillModel(request.half_spread, request.slippage_bps, request.commission),
+        include_equity=request.include_equity,
+    )
+    job = backtest.runner.submit(strategy.id, [backtest.strategy_spec(strategy)], params)
+    return _job_response(job)
+
+@router.get("/{strategy_id}/backtest/{job_id}", response_model=schemas.BacktestJobResponse)
+async def read_strategy_backtest(
+    strategy_id: UUID,
+    job_id: str,
+    owner_id: Optional[UUID] = Depends(get_visible_owner),
+    db: AsyncSession = Depends(get_async_db)
+):
+    job = backtest.runner.get(job_id)
+    if not job or job.strategy_id != str(strategy_id):
+        raise HTTPException(status_code=404, detail="Backtest job not found")
+    if owner_id is not None:
+        strategy = await crud.get_strategy_async(db, strategy_id)
+        if not strategy or strategy.user_id != owner_id:
+            raise HTTPException(status_code=404, detail="Backtest job not found")
+    return _job_response(job)
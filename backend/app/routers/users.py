@@ -1,63 +1,84 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+import csv
+import io
+import json
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from pydantic import ValidationError
 from sqlalchemy.orm import Session
-from app import schemas, crud, models
-from app.database import get_db
-from app.routers.auth import oauth2_scheme
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncSession
+from app import schemas, crud, models, pagination, profilecache, readpath
+from app.database import get_db, get_async_db
+from app.replica import get_read_db
 from app.routers.strategies import get_current_user_id
-import httpx
-from app import config
+from typing import Literal, Optional
 from uuid import UUID
 
+# Upper bound on rows per POST /users/bulk request
+MAX_BULK_USERS = 1000
+
 router = APIRouter(
     prefix="/users",
     tags=["users"]
 )
 
-# Helper to get full current user object (to check roles)
-def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
-    user_id = crud.get_user_by_email # Logic needs ID not email, let's simpler fetch
-    # Quick fetch from Supabase to get ID then DB
-    user_url = f"{config.settings.SUPABASE_URL}/auth/v1/user"
-    headers = {
-        "apikey": config.settings.SUPABASE_KEY,
-        "Authorization": f"Bearer {token}"
-    }
-    response = httpx.get(user_url, headers=headers)
-    if response.status_code != 200:
-        raise HTTPException(status_code=401, detail="Invalid token")
-    
-    user_id = response.json().get("id")
-    user = db.query(models.Profile).filter(models.Profile.id == user_id).first()
+# Helper to get the current user's profile (to check roles)
+# Returns a cached ProfileRecord, not the ORM object: most requests hit no DB at all.
+async def get_current_user(user_id: UUID = Depends(get_current_user_id), db: AsyncSession = Depends(get_async_db)):
+    # Token is verified locally by the shared verifier, then we load the profile
+    user = await crud.get_profile_record_async(db, user_id)
     return user
 
 # 1. LIST ALL USERS (Super Admin & Admin)
 @router.get("/", response_model=list[schemas.UserResponse])
-def read_users(
-    skip: int = 0, 
-    limit: int = 100, 
-    current_user: models.Profile = Depends(get_current_user),
-    db: Session = Depends(get_db)
+async def read_users(
+    role: Optional[Literal['super_admin', 'admin', 'analyst', 'account_manager']] = None,
+    is_active: Optional[bool] = None,
+    search: Optional[str] = Query(default=None, min_length=1, max_length=100),
+    cursor: Optional[str] = None,
+    limit: int = Query(default=pagination.DEFAULT_PAGE_SIZE, ge=1, le=pagination.MAX_PAGE_SIZE),
+    current_user: profilecache.ProfileRecord = Depends(get_current_user),
+    db: AsyncSession = Depends(get_read_db)
 ):
+    """
+    Newest first, one page at a time; 'search' matches anywhere in the email or
+    names. Like /strategies/, the body is a plain list: the next page's cursor
+    is in 'X-Next-Cursor' and an approximate total in 'X-Total-Estimate'
+    (only computed for the first page). Encoded by app/readpath.py.
+    """
     if current_user.role not in ['super_admin', 'admin']:
         raise HTTPException(status_code=403, detail="Not authorized to view users")
-    return crud.get_all_users(db, skip=skip, limit=limit)
+
+    try:
+        body, next_cursor, total = await readpath.user_page(
+            db, role=role, is_active=is_active, search=search,
+            cursor=cursor, limit=limit, with_total=cursor is None
+        )
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+    headers = {}
+    if next_cursor:
+        headers["X-Next-Cursor"] = next_cursor
+    if total is not None:
+        headers["X-Total-Estimate"] = str(total)
+    return readpath.JSONBytesResponse(body, headers=headers)
 
 # 2. CREATE USER (Existing - Secured)
 @router.post("/", response_model=schemas.UserResponse)
-def create_user(
+async def create_user(
     user: schemas.UserCreate, 
-    current_user: models.Profile = Depends(get_current_user), # Added security
-    db: Session = Depends(get_db)
+    current_user: profilecache.ProfileRecord = Depends(get_current_user), # Added security
+    db: AsyncSession = Depends(get_async_db)
 ):
     if current_user.role != 'super_admin':
         raise HTTPException(status_code=403, detail="Only Super Admin can create users")
         
-    db_user = crud.get_user_by_email(db, email=user.email)
+    db_user = await crud.get_user_by_email_async(db, email=user.email)
     if db_user:
         raise HTTPException(status_code=400, detail="Email already registered")
     
     try:
-        new_user = crud.create_user_profile(db=db, user=user)
+        new_user = await crud.create_user_profile(db=db, user=user, actor_id=current_user.id)
         return new_user
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -66,13 +87,13 @@ def create_user(
 @router.delete("/{user_id}")
 def delete_user(
     user_id: UUID, 
-    current_user: models.Profile = Depends(get_current_user),
+    current_user: profilecache.ProfileRecord = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     if current_user.role != 'super_admin':
         raise HTTPException(status_code=403, detail="Only Super Admin can delete users")
         
-    success = crud.delete_user(db, user_id)
+    success = crud.delete_user(db, user_id, actor_id=current_user.id)
     if not success:
         raise HTTPException(status_code=404, detail="User not found")
     return {"status": "success", "message": "User deleted"}
@@ -82,7 +103,7 @@ def delete_user(
 def update_user(
     user_id: UUID, 
     user_update: schemas.UserCreate, 
-    current_user: models.Profile = Depends(get_current_user),
+    current_user: profilecache.ProfileRecord = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     # 1. Basic Auth: Only Admins/Super Admins allowed
@@ -107,5 +128,118 @@ def update_user(
             raise HTTPException(status_code=403, detail="Admins cannot change user roles")
 
     # Perform Update
-    updated_user = crud.update_user(db, user_id, incoming_data)
-    return updated_user
\ No newline at end of file
+    updated_user = crud.update_user(db, user_id, incoming_data, actor_id=current_user.id)
+    return updated_user
+# 5. BULK ONBOARDING (Super Admin Only)
+def _parse_bulk_payload(body: bytes, content_type: str) -> list:
+    """Rows of a CSV upload (header line = field names) or a JSON array."""
+    if content_type.startswith(("text/csv", "application/csv")):
+        try:
+            reader = csv.DictReader(io.StringIO(body.decode("utf-8-sig")))
+            # Empty cells mean "not given", so the schema defaults apply
+            return [{key.strip(): value.strip() for key, value in row.items() if key and value and value.strip()}
+                    for row in reader]
+        except (UnicodeDecodeError, csv.Error) as e:
+            raise HTTPException(status_code=400, detail=f"Invalid CSV: {e}")
+    try:
+        payload = json.loads(body)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Body must be a JSON array or CSV (Content-Type: text/csv)")
+    if not isinstance(payload, list):
+        raise HTTPException(status_code=400, detail="Body must be a JSON array of users")
+    return payload
+
+@router.post("/bulk", response_model=schemas.BulkUserResponse, openapi_extra={"requestBody": {"required": True, "content": {
+    "application/json": {"schema": {"type": "array", "items": {"$ref": "#/components/schemas/UserCreate"}}},
+    "text/csv": {"schema": {"type": "string"},
+                 "example": "email,password,first_name,last_name,role,multiplier,telegram_id"},
+}}})
+async def create_users_bulk(
+    request: Request,
+    current_user: profilecache.ProfileRecord = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Onboard many users at once (e.g. a new firm's accounts) from a JSON array
+    of UserCreate or a CSV with the same columns. Every row is validated and
+    checked against existing emails up front and reported by index; auth users
+    are created concurrently, then all profiles are inserted in one batch.
+    """
+    if current_user.role != 'super_admin':
+        raise HTTPException(status_code=403, detail="Only Super Admin can create users")
+
+    payload = _parse_bulk_payload(await request.body(), request.headers.get("content-type", ""))
+    if len(payload) > MAX_BULK_USERS:
+        raise HTTPException(status_code=422, detail=f"At most {MAX_BULK_USERS} users per request")
+
+    # 1. Validate every row on its own, and catch emails repeated within the upload
+    results = []
+    valid = []
+    seen = set()
+    for index, item in enumerate(payload):
+        email = item.get("email") if isinstance(item, dict) else None
+        try:
+            user = schemas.UserCreate.model_validate(item)
+        except ValidationError as e:
+            errors = [f"{'.'.join(str(part) for part in err['loc']) or 'row'}: {err['msg']}" for err in e.errors()]
+            results.append({"index": index, "email": email, "status": "error", "errors": errors})
+            continue
+        if user.email in seen:
+            results.append({"index": index, "email": user.email, "status": "error",
+                            "errors": ["email: duplicated in this upload"]})
+            continue
+        seen.add(user.email)
+        valid.append((index, user))
+
+    # 2. One query for emails that already have a profile
+    existing = await crud.existing_emails_async(db, [user.email for _, user in valid]) if valid else set()
+    for index, user in valid:
+        if user.email in existing:
+            results.append({"index": index, "email": user.email, "status": "error",
+                            "errors": ["email: already registered"]})
+    valid = [(index, user) for index, user in valid if user.email not in existing]
+
+    # 3. Auth users concurrently, profiles in one INSERT (undone together on failure)
+    try:
+        outcomes = await crud.bulk_create_user_profiles_async(
+            db, [user for _, user in valid], actor_id=current_user.id
+        )
+    except SQLAlchemyError as e:
+        raise HTTPException(status_code=500, detail=f"Bulk insert failed, nothing was created: {e.__class__.__name__}")
+
+    for (index, user), outcome in zip(valid, outcomes):
+        if isinstance(outcome, dict):
+            results.append({"index": index, "email": user.email, "status": "created", "user": outcome})
+        else:
+            results.append({"index": index, "email": user.email, "status": "error", "errors": [outcome]})
+
+    results.sort(key=lambda result: result["index"])
+    created = sum(result["status"] == "created" for result in results)
+    return {"created": created, "failed": len(results) - created, "results": results}
+
+# 6. BROKER ACCOUNT (Super Admin & Admin): only linked profiles are traded by fan-out
+@router.put("/{user_id}/broker-account", response_model=schemas.BrokerAccountResponse)
+async def set_broker_account(
+    user_id: UUID,
+    account: schemas.BrokerAccountUpdate,
+    current_user: profilecache.ProfileRecord = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    if current_user.role not in ['super_admin', 'admin']:
+        raise HTTPException(status_code=403, detail="Not authorized to edit broker accounts")
+    if not await crud.get_user_async(db, user_id):
+        raise HTTPException(status_code=404, detail="User not found")
+    return await crud.set_broker_account_async(db, user_id, account.broker, account.account_ref,
+                                               actor_id=current_user.id)
+
+@router.delete("/{user_id}/broker-account")
+async def delete_broker_account(
+    user_id: UUID,
+    current_user: profilecache.ProfileRecord = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    if current_user.role not in ['super_admin', 'admin']:
+        raise HTTPException(status_code=403, detail="Not authorized to edit broker accounts")
+    if not await crud.delete_broker_account_async(db, user_id, actor_id=current_user.id):
+        raise HTTPException(status_code=404, detail="No broker account for this user")
+    return {"status": "success", "message": "Broker account removed"}
@@ -32,6 +32,30 @@ class UserResponse(UserBase):
     class Config:
         from_attributes = True
 
+# Bulk onboarding (POST /users/bulk), reported per submitted row
+class BulkUserItemResult(BaseModel):
+    index: int # Position in the submitted list / CSV data row (0-based)
+    email: Optional[str] = None
+    status: Literal['created', 'error']
+    user: Optional[UserResponse] = None
+    errors: Optional[list[str]] = None
+
+class BulkUserResponse(BaseModel):
+    created: int
+    failed: int
+    results: list[BulkUserItemResult]
+
+# Broker account of a profile (PUT /users/{id}/broker-account); only linked profiles are traded
+class BrokerAccountUpdate(BaseModel):
+    broker: Optional[str] = None # Adapter name; None = settings.DEFAULT_BROKER
+    account_ref: Optional[str] = None # The account id at the broker
+
+class BrokerAccountResponse(BrokerAccountUpdate):
+    profile_id: UUID
+
+    class Config:
+        from_attributes = True
+
 # Login Request
 class UserLogin(BaseModel):
     email: EmailStr
@@ -71,6 +95,252 @@ class StrategyResponse(StrategyCreate):
     user_id: UUID
     is_active: bool
     created_at: datetime
+    template_id: Optional[UUID] = None # Shared leg set; equal for equivalent strategies
     
     class Config:
-        from_attributes = True
\ No newline at end of file
+        from_attributes = True
+
+class StrategyClone(BaseModel):
+    name: Optional[str] = None # Default: the source strategy's name
+    # Admins can clone to other users; default is the caller
+    user_ids: Optional[list[UUID]] = Field(default=None, min_length=1, max_length=1000)
+
+# --- BULK STRATEGY SCHEMAS ---
+
+class BulkStrategyItemResult(BaseModel):
+    index: int # Position in the submitted list
+    status: Literal['created', 'error']
+    strategy: Optional[StrategyResponse] = None
+    errors: Optional[list[str]] = None
+
+class BulkStrategyResponse(BaseModel):
+    created: int
+    failed: int
+    results: list[BulkStrategyItemResult]
+
+# --- ORDER FAN-OUT SCHEMAS ---
+
+class FanOutResponse(BaseModel):
+    signal_id: str
+    orders: int
+    accepted: int
+    rejected: int
+    timeout: int
+    error: int
+    elapsed_ms: float
+
+# Broker order reconciliation (app/reconcile.py), one sweep
+class ReconcileReport(BaseModel):
+    skipped: bool = False # Another API process sweeps (or owns the position book); nothing checked
+    orders: int # Open orders checked
+    requests: int # Status requests sent to the brokers
+    failed_requests: int # Their orders are asked again by the next sweep
+    missing: int # Accepted / partial orders a broker didn't return
+    changed: int # Orders whose status / fills changed (rows updated)
+    filled: int # Orders with new fills (booked into /positions)
+    load_ms: float
+    poll_ms: float
+    apply_ms: float
+    elapsed_ms: float
+    finished_at: Optional[datetime] = None
+
+# --- MARKET DATA SCHEMAS ---
+
+class TickCreate(BaseModel):
+    ticker: str = Field(min_length=1, max_length=32)
+    price: float = Field(gt=0)
+    size: float = Field(default=0.0, ge=0)
+    ts: Optional[float] = None # Epoch seconds; default: now
+
+class TicksResult(BaseModel):
+    published: int
+
+# --- OPTION CHAIN SCHEMAS ---
+
+class OptionContract(BaseModel):
+    expiration_days: float = Field(ge=0)
+    strike: float = Field(gt=0)
+    option_type: Literal['call', 'put']
+    iv: float = Field(gt=0, le=10) # Annualized implied vol
+
+class OptionChainUpload(BaseModel):
+    snapshot_time: Optional[datetime] = None # Default: now; naive times are UTC
+    spot: float = Field(gt=0)
+    rate: float = Field(default=0.0, ge=-0.1, le=1)
+    dividend: float = Field(default=0.0, ge=0, le=1)
+    contracts: list[OptionContract] = Field(min_length=1, max_length=100000)
+
+class OptionChainSummary(BaseModel):
+    ticker: str
+    snapshot_time: datetime
+    spot: float
+    expiries: int
+    strikes: int
+    contracts: int
+
+# --- PAYOFF / GREEKS SCHEMAS ---
+
+class PayoffSlice(BaseModel):
+    days: float # Days from the snapshot; the last slice is the first expiry
+    pnl: list[float] # One value per price in PayoffResponse.prices
+
+class StrategyGreeks(BaseModel):
+    delta: float
+    gamma: float
+    theta: float # Per calendar day
+    vega: float # Per 1 vol point
+
+class PayoffResponse(BaseModel):
+    strategy_id: UUID
+    ticker: str
+    spot: float
+    as_of: Optional[str] = None # Market snapshot the curves were computed from
+    premium: float # Net cost today: > 0 debit, < 0 credit
+    prices: list[float]
+    slices: list[PayoffSlice]
+    greeks: StrategyGreeks
+    max_profit: float # Over the grid, at the first expiry
+    max_loss: float
+    breakevens: list[float]
+
+# --- BACKTEST SCHEMAS ---
+
+class BacktestRequest(BaseModel):
+    start: Optional[datetime] = None # Inclusive; default: first bar
+    end: Optional[datetime] = None # Exclusive; default: after the last bar
+    vol: float = Field(default=0.20, gt=0, le=5) # When the bar data has no 'iv' column
+    rate: float = Field(default=0.0, ge=-0.1, le=1)
+    strike_step: float = Field(default=1.0, gt=0) # Grid for delta-targeted strikes
+    contract_multiplier: float = Field(default=100.0, gt=0) # Shares per option contract
+    half_spread: float = Field(default=0.02, ge=0, lt=1) # Fraction of the option price, per fill
+    slippage_bps: float = Field(default=2.0, ge=0) # Underlying legs
+    commission: float = Field(default=0.65, ge=0) # Per option contract / underlying share, per fill
+    include_equity: bool = False # Return the per-bar P&L curve
+
+class BacktestEquity(BaseModel):
+    ts: list[int] # Epoch seconds
+    pnl: list[float]
+
+# P&L values are in currency: option leg quantities are contracts of
+# contract_multiplier shares, underlying leg quantities are shares
+class BacktestResult(BaseModel):
+    strategy_id: UUID
+    ticker: str
+    error: Optional[str] = None # Set instead of the stats (e.g. no bar data)
+    start: Optional[int] = None
+    end: Optional[int] = None
+    bars: int = 0
+    years: float = 0.0
+    total_pnl: float = 0.0
+    max_drawdown: float = 0.0
+    trades: int = 0
+    win_rate: float = 0.0
+    avg_win: float = 0.0
+    avg_loss: float = 0.0
+    best_trade: float = 0.0
+    worst_trade: float = 0.0
+    profit_factor: Optional[float] = None # None when there was no losing trade
+    contract_multiplier: Optional[float] = None # Shares per option contract the P&L assumes
+    equity: Optional[BacktestEquity] = None
+
+class BacktestJobResponse(BaseModel):
+    job_id: str
+    strategy_id: UUID
+    status: Literal['queued', 'running', 'done', 'failed']
+    progress: float # 0..1
+    error: Optional[str] = None
+    result: Optional[BacktestResult] = None
+
+# --- AUDIT LOG SCHEMAS ---
+
+class AuditEventResponse(BaseModel):
+    id: UUID
+    created_at: datetime
+    actor_id: Optional[UUID] = None # Who did it; null = the system
+    entity_type: Literal['profile', 'strategy']
+    entity_id: UUID
+    action: str # create, update, delete, clone, fanout, order
+    changes: Optional[dict] = None # {field: [old, new]} for updates, else a snapshot / details
+
+    class Config:
+        from_attributes = True
+
+# --- POSITION / P&L SCHEMAS ---
+
+class FillCreate(BaseModel):
+    fill_id: Optional[str] = None # Broker execution id; a re-sent fill with the same id is ignored
+    account_id: UUID
+    strategy_id: UUID
+    leg_index: int = Field(ge=1, le=4)
+    action: Literal['buy', 'sell']
+    quantity: float = Field(gt=0)
+    price: float = Field(ge=0)
+    broker: str
+    ticker: Optional[str] = None # With an equity/future instrument_type, marked from market data
+    instrument_type: Optional[Literal['equity', 'option', 'future']] = None
+
+class FillsResult(BaseModel):
+    applied: int
+    duplicates: int
+
+class MarkUpdate(BaseModel):
+    # Either one leg (strategy_id + leg_index) or every equity/future leg on 'ticker'
+    strategy_id: Optional[UUID] = None
+    leg_index: Optional[int] = Field(default=None, ge=1, le=4)
+    ticker: Optional[str] = None
+    price: float = Field(ge=0)
+
+class MarksResult(BaseModel):
+    marked: int # Legs whose mark was set
+    unknown: int # Updates naming a leg / ticker nobody holds
+
+class PnL(BaseModel):
+    realized: float
+    unrealized: float
+    total: float
+    market_value: float # Sum of quantity x mark (signed)
+
+class StrategyPnL(PnL):
+    strategy_id: UUID
+    accounts: int # Accounts with a position on it
+
+class BrokerPnL(PnL):
+    broker: str
+
+class PositionsSummary(BaseModel):
+    version: int # Changes whenever any position or mark does (also the ETag)
+    totals: PnL
+    strategies: list[StrategyPnL]
+    brokers: list[BrokerPnL]
+
+class LegPnL(PnL):
+    leg_index: int
+    ticker: Optional[str] = None
+    instrument_type: Optional[str] = None
+    quantity: float # Net over all accounts
+    mark: float
+    accounts: int
+
+class StrategyPositions(StrategyPnL):
+    version: int
+    legs: list[LegPnL]
+
+class AccountPnL(PnL):
+    account_id: UUID
+
+class PositionResponse(BaseModel):
+    strategy_id: UUID
+    leg_index: int
+    ticker: Optional[str] = None
+    instrument_type: Optional[str] = None
+    broker: str
+    quantity: float # Signed; 0 = closed (realized P&L only)
+    average_price: Optional[float] = None
+    mark: float
+    realized: float
+    unrealized: float
+    total: float
+
+class AccountPositions(AccountPnL):
+    version: int
+    positions: list[PositionResponse]
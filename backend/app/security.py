@@ -0,0 +1,270 @@
+import asyncio
+import hashlib
+import logging
+import time
+from datetime import datetime, timedelta, timezone
+from uuid import UUID
+
+import jwt
+from fastapi import HTTPException, Request
+from sqlalchemy import text
+from sqlalchemy.exc import SQLAlchemyError
+
+from app import config, crud, database, gotrue
+
+logger = logging.getLogger(__name__)
+
+# Algorithms we accept. HS256 is only ever checked against the JWT secret and
+# the asymmetric ones only against JWKS keys, so a token cannot pick its own key.
+SYMMETRIC_ALGORITHMS = {"HS256"}
+ASYMMETRIC_ALGORITHMS = {"RS256", "ES256"}
+
+# Don't hammer the JWKS endpoint when someone sends tokens with random 'kid's
+MIN_REFRESH_INTERVAL = 30
+
+# Revocations must hold in every API process, not just the one that served the
+# logout. They are stored in revoked_tokens and, on Postgres, NOTIFYed on this
+# channel (delivered by profilecache.listener). Every worker loads the unexpired
+# rows at start and polls for newer ones (missed notifications, no LISTEN behind
+# PgBouncer), so a revoked token is refused everywhere within the poll period.
+REVOCATION_CHANNEL = "token_revoked"
+# Re-read this far behind the newest revocation seen: a row stamped earlier
+# may commit after a poll
+REVOCATION_POLL_OVERLAP = timedelta(seconds=60)
+
+
+class UnknownSigningKey(jwt.InvalidTokenError):
+    """The token's 'kid' isn't in our cached JWKS (yet)."""
+
+
+class TokenVerifier:
+    """
+    Verifies Supabase access tokens locally (signature, expiry, audience)
+    instead of asking GoTrue '/auth/v1/user' on every request.
+    """
+
+    def __init__(self, jwt_secret, jwks_enabled, audience, refresh_seconds, max_age_seconds=0,
+                 revocation_poll_seconds=5.0):
+        self.jwt_secret = jwt_secret
+        self.jwks_enabled = jwks_enabled
+        self.audience = audience
+        self.refresh_seconds = refresh_seconds
+        self.max_age_seconds = max_age_seconds
+        self.revocation_poll_seconds = revocation_poll_seconds
+
+        self._keys = {}  # kid -> public key
+        self._keys_loaded_at = 0.0
+        self._refresh_lock = asyncio.Lock()
+        self._refresher = None
+
+        # Revocation: session_id (or token hash) -> 'exp' of the revoked token.
+        # Entries are dropped once the token would have expired anyway.
+        self._denylist = {}
+        self._revocations_seen_at = None  # Newest revoked_at loaded from the table
+        self._revocation_poller = None
+
+    # --- KEY SET ---
+
+    async def refresh_keys(self):
+        """Fetch the JWKS and swap in the new key set (atomic dict replace)."""
+        if not self.jwks_enabled:
+            return
+        try:
+            response = await gotrue.client.get_jwks()
+        except gotrue.GoTrueError:
+            return  # Keep serving with the keys we already have
+        if response.status_code != 200:
+            return
+
+        keys = {}
+        for jwk in response.json().get("keys", []):
+            try:
+                keys[jwk.get("kid")] = jwt.PyJWK(jwk).key
+            except jwt.PyJWTError:
+                continue  # Unsupported key type, skip it
+        self._keys = keys
+        self._keys_loaded_at = time.monotonic()
+
+    async def _refresh_if_stale(self):
+        if time.monotonic() - self._keys_loaded_at < MIN_REFRESH_INTERVAL:
+            return
+        async with self._refresh_lock:
+            if time.monotonic() - self._keys_loaded_at >= MIN_REFRESH_INTERVAL:
+                await self.refresh_keys()
+
+    async def _refresh_loop(self):
+        while True:
+            await self.refresh_keys()
+            await asyncio.sleep(self.refresh_seconds)
+
+    def start(self):
+        """
+        Start the background JWKS refresher and the revocation poller (call
+        from the app lifespan).
+        """
+        if self._refresher is None and self.jwks_enabled:
+            self._refresher = asyncio.create_task(self._refresh_loop(), name="jwks-refresh")
+        if self._revocation_poller is None and config.settings.DATABASE_URL:
+            self._revocation_poller = asyncio.create_task(self._revocation_loop(), name="revocation-poll")
+
+    async def stop(self):
+        for task in (self._refresher, self._revocation_poller):
+            if task is None:
+                continue
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        self._refresher = self._revocation_poller = None
+
+    def _key_for(self, token):
+        header = jwt.get_unverified_header(token)
+        alg = header.get("alg")
+
+        if alg in SYMMETRIC_ALGORITHMS:
+            if not self.jwt_secret:
+                raise jwt.InvalidTokenError("No JWT secret configured")
+            return self.jwt_secret, alg
+
+        if alg in ASYMMETRIC_ALGORITHMS:
+            key = self._keys.get(header.get("kid"))
+            if key is None:
+                raise UnknownSigningKey("Unknown signing key")
+            return key, alg
+
+        raise jwt.InvalidTokenError(f"Unsupported algorithm: {alg}")
+
+    # --- VERIFICATION ---
+
+    async def verify(self, token: str) -> dict:
+        """Like decode(), but picks up rotated JWKS keys on an unknown 'kid'."""
+        try:
+            return self.decode(token)
+        except UnknownSigningKey:
+            await self._refresh_if_stale()
+            return self.decode(token)
+
+    def decode(self, token: str) -> dict:
+        """Return the verified claims or raise jwt.InvalidTokenError."""
+        key, alg = self._key_for(token)
+        claims = jwt.decode(
+            token,
+            key,
+            algorithms=[alg],
+            audience=self.audience,
+            options={"require": ["exp", "sub"]},
+        )
+
+        if self.max_age_seconds and time.time() - claims.get("iat", 0) > self.max_age_seconds:
+            raise jwt.ExpiredSignatureError("Token is older than the allowed max age")
+
+        if self.is_revoked(token, claims):
+            raise jwt.InvalidTokenError("Token has been revoked")
+
+        return claims
+
+    # --- REVOCATION ---
+
+    @staticmethod
+    def _revocation_key(token, claims):
+        # Supabase puts the auth session in 'session_id'; revoking it kills every
+        # access token minted for that login, not just this one.
+        session_id = claims.get("session_id")
+        if session_id:
+            return session_id
+        return hashlib.sha256(token.encode()).hexdigest()
+
+    def deny(self, key: str, exp: float):
+        """Refuse tokens with this revocation key until 'exp' (this process only)."""
+        now = time.time()
+        # Prune expired entries so the denylist stays small
+        for denied, denied_exp in list(self._denylist.items()):
+            if denied_exp < now:
+                self._denylist.pop(denied, None)
+        if exp >= now:
+            self._denylist[key] = exp
+
+    async def revoke(self, db, token: str, claims: dict):
+        """Revoke the token's auth session here, in the table and (Postgres) on the other workers."""
+        key, exp = self._revocation_key(token, claims), claims.get("exp", time.time())
+        self.deny(key, exp)
+        await crud.store_revoked_token_async(db, key, datetime.fromtimestamp(exp, timezone.utc),
+                                             datetime.now(timezone.utc))
+        if db.get_bind().dialect.name == "postgresql":
+            await db.execute(text("SELECT pg_notify(:channel, :payload)"),
+                             {"channel": REVOCATION_CHANNEL, "payload": f"{exp} {key}"})
+        await db.commit()
+
+    def on_revocation_notify(self, payload: str):
+        exp, _, key = payload.partition(" ")
+        try:
+            self.deny(key, float(exp))
+        except ValueError:
+            pass
+
+    async def load_revocations(self):
+        """Deny everything revoked since the last load (all unexpired rows the first time)."""
+        since = None if self._revocations_seen_at is None else self._revocations_seen_at - REVOCATION_POLL_OVERLAP
+        async with database.AsyncSessionLocal() as db:
+            rows = await crud.get_revoked_tokens_async(db, datetime.now(timezone.utc), since)
+        for key, expires_at, revoked_at in rows:
+            self.deny(key, expires_at.timestamp())
+            if self._revocations_seen_at is None or revoked_at > self._revocations_seen_at:
+                self._revocations_seen_at = revoked_at
+        if self._revocations_seen_at is None:
+            self._revocations_seen_at = datetime.now(timezone.utc) - REVOCATION_POLL_OVERLAP
+
+    async def _revocation_loop(self):
+        while True:
+            try:
+                await self.load_revocations()
+            except (SQLAlchemyError, OSError) as e:
+                logger.warning("Loading token revocations failed: %s", e.__class__.__name__)
+            if not self.revocation_poll_seconds:
+                return
+            await asyncio.sleep(self.revocation_poll_seconds)
+
+    def is_revoked(self, token: str, claims: dict) -> bool:
+        if not self._denylist:
+            return False
+        return self._revocation_key(token, claims) in self._denylist
+
+
+# One verifier shared by every auth dependency
+verifier = TokenVerifier(
+    jwt_secret=config.settings.SUPABASE_JWT_SECRET,
+    jwks_enabled=bool(config.settings.SUPABASE_URL),
+    audience=config.settings.JWT_AUDIENCE,
+    refresh_seconds=config.settings.JWKS_REFRESH_SECONDS,
+    max_age_seconds=config.settings.TOKEN_MAX_AGE_SECONDS,
+    revocation_poll_seconds=config.settings.TOKEN_REVOCATION_POLL_SECONDS,
+)
+
+
+# request.state key of (token, claims) the load shedder (app/overload.py)
+# already verified for its per-user rate limit
+VERIFIED_CLAIMS_STATE = "verified_token_claims"
+
+
+async def get_token_claims(token: str, request: Request = None) -> dict:
+    """
+    Verify the bearer token and return its claims, or raise a 401. Given the
+    request, claims already verified for this same token are reused.
+    """
+    if request is not None:
+        verified = getattr(request.state, VERIFIED_CLAIMS_STATE, None)
+        if verified is not None and verified[0] == token:
+            return verified[1]
+    try:
+        return await verifier.verify(token)
+    except jwt.PyJWTError:
+        raise HTTPException(status_code=401, detail="Invalid token")
+
+
+async def get_token_user_id(token: str, request: Request = None) -> UUID:
+    # Supabase stores the auth user id (== profiles.id) in 'sub'
+    try:
+        return UUID((await get_token_claims(token, request))["sub"])
+    except ValueError:
+        raise HTTPException(status_code=401, detail="Invalid token")
@@ -0,0 +1,211 @@
+import asyncio
+import logging
+import uuid
+from datetime import datetime, timezone
+
+from sqlalchemy.exc import DataError, IntegrityError
+
+from app import config, crud, database
+
+logger = logging.getLogger(__name__)
+
+# --- WRITE-BEHIND SESSION LOGGING (TRD [28]) ---
+# Login/logout no longer write user_sessions inline. They queue an event here
+# and return; a background task flushes the queue in ONE transaction
+# (multi-row INSERT for logins + batched UPDATE for logouts) whenever
+# SESSION_LOG_BATCH_SIZE events are waiting or SESSION_LOG_FLUSH_SECONDS passed.
+# The lifespan drains whatever is left on shutdown.
+#
+# A batch the database rejects as data (integrity / data error: a login for a
+# deleted profile, an oversized field) is split in halves and retried, down
+# to single rows, so one bad row can't stall every later flush. A row that is
+# rejected on its own SESSION_LOG_MAX_ATTEMPTS flushes in a row is dropped
+# and counted. Any other error (DB down) re-queues the rest as it is.
+
+# If the DB is down, stop buffering past this and drop the oldest events
+MAX_PENDING = 50000
+
+
+class SessionLogWriter:
+    def __init__(self, batch_size=200, flush_interval=1.0, max_pending=MAX_PENDING, max_attempts=3):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.max_attempts = max_attempts
+
+        self._logins = []       # user_sessions rows waiting to be inserted
+        self._logouts = {}      # session_id -> logout time
+        self._open_by_user = {} # user_id -> id of its newest not-yet-flushed session
+        self._rejections = {}   # session id -> flushes that rejected its login / logout row
+        self._wakeup = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        self._task = None
+        self._stopping = False
+
+        self.flushed_rows = 0
+        self.dropped_rows = 0
+        self.rejected_rows = 0  # Dropped after max_attempts rejections
+
+    @property
+    def pending(self) -> int:
+        return len(self._logins) + len(self._logouts)
+
+    # --- REQUEST PATH (no I/O) ---
+
+    def log_login(self, user_id, ip_address: str, user_agent: str):
+        """Queue a new session row and return its id (generated here, not by the DB)."""
+        session_id = uuid.uuid4()
+        self._logins.append({
+            "id": session_id,
+            "user_id": user_id,
+            "login_time": datetime.now(timezone.utc),
+            "ip_address": ip_address,
+            "user_agent": user_agent
+        })
+        self._open_by_user[user_id] = session_id
+        self._trim()
+        if self.pending >= self.batch_size:
+            self._wakeup.set()
+        return session_id
+
+    def log_logout(self, session_id):
+        self._logouts[session_id] = datetime.now(timezone.utc)
+        if self.pending >= self.batch_size:
+            self._wakeup.set()
+
+    def unflushed_session(self, user_id):
+        """Newest session of this user that is still only in memory, if any."""
+        session_id = self._open_by_user.get(user_id)
+        if session_id is None or session_id in self._logouts:
+            return None
+        return session_id
+
+    def _trim(self):
+        overflow = len(self._logins) - self.max_pending
+        if overflow > 0:
+            del self._logins[:overflow]
+            self.dropped_rows += overflow
+            logger.warning("Session log backlog full, dropped %d login rows", overflow)
+
+    # --- BACKGROUND FLUSH ---
+
+    @staticmethod
+    async def _write(logins: list[dict], logouts: list[dict]):
+        """One transaction. Inserts first: a login and its logout may be in the same batch."""
+        async with database.AsyncSessionLocal() as db:
+            await crud.insert_user_sessions_async(db, logins)
+            await crud.end_user_sessions_async(db, logouts)
+            await db.commit()
+
+    async def _write_isolating(self, logins: list[dict], logouts: list[dict]):
+        """
+        Write a batch, splitting parts the database rejects until the bad rows
+        are isolated. Returns (rejected, unwritten), each a (logins, logouts)
+        pair: rows refused on their own, and rows not attempted after any
+        other error. Parts are written in order, all logins before logouts.
+        """
+        parts = [(logins, logouts)]
+        rejected = ([], [])
+        while parts:
+            part_logins, part_logouts = parts.pop(0)
+            try:
+                await self._write(part_logins, part_logouts)
+            except (IntegrityError, DataError) as e:
+                if len(part_logins) + len(part_logouts) == 1:
+                    logger.warning("Session log row rejected: %s", e.orig)
+                    rejected[0].extend(part_logins)
+                    rejected[1].extend(part_logouts)
+                elif part_logins and part_logouts:
+                    parts[:0] = [(part_logins, []), ([], part_logouts)]
+                else:
+                    rows = part_logins or part_logouts
+                    half = len(rows) // 2
+                    parts[:0] = ([(rows[:half], []), (rows[half:], [])] if part_logins
+                                 else [([], rows[:half]), ([], rows[half:])])
+            except Exception:
+                unwritten = ([], [])
+                for rest_logins, rest_logouts in [(part_logins, part_logouts)] + parts:
+                    unwritten[0].extend(rest_logins)
+                    unwritten[1].extend(rest_logouts)
+                logger.exception("Session log flush failed, will retry %d rows", len(unwritten[0]) + len(unwritten[1]))
+                return rejected, unwritten
+        return rejected, ([], [])
+
+    def _requeue(self, logins: list[dict], logouts: list[dict]):
+        self._logins[:0] = logins
+        for row in logouts:
+            self._logouts.setdefault(row["session_id"], row["closed_at"])
+
+    async def flush(self):
+        async with self._flush_lock:
+            if not self.pending:
+                return
+            # Swap the buffers out (no await in between, so nothing is lost)
+            logins, self._logins = self._logins, []
+            logouts, self._logouts = self._logouts, {}
+            logouts = [{"session_id": sid, "closed_at": at} for sid, at in logouts.items()]
+
+            (rejected_logins, rejected_logouts), (unwritten_logins, unwritten_logouts) = \
+                await self._write_isolating(logins, logouts)
+
+            # Rejected rows get max_attempts flushes (the cause may be transient,
+            # e.g. a profile whose insert isn't visible yet), then are dropped
+            retry_logins, retry_logouts = [], []
+            for rows, retry, key in ((rejected_logins, retry_logins, "id"),
+                                     (rejected_logouts, retry_logouts, "session_id")):
+                for row in rows:
+                    attempts = self._rejections.get(row[key], 0) + 1
+                    if attempts < self.max_attempts:
+                        self._rejections[row[key]] = attempts
+                        retry.append(row)
+                    else:
+                        self._rejections.pop(row[key], None)
+                        self.rejected_rows += 1
+                        logger.error("Session log row for session %s dropped after %d rejections",
+                                     row[key], attempts)
+            self._requeue(retry_logins + unwritten_logins, retry_logouts + unwritten_logouts)
+            self._trim()
+
+            kept = {row["id"] for row in self._logins}
+            written = len(logins) + len(logouts) - len(rejected_logins) - len(rejected_logouts) \
+                - len(unwritten_logins) - len(unwritten_logouts)
+            self.flushed_rows += written
+            for row in logins:
+                if row["id"] not in kept:
+                    self._rejections.pop(row["id"], None)
+                    if self._open_by_user.get(row["user_id"]) == row["id"]:
+                        del self._open_by_user[row["user_id"]]
+            for row in logouts:
+                if row["session_id"] not in self._logouts:
+                    self._rejections.pop(row["session_id"], None)
+
+    async def _run(self):
+        while not self._stopping:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()
+
+    def start(self):
+        if self._task is None:
+            self._stopping = False
+            self._task = asyncio.create_task(self._run(), name="session-log-writer")
+
+    async def stop(self):
+        """Stop the background task and drain everything still queued."""
+        if self._task is not None:
+            # Not cancel(): a flush in progress must finish, or its batch is lost
+            self._stopping = True
+            self._wakeup.set()
+            await self._task
+            self._task = None
+        await self.flush()
+
+
+writer = SessionLogWriter(
+    batch_size=config.settings.SESSION_LOG_BATCH_SIZE,
+    flush_interval=config.settings.SESSION_LOG_FLUSH_SECONDS,
+    max_attempts=config.settings.SESSION_LOG_MAX_ATTEMPTS,
+)
@@ -0,0 +1,217 @@
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime
+
+import numpy as np
+
+from app import pricing
+
+# --- STRIKE / DTE RESOLUTION ---
+# Turns a leg's targets (TRD [100] delta or fixed strike, TRD [102] DTE)
+# into a concrete listed contract from an option chain snapshot.
+#
+# The chain is laid out as dense grids indexed [type, expiry, strike]
+# (type 0 = call, 1 = put; NaN where a contract isn't listed). Each
+# (type, expiry) row is then pre-sorted by |delta| and by strike into one
+# flat searchable array, so resolving L legs is one np.searchsorted
+# (O(L log N)) instead of an L x strikes distance matrix.
+#
+# Chains come in through POST /marketdata/{ticker}/chain (app/routers/
+# marketdata.py), which builds the grids and loads them into the resolver;
+# app/chains.py stores them and loads them into every other worker's too.
+
+CALL, PUT = 0, 1
+DAYS_PER_YEAR = 365.0
+
+
+@dataclass
+class OptionChain:
+    ticker: str
+    snapshot_time: datetime
+    spot: float
+    expiries: np.ndarray   # (E,) days to expiry, sorted ascending
+    strikes: np.ndarray    # (K,) sorted ascending
+    iv: np.ndarray         # (2, E, K) implied vol, NaN = not listed
+    rate: float = 0.0
+    dividend: float = 0.0
+    deltas: np.ndarray = None  # (2, E, K), filled by compute_deltas()
+    delta_index: "RowIndex" = None
+    strike_index: "RowIndex" = None
+
+    @classmethod
+    def from_records(cls, ticker, snapshot_time, spot, records, rate=0.0, dividend=0.0):
+        """
+        Build the grids from (expiration_days, strike, option_type, iv) rows,
+        option_type being 'call' or 'put'.
+        """
+        rows = np.array([(float(dte), float(strike), CALL if kind == "call" else PUT, float(iv))
+                         for dte, strike, kind, iv in records], dtype=float).reshape(-1, 4)
+        expiries, exp_idx = np.unique(rows[:, 0], return_inverse=True)
+        strikes, strike_idx = np.unique(rows[:, 1], return_inverse=True)
+
+        iv = np.full((2, len(expiries), len(strikes)), np.nan)
+        iv[rows[:, 2].astype(int), exp_idx, strike_idx] = rows[:, 3]
+        return cls(ticker, snapshot_time, float(spot), expiries, strikes, iv, rate, dividend)
+
+    def compute_deltas(self):
+        """All Black-Scholes deltas for the chain in one vectorized pass."""
+        time = (self.expiries / DAYS_PER_YEAR)[None, :, None]
+        is_call = (np.arange(2) == CALL)[:, None, None]
+        deltas = pricing.delta(self.spot, self.strikes[None, None, :], time, self.iv,
+                               is_call, self.rate, self.dividend)
+        # Unlisted contracts (NaN iv) stay NaN and are never picked
+        listed = ~np.isnan(self.iv)
+        self.deltas = np.where(listed, deltas, np.nan)
+
+        rows = 2 * len(self.expiries)
+        self.delta_index = RowIndex(np.abs(self.deltas).reshape(rows, -1))
+        strike_grid = np.where(listed, self.strikes[None, None, :], np.nan)
+        self.strike_index = RowIndex(strike_grid.reshape(rows, -1))
+        return self
+
+
+class RowIndex:
+    """
+    Nearest-value lookup within the rows of a (R, K) grid, vectorized over queries.
+    Rows are sorted and laid end to end with a per-row offset larger than any
+    value range, so one global searchsorted finds the spot inside each row.
+    NaN cells (unlisted) sort to the end of their row and are never returned.
+    """
+
+    def __init__(self, grid: np.ndarray):
+        self.n_rows, self.n_cols = grid.shape
+        self.order = np.argsort(grid, axis=1)  # NaN last
+        values = np.take_along_axis(grid, self.order, axis=1)
+        self.valid = ~np.isnan(values)
+
+        low = np.nanmin(grid) if self.valid.any() else 0.0
+        high = np.nanmax(grid) if self.valid.any() else 0.0
+        self.low = low
+        self.span = (high - low) + 1.0
+        # NaN -> just below the next row's start, so it's never "nearest"
+        shifted = np.where(self.valid, values - low, self.span - 0.5)
+        self.offsets = np.arange(self.n_rows)[:, None] * (2 * self.span)
+        self.keys = (shifted + self.offsets).ravel()
+
+    def nearest(self, rows: np.ndarray, targets: np.ndarray) -> np.ndarray:
+        """Column index of the closest valid cell per (row, target), -1 if none."""
+        keys = np.clip(targets - self.low, -0.25, self.span - 0.75) + rows * (2 * self.span)
+        pos = np.searchsorted(self.keys, keys)
+
+        row_start = rows * self.n_cols
+        right = np.clip(pos, row_start, row_start + self.n_cols - 1)
+        left = np.clip(pos - 1, row_start, row_start + self.n_cols - 1)
+
+        flat_valid = self.valid.ravel()
+        right_dist = np.where(flat_valid[right], np.abs(self.keys[right] - keys), np.inf)
+        left_dist = np.where(flat_valid[left], np.abs(self.keys[left] - keys), np.inf)
+        best = np.where(left_dist <= right_dist, left, right)
+        found = np.isfinite(np.minimum(left_dist, right_dist)) & ~np.isnan(targets)
+        return np.where(found, self.order.ravel()[best], -1)
+
+
+@dataclass
+class ResolvedLegs:
+    """Column-oriented result, one entry per input leg (NaN = unresolved)."""
+    expiration_days: np.ndarray
+    strike: np.ndarray
+    delta: np.ndarray
+
+
+def nearest_expiry_index(expiries: np.ndarray, target_days: np.ndarray) -> np.ndarray:
+    """Index of the listed expiry closest to each target DTE (ties go to the later one)."""
+    right = np.clip(np.searchsorted(expiries, target_days), 0, len(expiries) - 1)
+    left = np.clip(right - 1, 0, len(expiries) - 1)
+    use_left = np.abs(expiries[left] - target_days) < np.abs(expiries[right] - target_days)
+    return np.where(use_left, left, right)
+
+
+class StrikeResolver:
+    """
+    Resolves legs against chain snapshots. Deltas are computed once per
+    (ticker, snapshot_time) and cached, so every strategy on the same
+    underlying shares the work.
+    """
+
+    def __init__(self, max_chains=64):
+        self.max_chains = max_chains
+        self._chains = OrderedDict()  # (ticker, snapshot_time) -> OptionChain with deltas
+
+    def load_chain(self, chain: OptionChain) -> OptionChain:
+        key = (chain.ticker, chain.snapshot_time)
+        cached = self._chains.get(key)
+        if cached is not None:
+            self._chains.move_to_end(key)
+            return cached
+        if chain.deltas is None:
+            chain.compute_deltas()
+        self._chains[key] = chain
+        if len(self._chains) > self.max_chains:
+            self._chains.popitem(last=False)
+        return chain
+
+    def get_chain(self, ticker: str, snapshot_time: datetime):
+        return self._chains.get((ticker, snapshot_time))
+
+    def latest_chain(self, ticker: str):
+        """Most recent cached snapshot for a ticker, or None."""
+        snapshots = [key for key in self._chains if key[0] == ticker]
+        return self._chains[max(snapshots, key=lambda key: key[1])] if snapshots else None
+
+    def resolve(self, chain: OptionChain, option_type, strike_mode, strike_value, expiration_days) -> ResolvedLegs:
+        """
+        Vectorized over legs; every argument is a sequence with one entry per leg.
+        - option_type: 'call' / 'put'
+        - strike_mode: 'delta' (strike_value = target |delta|, e.g. 0.30) or
+          'fixed' (strike_value = price; nearest listed strike)
+        - expiration_days: target DTE; the nearest listed expiry is used
+        """
+        chain = self.load_chain(chain)
+        type_idx = np.where(np.asarray(option_type) == "call", CALL, PUT)
+        by_delta = np.asarray(strike_mode) == "delta"
+        target = np.array(strike_value, dtype=float)  # None -> NaN
+        dte = np.nan_to_num(np.array(expiration_days, dtype=float))
+
+        exp_idx = nearest_expiry_index(chain.expiries, dte)
+        rows = type_idx * len(chain.expiries) + exp_idx
+
+        # |delta| closest to the target delta, or listed strike closest to the target price
+        strike_idx = np.where(
+            by_delta,
+            chain.delta_index.nearest(rows, target),
+            chain.strike_index.nearest(rows, target)
+        )
+
+        # Legs with no target or no listed contract at that expiry stay unresolved
+        resolved = strike_idx >= 0
+        strike_idx = np.where(resolved, strike_idx, 0)
+        strikes = np.where(resolved, chain.strikes[strike_idx], np.nan)
+        deltas = np.where(resolved, chain.deltas[type_idx, exp_idx, strike_idx], np.nan)
+        expiries = np.where(resolved, chain.expiries[exp_idx], np.nan)
+        return ResolvedLegs(expiries, strikes, deltas)
+
+    def resolve_strategy(self, chain: OptionChain, strategy) -> list[dict]:
+        """Resolve the option legs of one models.Strategy (legs loaded)."""
+        legs = [leg for leg in strategy.legs if leg.option_type]
+        if not legs:
+            return []
+        resolved = self.resolve(
+            chain,
+            [leg.option_type for leg in legs],
+            [leg.strike_mode or "fixed" for leg in legs],
+            [leg.strike_value for leg in legs],
+            [leg.expiration_days for leg in legs],
+        )
+        return [
+            {
+                "leg_index": int(leg.leg_index),
+                "expiration_days": None if np.isnan(resolved.expiration_days[i]) else float(resolved.expiration_days[i]),
+                "strike": None if np.isnan(resolved.strike[i]) else float(resolved.strike[i]),
+                "delta": None if np.isnan(resolved.delta[i]) else float(resolved.delta[i]),
+            }
+            for i, leg in enumerate(legs)
+        ]
+
+
+# Shared resolver (chain cache) for the app
+resolver = StrikeResolver()
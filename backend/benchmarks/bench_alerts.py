@@ -0,0 +1,106 @@
+"""
+Sustained Telegram alert throughput through the outbox dispatcher, against
+the local stub Bot API (which returns 429s like Telegram does).
+
+Every --interval seconds a strategy "fires": one alert per leg for each of
+--chats recipients is committed to alert_outbox. Reports alerts delivered
+per second, Telegram messages per second (coalescing packs several alerts
+into one message), 429s received and enqueue-to-delivery latency.
+
+    python -m benchmarks.bench_alerts --chats 200 --legs 4 --interval 1 --duration 20
+    python -m benchmarks.bench_alerts --database-url postgresql://...
+
+Run from the 'backend' folder. Defaults to a throwaway SQLite file.
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+
+from benchmarks.stub_telegram import StubServer
+
+
+async def drive(args, url):
+    from sqlalchemy import func, select
+    from app import alerts, database, models
+
+    dispatcher = alerts.AlertDispatcher(
+        alerts.TelegramClient("bench-token", url),
+        global_rate=args.global_rate, chat_rate=args.chat_rate,
+        coalesce_window=args.coalesce, batch_size=args.batch_size, poll_interval=0.5,
+    )
+    dispatcher.start()
+    outbox = models.AlertOutbox
+
+    start = time.perf_counter()
+    queued = 0
+    for burst in range(max(1, int(args.duration / args.interval))):
+        fired = time.perf_counter()
+        async with database.AsyncSessionLocal() as db:
+            batch = [(f"chat-{chat}", f"BENCH leg {leg + 1}: BUY 1 SPY call 0.3d 30DTE - accepted (signal {burst})")
+                     for chat in range(args.chats) for leg in range(args.legs)]
+            await dispatcher.enqueue(db, batch)
+            await db.commit()
+        queued += len(batch)
+        dispatcher.wake()
+        await asyncio.sleep(max(0.0, args.interval - (time.perf_counter() - fired)))
+    produced = time.perf_counter() - start
+
+    # Drain
+    while True:
+        async with database.AsyncSessionLocal() as db:
+            pending = await db.scalar(select(func.count()).select_from(outbox).filter(outbox.status == "pending"))
+        if not pending:
+            break
+        await asyncio.sleep(0.2)
+    elapsed = time.perf_counter() - start
+    await dispatcher.stop()
+
+    async with database.AsyncSessionLocal() as db:
+        rows = (await db.execute(select(outbox.created_at, outbox.sent_at).filter(outbox.status == "sent"))).all()
+    latencies = sorted((row.sent_at - row.created_at).total_seconds() for row in rows)
+    return queued, produced, elapsed, dispatcher, latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chats", type=int, default=200)
+    parser.add_argument("--legs", type=int, default=4)
+    parser.add_argument("--interval", type=float, default=1.0, help="Seconds between strategy signals")
+    parser.add_argument("--duration", type=float, default=20.0, help="Seconds of signals")
+    parser.add_argument("--global-rate", type=float, default=30.0)
+    parser.add_argument("--chat-rate", type=float, default=1.0)
+    parser.add_argument("--coalesce", type=float, default=1.0, help="Coalescing window, seconds")
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--latency-ms", type=float, default=30.0, help="Stub Bot API latency")
+    parser.add_argument("--port", type=int, default=9998)
+    parser.add_argument("--database-url")
+    args = parser.parse_args()
+
+    # Configure before the app (and its engines) are imported
+    os.environ["DATABASE_URL"] = args.database_url or f"sqlite:///{tempfile.mkdtemp()}/bench.db"
+    from app import bootstrap, database
+
+    with database.get_engine().begin() as connection:
+        bootstrap.create_schema(connection)
+
+    with StubServer(args.port, args.latency_ms, args.global_rate, args.chat_rate) as url:
+        queued, produced, elapsed, dispatcher, latencies = asyncio.run(drive(args, url))
+        import httpx
+        stub = httpx.get(f"{url}/stats").json()
+
+    print(f"{queued} alerts to {args.chats} chats over {produced:.1f} s "
+          f"({queued / produced:,.0f}/s offered), drained after {elapsed:.1f} s")
+    print(f"delivered : {dispatcher.sent / elapsed:8,.1f} alerts/s   failed {dispatcher.failed}")
+    print(f"messages  : {dispatcher.messages / elapsed:8,.1f} msg/s      "
+          f"({dispatcher.sent / max(1, dispatcher.messages):.1f} alerts per message)")
+    print(f"stub      : {stub['messages']} messages, {stub['rate_limited']} x 429")
+    if latencies:
+        p95 = latencies[int(0.95 * (len(latencies) - 1))]
+        print(f"latency   : p50 {statistics.median(latencies):.2f} s  p95 {p95:.2f} s  max {latencies[-1]:.2f} s")
+
+
+if __name__ == "__main__":
+    main()
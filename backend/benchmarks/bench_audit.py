@@ -0,0 +1,114 @@
+"""
+Audit log ingestion: what an audit event costs the request that records it,
+and how many events per second the background writer sustains.
+
+  - inline    : one INSERT + commit per event, as a request writing its own
+                audit row would do
+  - record()  : auditlog.writer.record(), the request-path cost now
+  - sustained : producers record events continuously while the writer
+                flushes (COPY on Postgres, multi-row INSERT on SQLite)
+
+    python -m benchmarks.bench_audit -n 20000 --batch-size 1000
+    python -m benchmarks.bench_audit --database-url postgresql://...
+
+Run from the 'backend' folder. Defaults to a throwaway SQLite file.
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+import uuid
+from datetime import datetime, timezone
+
+
+def _percentiles(samples):
+    samples = sorted(samples)
+    return samples[len(samples) // 2], samples[int(len(samples) * 0.99)]
+
+
+async def run(args):
+    from sqlalchemy import func, select
+    from app import auditlog, database, models
+
+    actor_id = uuid.uuid4()
+    entity_ids = [uuid.uuid4() for _ in range(100)]
+
+    def changes(i):
+        return {"multiplier": {"old": 1.0, "new": 1.0 + i % 7}, "is_active": {"old": True, "new": bool(i % 2)}}
+
+    # 1. Inline: the request waits for its own INSERT + commit
+    inline = []
+    for i in range(args.inline):
+        start = time.perf_counter()
+        event = (uuid.uuid4(), datetime.now(timezone.utc), actor_id, "profile", entity_ids[i % 100], "update", changes(i))
+        async with database.AsyncSessionLocal() as db:
+            await auditlog.write_events(db, [event])
+            await db.commit()
+        inline.append(time.perf_counter() - start)
+
+    # 2. record(): buffer append only, nothing flushes meanwhile
+    writer = auditlog.AuditLogWriter(batch_size=args.batch_size, flush_interval=args.flush_seconds,
+                                     max_pending=args.events * 2)
+    buffered = []
+    for i in range(args.inline):
+        start = time.perf_counter()
+        writer.record("update", "profile", entity_ids[i % 100], actor_id, changes(i))
+        buffered.append(time.perf_counter() - start)
+    await writer.flush()
+
+    # 3. Sustained: producers record in bursts while the writer flushes
+    writer.start()
+    per_producer = args.events // args.producers
+
+    async def producer():
+        for i in range(per_producer):
+            writer.record("order", "strategy", entity_ids[i % 100], actor_id, changes(i))
+            if i % 100 == 99:
+                await asyncio.sleep(0)
+
+    flushed_before = writer.flushed_events
+    start = time.perf_counter()
+    await asyncio.gather(*(producer() for _ in range(args.producers)))
+    produced = time.perf_counter() - start
+    await writer.stop()
+    elapsed = time.perf_counter() - start
+    sustained = writer.flushed_events - flushed_before
+
+    async with database.AsyncSessionLocal() as db:
+        stored = await db.scalar(select(func.count()).select_from(models.AuditEvent))
+
+    inline_p50, inline_p99 = _percentiles(inline)
+    record_p50, record_p99 = _percentiles(buffered)
+    print(f"{stored} events stored, batch size {args.batch_size}")
+    print(f"inline INSERT : p50 {inline_p50 * 1e6:9.1f} us  p99 {inline_p99 * 1e6:9.1f} us  "
+          f"(mean {statistics.mean(inline) * 1e6:.1f} us)")
+    print(f"record()      : p50 {record_p50 * 1e6:9.1f} us  p99 {record_p99 * 1e6:9.1f} us  "
+          f"{inline_p50 / record_p50:.0f}x less per request")
+    print(f"sustained     : {sustained} events in {elapsed:.2f} s ({sustained / elapsed:,.0f} events/s written, "
+          f"{sustained / produced:,.0f} events/s recorded, {writer.dropped_events} dropped)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("-n", "--events", type=int, default=20000, help="Events in the sustained run")
+    parser.add_argument("--inline", type=int, default=500, help="Events timed one by one")
+    parser.add_argument("--producers", type=int, default=8)
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--flush-seconds", type=float, default=0.5)
+    parser.add_argument("--database-url")
+    args = parser.parse_args()
+
+    # Configure before the app (and its engines) are imported
+    os.environ["DATABASE_URL"] = args.database_url or f"sqlite:///{tempfile.mkdtemp()}/bench.db"
+    from app import bootstrap, database
+
+    with database.get_engine().begin() as connection:
+        bootstrap.create_schema(connection)
+
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
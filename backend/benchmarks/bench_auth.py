@@ -0,0 +1,73 @@
+"""
+Per-request auth cost: local JWT verification vs. the old GoTrue round trip.
+
+    python -m benchmarks.bench_auth                 # local verification only
+    python -m benchmarks.bench_auth --remote TOKEN  # also time /auth/v1/user
+
+Run from the 'backend' folder.
+"""
+import argparse
+import time
+import uuid
+
+import httpx
+import jwt
+
+from app import config
+from app.security import TokenVerifier
+
+
+def make_token(secret):
+    now = int(time.time())
+    claims = {
+        "sub": str(uuid.uuid4()),
+        "aud": "authenticated",
+        "role": "authenticated",
+        "session_id": str(uuid.uuid4()),
+        "iat": now,
+        "exp": now + 3600,
+    }
+    return jwt.encode(claims, secret, algorithm="HS256")
+
+
+def bench_local(iterations):
+    secret = "bench-secret-" + uuid.uuid4().hex
+    verifier = TokenVerifier(secret, False, "authenticated", 600)
+    token = make_token(secret)
+
+    start = time.perf_counter()
+    for _ in range(iterations):
+        verifier.decode(token)
+    elapsed = time.perf_counter() - start
+    return elapsed / iterations
+
+
+def bench_remote(token, iterations):
+    url = f"{config.settings.SUPABASE_URL}/auth/v1/user"
+    headers = {"apikey": config.settings.SUPABASE_KEY, "Authorization": f"Bearer {token}"}
+
+    start = time.perf_counter()
+    for _ in range(iterations):
+        httpx.get(url, headers=headers)
+    elapsed = time.perf_counter() - start
+    return elapsed / iterations
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("-n", "--iterations", type=int, default=20000)
+    parser.add_argument("--remote", metavar="TOKEN", help="Also time the GoTrue /auth/v1/user lookup")
+    args = parser.parse_args()
+
+    local = bench_local(args.iterations)
+    print(f"local verify : {local * 1e6:8.1f} us/request  ({args.iterations} iterations)")
+
+    if args.remote:
+        remote_iterations = min(args.iterations, 50)
+        remote = bench_remote(args.remote, remote_iterations)
+        print(f"GoTrue lookup: {remote * 1e6:8.1f} us/request  ({remote_iterations} iterations)")
+        print(f"speedup      : {remote / local:8.0f}x")
+
+
+if __name__ == "__main__":
+    main()
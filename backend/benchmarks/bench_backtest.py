@@ -0,0 +1,82 @@
+"""
+Backtest throughput in strategy-years per second: N random 1-4 leg
+strategies over synthetic daily bars (GBM with a stochastic IV column),
+serial vs. a process pool sharing the memory-mapped data.
+
+    python -m benchmarks.bench_backtest -n 200 --years 10 --workers 1 4
+
+Run from the 'backend' folder. No database needed; the bars are written
+to a temporary directory (or --data-dir) as memory-mappable .npy columns.
+"""
+import argparse
+import tempfile
+import time
+import uuid
+
+import numpy as np
+
+from app import backtest
+
+TICKERS = {"SPY": 300.0, "QQQ": 250.0, "IWM": 150.0, "AAPL": 120.0}
+
+
+def synthetic_bars(data_dir, years, rng):
+    days = int(years * 252)
+    ts = 1262304000 + np.arange(days, dtype=np.int64) * 86400 * 365 // 252
+    for ticker, spot in TICKERS.items():
+        returns = rng.normal(0.0003, 0.012, days)
+        close = spot * np.exp(np.cumsum(returns))
+        iv = np.clip(0.18 + np.cumsum(rng.normal(0, 0.004, days)) * 0.1, 0.08, 0.8)
+        backtest.write_bars(data_dir, ticker, {
+            "ts": ts, "open": close, "high": close * 1.005, "low": close * 0.995,
+            "close": close, "volume": rng.integers(1_000_000, 5_000_000, days), "iv": iv,
+        })
+
+
+def random_specs(n, rng):
+    tickers = list(TICKERS)
+    specs = []
+    for _ in range(n):
+        legs = []
+        for _ in range(int(rng.integers(1, 5))):
+            delta = rng.random() < 0.5
+            legs.append({
+                "action": "buy" if rng.random() < 0.5 else "sell",
+                "option_type": "call" if rng.random() < 0.5 else "put",
+                "quantity": float(rng.integers(1, 5)),
+                "strike_mode": "delta" if delta else "fixed",
+                "strike_value": float(rng.uniform(0.1, 0.6)) if delta else float(round(TICKERS[tickers[0]])),
+                "expiration_days": float(rng.choice([7, 14, 30, 45])),
+            })
+        specs.append({"id": str(uuid.uuid4()), "ticker": tickers[rng.integers(len(tickers))], "legs": legs})
+    return specs
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("-n", "--strategies", type=int, default=200)
+    parser.add_argument("--years", type=float, default=10.0)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, backtest.default_workers()])
+    parser.add_argument("--data-dir", help="Reuse/keep the synthetic bars here")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(11)
+    with tempfile.TemporaryDirectory() as tmp:
+        data_dir = args.data_dir or tmp
+        synthetic_bars(data_dir, args.years, rng)
+        specs = random_specs(args.strategies, rng)
+        params = backtest.BacktestParams()
+
+        print(f"{args.strategies} strategies x {args.years:g} years of daily bars")
+        for workers in args.workers:
+            start = time.perf_counter()
+            results = backtest.run_many(specs, params, data_dir, workers)
+            elapsed = time.perf_counter() - start
+            errors = sum(1 for r in results if "error" in r)
+            strategy_years = sum(r.get("years", 0.0) for r in results)
+            print(f"workers={workers:<3}: {elapsed:7.2f} s  {strategy_years / elapsed:10,.0f} strategy-years/s"
+                  f"  ({errors} errors)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""
+Bulk strategy creation: N x POST /strategies/ vs one POST /strategies/bulk.
+
+    python -m benchmarks.bench_bulk_strategies -n 500 --legs 4
+    python -m benchmarks.bench_bulk_strategies --database-url postgresql://...
+
+Run from the 'backend' folder. Defaults to a throwaway SQLite file; pass
+--database-url to measure against Postgres (round trips matter much more there).
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+import uuid
+
+
+def strategy_payload(i, legs):
+    return {
+        "name": f"bench-{i}",
+        "ticker": "SPY",
+        "instrument_type": "option",
+        "legs": [
+            {
+                "leg_index": leg + 1,
+                "action": "buy" if leg % 2 == 0 else "sell",
+                "option_type": "call" if leg < 2 else "put",
+                "quantity": 1,
+                "strike_value": 0.30,
+                "strike_mode": "delta",
+                "expiration_days": 30
+            }
+            for leg in range(legs)
+        ]
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("-n", "--strategies", type=int, default=500)
+    parser.add_argument("--legs", type=int, default=4, choices=range(1, 5))
+    parser.add_argument("--database-url")
+    args = parser.parse_args()
+
+    # Configure before the app (and its engines) are imported
+    from benchmarks.stub_gotrue import STUB_JWT_SECRET, make_access_token
+    os.environ["DATABASE_URL"] = args.database_url or f"sqlite:///{tempfile.mkdtemp()}/bench.db"
+    os.environ["SUPABASE_JWT_SECRET"] = STUB_JWT_SECRET
+    os.environ["DEFAULT_BROKER"] = "simulated"
+    os.environ.pop("SUPABASE_URL", None)
+
+    from fastapi.testclient import TestClient
+    from app import bootstrap, database, models
+    from app.main import app
+
+    with database.engine.begin() as connection:
+        bootstrap.create_schema(connection)
+
+    user_id = uuid.uuid4()
+    with database.SessionLocal() as db:
+        db.add(models.Profile(id=user_id, email=f"bench-{user_id}@bench.local", role="analyst"))
+        db.commit()
+    headers = {"Authorization": f"Bearer {make_access_token(user_id, 'bench@bench.local')}"}
+    payloads = [strategy_payload(i, args.legs) for i in range(args.strategies)]
+
+    with TestClient(app) as client:
+        start = time.perf_counter()
+        for payload in payloads:
+            client.post("/strategies/", headers=headers, json=payload).raise_for_status()
+        single = time.perf_counter() - start
+
+        start = time.perf_counter()
+        response = client.post("/strategies/bulk", headers=headers, json=payloads)
+        response.raise_for_status()
+        bulk = time.perf_counter() - start
+
+    if response.json()["created"] != args.strategies:
+        sys.exit(f"bulk created {response.json()['created']} of {args.strategies}")
+
+    total_legs = args.strategies * args.legs
+    print(f"{args.strategies} strategies / {total_legs} legs")
+    print(f"N x POST /strategies/    : {single:8.3f} s  ({args.strategies / single:8.0f} strategies/s)")
+    print(f"1 x POST /strategies/bulk: {bulk:8.3f} s  ({args.strategies / bulk:8.0f} strategies/s)")
+    print(f"speedup                  : {single / bulk:8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""
+Onboarding N users: one create_user_profile call per user (auth user, then
+profile, sequentially) vs. crud.bulk_create_user_profiles_async (concurrent
+auth users, one profile INSERT), against the local stub GoTrue.
+
+    python -m benchmarks.bench_bulk_users -n 500 --latency-ms 50 --concurrency 10
+    python -m benchmarks.bench_bulk_users --database-url postgresql://...
+
+Run from the 'backend' folder. Defaults to a throwaway SQLite file.
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+
+from benchmarks.stub_gotrue import StubServer
+
+
+async def run(args):
+    from sqlalchemy import func, select
+    from app import crud, database, gotrue, models, schemas
+
+    def users(prefix):
+        return [schemas.UserCreate(email=f"{prefix}{i}@example.com", password="bench-password",
+                                   first_name="Bench", last_name=str(i), multiplier=1.5, telegram_id=str(10 ** 8 + i))
+                for i in range(args.users)]
+
+    await gotrue.client.open()
+    try:
+        start = time.perf_counter()
+        for user in users("one-by-one-"):
+            async with database.AsyncSessionLocal() as db:
+                await crud.create_user_profile(db, user)
+        sequential = time.perf_counter() - start
+
+        start = time.perf_counter()
+        async with database.AsyncSessionLocal() as db:
+            outcomes = await crud.bulk_create_user_profiles_async(db, users("bulk-"), args.concurrency)
+        bulk = time.perf_counter() - start
+    finally:
+        await gotrue.client.close()
+
+    async with database.AsyncSessionLocal() as db:
+        profiles = await db.scalar(select(func.count()).select_from(models.Profile))
+    failed = sum(not isinstance(outcome, dict) for outcome in outcomes)
+
+    print(f"{args.users} users, GoTrue latency {args.latency_ms:.0f} ms, {profiles} profiles stored")
+    print(f"one by one : {sequential:7.2f} s  ({args.users / sequential:7.1f} users/s)")
+    print(f"bulk       : {bulk:7.2f} s  ({args.users / bulk:7.1f} users/s, concurrency {args.concurrency}, "
+          f"{failed} failed)  {sequential / bulk:.1f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("-n", "--users", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=10, help="Auth users created at once")
+    parser.add_argument("--latency-ms", type=float, default=50.0, help="Stub GoTrue latency")
+    parser.add_argument("--port", type=int, default=9999)
+    parser.add_argument("--database-url")
+    args = parser.parse_args()
+
+    # Configure before the app (and its engines / GoTrue client) are imported
+    os.environ["DATABASE_URL"] = args.database_url or f"sqlite:///{tempfile.mkdtemp()}/bench.db"
+    os.environ["SUPABASE_URL"] = f"http://127.0.0.1:{args.port}"
+    os.environ.setdefault("SUPABASE_KEY", "bench-service-key")
+    from app import bootstrap, database
+
+    with database.get_engine().begin() as connection:
+        bootstrap.create_schema(connection)
+
+    with StubServer(args.port, args.latency_ms):
+        asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""
+Order fan-out throughput/latency: one 4-leg signal to N accounts spread
+over several simulated brokers.
+
+    python -m benchmarks.bench_fanout --accounts 2000 --brokers 3 --latency-ms 5
+
+Run from the 'backend' folder. No database needed.
+"""
+import argparse
+import asyncio
+import statistics
+import time
+import uuid
+from types import SimpleNamespace
+
+from app.brokers import Account, SimulatedBroker
+from app.fanout import FanOutEngine
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def make_strategy(legs=4):
+    return SimpleNamespace(
+        id=uuid.uuid4(),
+        ticker="SPY",
+        instrument_type="option",
+        legs=[
+            SimpleNamespace(leg_index=i + 1, action="buy" if i % 2 == 0 else "sell",
+                            option_type="call" if i < 2 else "put", quantity=1,
+                            strike_value=0.3, strike_mode="delta", expiration_days=30)
+            for i in range(legs)
+        ],
+    )
+
+
+async def run(args):
+    adapters = {}
+    for b in range(args.brokers):
+        broker = SimulatedBroker(name=f"sim-{b}", latency=args.latency_ms / 1000,
+                                 jitter=args.latency_ms / 2000, max_concurrency=args.concurrency,
+                                 reject_rate=args.reject_rate, seed=b)
+        adapters[broker.name] = broker
+
+    names = list(adapters)
+    accounts = [Account(id=uuid.uuid4(), multiplier=1 + (i % 19) * 0.5, broker=names[i % len(names)])
+                for i in range(args.accounts)]
+    engine = FanOutEngine(adapters)
+    strategy = make_strategy()
+
+    await engine.fan_out(strategy, accounts[:10])  # Warm up
+
+    signal_times = []
+    results = []
+    for _ in range(args.signals):
+        start = time.perf_counter()
+        results.append(await engine.fan_out(strategy, accounts))
+        signal_times.append(time.perf_counter() - start)
+
+    acks = [ack for result in results for ack in result.acks]
+    latencies = [ack.latency * 1000 for ack in acks]
+    total = sum(signal_times)
+    print(f"{args.accounts} accounts x 4 legs over {args.brokers} brokers "
+          f"(latency {args.latency_ms} ms, {args.concurrency} in flight per broker)")
+    print(f"orders per signal : {len(results[0].acks)}")
+    print(f"signal fan-out    : mean {statistics.mean(signal_times) * 1000:8.1f} ms")
+    print(f"throughput        : {len(acks) / total:8.0f} orders/s")
+    print(f"ack latency       : p50 {percentile(latencies, 50):6.2f} ms  "
+          f"p99 {percentile(latencies, 99):6.2f} ms")
+    print(f"accepted/rejected : {sum(r.count('accepted') for r in results)}/"
+          f"{sum(r.count('rejected') for r in results)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--accounts", type=int, default=2000)
+    parser.add_argument("--brokers", type=int, default=3)
+    parser.add_argument("--signals", type=int, default=5)
+    parser.add_argument("--latency-ms", type=float, default=5.0)
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--reject-rate", type=float, default=0.0)
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
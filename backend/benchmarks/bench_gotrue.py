@@ -0,0 +1,68 @@
+"""
+GoTrue call throughput: a fresh connection per call (old module-level
+httpx.post, run on a threadpool like a sync FastAPI route) vs. the shared
+pooled AsyncClient in app/gotrue.py.
+
+    python -m benchmarks.bench_gotrue -n 2000 -c 50 --latency-ms 10
+
+Run from the 'backend' folder. Starts a local stub GoTrue server.
+"""
+import argparse
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+
+from app.gotrue import GoTrueClient
+from benchmarks.stub_gotrue import StubServer
+
+
+def bench_fresh_connections(url, n, concurrency):
+    def call(i):
+        httpx.post(f"{url}/auth/v1/token?grant_type=password",
+                   json={"email": f"user{i % 100}@bench.local", "password": "x"})
+
+    # Starlette's default threadpool is 40 workers
+    with ThreadPoolExecutor(max_workers=min(concurrency, 40)) as pool:
+        start = time.perf_counter()
+        list(pool.map(call, range(n)))
+        return time.perf_counter() - start
+
+
+async def bench_shared_client(url, n, concurrency):
+    client = GoTrueClient(url, "bench-key", max_connections=concurrency, max_keepalive=concurrency)
+    await client.open()
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def call(i):
+        async with semaphore:
+            await client.password_grant(f"user{i % 100}@bench.local", "x")
+
+    try:
+        start = time.perf_counter()
+        await asyncio.gather(*(call(i) for i in range(n)))
+        return time.perf_counter() - start
+    finally:
+        await client.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("-n", "--requests", type=int, default=2000)
+    parser.add_argument("-c", "--concurrency", type=int, default=50)
+    parser.add_argument("--latency-ms", type=float, default=10.0, help="Simulated GoTrue latency")
+    parser.add_argument("--port", type=int, default=9999)
+    args = parser.parse_args()
+
+    with StubServer(args.port, args.latency_ms) as url:
+        fresh = bench_fresh_connections(url, args.requests, args.concurrency)
+        shared = asyncio.run(bench_shared_client(url, args.requests, args.concurrency))
+
+    print(f"fresh connection per call: {args.requests / fresh:8.0f} req/s")
+    print(f"shared pooled AsyncClient: {args.requests / shared:8.0f} req/s")
+    print(f"throughput gain          : {fresh / shared:8.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""
+Market data ingest + fan-out: ticks/s replayed from a file into the hub
+with several subscribers per ticker draining their queues.
+
+    python -m benchmarks.bench_marketdata --ticks 200000 --tickers 50 --subscribers 20
+
+Run from the 'backend' folder. No database needed.
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from app.marketdata import MarketDataHub, ReplayFeed
+
+
+def write_replay_file(path, n_ticks, n_tickers, seed=0):
+    rng = np.random.default_rng(seed)
+    tickers = [f"T{i:03d}" for i in range(n_tickers)]
+    prices = 100 + np.cumsum(rng.normal(0, 0.05, n_ticks))
+    picks = rng.integers(0, n_tickers, n_ticks)
+    sizes = rng.integers(1, 500, n_ticks)
+    with open(path, "w") as f:
+        f.write("ts,ticker,price,size\n")
+        for i in range(n_ticks):
+            f.write(f"{1_700_000_000 + i * 0.001:.3f},{tickers[picks[i]]},{prices[i]:.2f},{sizes[i]}\n")
+    return tickers
+
+
+async def run(args, path, tickers):
+    # Parse once up front so we time ingest + fan-out, not CSV parsing
+    rows = list(ReplayFeed(None, path).rows())
+
+    # 1. Ring buffers only, nobody listening
+    bare = MarketDataHub()
+    start = time.perf_counter()
+    for ts, ticker, price, size in rows:
+        bare.publish(ticker, price, size, ts)
+    bare_ingest = time.perf_counter() - start
+
+    # 2. Same feed with subscribers draining their queues
+    hub = MarketDataHub()
+    delivered = 0
+
+    async def consume(subscription):
+        nonlocal delivered
+        while True:
+            await subscription.get()
+            delivered += 1
+
+    subscriptions = [hub.subscribe([ticker], maxsize=args.ticks) for ticker in tickers for _ in range(args.subscribers)]
+    consumers = [asyncio.create_task(consume(sub)) for sub in subscriptions]
+
+    start = time.perf_counter()
+    for i, (ts, ticker, price, size) in enumerate(rows):
+        hub.publish(ticker, price, size, ts)
+        if i % 1000 == 0:
+            await asyncio.sleep(0)
+    enqueue = time.perf_counter() - start
+
+    expected = len(rows) * args.subscribers
+    while delivered < expected:
+        await asyncio.sleep(0)
+    total = time.perf_counter() - start
+
+    for task in consumers:
+        task.cancel()
+
+    book = hub.book(tickers[0])
+    start = time.perf_counter()
+    for _ in range(100000):
+        hub.last_price(tickers[0])
+    lookup = (time.perf_counter() - start) / 100000
+
+    print(f"{len(rows)} ticks, {len(tickers)} tickers, {args.subscribers} subscribers/ticker")
+    print(f"ingest, no subs  : {len(rows) / bare_ingest:12,.0f} ticks/s")
+    print(f"ingest + enqueue : {len(rows) / enqueue:12,.0f} ticks/s")
+    print(f"until delivered  : {len(rows) / total:12,.0f} ticks/s  ({delivered / total:,.0f} deliveries/s)")
+    print(f"last price lookup: {lookup * 1e9:12.0f} ns")
+    print(f"bars for {tickers[0]}    : {len(book.recent_bars(10_000))}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--ticks", type=int, default=200000)
+    parser.add_argument("--tickers", type=int, default=50)
+    parser.add_argument("--subscribers", type=int, default=20)
+    args = parser.parse_args()
+
+    fd, path = tempfile.mkstemp(suffix=".csv")
+    os.close(fd)
+    try:
+        tickers = write_replay_file(path, args.ticks, args.tickers)
+        asyncio.run(run(args, path, tickers))
+    finally:
+        os.remove(path)
+
+
+if __name__ == "__main__":
+    main()
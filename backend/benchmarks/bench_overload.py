@@ -0,0 +1,205 @@
+"""
+Goodput past saturation, with and without load shedding (app/overload.py).
+
+Starts the API (uvicorn) against a stub GoTrue twice, once with
+OVERLOAD_ENABLED=false and once with it on, and drives one scenario (login by
+default: GoTrue + DB, the market-open burst) at rising concurrency. The
+saturating resource is the GoTrue connection pool (--gotrue-connections x
+--gotrue-latency-ms sets the capacity), as the DB pool / GoTrue are in
+production; keep that capacity below what the machine's CPU can serve, or
+the load generator itself becomes the bottleneck.
+
+Clients give up after --client-timeout (as browsers / the frontend do) and
+honour Retry-After on a 429 / 503. Goodput = 2xx responses within the client
+timeout per second; without shedding it collapses once the queue wait passes
+the client timeout, with shedding it should stay near capacity.
+
+    python -m benchmarks.bench_overload
+    python -m benchmarks.bench_overload --levels 16 64 256 512 --gotrue-connections 20 --gotrue-latency-ms 100
+
+Run from the 'backend' folder. Without --database-url a throwaway SQLite file
+is used. Rate limits are off (all clients share one address), so only the
+concurrency limits are measured.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from urllib.parse import urlencode
+
+import orjson
+
+from benchmarks.loadtest import SCENARIOS, build_requests, free_port, seed, wait_ready
+from benchmarks.stub_gotrue import STUB_JWT_SECRET
+
+
+class Connection:
+    """
+    Minimal keep-alive HTTP/1.1 client on asyncio streams. httpx costs enough
+    CPU per request that, with hundreds of clients on the same machine, the
+    load generator would saturate before the API does.
+    """
+
+    def __init__(self, host, port):
+        self.host = host
+        self.port = port
+        self.reader = self.writer = None
+
+    async def request(self, method, path, headers=None, json=None, params=None):
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+        body = orjson.dumps(json) if json is not None else b""
+        if params:
+            path += "?" + urlencode(params)
+        lines = [f"{method} {path} HTTP/1.1", f"Host: {self.host}", f"Content-Length: {len(body)}"]
+        if json is not None:
+            lines.append("Content-Type: application/json")
+        lines += [f"{name}: {value}" for name, value in (headers or {}).items()]
+        self.writer.write(("\r\n".join(lines) + "\r\n\r\n").encode() + body)
+
+        status_line = await self.reader.readline()
+        if not status_line:
+            raise ConnectionError("Connection closed by the server")
+        response_headers = {}
+        while (line := await self.reader.readline()) not in (b"\r\n", b""):
+            name, _, value = line.decode("latin-1").partition(":")
+            response_headers[name.strip().lower()] = value.strip()
+        await self.reader.readexactly(int(response_headers.get("content-length", 0)))
+        if response_headers.get("connection") == "close":
+            self.close()
+        return int(status_line.split()[1]), response_headers
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            self.reader = self.writer = None
+
+
+async def drive_level(host, port, make_request, concurrency, duration, client_timeout, seed_value):
+    counts = {"ok": 0, "shed": 0, "timeout": 0, "error": 0}
+    latencies = []
+    deadline = time.perf_counter() + duration
+
+    async def worker(worker_id):
+        rng = random.Random(seed_value * 1000 + worker_id)
+        connection = Connection(host, port)
+        while time.perf_counter() < deadline:
+            method, path, kwargs = make_request(rng)
+            start = time.perf_counter()
+            try:
+                status, headers = await asyncio.wait_for(connection.request(method, path, **kwargs), client_timeout)
+            except asyncio.TimeoutError:
+                # Gave up: the connection is in an unknown state, like a browser's after an abort
+                connection.close()
+                counts["timeout"] += 1
+                continue
+            except (OSError, asyncio.IncompleteReadError, ValueError):
+                connection.close()
+                counts["error"] += 1
+                continue
+            if status in (429, 503) and "retry-after" in headers:
+                counts["shed"] += 1
+                # Jittered, so shed clients don't come back in lockstep
+                await asyncio.sleep(float(headers["retry-after"]) * rng.uniform(0.5, 1.5))
+            elif status < 400:
+                counts["ok"] += 1
+                latencies.append(time.perf_counter() - start)
+            else:
+                counts["error"] += 1
+        connection.close()
+
+    await asyncio.gather(*(worker(i) for i in range(concurrency)))
+
+    result = {"concurrency": concurrency, **counts, "goodput_rps": round(counts["ok"] / duration, 1)}
+    if len(latencies) >= 2:
+        cuts = statistics.quantiles(latencies, n=100, method="inclusive")
+        result.update(p50_ms=round(cuts[49] * 1000, 1), p99_ms=round(cuts[98] * 1000, 1))
+    return result
+
+
+def run_mode(args, enabled, profiles, workdir):
+    # Logs go to files: past saturation the API logs a lot, and an unread pipe would block it
+    mode = "on" if enabled else "off"
+    stub_log = open(os.path.join(workdir, f"stub-{mode}.log"), "wb")
+    api_log = open(os.path.join(workdir, f"api-{mode}.log"), "wb")
+    gotrue_port, api_port = free_port(), free_port()
+    stub = subprocess.Popen(
+        [sys.executable, "-m", "benchmarks.stub_gotrue", "--port", str(gotrue_port),
+         "--latency-ms", str(args.gotrue_latency_ms), "--users", os.path.join(workdir, "users.json")],
+        stdout=subprocess.DEVNULL, stderr=stub_log,
+    )
+    env = dict(os.environ, SUPABASE_URL=f"http://127.0.0.1:{gotrue_port}", SUPABASE_KEY="bench",
+               SUPABASE_JWT_SECRET=STUB_JWT_SECRET, GOTRUE_MAX_CONNECTIONS=str(args.gotrue_connections),
+               OVERLOAD_ENABLED="true" if enabled else "false",
+               RATE_LIMIT_USER_PER_SECOND="0", RATE_LIMIT_IP_PER_SECOND="0")
+    api = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(api_port),
+         "--log-level", "warning", "--backlog", "4096"],
+        env=env, stdout=subprocess.DEVNULL, stderr=api_log,
+    )
+    base_url = f"http://127.0.0.1:{api_port}"
+    results = []
+    try:
+        wait_ready(f"http://127.0.0.1:{gotrue_port}/auth/v1/.well-known/jwks.json", stub)
+        wait_ready(f"{base_url}/", api)
+        make_request = build_requests(profiles, random.Random(args.seed))[args.scenario]
+        for concurrency in args.levels:
+            result = asyncio.run(drive_level("127.0.0.1", api_port, make_request, concurrency, args.duration,
+                                             args.client_timeout, args.seed))
+            results.append(result)
+            print(f"{mode:<9} {concurrency:>6} {result['goodput_rps']:>9.1f} "
+                  f"{result.get('p50_ms', 0):>8.1f} {result.get('p99_ms', 0):>8.1f} "
+                  f"{result['shed']:>7} {result['timeout']:>8} {result['error']:>7}")
+            time.sleep(args.client_timeout)  # Let abandoned requests drain
+    finally:
+        api.terminate()
+        stub.terminate()
+        api.wait()
+        stub.wait()
+        api_log.close()
+        stub_log.close()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url")
+    parser.add_argument("--scenario", choices=SCENARIOS, default="login")
+    parser.add_argument("--levels", type=int, nargs="+", default=[8, 32, 128, 256], help="Concurrent clients")
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds per level")
+    parser.add_argument("--client-timeout", type=float, default=2.0)
+    parser.add_argument("--gotrue-latency-ms", type=float, default=200.0)
+    parser.add_argument("--gotrue-connections", type=int, default=8, help="The API's GoTrue connection pool")
+    parser.add_argument("--profiles", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--out", help="Write both runs to this JSON file")
+    args = parser.parse_args()
+    # Only what the scenarios need
+    args.sessions, args.strategies = 0, 2000
+
+    workdir = tempfile.mkdtemp(prefix="bench-overload-")
+    # Configure before anything from 'app' is imported
+    os.environ.update(DATABASE_URL=args.database_url or f"sqlite:///{workdir}/bench.db", ENV_FILE="",
+                      DEFAULT_BROKER="simulated")
+    profiles, counts = seed(args)
+    with open(os.path.join(workdir, "users.json"), "w") as f:
+        json.dump({p["email"]: str(p["id"]) for p in profiles}, f)
+
+    print(f"{args.scenario}, seeded {counts}, client timeout {args.client_timeout:.1f} s, "
+          f"GoTrue {args.gotrue_connections} connections x {args.gotrue_latency_ms:.0f} ms "
+          f"(~{args.gotrue_connections / args.gotrue_latency_ms * 1000:.0f} logins/s), logs in {workdir}")
+    print(f"{'shedding':<9} {'conc':>6} {'goodput':>9} {'p50 ms':>8} {'p99 ms':>8} {'shed':>7} {'timeout':>8} {'errors':>7}")
+    results = {"off": run_mode(args, False, profiles, workdir), "on": run_mode(args, True, profiles, workdir)}
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""
+Payoff/Greeks engine throughput: P&L curves + aggregate Greeks for N
+random 1-4 leg option strategies across several tickers in one batch.
+
+    python -m benchmarks.bench_payoff -n 10000 --points 101 --slices 0 0.5
+
+Run from the 'backend' folder. No database needed. Also times packing
+ORM-like strategy objects into a LegBook and a cached single-strategy call.
+"""
+import argparse
+import time
+import uuid
+from types import SimpleNamespace
+
+import numpy as np
+
+from app import payoff
+
+TICKERS = {"SPY": 500.0, "QQQ": 430.0, "IWM": 200.0, "AAPL": 190.0, "NVDA": 900.0}
+
+
+def random_strategies(n, rng):
+    tickers = list(TICKERS)
+    strategies = []
+    for _ in range(n):
+        ticker = tickers[rng.integers(len(tickers))]
+        spot = TICKERS[ticker]
+        legs = [
+            SimpleNamespace(
+                leg_index=i + 1,
+                action="buy" if rng.random() < 0.5 else "sell",
+                option_type="call" if rng.random() < 0.5 else "put",
+                quantity=int(rng.integers(1, 5)),
+                strike_mode="fixed",
+                strike_value=round(spot * rng.uniform(0.85, 1.15)),
+                expiration_days=int(rng.choice([7, 14, 30, 45, 60])),
+            )
+            for i in range(int(rng.integers(1, payoff.MAX_LEGS + 1)))
+        ]
+        strategies.append(SimpleNamespace(id=uuid.uuid4(), ticker=ticker, legs=legs))
+    return strategies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("-n", "--strategies", type=int, default=10000)
+    parser.add_argument("--points", type=int, default=payoff.DEFAULT_POINTS)
+    parser.add_argument("--slices", type=float, nargs="+", default=[0.0, 0.5])
+    parser.add_argument("--chunk", type=int, default=payoff.CHUNK_STRATEGIES)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(7)
+    strategies = random_strategies(args.strategies, rng)
+    snapshots = {t: payoff.MarketSnapshot(t, spot, as_of="bench", vol=0.25, rate=0.04) for t, spot in TICKERS.items()}
+
+    start = time.perf_counter()
+    book = payoff.LegBook.from_strategies(strategies, snapshots)
+    pack = time.perf_counter() - start
+
+    engine = payoff.PayoffEngine()
+    best = float("inf")
+    for _ in range(args.repeat):
+        start = time.perf_counter()
+        result = engine.evaluate(book, args.points, slices=args.slices, chunk=args.chunk)
+        best = min(best, time.perf_counter() - start)
+
+    # Single strategy, first call (miss) then cached
+    single = strategies[0]
+    start = time.perf_counter()
+    engine.evaluate_strategy(single, snapshots[single.ticker])
+    miss = time.perf_counter() - start
+    start = time.perf_counter()
+    engine.evaluate_strategy(single, snapshots[single.ticker])
+    hit = time.perf_counter() - start
+
+    slices = len(args.slices) + 1
+    legs = int((book.quantity != 0).sum())
+    evaluations = legs * slices * args.points
+    print(f"{args.strategies} strategies / {legs} legs x {slices} slices x {args.points} prices")
+    print(f"pack LegBook      : {pack * 1000:8.1f} ms")
+    print(f"batch evaluate    : {best * 1000:8.1f} ms  ({args.strategies / best:,.0f} strategies/s, "
+          f"{evaluations / best / 1e6:,.1f}M leg-prices/s)")
+    print(f"single (miss/hit) : {miss * 1000:8.3f} / {hit * 1000:.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+"""
+Live positions / P&L at scale: N accounts all trading the same strategies.
+
+  - fills     : apply_fill() rate (one position row + running totals)
+  - marks     : mark() rate, each moving every account holding the leg
+  - mixed     : fills and marks interleaved, like a live session
+  - reads     : a dashboard refresh (summary + a strategy + top accounts)
+                from the running totals vs. recomputing from the raw fills
+  - snapshot  : upsert of every position row, then a restart (load)
+
+    python -m benchmarks.bench_positions --accounts 10000 --strategies 10 --fills 200000
+    python -m benchmarks.bench_positions --database-url postgresql://...
+
+Run from the 'backend' folder. Defaults to a throwaway SQLite file.
+"""
+import argparse
+import asyncio
+import os
+import random
+import tempfile
+import time
+import uuid
+
+
+def _rate(count, seconds):
+    return f"{count / seconds:12,.0f}/s  ({seconds / count * 1e6:7.2f} us each)"
+
+
+async def run(args):
+    from app import positions
+
+    rng = random.Random(args.seed)
+    accounts = [uuid.uuid4() for _ in range(args.accounts)]
+    strategies = [uuid.uuid4() for _ in range(args.strategies)]
+    legs = [(strategy, leg) for strategy in strategies for leg in range(1, args.legs + 1)]
+    brokers = ["simulated", "ibkr", "tradier"]
+    broker_of = {account: brokers[i % len(brokers)] for i, account in enumerate(accounts)}
+
+    def fill(i):
+        account, (strategy, leg) = rng.choice(accounts), rng.choice(legs)
+        return positions.Fill(account, strategy, leg, rng.choice((-1, 1)) * rng.randint(1, 10),
+                              round(rng.uniform(90, 110), 2), broker_of[account], "SPY", "option", f"fill-{i}")
+
+    book = positions.PositionBook()
+    log = []
+
+    # Every account opens every leg once (the fan-out of one signal per strategy)
+    start = time.perf_counter()
+    for account in accounts:
+        for strategy, leg in legs:
+            log.append(positions.Fill(account, strategy, leg, 1.0, 100.0, broker_of[account], "SPY", "option"))
+            book.apply_fill(log[-1])
+    opened = time.perf_counter() - start
+
+    fills = [fill(i) for i in range(args.fills)]
+    start = time.perf_counter()
+    for item in fills:
+        book.apply_fill(item)
+    filled = time.perf_counter() - start
+    log.extend(fills)
+
+    marks = [(rng.choice(legs), round(rng.uniform(90, 110), 2)) for _ in range(args.marks)]
+    start = time.perf_counter()
+    for (strategy, leg), price in marks:
+        book.mark(strategy, leg, price)
+    marked = time.perf_counter() - start
+
+    mixed = [fill(args.fills + i) if i % 10 else None for i in range(args.fills // 4)]
+    start = time.perf_counter()
+    for item in mixed:
+        if item is None:
+            (strategy, leg), price = rng.choice(legs), round(rng.uniform(90, 110), 2)
+            book.mark(strategy, leg, price)
+        else:
+            book.apply_fill(item)
+    mixed_seconds = time.perf_counter() - start
+
+    def refresh(target):
+        target.summary()
+        target.strategy_detail(strategies[0])
+        target.ranked_accounts(limit=50)
+        target.ranked_accounts(strategies[0], limit=50, worst_first=True)
+
+    start = time.perf_counter()
+    for _ in range(args.reads):
+        refresh(book)
+    incremental = (time.perf_counter() - start) / args.reads
+
+    # Baseline: rebuild everything from the fill log, then answer the same reads
+    start = time.perf_counter()
+    rebuilt = positions.PositionBook()
+    for item in log:
+        rebuilt.apply_fill(item._replace(fill_id=None))
+    refresh(rebuilt)
+    from_fills = time.perf_counter() - start
+
+    running_total = book.totals()["total"]
+    book.recompute()
+    drift = abs(running_total - book.totals()["total"])
+
+    book.restored = True
+    rows = len(book._dirty_positions)
+    start = time.perf_counter()
+    await book.snapshot()
+    saved = time.perf_counter() - start
+
+    restarted = positions.PositionBook()
+    start = time.perf_counter()
+    await restarted.load()
+    loaded = time.perf_counter() - start
+    same = abs(restarted.totals()["total"] - book.totals()["total"]) < 1e-6 * max(1.0, abs(book.totals()["total"]))
+
+    print(f"{args.accounts} accounts x {len(legs)} legs = {book.positions.size} positions, {len(log)} fills in the log")
+    print(f"open legs : {_rate(book.positions.size, opened)}")
+    print(f"fills     : {_rate(len(fills), filled)}")
+    print(f"marks     : {_rate(len(marks), marked)}  ({args.accounts} holders each)")
+    print(f"mixed     : {_rate(len(mixed), mixed_seconds)}  (9 fills : 1 mark)")
+    print(f"refresh   : {incremental * 1000:9.2f} ms from running totals vs {from_fills * 1000:9.1f} ms "
+          f"from raw fills ({from_fills / incremental:,.0f}x); drift before re-sum {drift:.2e}")
+    print(f"snapshot  : {rows} rows in {saved:.2f} s, restart (load) in {loaded:.2f} s, totals match: {same}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--accounts", type=int, default=10000)
+    parser.add_argument("--strategies", type=int, default=10)
+    parser.add_argument("--legs", type=int, default=2, help="Legs per strategy")
+    parser.add_argument("--fills", type=int, default=200000)
+    parser.add_argument("--marks", type=int, default=5000)
+    parser.add_argument("--reads", type=int, default=20, help="Dashboard refreshes timed")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--database-url")
+    args = parser.parse_args()
+
+    # Configure before the app (and its engines) are imported
+    os.environ["DATABASE_URL"] = args.database_url or f"sqlite:///{tempfile.mkdtemp()}/bench.db"
+    from app import bootstrap, database
+
+    with database.get_engine().begin() as connection:
+        bootstrap.create_schema(connection)
+
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+"""
+CPU per request of the list endpoints: ORM + response_model vs. the
+ORM-bypass read path (app/readpath.py).
+
+Seeds --strategies strategies (drawn from --distinct leg sets) and --users
+profiles, then walks every page of GET /strategies/ and GET /users/ both ways:
+  - orm  : crud.list_*_async, then validate + encode through the response
+           model, exactly what FastAPI does with response_model
+  - core : readpath.strategy_page / user_page (Core rows -> orjson)
+Every page is compared byte for byte; a mismatch aborts the run. Reports
+process CPU time per page request (query + shaping + encoding, no HTTP).
+
+    python -m benchmarks.bench_read_path --strategies 20000 --users 5000 --limit 100
+    python -m benchmarks.bench_read_path --database-url postgresql://...
+
+Run from the 'backend' folder. Defaults to a throwaway SQLite file.
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import tempfile
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+
+from benchmarks.bench_templates import leg_set
+
+
+async def seed(args):
+    from sqlalchemy import insert
+    from app import crud, database, models, schemas
+
+    # Explicit, distinct created_at (as in benchmarks/loadtest.py) so keyset pages advance
+    rng = random.Random(args.seed)
+    start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    users = [uuid.uuid4() for _ in range(args.users)]
+    async with database.AsyncSessionLocal() as db:
+        await db.execute(insert(models.Profile), [
+            {"id": u, "email": f"bench-{u.hex}@example.com", "first_name": f"First{i}", "last_name": f"Last{i}",
+             "role": rng.choice(["admin", "analyst", "account_manager"]), "multiplier": rng.choice([1, 1.5, 2, 3]),
+             "telegram_id": str(rng.randint(10 ** 8, 10 ** 9)), "is_active": True,
+             "created_at": start + timedelta(seconds=i)}
+            for i, u in enumerate(users)])
+
+        # Leg sets through the normal template path, strategy rows directly
+        sets = [schemas.StrategyCreate(name=None, ticker=rng.choice(["SPY", "QQQ", "IWM"]), instrument_type="option",
+                                       legs=[schemas.StrategyLegBase(**leg) for leg in leg_set(rng)])
+                for _ in range(args.distinct)]
+        template_ids = await crud.get_or_create_templates_async(db, sets)
+        rows = []
+        for i in range(args.strategies):
+            k = rng.randrange(args.distinct)
+            rows.append({"id": uuid.uuid4(), "user_id": rng.choice(users), "name": f"s{i}", "ticker": sets[k].ticker,
+                         "instrument_type": "option", "is_active": rng.random() < 0.9,
+                         "template_id": template_ids[k], "created_at": start + timedelta(seconds=i)})
+        for offset in range(0, len(rows), 5000):
+            await db.execute(insert(models.Strategy), rows[offset:offset + 5000])
+        await db.commit()
+
+
+async def walk(fetch, limit):
+    """CPU seconds of every page of one listing, plus the bodies."""
+    from app import database
+
+    cpu, bodies, cursor = [], [], None
+    while True:
+        async with database.AsyncSessionLocal() as db:
+            start = time.process_time()
+            body, cursor = await fetch(db, cursor, limit)
+            cpu.append(time.process_time() - start)
+        bodies.append(body)
+        if not cursor:
+            return cpu, bodies
+
+
+async def run(args):
+    from pydantic import TypeAdapter
+    from app import crud, readpath, schemas
+
+    await seed(args)
+    strategy_list = TypeAdapter(list[schemas.StrategyResponse])
+    user_list = TypeAdapter(list[schemas.UserResponse])
+
+    async def orm_strategies(db, cursor, limit):
+        page, next_cursor = await crud.list_strategies_async(db, cursor=cursor, limit=limit)
+        return strategy_list.dump_json(strategy_list.validate_python(page, from_attributes=True)), next_cursor
+
+    async def core_strategies(db, cursor, limit):
+        return await readpath.strategy_page(db, cursor=cursor, limit=limit)
+
+    async def orm_users(db, cursor, limit):
+        page, next_cursor, _ = await crud.list_users_async(db, cursor=cursor, limit=limit, with_total=False)
+        return user_list.dump_json(user_list.validate_python(page, from_attributes=True)), next_cursor
+
+    async def core_users(db, cursor, limit):
+        body, next_cursor, _ = await readpath.user_page(db, cursor=cursor, limit=limit, with_total=False)
+        return body, next_cursor
+
+    print(f"{'endpoint':<12} {'pages':>6} {'orm ms/req':>11} {'core ms/req':>12} {'saved':>7}")
+    for name, orm, core in [("/strategies/", orm_strategies, core_strategies), ("/users/", orm_users, core_users)]:
+        orm_cpu, core_cpu = [], []
+        for _ in range(args.repeat):
+            cpu, expected = await walk(orm, args.limit)
+            orm_cpu += cpu
+            cpu, bodies = await walk(core, args.limit)
+            core_cpu += cpu
+            mismatched = sum(a != b for a, b in zip(expected, bodies)) + abs(len(expected) - len(bodies))
+            if mismatched:
+                raise SystemExit(f"{name}: {mismatched} of {len(expected)} pages differ from the response_model output")
+        orm_ms, core_ms = statistics.median(orm_cpu) * 1000, statistics.median(core_cpu) * 1000
+        print(f"{name:<12} {len(bodies):>6} {orm_ms:>11.2f} {core_ms:>12.2f} {1 - core_ms / orm_ms:>7.0%}")
+    print("bodies identical on every page")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--strategies", type=int, default=20000)
+    parser.add_argument("--users", type=int, default=5000)
+    parser.add_argument("--distinct", type=int, default=500, help="Distinct leg sets")
+    parser.add_argument("--limit", type=int, default=100, help="Page size")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--database-url")
+    args = parser.parse_args()
+
+    # Configure before the app (and its engines) are imported
+    os.environ["DATABASE_URL"] = args.database_url or f"sqlite:///{tempfile.mkdtemp()}/bench.db"
+    from app import bootstrap, database
+
+    with database.get_engine().begin() as connection:
+        bootstrap.create_schema(connection)
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""
+Order-status reconciliation after a fan-out: N accounts x legs child orders
+spread over several simulated brokers (latency, error rate, per-broker rate
+limit), stored in broker_orders.
+
+  - one by one : each account's orders polled in turn, one request per
+                 account (timed on a sample, extrapolated to all accounts)
+  - sweep      : app/reconcile.py, all brokers concurrently, batched status
+                 requests, diff by client order id, batched UPDATEs
+
+    python -m benchmarks.bench_reconcile --accounts 2000 --brokers 4 --latency-ms 50
+    python -m benchmarks.bench_reconcile --database-url postgresql://...
+
+Run from the 'backend' folder. Defaults to a throwaway SQLite file.
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+import uuid
+
+from benchmarks.bench_fanout import make_strategy
+
+
+async def run(args):
+    from sqlalchemy import func, select
+    from app import crud, database, models, positions
+    from app.brokers import Account, SimulatedBroker
+    from app.fanout import FanOutEngine
+    from app.reconcile import Reconciler
+
+    adapters = {}
+    for b in range(args.brokers):
+        broker = SimulatedBroker(name=f"sim-{b}", latency=0, jitter=0, error_rate=0, seed=b,
+                                 fill_rate=args.fill_rate, partial_rate=args.partial_rate,
+                                 max_concurrency=args.concurrency, status_batch_size=args.batch_size,
+                                 status_rate_limit=args.rate)
+        adapters[broker.name] = broker
+    names = list(adapters)
+    accounts = [Account(id=uuid.uuid4(), multiplier=1 + i % 4, broker=names[i % len(names)])
+                for i in range(args.accounts)]
+
+    # Place the orders (no latency), store them, then turn the brokers' latency / errors on
+    result = await FanOutEngine(adapters).fan_out(make_strategy(args.legs), accounts)
+    async with database.AsyncSessionLocal() as db:
+        await crud.create_broker_orders_async(db, result.orders, result.acks)
+        await db.commit()
+    for broker in adapters.values():
+        broker.latency, broker.jitter, broker.error_rate = args.latency_ms / 1000, args.latency_ms / 10000, args.error_rate
+
+    # One by one: a request per account, sequentially
+    by_account = {}
+    for order in result.orders:
+        by_account.setdefault(order.account_id, []).append(order.client_order_id)
+    sample = accounts[:args.baseline_accounts]
+    start = time.perf_counter()
+    for account in sample:
+        try:
+            await adapters[account.broker].get_order_states(by_account[account.id])
+        except Exception:
+            pass
+    one_by_one = (time.perf_counter() - start) / len(sample) * len(accounts)
+
+    book = positions.PositionBook()
+    reconciler = Reconciler(adapters, update_batch=args.update_batch, book=book)
+    print(f"{len(result.orders)} orders, {args.accounts} accounts on {args.brokers} brokers, "
+          f"latency {args.latency_ms:.0f} ms, {args.rate:.0f} req/s and {args.concurrency} in flight per broker, "
+          f"{args.batch_size} orders per request, error rate {args.error_rate:.0%}")
+    print(f"one by one : ~{one_by_one:7.2f} s per sweep (from {len(sample)} accounts)")
+    for sweep in range(1, args.sweeps + 1):
+        report = await reconciler.sweep()
+        print(f"sweep {sweep}    : {report.elapsed_ms / 1000:7.2f} s  ({report.orders} open, {report.requests} requests, "
+              f"{report.failed_requests} failed, {report.changed} changed, {report.filled} filled; "
+              f"load {report.load_ms:.0f} / poll {report.poll_ms:.0f} / apply {report.apply_ms:.0f} ms)")
+
+    async with database.AsyncSessionLocal() as db:
+        statuses = dict((await db.execute(
+            select(models.BrokerOrder.status, func.count()).group_by(models.BrokerOrder.status)
+        )).all())
+    print(f"stored     : {statuses}; position book {book.stats()['fills']} fills, "
+          f"realized + unrealized {book.totals()['total']:.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--accounts", type=int, default=2000)
+    parser.add_argument("--legs", type=int, default=2)
+    parser.add_argument("--brokers", type=int, default=4)
+    parser.add_argument("--latency-ms", type=float, default=50.0)
+    parser.add_argument("--error-rate", type=float, default=0.01)
+    parser.add_argument("--rate", type=float, default=20.0, help="Status requests per second, per broker")
+    parser.add_argument("--concurrency", type=int, default=10, help="Status requests in flight, per broker")
+    parser.add_argument("--batch-size", type=int, default=50, help="Orders per status request")
+    parser.add_argument("--fill-rate", type=float, default=0.4)
+    parser.add_argument("--partial-rate", type=float, default=0.3)
+    parser.add_argument("--update-batch", type=int, default=1000)
+    parser.add_argument("--sweeps", type=int, default=3)
+    parser.add_argument("--baseline-accounts", type=int, default=50)
+    parser.add_argument("--database-url")
+    args = parser.parse_args()
+
+    # Configure before the app (and its engines) are imported
+    os.environ["DATABASE_URL"] = args.database_url or f"sqlite:///{tempfile.mkdtemp()}/bench.db"
+    from app import bootstrap, database
+
+    with database.get_engine().begin() as connection:
+        bootstrap.create_schema(connection)
+
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,174 @@
+"""
+Leg-set templates: storage and clone cost vs. copying legs per strategy.
+
+Seeds N strategies drawn from K distinct leg sets (a few popular signals
+cloned across many users), then compares:
+  - rows / bytes: strategy_legs + strategy_templates vs. a per-strategy
+    copy of every leg (the pre-template layout, rebuilt in a scratch table)
+  - clone to M users: one INSERT of M strategy rows vs. M rows + M x legs
+  - "strategies equivalent to X": first page via the template index
+
+    python -m benchmarks.bench_templates -n 100000 --distinct 500 --clone-users 500
+    python -m benchmarks.bench_templates --database-url postgresql://...
+
+Run from the 'backend' folder. Defaults to a throwaway SQLite file.
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import tempfile
+import time
+import uuid
+
+LEGACY_TABLE = "bench_legacy_strategy_legs"
+
+
+def leg_set(rng):
+    return [
+        {
+            "leg_index": i + 1,
+            "action": rng.choice(["buy", "sell"]),
+            "option_type": rng.choice(["call", "put"]),
+            "quantity": rng.randint(1, 5),
+            "strike_mode": "delta",
+            "strike_value": round(rng.uniform(0.1, 0.5), 2),
+            "expiration_days": rng.choice([7, 14, 30, 45, 60]),
+        }
+        for i in range(rng.randint(1, 4))
+    ]
+
+
+async def table_bytes(db, names):
+    from sqlalchemy import text
+
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        return {name: await db.scalar(text("SELECT pg_total_relation_size(:t)"), {"t": name}) for name in names}
+    try:
+        # SQLite: tables + their indexes, when the dbstat module is compiled in
+        sizes = {}
+        for name in names:
+            sizes[name] = await db.scalar(text(
+                "SELECT SUM(pgsize) FROM dbstat WHERE name = :t "
+                "OR name IN (SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = :t)"), {"t": name})
+        return sizes
+    except Exception:
+        return None
+
+
+async def run(args):
+    from sqlalchemy import Column, MetaData, Table, func, insert, select
+    from sqlalchemy.dialects.postgresql import UUID
+    from app import crud, database, models, schemas
+
+    rng = random.Random(args.seed)
+    sets = [(rng.choice(["SPY", "QQQ", "IWM"]), leg_set(rng)) for _ in range(args.distinct)]
+    users = [uuid.uuid4() for _ in range(args.users)]
+
+    async with database.AsyncSessionLocal() as db:
+        await db.execute(insert(models.Profile), [
+            {"id": u, "email": f"bench-{u.hex}@example.com", "role": "admin", "telegram_id": None} for u in users])
+        await db.commit()
+
+    # 1. Seed through the normal bulk path (dedups into templates)
+    start = time.perf_counter()
+    for offset in range(0, args.strategies, 1000):
+        batch = [
+            schemas.StrategyCreate(name=f"s{i}", ticker=ticker, instrument_type="option",
+                                   legs=[schemas.StrategyLegBase(**leg) for leg in legs])
+            for i in range(offset, min(offset + 1000, args.strategies))
+            for ticker, legs in [sets[min(int(rng.paretovariate(1.2)) - 1, args.distinct - 1)]]
+        ]
+        async with database.AsyncSessionLocal() as db:
+            await crud.bulk_create_strategies_async(db, batch, users[(offset // 1000) % len(users)])
+    seed_time = time.perf_counter() - start
+
+    # 2. The pre-template layout for comparison: every strategy carries its own legs
+    legacy_table = Table(LEGACY_TABLE, MetaData(),
+                         Column("id", UUID(as_uuid=True), primary_key=True),
+                         Column("strategy_id", UUID(as_uuid=True), nullable=False, index=True),
+                         *(Column(column.name, column.type, nullable=column.nullable)
+                           for column in models.StrategyLeg.__table__.columns
+                           if column.name not in ("id", "template_id")))
+    leg_columns = [c.name for c in legacy_table.columns if c.name not in ("id", "strategy_id")]
+    async with database.AsyncSessionLocal() as db:
+        await db.run_sync(lambda session: legacy_table.drop(session.connection(), checkfirst=True))
+        await db.run_sync(lambda session: legacy_table.create(session.connection()))
+        rows = (await db.execute(
+            select(models.Strategy.id, *(models.StrategyLeg.__table__.c[c] for c in leg_columns))
+            .join(models.StrategyLeg, models.StrategyLeg.template_id == models.Strategy.template_id))).all()
+        legacy = [{"id": uuid.uuid4(), "strategy_id": r.id, **{c: getattr(r, c) for c in leg_columns}} for r in rows]
+        for offset in range(0, len(legacy), 5000):
+            await db.execute(insert(legacy_table), legacy[offset:offset + 5000])
+        await db.commit()
+
+        counts = {}
+        for name, model in [("strategies", models.Strategy), ("strategy_templates", models.StrategyTemplate),
+                            ("strategy_legs", models.StrategyLeg)]:
+            counts[name] = await db.scalar(select(func.count()).select_from(model))
+        sizes = await table_bytes(db, ["strategy_templates", "strategy_legs", LEGACY_TABLE])
+
+    print(f"seeded {counts['strategies']:,} strategies from {args.distinct} leg sets in {seed_time:.1f} s")
+    print(f"leg rows      : {counts['strategy_legs']:,} in {counts['strategy_templates']:,} templates "
+          f"vs {len(legacy):,} copied per strategy ({len(legacy) / max(1, counts['strategy_legs']):,.0f}x)")
+    if sizes:
+        templated = sizes["strategy_templates"] + sizes["strategy_legs"]
+        print(f"leg storage   : {templated / 1e6:,.2f} MB (templates + legs) vs {sizes[LEGACY_TABLE] / 1e6:,.2f} MB "
+              f"({sizes[LEGACY_TABLE] / max(1, templated):,.1f}x smaller)")
+
+    # 3. Clone latency: share the template vs. copy the legs
+    async with database.AsyncSessionLocal() as db:
+        source = await crud.get_strategy_async(db, (await db.scalar(select(models.Strategy.id)
+                                                                    .order_by(models.Strategy.id).limit(1))))
+        source_legs = [{c: getattr(leg, c) for c in leg_columns} for leg in source.legs]
+        targets = (users * (args.clone_users // len(users) + 1))[:args.clone_users]
+
+        shared, copied = [], []
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            await crud.clone_strategy_async(db, source, targets)
+            shared.append(time.perf_counter() - start)
+
+            start = time.perf_counter()
+            rows = [{"id": uuid.uuid4(), "user_id": u, "name": source.name, "ticker": source.ticker,
+                     "instrument_type": source.instrument_type, "is_active": True,
+                     "template_id": source.template_id} for u in targets]
+            await db.execute(insert(models.Strategy), rows)
+            await db.execute(insert(legacy_table), [
+                {"id": uuid.uuid4(), "strategy_id": row["id"], **leg} for row in rows for leg in source_legs])
+            await db.commit()
+            copied.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        page, _ = await crud.list_strategies_async(db, template_id=source.template_id, limit=50)
+        lookup = time.perf_counter() - start
+
+    print(f"clone x{args.clone_users:<6}: {statistics.median(shared) * 1000:8.1f} ms shared template vs "
+          f"{statistics.median(copied) * 1000:8.1f} ms copying {len(source_legs)} legs each")
+    print(f"equivalents   : first {len(page)} in {lookup * 1000:.1f} ms (template index)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("-n", "--strategies", type=int, default=100000)
+    parser.add_argument("--distinct", type=int, default=500, help="Distinct leg sets")
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--clone-users", type=int, default=500)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=3)
+    parser.add_argument("--database-url")
+    args = parser.parse_args()
+
+    # Configure before the app (and its engines) are imported
+    os.environ["DATABASE_URL"] = args.database_url or f"sqlite:///{tempfile.mkdtemp()}/bench.db"
+    from app import bootstrap, database
+
+    with database.get_engine().begin() as connection:
+        bootstrap.create_schema(connection)
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
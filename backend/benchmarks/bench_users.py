@@ -0,0 +1,152 @@
+"""
+User directory listing on a seeded profiles table (1M rows by default):
+OFFSET vs keyset pages at increasing depth, filtered search, and the
+approximate total vs COUNT(*).
+
+    python -m benchmarks.bench_users
+    python -m benchmarks.bench_users --rows 200000 --database-url postgresql://...
+
+Run from the 'backend' folder. Defaults to a throwaway SQLite file (no trigram
+indexes there, so search is a scan); pass --database-url to measure Postgres.
+Seeding is skipped if the table already holds at least --rows profiles.
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+
+ROLES = ["analyst", "analyst", "analyst", "account_manager", "admin"]
+FIRST_NAMES = ["Ann", "Bob", "Chen", "Dana", "Eve", "Farid", "Gita", "Hugo"]
+
+
+def seed(engine, models, rows, chunk=20000):
+    from sqlalchemy import func, insert, select
+
+    with engine.begin() as conn:
+        existing = conn.execute(select(func.count()).select_from(models.Profile)).scalar_one()
+    if existing >= rows:
+        return 0
+
+    start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    table = models.Profile.__table__
+    for offset in range(existing, rows, chunk):
+        batch = [
+            {
+                "id": uuid.uuid4(),
+                "email": f"user{i:07d}@bench.local",
+                "first_name": FIRST_NAMES[i % len(FIRST_NAMES)],
+                "last_name": f"Trader{i % 9973}",
+                "role": ROLES[i % len(ROLES)],
+                "is_active": i % 10 != 0,
+                "multiplier": 1.0,
+                # Explicit and distinct: keyset order must be total
+                "created_at": start + timedelta(seconds=i),
+            }
+            for i in range(offset, min(offset + chunk, rows))
+        ]
+        with engine.begin() as conn:
+            conn.execute(insert(table), batch)
+    with engine.begin() as conn:
+        if engine.dialect.name == "postgresql":
+            conn.exec_driver_sql("ANALYZE profiles")
+        else:
+            conn.exec_driver_sql("ANALYZE")
+    return rows - existing
+
+
+async def timed(coro_factory, repeat):
+    best = float("inf")
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = await coro_factory()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000, result
+
+
+async def run(args):
+    from sqlalchemy import func, select
+    from app import crud, database, models, pagination
+
+    async with database.AsyncSessionLocal() as db:
+        print(f"{'page':>8}  {'OFFSET ms':>10}  {'keyset ms':>10}")
+        cursor = None
+        page = 0
+        checkpoints = set(args.pages)
+        while page <= max(checkpoints):
+            if page in checkpoints:
+                query = select(models.Profile).order_by(models.Profile.created_at.desc(), models.Profile.id.desc())
+
+                async def by_offset():
+                    rows = await db.execute(query.offset(page * args.limit).limit(args.limit))
+                    return rows.scalars().all()
+
+                async def by_keyset():
+                    return await crud.list_users_async(db, cursor=cursor, limit=args.limit, with_total=False)
+
+                offset_ms, _ = await timed(by_offset, args.repeat)
+                keyset_ms, _ = await timed(by_keyset, args.repeat)
+                print(f"{page:>8}  {offset_ms:>10.2f}  {keyset_ms:>10.2f}")
+                db.expunge_all()
+            # Walk the cursor chain cheaply to the next checkpoint
+            _, cursor, _ = await crud.list_users_async(db, cursor=cursor, limit=args.limit, with_total=False)
+            db.expunge_all()
+            page += 1
+            if cursor is None:
+                break
+
+        print()
+        print(f"{'filters':<36}  {'page ms':>8}  {'estimate ms':>11}  {'estimate':>9}  {'COUNT(*) ms':>11}  {'exact':>9}")
+        for label, filters in [
+            ("none", {}),
+            ("role=admin", {"role": "admin"}),
+            ("is_active=false", {"is_active": False}),
+            ("search='user00042'", {"search": "user00042"}),
+            ("role=analyst search='trader42'", {"role": "analyst", "search": "trader42"}),
+        ]:
+            query = crud._user_filters(select(models.Profile), **filters)
+
+            async def page_only():
+                return await crud.list_users_async(db, limit=args.limit, with_total=False, **filters)
+
+            async def exact():
+                rows = await db.execute(select(func.count()).select_from(query.subquery()))
+                return rows.scalar_one()
+
+            page_ms, _ = await timed(page_only, args.repeat)
+            estimate_ms, estimate = await timed(lambda: pagination.estimate_count(db, query), args.repeat)
+            exact_ms, count = await timed(exact, args.repeat)
+            db.expunge_all()
+            print(f"{label:<36}  {page_ms:>8.2f}  {estimate_ms:>11.2f}  {estimate:>9}  {exact_ms:>11.2f}  {count:>9}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--limit", type=int, default=100)
+    parser.add_argument("--pages", type=int, nargs="+", default=[0, 10, 100, 1000, 5000])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--database-url")
+    args = parser.parse_args()
+
+    # Configure before the app (and its engines) are imported
+    os.environ["DATABASE_URL"] = args.database_url or f"sqlite:///{tempfile.mkdtemp()}/bench.db"
+    os.environ.pop("SUPABASE_URL", None)
+
+    from app import bootstrap, database, models
+    with database.engine.begin() as connection:
+        bootstrap.create_schema(connection)
+
+    start = time.perf_counter()
+    seeded = seed(database.engine, models, args.rows)
+    if seeded:
+        print(f"seeded {seeded} profiles in {time.perf_counter() - start:.1f} s")
+
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,401 @@
+"""
+Offline load test: seeds a database, starts the API (uvicorn) against a local
+stub GoTrue, drives the main endpoints at a fixed concurrency and writes
+throughput and p50/p95/p99 latency per scenario to a JSON file.
+
+    python -m benchmarks.loadtest --out results.json
+    python -m benchmarks.loadtest --database-url postgresql://... -c 64 --duration 20
+    python -m benchmarks.loadtest --compare baseline.json --tolerance 0.15
+
+Run from the 'backend' folder. Without --database-url a throwaway SQLite file
+is used. With --compare the run is checked against a stored result file:
+throughput lower or p95 higher by more than --tolerance is a regression and
+the exit status is 1. Keep baselines per machine and database: the numbers
+are only comparable on the same setup.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+
+import httpx
+
+from benchmarks.stub_gotrue import STUB_JWT_SECRET, make_access_token
+
+SCENARIOS = ["login", "create_strategy", "list_strategies", "list_users"]
+TICKERS = ["SPY", "QQQ", "IWM", "AAPL", "MSFT", "NVDA", "TSLA", "AMZN"]
+ROLES = ["analyst"] * 6 + ["account_manager"] * 3 + ["admin"]
+PASSWORD = "loadtest-password"
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def wait_ready(url, process, timeout=60.0):
+    start = time.perf_counter()
+    while time.perf_counter() - start < timeout:
+        if process.poll() is not None:
+            output = process.stderr.read().decode()[-1000:] if process.stderr else "see its log"
+            raise RuntimeError(f"{url} exited: {output}")
+        try:
+            httpx.get(url, timeout=1.0)
+            return
+        except httpx.TransportError:
+            time.sleep(0.05)
+    raise RuntimeError(f"{url} did not come up within {timeout} s")
+
+
+# --- SEEDING ---
+
+def legs_for(n, rng):
+    return [
+        {
+            "leg_index": i + 1,
+            "action": rng.choice(["buy", "sell"]),
+            "option_type": rng.choice(["call", "put"]),
+            "quantity": rng.randint(1, 10),
+            "strike_mode": "delta",
+            "strike_value": round(rng.uniform(0.1, 0.5), 2),
+            "expiration_days": rng.choice([7, 14, 30, 45, 60]),
+        }
+        for i in range(n)
+    ]
+
+
+def seed(args):
+    """Profiles, sessions, strategies and legs in bulk. Returns the driver accounts."""
+    from sqlalchemy import insert
+    from app import bootstrap, database, legsets, models
+
+    rng = random.Random(args.seed)
+    engine = database.get_engine()
+    with engine.begin() as connection:
+        bootstrap.create_schema(connection)
+
+    start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    profiles = [
+        {
+            "id": uuid.uuid4(),
+            "email": f"user{i:06d}@example.com",
+            "first_name": f"First{i % 500}",
+            "last_name": f"Last{i % 997}",
+            "role": "super_admin" if i == 0 else ROLES[i % len(ROLES)],
+            "is_active": True,
+            "multiplier": rng.choice([1.0, 1.0, 1.5, 2.0]),
+            # Explicit and distinct so keyset pages are stable on every backend
+            "created_at": start + timedelta(seconds=i),
+        }
+        for i in range(args.profiles)
+    ]
+    sessions = [
+        {
+            "id": uuid.uuid4(),
+            "user_id": profiles[rng.randrange(args.profiles)]["id"],
+            "login_time": start + timedelta(seconds=rng.randrange(10_000_000)),
+            "logout_time": None,
+            "ip_address": f"10.0.{rng.randrange(256)}.{rng.randrange(256)}",
+            "user_agent": "loadtest",
+        }
+        for _ in range(args.sessions)
+    ]
+    for row in sessions[: len(sessions) * 9 // 10]:
+        row["logout_time"] = row["login_time"] + timedelta(minutes=rng.randrange(1, 600))
+
+    strategies, templates, legs = [], {}, []
+    for i in range(args.strategies):
+        ticker = rng.choice(TICKERS)
+        leg_set = legs_for(rng.randint(1, 4), rng)
+        digest = legsets.content_hash(ticker, "option", leg_set)
+        if digest not in templates:
+            templates[digest] = {"id": uuid.uuid4(), "content_hash": digest, "ticker": ticker,
+                                 "instrument_type": "option", "leg_count": len(leg_set)}
+            legs.extend({"id": uuid.uuid4(), "template_id": templates[digest]["id"], **leg} for leg in leg_set)
+        strategies.append({
+            "id": uuid.uuid4(),
+            "user_id": profiles[i % args.profiles]["id"],
+            "name": f"seed-{i}",
+            "ticker": ticker,
+            "instrument_type": "option",
+            "is_active": rng.random() < 0.8,
+            "created_at": start + timedelta(seconds=i),
+            "template_id": templates[digest]["id"],
+        })
+
+    chunk = 5000
+    with engine.begin() as connection:
+        for table, rows in [(models.Profile, profiles), (models.UserSession, sessions),
+                            (models.StrategyTemplate, list(templates.values())),
+                            (models.Strategy, strategies), (models.StrategyLeg, legs)]:
+            for offset in range(0, len(rows), chunk):
+                connection.execute(insert(table.__table__), rows[offset:offset + chunk])
+    engine.dispose()
+
+    counts = {"profiles": len(profiles), "sessions": len(sessions),
+              "strategies": len(strategies), "templates": len(templates), "legs": len(legs)}
+    return profiles, counts
+
+
+# --- SCENARIOS ---
+
+def strategy_payload(rng):
+    n = rng.randint(1, 4)
+    return {
+        "name": f"load-{uuid.uuid4().hex[:8]}",
+        "ticker": rng.choice(TICKERS),
+        "instrument_type": "option",
+        "legs": [
+            {
+                "leg_index": i + 1,
+                "action": rng.choice(["buy", "sell"]),
+                "option_type": rng.choice(["call", "put"]),
+                "quantity": rng.randint(1, 10),
+                "strike_mode": "delta",
+                "strike_value": round(rng.uniform(0.1, 0.5), 2),
+                "expiration_days": rng.choice([7, 14, 30, 45]),
+            }
+            for i in range(n)
+        ],
+    }
+
+
+def build_requests(profiles, rng):
+    """Scenario name -> function(rng) returning (method, path, kwargs)."""
+    admin = profiles[0]
+    traders = profiles[1:] or profiles
+    tokens = {}
+
+    def auth(profile):
+        token = tokens.get(profile["id"])
+        if token is None:
+            token = tokens[profile["id"]] = make_access_token(profile["id"], profile["email"], ttl=86400)
+        return {"Authorization": f"Bearer {token}"}
+
+    def login(rng):
+        profile = rng.choice(traders)
+        return "POST", "/auth/login", {"json": {"email": profile["email"], "password": PASSWORD}}
+
+    def create_strategy(rng):
+        return "POST", "/strategies/", {"headers": auth(rng.choice(traders)), "json": strategy_payload(rng)}
+
+    def list_strategies(rng):
+        params = {"limit": 50}
+        if rng.random() < 0.5:
+            params["ticker"] = rng.choice(TICKERS)
+        return "GET", "/strategies/", {"headers": auth(rng.choice(traders)), "params": params}
+
+    def list_users(rng):
+        params = {"limit": 50}
+        if rng.random() < 0.3:
+            params["role"] = "analyst"
+        return "GET", "/users/", {"headers": auth(admin), "params": params}
+
+    return {"login": login, "create_strategy": create_strategy,
+            "list_strategies": list_strategies, "list_users": list_users}
+
+
+async def run_scenario(client, make_request, concurrency, duration, warmup, seed):
+    latencies = []
+    errors = 0
+    statuses = {}
+    deadline_warmup = time.perf_counter() + warmup
+    deadline = deadline_warmup + duration
+
+    async def worker(worker_id):
+        nonlocal errors
+        rng = random.Random(seed * 1000 + worker_id)
+        while True:
+            now = time.perf_counter()
+            if now >= deadline:
+                return
+            method, path, kwargs = make_request(rng)
+            start = time.perf_counter()
+            try:
+                response = await client.request(method, path, **kwargs)
+                status = response.status_code
+            except httpx.HTTPError:
+                status = "error"
+            elapsed = time.perf_counter() - start
+            if start < deadline_warmup:
+                continue
+            statuses[status] = statuses.get(status, 0) + 1
+            if status == "error" or status >= 400:
+                errors += 1
+            else:
+                latencies.append(elapsed)
+
+    await asyncio.gather(*(worker(i) for i in range(concurrency)))
+    return summarize(latencies, errors, statuses, duration)
+
+
+def summarize(latencies, errors, statuses, duration):
+    result = {
+        "requests": len(latencies) + errors,
+        "errors": errors,
+        "statuses": {str(k): v for k, v in sorted(statuses.items(), key=str)},
+        "throughput_rps": round(len(latencies) / duration, 1),
+    }
+    if len(latencies) >= 2:
+        cuts = statistics.quantiles(latencies, n=100, method="inclusive")
+        result.update({
+            "mean_ms": round(statistics.fmean(latencies) * 1000, 2),
+            "p50_ms": round(cuts[49] * 1000, 2),
+            "p95_ms": round(cuts[94] * 1000, 2),
+            "p99_ms": round(cuts[98] * 1000, 2),
+        })
+    return result
+
+
+async def drive(args, base_url, profiles):
+    rng = random.Random(args.seed)
+    requests = build_requests(profiles, rng)
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    results = {}
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=30.0) as client:
+        for name in args.scenarios:
+            results[name] = await run_scenario(client, requests[name], args.concurrency,
+                                               args.duration, args.warmup, args.seed)
+            print_row(name, results[name])
+    return results
+
+
+# --- REPORTING ---
+
+def print_row(name, r):
+    print(f"{name:<18} {r['requests']:>8} {r['errors']:>7} {r['throughput_rps']:>10.1f} "
+          f"{r.get('p50_ms', 0):>9.2f} {r.get('p95_ms', 0):>9.2f} {r.get('p99_ms', 0):>9.2f}")
+
+
+def compare(current, baseline, tolerance):
+    """Print the deltas; return the list of regressions."""
+    regressions = []
+    print()
+    print(f"{'scenario':<18} {'rps base':>10} {'rps now':>10} {'p95 base':>10} {'p95 now':>10}  verdict")
+    for name, now in current["scenarios"].items():
+        base = baseline.get("scenarios", {}).get(name)
+        if base is None or "p95_ms" not in base or "p95_ms" not in now:
+            print(f"{name:<18} {'-':>10} {now['throughput_rps']:>10.1f} {'-':>10} {now.get('p95_ms', 0):>10.2f}  no baseline")
+            continue
+        problems = []
+        if now["throughput_rps"] < base["throughput_rps"] * (1 - tolerance):
+            problems.append("throughput")
+        if now["p95_ms"] > base["p95_ms"] * (1 + tolerance):
+            problems.append("p95")
+        if now["errors"] > base["errors"]:
+            problems.append("errors")
+        verdict = "REGRESSION (" + ", ".join(problems) + ")" if problems else "ok"
+        print(f"{name:<18} {base['throughput_rps']:>10.1f} {now['throughput_rps']:>10.1f} "
+              f"{base['p95_ms']:>10.2f} {now['p95_ms']:>10.2f}  {verdict}")
+        if problems:
+            regressions.append(name)
+    return regressions
+
+
+def git_revision():
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True)
+        return out.stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url")
+    parser.add_argument("--profiles", type=int, default=5000)
+    parser.add_argument("--sessions", type=int, default=50000)
+    parser.add_argument("--strategies", type=int, default=20000)
+    parser.add_argument("-c", "--concurrency", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=10.0, help="Measured seconds per scenario")
+    parser.add_argument("--warmup", type=float, default=2.0, help="Unmeasured seconds before each scenario")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn worker processes")
+    parser.add_argument("--gotrue-latency-ms", type=float, default=0.0)
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=SCENARIOS)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--out", default="loadtest-results.json")
+    parser.add_argument("--compare", help="Baseline result file to check against")
+    parser.add_argument("--tolerance", type=float, default=0.10)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="loadtest-")
+    database_url = args.database_url or f"sqlite:///{workdir}/loadtest.db"
+    # Configure before anything from 'app' is imported
+    os.environ.update(DATABASE_URL=database_url, ENV_FILE="", DEFAULT_BROKER="simulated")
+
+    start = time.perf_counter()
+    profiles, counts = seed(args)
+    print(f"seeded {counts} in {time.perf_counter() - start:.1f} s")
+
+    users_file = os.path.join(workdir, "users.json")
+    with open(users_file, "w") as f:
+        json.dump({p["email"]: str(p["id"]) for p in profiles}, f)
+
+    gotrue_port, api_port = free_port(), free_port()
+    stub = subprocess.Popen(
+        [sys.executable, "-m", "benchmarks.stub_gotrue", "--port", str(gotrue_port),
+         "--latency-ms", str(args.gotrue_latency_ms), "--users", users_file],
+        stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+    )
+    # Rate limits off: every simulated user comes from one address, and list_users runs on one admin token
+    env = dict(os.environ, SUPABASE_URL=f"http://127.0.0.1:{gotrue_port}", SUPABASE_KEY="loadtest",
+               SUPABASE_JWT_SECRET=STUB_JWT_SECRET, RATE_LIMIT_USER_PER_SECOND="0", RATE_LIMIT_IP_PER_SECOND="0")
+    api = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(api_port),
+         "--workers", str(args.workers), "--log-level", "warning", "--backlog", "4096"],
+        env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+    )
+    try:
+        wait_ready(f"http://127.0.0.1:{gotrue_port}/auth/v1/.well-known/jwks.json", stub)
+        wait_ready(f"http://127.0.0.1:{api_port}/", api)
+
+        print(f"{'scenario':<18} {'requests':>8} {'errors':>7} {'rps':>10} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+        scenarios = asyncio.run(drive(args, f"http://127.0.0.1:{api_port}", profiles))
+    finally:
+        api.terminate()
+        stub.terminate()
+        api.wait()
+        stub.wait()
+
+    result = {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "git_revision": git_revision(),
+            "database": database_url.split(":", 1)[0],
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "cpus": os.cpu_count(),
+            "concurrency": args.concurrency,
+            "duration_s": args.duration,
+            "workers": args.workers,
+            "gotrue_latency_ms": args.gotrue_latency_ms,
+            "seeded": counts,
+        },
+        "scenarios": scenarios,
+    }
+    with open(args.out, "w") as f:
+        json.dump(result, f, indent=2)
+    print(f"results written to {args.out}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(result, baseline, args.tolerance)
+        if regressions:
+            print(f"regressions: {', '.join(regressions)}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+"""
+Minimal local stand-in for Supabase Auth (GoTrue), for benchmarks.
+
+Implements just the endpoints the backend calls. Access tokens are HS256
+JWTs signed with STUB_JWT_SECRET, so point SUPABASE_JWT_SECRET at it.
+
+    python -m benchmarks.stub_gotrue --port 9999 --latency-ms 20 [--users users.json]
+
+--users takes a JSON object {email: user id} of already registered users, so
+logins return the ids the seeded profiles were created with.
+"""
+import argparse
+import asyncio
+import json
+import threading
+import time
+import uuid
+
+import jwt
+import uvicorn
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+
+STUB_JWT_SECRET = "stub-gotrue-secret-0123456789abcdef"
+
+
+def make_access_token(user_id, email, ttl=3600):
+    now = int(time.time())
+    claims = {
+        "sub": str(user_id),
+        "email": email,
+        "aud": "authenticated",
+        "role": "authenticated",
+        "session_id": str(uuid.uuid4()),
+        "iat": now,
+        "exp": now + ttl,
+    }
+    return jwt.encode(claims, STUB_JWT_SECRET, algorithm="HS256")
+
+
+def build_app(latency_ms=0.0, users=None):
+    # email -> user id, so logins return the same id the profile was created with
+    users = dict(users or {})
+    delay = latency_ms / 1000.0
+
+    async def simulate_latency():
+        if delay:
+            await asyncio.sleep(delay)
+
+    async def token(request):
+        await simulate_latency()
+        body = await request.json()
+        email = body.get("email")
+        user_id = users.setdefault(email, str(uuid.uuid4()))
+        return JSONResponse({
+            "access_token": make_access_token(user_id, email),
+            "token_type": "bearer",
+            "expires_in": 3600,
+            "user": {"id": user_id, "email": email},
+        })
+
+    async def admin_users(request):
+        await simulate_latency()
+        body = await request.json()
+        email = body.get("email")
+        if email in users:
+            return JSONResponse({"msg": "User already registered"}, status_code=422)
+        users[email] = str(uuid.uuid4())
+        return JSONResponse({"id": users[email], "email": email})
+
+    async def delete_admin_user(request):
+        await simulate_latency()
+        user_id = request.path_params["user_id"]
+        for email, registered in list(users.items()):
+            if registered == user_id:
+                del users[email]
+                return JSONResponse({})
+        return JSONResponse({"msg": "User not found"}, status_code=404)
+
+    async def user(request):
+        await simulate_latency()
+        auth = request.headers.get("authorization", "")
+        try:
+            claims = jwt.decode(auth.removeprefix("Bearer "), STUB_JWT_SECRET,
+                                algorithms=["HS256"], audience="authenticated")
+        except jwt.PyJWTError:
+            return JSONResponse({"msg": "invalid JWT"}, status_code=401)
+        return JSONResponse({"id": claims["sub"], "email": claims.get("email")})
+
+    async def jwks(request):
+        await simulate_latency()
+        return JSONResponse({"keys": []})
+
+    return Starlette(routes=[
+        Route("/auth/v1/token", token, methods=["POST"]),
+        Route("/auth/v1/admin/users", admin_users, methods=["POST"]),
+        Route("/auth/v1/admin/users/{user_id}", delete_admin_user, methods=["DELETE"]),
+        Route("/auth/v1/user", user, methods=["GET"]),
+        Route("/auth/v1/.well-known/jwks.json", jwks, methods=["GET"]),
+    ])
+
+
+class StubServer:
+    """Runs the stub in a background thread: `with StubServer(port) as url: ...`"""
+
+    def __init__(self, port=9999, latency_ms=0.0, users=None):
+        self.port = port
+        config = uvicorn.Config(build_app(latency_ms, users), host="127.0.0.1", port=port,
+                                log_level="warning", backlog=4096)
+        self.server = uvicorn.Server(config)
+        self.thread = threading.Thread(target=self.server.run, daemon=True)
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.port}"
+
+    def __enter__(self):
+        self.thread.start()
+        while not self.server.started:
+            time.sleep(0.01)
+        return self.url
+
+    def __exit__(self, *exc):
+        self.server.should_exit = True
+        self.thread.join()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--port", type=int, default=9999)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--users", help="JSON file {email: user id}")
+    args = parser.parse_args()
+    users = None
+    if args.users:
+        with open(args.users) as f:
+            users = json.load(f)
+    uvicorn.run(build_app(args.latency_ms, users), host="127.0.0.1", port=args.port,
+                log_level="warning", backlog=4096)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""
+Minimal local stand-in for the Telegram Bot API (sendMessage only), for
+benchmarks and manual testing of app/alerts.py.
+
+Enforces Telegram-like flood limits: more than --global-rate messages in
+any second, or two messages to one chat closer than 1/--chat-rate seconds,
+get a 429 with parameters.retry_after. Chat ids starting with 'blocked'
+get a 403 (bot blocked by the user).
+
+    python -m benchmarks.stub_telegram --port 9998 --latency-ms 30
+    TELEGRAM_BOT_TOKEN=stub TELEGRAM_API_URL=http://127.0.0.1:9998 uvicorn app.main:app
+
+GET /stats returns what was received.
+"""
+import argparse
+import asyncio
+import threading
+import time
+from collections import defaultdict, deque
+
+import uvicorn
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+
+# Real limits are fuzzy; don't punish a client for a few ms of network jitter
+SLACK = 0.9
+
+
+def build_app(latency_ms=0.0, global_rate=30.0, chat_rate=1.0):
+    delay = latency_ms / 1000.0
+    recent = deque()                # Send times within the last second (all chats)
+    last_by_chat = {}
+    stats = {"messages": 0, "rate_limited": 0, "blocked": 0, "chats": defaultdict(int)}
+
+    def flooded(chat_id, now):
+        while recent and now - recent[0] > 1.0:
+            recent.popleft()
+        if len(recent) >= global_rate / SLACK:
+            return 1
+        last = last_by_chat.get(chat_id)
+        if last is not None and now - last < SLACK / chat_rate:
+            return max(1, round(1.0 / chat_rate))
+        return 0
+
+    async def send_message(request):
+        if delay:
+            await asyncio.sleep(delay)
+        body = await request.json()
+        chat_id = str(body.get("chat_id"))
+        if chat_id.startswith("blocked"):
+            stats["blocked"] += 1
+            return JSONResponse({"ok": False, "error_code": 403,
+                                 "description": "Forbidden: bot was blocked by the user"}, status_code=403)
+
+        now = time.monotonic()
+        retry_after = flooded(chat_id, now)
+        if retry_after:
+            stats["rate_limited"] += 1
+            return JSONResponse({"ok": False, "error_code": 429,
+                                 "description": f"Too Many Requests: retry after {retry_after}",
+                                 "parameters": {"retry_after": retry_after}}, status_code=429)
+
+        recent.append(now)
+        last_by_chat[chat_id] = now
+        stats["messages"] += 1
+        stats["chats"][chat_id] += 1
+        return JSONResponse({"ok": True, "result": {"message_id": stats["messages"],
+                                                    "chat": {"id": chat_id}, "text": body.get("text")}})
+
+    async def read_stats(request):
+        return JSONResponse({"messages": stats["messages"], "rate_limited": stats["rate_limited"],
+                             "blocked": stats["blocked"], "chats": len(stats["chats"])})
+
+    return Starlette(routes=[
+        Route("/bot{token}/sendMessage", send_message, methods=["POST"]),
+        Route("/stats", read_stats, methods=["GET"]),
+    ])
+
+
+class StubServer:
+    """Runs the stub in a background thread: `with StubServer(port) as url: ...`"""
+
+    def __init__(self, port=9998, latency_ms=0.0, global_rate=30.0, chat_rate=1.0):
+        self.port = port
+        config = uvicorn.Config(build_app(latency_ms, global_rate, chat_rate), host="127.0.0.1", port=port,
+                                log_level="warning", backlog=4096)
+        self.server = uvicorn.Server(config)
+        self.thread = threading.Thread(target=self.server.run, daemon=True)
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.port}"
+
+    def __enter__(self):
+        self.thread.start()
+        while not self.server.started:
+            time.sleep(0.01)
+        return self.url
+
+    def __exit__(self, *exc):
+        self.server.should_exit = True
+        self.thread.join()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=9998)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--global-rate", type=float, default=30.0)
+    parser.add_argument("--chat-rate", type=float, default=1.0)
+    args = parser.parse_args()
+    uvicorn.run(build_app(args.latency_ms, args.global_rate, args.chat_rate), host="127.0.0.1",
+                port=args.port, log_level="warning", backlog=4096)
+
+
+if __name__ == "__main__":
+    main()
@@ -14,7 +14,22 @@ api.interceptors.request.use((config) => {
     if (token) {
         config.headers.Authorization = `Bearer ${token}`;
     }
+    // Read-your-writes: while our last write may not have reached the read
+    // replica, the API reads from the primary for us (on any worker)
+    const lastWrite = localStorage.getItem('last_write');
+    if (lastWrite) {
+        config.headers['X-Last-Write'] = lastWrite;
+    }
     return config;
 });
 
+// Remember when the API last committed a write of ours
+api.interceptors.response.use((response) => {
+    const lastWrite = response.headers['x-last-write'];
+    if (lastWrite) {
+        localStorage.setItem('last_write', lastWrite);
+    }
+    return response;
+});
+
 export default api;
\ No newline at end of file